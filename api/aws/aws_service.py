@@ -2,10 +2,11 @@ from api.cloud_services import CloudService
 from sdk.aws.ec2 import EC2Helper
 
 
-def aws_get_service(service: str, type: str, state: str):
+def aws_get_service(service: str, type: str, state: str, fresh: bool = False):
     query_dict = {}
     query_dict["state"] = state
     query_dict["type"] = type
+    query_dict["fresh"] = fresh
     aws_helper = EC2Helper()
     if service == CloudService.vms:
         instances = aws_helper.list_instances(query_dict)
@@ -5,6 +5,6 @@ router = APIRouter()
 
 
 @router.get("/{service}")
-def aws_router(service: str, type: str, state: str):
+def aws_router(service: str, type: str, state: str, fresh: bool = False):
     if service == "vms":
-        return aws_get_service(service=service, type=type, state=state)
+        return aws_get_service(service=service, type=type, state=state, fresh=fresh)
@@ -0,0 +1,107 @@
+"""
+Micro-benchmark for per-message command parsing.
+
+Compares the old per-call regex construction (done twice per message, plus rebuilding the
+command table of lambdas) with the precompiled ``command_router`` and reports the cost per
+message and the share of one CPU core it takes at 1k and 10k messages/sec.
+
+Usage:
+    python -m benchmarks.bench_command_router [--iterations=N]
+"""
+
+import argparse
+import re
+import sys
+import timeit
+from unittest.mock import Mock
+
+# Mock config module so that no connections are made at import time (same as the tests)
+sys.modules.setdefault("config", Mock())
+sys.modules.setdefault("gspread", Mock())
+
+import slack_handlers.handlers  # noqa: E402,F401  (populates COMMAND_REGISTRY)
+from sdk.tools.help_system import COMMAND_REGISTRY  # noqa: E402
+from sdk.tools.helpers import match_command, parse_parameters_line  # noqa: E402
+
+MESSAGES = [
+    "aws vm list --state=running,stopped --type=t2.micro",
+    "openstack vm create --name=test --os_name=fedora --flavor=ci.cpu.small --key_pair=new",
+    "gcp vm modify --stop --vm-name=vm-abc12345",
+    "rota --check --release=4.15.1",
+    "hello",
+    "aws vm creaate --os_name=linux",
+]
+
+RATES = (1_000, 10_000)
+
+
+def _legacy_match(command_line):
+    commands_pattern = "|".join(map(re.escape, COMMAND_REGISTRY))
+    pattern = re.compile(
+        r"^(?P<base_command>help$|"
+        r"(?:(help\s)?"
+        r"(" + commands_pattern + r")"
+        r"(\s(?:help|h))?)"
+        r")\b"
+        r"(?P<params>.*)"
+    )
+    return pattern.match(command_line)
+
+
+def legacy_route(command_line):
+    match = _legacy_match(command_line)  # get_base_command
+    base_command = match.group("base_command").strip() if match else None
+    match = _legacy_match(command_line)  # get_parameters_line
+    params_line = match.group("params").strip() if match else None
+    commands = {name: (lambda: None) for name in COMMAND_REGISTRY}
+    return commands.get(base_command), params_line
+
+
+def router_route(command_line):
+    match = match_command(command_line)
+    if not match:
+        return None, None
+    return match.handler, match.params_line
+
+
+def legacy_parse(command_line):
+    _, params_line = legacy_route(command_line)
+    return parse_parameters_line(params_line)
+
+
+def router_parse(command_line):
+    _, params_line = router_route(command_line)
+    return parse_parameters_line(params_line)
+
+
+def _per_message_us(func, iterations):
+    def run():
+        for message in MESSAGES:
+            func(message)
+
+    run()  # warm up (compiles the router once)
+    best = min(timeit.repeat(run, number=iterations, repeat=5))
+    return best / (iterations * len(MESSAGES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"Registered commands: {len(COMMAND_REGISTRY)}")
+    print(f"{'variant':<26} {'us/msg':>8} " + " ".join(f"{r:>9}/s" for r in RATES))
+    for label, func in (
+        ("legacy route", legacy_route),
+        ("router route", router_route),
+        ("legacy route + params", legacy_parse),
+        ("router route + params", router_parse),
+    ):
+        cost_us = _per_message_us(func, args.iterations)
+        cpu = " ".join(f"{cost_us * rate / 1e6:>10.1%}" for rate in RATES)
+        print(f"{label:<26} {cost_us:>8.2f} {cpu}")
+    print("Columns under each rate show the share of one CPU core spent parsing.")
+
+
+if __name__ == "__main__":
+    main()
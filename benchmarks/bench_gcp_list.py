@@ -0,0 +1,351 @@
+"""
+Benchmark for ``gcp vm list`` against a local fake Compute Engine API.
+
+The fake is an HTTP server speaking the Compute REST API that ``compute_v1`` uses:
+``regions.get``, ``instances.aggregatedList`` (every zone of the project, 500 instances per
+page) and ``instances.list`` of one zone, which applies the ``filter`` (parenthesized ``eq``
+regular expressions) and the ``x-goog-fieldmask`` header like Compute does. Each response
+waits for a fixed latency plus a cost per kilobyte sent. The benchmark compares the old
+listing (``aggregated_list`` of the whole project, filtered client-side) with
+``GCPHelper.list_instances`` (the region's zones listed concurrently, filtered by Compute,
+with a field mask), and reports the wall time, the number of requests and the bytes
+received.
+
+Usage:
+    python -m benchmarks.bench_gcp_list [--instances=N] [--regions=N]
+        [--latency-ms=MS] [--per-kb-us=US]
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock
+from urllib.parse import parse_qs, urlparse
+
+# Mock config module so that no connections are made at import time (same as the tests)
+sys.modules.setdefault("config", Mock())
+
+from google.api_core.client_options import ClientOptions  # noqa: E402
+from google.auth.credentials import AnonymousCredentials  # noqa: E402
+from google.cloud import compute_v1  # noqa: E402
+
+from sdk.gcp import compute_engine  # noqa: E402
+from sdk.gcp.compute_engine import GCPHelper  # noqa: E402
+from sdk.tools.client_registry import client_registry  # noqa: E402
+
+PROJECT = "bench-project"
+REGION = "us-central1"
+ZONE_SUFFIXES = ("a", "b", "c")
+OTHER_REGIONS = (
+    "europe-west1",
+    "europe-west4",
+    "asia-south1",
+    "asia-east1",
+    "us-east1",
+    "us-west1",
+    "southamerica-east1",
+    "australia-southeast1",
+)
+STATUSES = ("RUNNING", "TERMINATED", "STOPPING")
+MACHINE_TYPES = ("e2-medium", "e2-standard-4", "n2-standard-4", "n2-standard-8")
+BASE = "https://www.googleapis.com/compute/v1/projects/" + PROJECT
+MAX_RESULTS = 500
+LICENSE = (
+    "https://www.googleapis.com/compute/v1/projects/debian-cloud"
+    "/global/licenses/debian-12-bookworm"
+)
+
+
+def _instance(i, zone):
+    """An instance with roughly the fields and size Compute returns."""
+    return {
+        "kind": "compute#instance",
+        "id": str(1000000000000000000 + i),
+        "creationTimestamp": "2024-01-01T00:00:00.000-08:00",
+        "name": f"{'web' if i % 4 else 'batch'}-{i}",
+        "description": "",
+        "tags": {
+            "items": ["http-server", "https-server"],
+            "fingerprint": "42WmSpB8rSM=",
+        },
+        "machineType": f"{BASE}/zones/{zone}/machineTypes/"
+        + MACHINE_TYPES[i % len(MACHINE_TYPES)],
+        "status": STATUSES[i % len(STATUSES)],
+        "zone": f"{BASE}/zones/{zone}",
+        "canIpForward": False,
+        "networkInterfaces": [
+            {
+                "kind": "compute#networkInterface",
+                "network": f"{BASE}/global/networks/default",
+                "subnetwork": f"{BASE}/regions/{zone[:-2]}/subnetworks/default",
+                "networkIP": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+                "name": "nic0",
+                "accessConfigs": [
+                    {
+                        "kind": "compute#accessConfig",
+                        "type": "ONE_TO_ONE_NAT",
+                        "name": "External NAT",
+                        "natIP": f"34.1.{i // 256 % 256}.{i % 256}",
+                        "networkTier": "PREMIUM",
+                    }
+                ],
+                "fingerprint": "yYvOLVbxNRA=",
+                "stackType": "IPV4_ONLY",
+            }
+        ],
+        "disks": [
+            {
+                "kind": "compute#attachedDisk",
+                "type": "PERSISTENT",
+                "mode": "READ_WRITE",
+                "source": f"{BASE}/zones/{zone}/disks/disk-{i}",
+                "deviceName": f"disk-{i}",
+                "index": 0,
+                "boot": True,
+                "autoDelete": True,
+                "licenses": [LICENSE],
+                "interface": "SCSI",
+                "guestOsFeatures": [
+                    {"type": "UEFI_COMPATIBLE"},
+                    {"type": "VIRTIO_SCSI_MULTIQUEUE"},
+                    {"type": "GVNIC"},
+                ],
+                "diskSizeGb": "20",
+                "architecture": "X86_64",
+            }
+        ],
+        "metadata": {
+            "kind": "compute#metadata",
+            "fingerprint": "Z2W9gOsyPAo=",
+            "items": [
+                {"key": "ssh-keys", "value": "user:ssh-rsa " + "A" * 372 + " user"},
+                {"key": "startup-script", "value": "#!/bin/bash\napt-get update\n"},
+            ],
+        },
+        "serviceAccounts": [
+            {
+                "email": "123456789-compute@developer.gserviceaccount.com",
+                "scopes": ["https://www.googleapis.com/auth/cloud-platform"],
+            }
+        ],
+        "selfLink": f"{BASE}/zones/{zone}/instances/instance-{i}",
+        "scheduling": {
+            "onHostMaintenance": "MIGRATE",
+            "automaticRestart": True,
+            "preemptible": False,
+            "provisioningModel": "STANDARD",
+        },
+        "cpuPlatform": "Intel Broadwell",
+        "labels": {"architecture": "x86_64", "team": "bench"},
+        "labelFingerprint": "6Mqe2_B0K9M=",
+        "startRestricted": False,
+        "deletionProtection": False,
+        "shieldedInstanceConfig": {
+            "enableSecureBoot": False,
+            "enableVtpm": True,
+            "enableIntegrityMonitoring": True,
+        },
+        "fingerprint": "q2LhUh5Ot6g=",
+        "lastStartTimestamp": "2024-01-01T00:00:10.000-08:00",
+    }
+
+
+def _parse_mask(mask):
+    """``items(id,name),nextPageToken`` as ``{"items": {"id": {}, "name": {}}, ...}``."""
+    tree, stack, name = {}, [], ""
+    node = tree
+    for char in mask + ",":
+        if char in ",()" and name:
+            node[name.strip()] = {}
+        if char == "(":
+            stack.append(node)
+            node = node[name.strip()]
+        elif char == ")":
+            node = stack.pop()
+        if char in ",()":
+            name = ""
+        else:
+            name += char
+    return tree
+
+
+def _apply_mask(value, tree):
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_apply_mask(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {k: _apply_mask(v, tree[k]) for k, v in value.items() if k in tree}
+    return value
+
+
+def _parse_filter(expression):
+    """``(status eq "RUNNING|STOPPING") (name eq "web-.*")`` as ``[(field, regex)]``."""
+    return [
+        (field, re.compile(value.replace('\\"', '"')))
+        for field, value in re.findall(r'\((\w+) eq "((?:[^"\\]|\\.)*)"\)', expression)
+    ]
+
+
+class FakeCompute:
+    """Instances spread over the zones of several regions, served over HTTP."""
+
+    def __init__(self, count, regions, latency, per_kb):
+        self.latency = latency
+        self.per_kb = per_kb
+        self.requests = 0
+        self.received = 0
+        self._lock = threading.Lock()
+        region_names = (REGION,) + OTHER_REGIONS[: max(0, regions - 1)]
+        self.zones = [f"{r}-{s}" for r in region_names for s in ZONE_SUFFIXES]
+        self.by_zone = {zone: [] for zone in self.zones}
+        for i in range(count):
+            zone = self.zones[i % len(self.zones)]
+            self.by_zone[zone].append(_instance(i, zone))
+
+    def _page(self, instances, query):
+        start = int(query.get("pageToken", ["0"])[0] or 0)
+        size = int(query.get("maxResults", [MAX_RESULTS])[0])
+        token = str(start + size) if start + size < len(instances) else None
+        return instances[start : start + size], token
+
+    def respond(self, path, query, mask):
+        parts = path.strip("/").split("/")
+        # compute/v1/projects/{project}/...
+        rest = parts[4:]
+        if rest[0] == "regions":
+            zones = [z for z in self.zones if z.startswith(rest[1] + "-")]
+            body = {"name": rest[1], "zones": [f"{BASE}/zones/{z}" for z in zones]}
+        elif rest[:2] == ["aggregated", "instances"]:
+            pairs = [(z, i) for z in self.zones for i in self.by_zone[z]]
+            page, token = self._page(pairs, query)
+            items = {}
+            for zone, instance in page:
+                items.setdefault(f"zones/{zone}", {"instances": []})
+                items[f"zones/{zone}"]["instances"].append(instance)
+            body = {"items": items}
+            if token:
+                body["nextPageToken"] = token
+        else:
+            instances = self.by_zone.get(rest[1], [])
+            filters = _parse_filter(query.get("filter", [""])[0])
+            instances = [
+                instance
+                for instance in instances
+                if all(regex.fullmatch(instance[f]) for f, regex in filters)
+            ]
+            page, token = self._page(instances, query)
+            body = {"items": page}
+            if token:
+                body["nextPageToken"] = token
+        if mask:
+            body = _apply_mask(body, _parse_mask(mask))
+        data = json.dumps(body).encode()
+        time.sleep(self.latency + self.per_kb * len(data) / 1024)
+        with self._lock:
+            self.requests += 1
+            self.received += len(data)
+        return data
+
+    def serve(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                data = fake.respond(
+                    url.path,
+                    parse_qs(url.query),
+                    self.headers.get("x-goog-fieldmask"),
+                )
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def legacy_list(helper, params_dict):
+    """The old listing: ``aggregated_list`` of the project, filtered client-side."""
+    states = {s.lower() for s in params_dict.get("state", "").split(",") if s}
+    types = {t.lower() for t in params_dict.get("type", "").split(",") if t}
+    client = client_registry.gcp_client(compute_v1.InstancesClient)
+    request = compute_v1.AggregatedListInstancesRequest(
+        project=helper.project_id, max_results=MAX_RESULTS
+    )
+    instances = []
+    for zone_key, response in client.aggregated_list(request=request):
+        if not response.instances or not zone_key.startswith(f"zones/{helper.region}"):
+            continue
+        for instance in response.instances:
+            if states and instance.status.lower() not in states:
+                continue
+            if types and instance.machine_type.split("/")[-1] not in types:
+                continue
+            instances.append(helper._instance_to_info(instance, zone_key))
+    return {"count": len(instances), "instances": instances}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--instances", type=int, default=5000)
+    parser.add_argument("--regions", type=int, default=6)
+    parser.add_argument("--latency-ms", type=float, default=60.0)
+    parser.add_argument("--per-kb-us", type=float, default=100.0)
+    args = parser.parse_args()
+
+    fake = FakeCompute(
+        args.instances, args.regions, args.latency_ms / 1e3, args.per_kb_us / 1e6
+    )
+    server = fake.serve()
+    options = ClientOptions(api_endpoint=f"http://127.0.0.1:{server.server_port}")
+    clients = {
+        cls: cls(credentials=AnonymousCredentials(), client_options=options)
+        for cls in (compute_v1.InstancesClient, compute_v1.RegionsClient)
+    }
+    client_registry.gcp_client = clients.__getitem__
+
+    helper = GCPHelper.__new__(GCPHelper)
+    helper.project_id, helper.region = PROJECT, REGION
+
+    print(
+        f"{args.instances} instances in {len(fake.zones)} zones, "
+        f"{args.latency_ms:g} ms per request, {args.per_kb_us:g} us per KB"
+    )
+    print(f"{'variant':<36} {'seconds':>8} {'requests':>9} {'KB':>8} {'returned':>9}")
+    running = {"state": "running", "type": "e2-medium"}
+    for label, func, params in (
+        ("legacy region", legacy_list, {}),
+        ("per zone, cold zone cache", GCPHelper.list_instances, {}),
+        ("per zone", GCPHelper.list_instances, {}),
+        ("legacy running e2-medium", legacy_list, running),
+        ("per zone running e2-medium", GCPHelper.list_instances, running),
+    ):
+        if "cold" in label:
+            compute_engine._region_zones.clear()
+        fake.requests = fake.received = 0
+        started = time.perf_counter()
+        result = func(helper, params)
+        seconds = time.perf_counter() - started
+        print(
+            f"{label:<36} {seconds:>8.2f} {fake.requests:>9} "
+            f"{fake.received / 1024:>8.0f} {result['count']:>9}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
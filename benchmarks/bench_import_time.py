@@ -0,0 +1,124 @@
+"""
+Cold-start benchmark for the bot's import graph.
+
+Imports each module in a fresh interpreter with ``-X importtime`` and reports the median
+cumulative import time, the slowest imported packages and whether any of the deferred heavy
+modules (cloud SDKs, gspread) were loaded. Exits with status 1 if a module exceeds the budget
+or loads a deferred module, so it can guard cold start in CI.
+
+``config`` is replaced by a Mock (same as the tests), so its Vault/.env loading is not counted.
+
+Usage:
+    python -m benchmarks.bench_import_time [--runs=N] [--budget-ms=MS] [--top=N] [module ...]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["slack_handlers.handlers", "sdk.gsheet.gsheet"]
+
+# Must only be imported on first use (see ``sdk.tools.lazy``)
+DEFERRED_MODULES = {
+    "slack_handlers.handlers": [
+        "boto3",
+        "openstack",
+        "google.cloud.compute_v1",
+        "gspread",
+    ],
+    "sdk.gsheet.gsheet": ["gspread"],
+}
+
+IMPORT_SNIPPET = (
+    "import sys; from unittest.mock import Mock; "
+    "sys.modules.setdefault('config', Mock()); "
+    "import {module}"
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_once(module):
+    """
+    Return ``{package: cumulative_us}`` for ``module`` and everything it imported, from one
+    cold import (modules loaded by the snippet itself are left out).
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            IMPORT_SNIPPET.format(module=module),
+        ],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=False,  # a failed import is reported with its stderr below
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    # Children are printed (indented) before their parent, so the lines since the previous
+    # top-level import are what ``module`` pulled in.
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, package = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        name = package.strip()
+        timings[name] = int(cumulative)
+        if package[1:2] != " ":  # top-level import
+            if name == module:
+                return timings
+            timings = {}
+    return timings
+
+
+def bench(module, runs):
+    runs_timings = [_import_once(module) for _ in range(runs)]
+    total_ms = statistics.median(t.get(module, 0) for t in runs_timings) / 1000
+    last = runs_timings[-1]
+    top = sorted(((us, pkg) for pkg, us in last.items() if pkg != module), reverse=True)
+    deferred = [
+        name
+        for name in DEFERRED_MODULES.get(module, [])
+        if any(pkg == name or pkg.startswith(name + ".") for pkg in last)
+    ]
+    return total_ms, top, deferred
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"Median of {args.runs} cold imports, budget {args.budget_ms:.0f} ms")
+    for module in args.modules:
+        total_ms, top, deferred = bench(module, args.runs)
+        status = "OK"
+        if total_ms > args.budget_ms:
+            status = "OVER BUDGET"
+            failed = True
+        if deferred:
+            status = "LOADS DEFERRED MODULES"
+            failed = True
+        print(f"\n{module}: {total_ms:8.1f} ms  [{status}]")
+        for us, pkg in top[: args.top]:
+            print(f"    {us / 1000:8.1f} ms  {pkg}")
+        if deferred:
+            print(f"    imported at startup: {', '.join(deferred)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Benchmark for ``openstack vm list`` against a fake Nova with many servers.
+
+The fake compute proxy answers ``servers(status=, limit=, marker=)`` like Nova does (newest
+first, at most ``max_limit`` servers per response, one status per request) and sleeps for a
+fixed latency per request plus a cost per returned server. It compares the old listing (the
+whole project, one status after the other, through openstacksdk's pagination) with
+``OpenStackHelper.iter_servers`` (statuses paged concurrently and merged), for the full
+listing and for the first page of ``--limit`` servers, and reports the wall time and the
+number of requests and servers transferred.
+
+Usage:
+    python -m benchmarks.bench_openstack_list [--servers=N] [--latency-ms=MS]
+        [--per-server-us=US] [--limit=N] [--page-size=N]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# Mock config module so that no connections are made at import time (same as the tests)
+sys.modules.setdefault("config", Mock())
+
+from sdk.openstack.core import OpenStackHelper  # noqa: E402
+
+STATUSES = ("ACTIVE", "SHUTOFF", "ERROR")
+# Share of the servers in each status
+STATUS_WEIGHTS = (0.7, 0.25, 0.05)
+# Nova's default ``[api] max_limit``
+NOVA_MAX_LIMIT = 1000
+
+
+class FakeCompute:
+    """Just enough of the compute proxy for listing servers, with simulated latency."""
+
+    def __init__(self, count, latency, per_server):
+        self.latency = latency
+        self.per_server = per_server
+        self.requests = 0
+        self.transferred = 0
+        self._lock = threading.Lock()
+        self._by_status = {status: [] for status in STATUSES}
+        boundaries = []
+        total = 0
+        for weight in STATUS_WEIGHTS:
+            total += weight
+            boundaries.append(total)
+        # Newest first, as Nova sorts by default
+        for i in reversed(range(count)):
+            position = (i * 7919 % count) / count
+            status = STATUSES[next(n for n, b in enumerate(boundaries) if position < b)]
+            self._by_status[status].append(
+                SimpleNamespace(
+                    id=f"{i:08x}-0000-4000-8000-000000000000",
+                    name=f"server-{i}",
+                    created_at=f"2024-01-01T00:00:00.{i:06d}Z",
+                    flavor={"original_name": "m1.small"},
+                    addresses={
+                        "private": [{"OS-EXT-IPS:type": "fixed", "addr": "10.0.0.1"}]
+                    },
+                    key_name="key",
+                    status=status,
+                )
+            )
+
+    def _request(self, status, limit, marker):
+        servers = self._by_status[status]
+        start = 0
+        if marker:
+            start = next(n for n, s in enumerate(servers) if s.id == marker) + 1
+        page = servers[start : start + min(limit or NOVA_MAX_LIMIT, NOVA_MAX_LIMIT)]
+        time.sleep(self.latency + self.per_server * len(page))
+        with self._lock:
+            self.requests += 1
+            self.transferred += len(page)
+        return page
+
+    def servers(self, status, limit=None, marker=None, paginated=True):
+        if not paginated:
+            return self._request(status, limit, marker)
+        return self._paginate(status, limit, marker)
+
+    def _paginate(self, status, limit, marker):
+        while True:
+            page = self._request(status, limit, marker)
+            yield from page
+            if not page:
+                return
+            marker = page[-1].id
+
+
+def legacy_list(helper, statuses, limit=None):
+    """The old listing: every server of each status, one status after the other."""
+    servers = []
+    for status in statuses:
+        servers += [
+            helper._server_to_info(s)
+            for s in helper.conn.compute.servers(status=status)
+        ]
+    return servers[:limit] if limit else servers
+
+
+def _run(func, compute, statuses, limit):
+    helper = OpenStackHelper.__new__(OpenStackHelper)
+    helper.conn = SimpleNamespace(compute=compute)
+    compute.requests = compute.transferred = 0
+    started = time.perf_counter()
+    servers = func(helper, statuses, limit)
+    return time.perf_counter() - started, len(servers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--servers", type=int, default=10_000)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--per-server-us", type=float, default=50.0)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    compute = FakeCompute(args.servers, args.latency_ms / 1e3, args.per_server_us / 1e6)
+    print(
+        f"{args.servers} servers, {args.latency_ms:g} ms per request, "
+        f"{args.per_server_us:g} us per server, page size {args.page_size}"
+    )
+    print(
+        f"{'variant':<34} {'seconds':>8} {'requests':>9} {'servers':>8} {'returned':>9}"
+    )
+
+    def paged(helper, statuses, limit):
+        return list(
+            helper.iter_servers(statuses, limit=limit, page_size=args.page_size)
+        )
+
+    for label, func, statuses, limit in (
+        ("legacy ACTIVE", legacy_list, ["ACTIVE"], None),
+        ("paged ACTIVE", paged, ["ACTIVE"], None),
+        ("legacy all statuses", legacy_list, STATUSES, None),
+        ("paged all statuses", paged, STATUSES, None),
+        (f"legacy all statuses, first {args.limit}", legacy_list, STATUSES, args.limit),
+        (f"paged all statuses, first {args.limit}", paged, STATUSES, args.limit),
+    ):
+        seconds, returned = _run(func, compute, statuses, limit)
+        print(
+            f"{label:<34} {seconds:>8.2f} {compute.requests:>9} "
+            f"{compute.transferred:>8} {returned:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,176 +1,363 @@
-import boto3
 from config import config
-from sdk.tools.helpers import get_list_of_values_for_key_in_dict_of_parameters
+from sdk.aws.inventory import instance_inventory
+from sdk.aws.topology import topology_resolver
+from sdk.tools.cache import TTLCache
+from sdk.tools.client_registry import client_registry
+from sdk.tools.helpers import (
+    get_config_value,
+    get_list_of_values_for_key_in_dict_of_parameters,
+)
+from sdk.tools.waiter import WaitError, tcp_reachable, wait_for, wait_for_ssh
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+import itertools
 import logging
 import random
+import re
 import string
 import traceback
 import botocore
 
 logger = logging.getLogger(__name__)
 
+# Enabled regions per AWS account, from describe_regions (they rarely change)
+_regions_cache = TTLCache(maxsize=16, ttl=3600)
+
+# vCPUs per instance type, from describe_instance_types (they do not change)
+_instance_type_vcpus = TTLCache(maxsize=1024, ttl=24 * 3600)
+
+# Same limit as boto3's ``wait_until_running`` (40 polls, 15 seconds apart)
+INSTANCE_RUNNING_TIMEOUT = 600
+
+# Service Quotas code of "Running On-Demand Standard (A, C, D, H, I, M, R, T, Z) instances",
+# a vCPU limit shared by the instance families below
+STANDARD_VCPU_QUOTA_CODE = "L-1216C47A"
+# Family = the letters before the generation digit, so that e.g. mac2, trn1, inf2, dl1,
+# hpc7g or u-6tb1 (which have quotas of their own) are not taken for m, t, i, d or h
+STANDARD_INSTANCE_FAMILIES = frozenset(
+    {"a", "c", "d", "h", "i", "im", "is", "m", "r", "t", "z"}
+)
+_INSTANCE_FAMILY = re.compile(r"([a-z]+)\d")
+
+
+def is_standard_instance_type(instance_type) -> bool:
+    """Whether ``instance_type`` (e.g. ``m5.large``) counts against the standard quota."""
+    family = _INSTANCE_FAMILY.match(instance_type or "")
+    return bool(family) and family.group(1) in STANDARD_INSTANCE_FAMILIES
+
 
 class EC2Helper:
     def __init__(self, region=None):
         self.region = region or config.AWS_DEFAULT_REGION
-        self.session = boto3.Session(
-            aws_access_key_id=config.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-            region_name=self.region,
-        )
+        # Session and clients are shared across helpers for the same region and credentials
+        self.session = client_registry.aws_session(self.region)
         logger.info(f"Region set for session: {self.region}")
 
-    def list_instances(self, params_dict=None):
+    @staticmethod
+    def _instance_to_info(instance):
+        """Map a ``describe_instances`` instance to the instance info dict."""
+        instance_state_name = instance.get("State", {}).get("Name", "")
+
+        # Tags is a list and each element in the list is a dictionary
+        ec2_instance_name = ""
+        ec2_architecture = ""
+        for tag in instance.get("Tags", []):
+            key = tag.get("Key", "")
+            value = tag.get("Value", "")
+            if key == "Name":
+                ec2_instance_name = value
+            elif key == "architecture":
+                ec2_architecture = value
+
+        # Create a formatted string with instance details
+        return {
+            "name": ec2_instance_name,
+            "architecture": ec2_architecture,
+            "instance_id": instance.get("InstanceId", ""),
+            "image_id": instance.get("ImageId", ""),
+            "instance_type": instance.get("InstanceType", ""),
+            "key_name": instance.get("KeyName", ""),
+            "vpc_id": instance.get("VpcId", ""),
+            "public_ip": instance.get("PublicIpAddress", "N/A"),
+            "private_ip": instance.get("PrivateIpAddress", "N/A"),
+            "state": instance_state_name,
+        }
+
+    def iter_instances(self, params_dict=None, page_size=None):
         """
-        get all EC2 instances in the specified region.
-        returns a dictionary with information on server instances
+        Yield EC2 instances in the specified region one at a time, following ``NextToken``
+        so that large accounts are not truncated. Pages of ``page_size`` instances
+        (default ``AWS_LIST_PAGE_SIZE``) are only fetched as the caller consumes them, so
+        stopping early skips the remaining API calls.
         """
         if params_dict is None:
             params_dict = {}
         try:
-            ec2 = self.session.client("ec2")
+            ec2 = client_registry.aws_client("ec2", self.region)
 
             # instance ids to retrieve
             instance_ids = get_list_of_values_for_key_in_dict_of_parameters(
                 "instance-ids", params_dict
             )
 
-            filters = []
-            state_filters = get_list_of_values_for_key_in_dict_of_parameters(
-                "state", params_dict
-            )
-            if state_filters:
-                filters.append({"Name": "instance-state-name", "Values": state_filters})
-
-            instance_type_filters = get_list_of_values_for_key_in_dict_of_parameters(
-                "type", params_dict
-            )
-            if instance_type_filters:
-                filters.append(
-                    {"Name": "instance-type", "Values": instance_type_filters}
-                )
-
-            response = ec2.describe_instances(InstanceIds=instance_ids, Filters=filters)
+            filters = self._filters_from_params(params_dict)
+            # Owners not sent to AWS because --name took the Name tag filter
+            check_owner = []
+            if get_list_of_values_for_key_in_dict_of_parameters("name", params_dict):
+                check_owner = [
+                    f"{owner}-*"
+                    for owner in get_list_of_values_for_key_in_dict_of_parameters(
+                        "owner", params_dict
+                    )
+                ]
         except Exception as e:
             logger.error(f"Unable to get instances description from AWS: {e}")
             raise e
 
-        instances_info = []
-
-        if response:
-            reservations = response.get("Reservations", [])
-            for reservation in reservations:
+        request = {"InstanceIds": instance_ids, "Filters": filters}
+        # MaxResults cannot be combined with InstanceIds; AWS accepts 5 to 1000
+        if not instance_ids:
+            if page_size is None:
+                page_size = get_config_value("AWS_LIST_PAGE_SIZE", 500)
+            request["MaxResults"] = min(1000, max(5, int(page_size)))
+
+        while True:
+            try:
+                response = ec2.describe_instances(**request)
+            except Exception as e:
+                logger.error(f"Unable to get instances description from AWS: {e}")
+                raise e
+
+            for reservation in response.get("Reservations", []):
                 for instance in reservation.get("Instances", []):
-                    instance_state_name = instance.get("State", {}).get("Name", "")
-
-                    # Tags is a list and each element in the list is a dictionary
-                    ec2_instance_name = ""
-                    ec2_architecture = ""
-                    for tag in instance.get("Tags", []):
-                        key = tag.get("Key", "")
-                        value = tag.get("Value", "")
-                        if key == "Name":
-                            ec2_instance_name = value
-                        elif key == "architecture":
-                            ec2_architecture = value
-
-                    # Create a formatted string with instance details
-                    instance_info = {
-                        "name": ec2_instance_name,
-                        "architecture": ec2_architecture,
-                        "instance_id": instance.get("InstanceId", ""),
-                        "image_id": instance.get("ImageId", ""),
-                        "instance_type": instance.get("InstanceType", ""),
-                        "key_name": instance.get("KeyName", ""),
-                        "vpc_id": instance.get("VpcId", ""),
-                        "public_ip": instance.get("PublicIpAddress", "N/A"),
-                        "private_ip": instance.get("PrivateIpAddress", "N/A"),
-                        "state": instance_state_name,
-                    }
-                    instances_info.append(instance_info)
-
-        # return a dictionary that contains the instances_info array and the count of server instances
-        return {"count": len(instances_info), "instances": instances_info}
-
-    def _get_custom_vpc_id(self, vpc_name="openshift-sustaining-vpc"):
+                    info = self._instance_to_info(instance)
+                    if check_owner and not any(
+                        fnmatch.fnmatchcase(info["name"], p) for p in check_owner
+                    ):
+                        continue
+                    yield info
+
+            next_token = response.get("NextToken")
+            if not next_token:
+                return
+            request["NextToken"] = next_token
+
+    @staticmethod
+    def _filters_from_params(params_dict) -> list:
         """
-        Get the custom VPC ID based on the VPC Name or Tag.
+        ``describe_instances`` filters for the list parameters, so that AWS only returns
+        the matching instances. Values may use the ``*`` and ``?`` wildcards.
+
+        * ``state``, ``type``, ``key`` (key pair name) and ``vpc`` (VPC ID) filter on those
+          attributes, ``name`` on the Name tag;
+        * ``owner`` matches the Name tags the bot gives (``<owner>-<suffix>``). With ``name``
+          also given only ``name`` is sent, as both would filter the same tag, and
+          ``iter_instances`` checks the owner itself;
+        * ``tag`` takes ``key=value`` pairs, or just ``key`` for any value.
+
+        Comma-separated values of one parameter match any of them; different parameters
+        (and different tag keys) must all match.
         """
-        ec2_client = self.session.client("ec2")
+        filters = []
+        for param, filter_name in (
+            ("state", "instance-state-name"),
+            ("type", "instance-type"),
+            ("name", "tag:Name"),
+            ("key", "key-name"),
+            ("vpc", "vpc-id"),
+        ):
+            values = get_list_of_values_for_key_in_dict_of_parameters(
+                param, params_dict
+            )
+            if values:
+                filters.append({"Name": filter_name, "Values": values})
 
-        try:
-            # Describe VPCs and filter by Name tag (or any other criteria)
-            response = ec2_client.describe_vpcs(
-                Filters=[{"Name": "tag:Name", "Values": [vpc_name]}]
+        owners = get_list_of_values_for_key_in_dict_of_parameters("owner", params_dict)
+        if owners and not any(f["Name"] == "tag:Name" for f in filters):
+            filters.append(
+                {"Name": "tag:Name", "Values": [f"{owner}-*" for owner in owners]}
             )
-            vpcs = response.get("Vpcs", [])
-            if not vpcs:
-                raise Exception(f"No VPC found with name/tag '{vpc_name}'.")
 
-            return vpcs[0]["VpcId"]
-        except Exception as e:
-            logger.error(f"Error fetching custom VPC ID: {e}")
-            raise
+        tag_values = {}
+        for tag in get_list_of_values_for_key_in_dict_of_parameters("tag", params_dict):
+            key, _, value = tag.partition("=")
+            tag_values.setdefault(key.strip(), []).append(value.strip() or "*")
+        for key, values in tag_values.items():
+            if "*" in values:
+                filters.append({"Name": "tag-key", "Values": [key]})
+            else:
+                filters.append({"Name": f"tag:{key}", "Values": values})
+        return filters
 
-    def _get_subnet_ids(self, vpc_id):
+    def list_instances(self, params_dict=None, limit=None):
         """
-        Get the subnet IDs associated with the given VPC.
+        get all EC2 instances in the specified region (or the first ``limit`` of them).
+        returns a dictionary with information on server instances; ``truncated`` is set
+        when more instances matched than ``limit``
+        When the inventory is enabled (see ``sdk.aws.inventory``) the instances come from
+        its in-memory snapshot and ``snapshot_age`` is set, unless ``fresh`` is passed.
+        """
+        # The inventory does not keep tags, so tag filters are always run by AWS
+        if (
+            instance_inventory.enabled
+            and not (params_dict or {}).get("fresh")
+            and not (params_dict or {}).get("tag")
+        ):
+            return instance_inventory.list_instances(self.region, params_dict, limit)
+
+        instances = self.iter_instances(params_dict)
+        if not limit:
+            instances_info = list(instances)
+            # return a dictionary that contains the instances_info array and the count of server instances
+            return {"count": len(instances_info), "instances": instances_info}
+
+        # Read one extra instance to tell whether the listing was cut short
+        instances_info = list(itertools.islice(instances, limit + 1))
+        instances.close()
+        result = {
+            "count": min(len(instances_info), limit),
+            "instances": instances_info[:limit],
+        }
+        if len(instances_info) > limit:
+            result["truncated"] = True
+        return result
+
+    def list_regions(self):
+        """
+        Names of the regions enabled for the account, sorted. The result is cached for
+        ``AWS_REGIONS_CACHE_TTL`` seconds (default one hour).
         """
-        ec2_client = self.session.client("ec2")
-
-        try:
-            # Describe subnets in the VPC
-            response = ec2_client.describe_subnets(
-                Filters=[{"Name": "vpc-id", "Values": [vpc_id]}]
-            )
-            if not response["Subnets"]:
-                raise Exception(f"No subnets found for VPC '{vpc_id}'.")
 
-            # Extract subnet IDs from the response
-            subnet_ids = [subnet["SubnetId"] for subnet in response["Subnets"]]
-            logger.info(f"Found subnets: {subnet_ids}")  # Log the subnets found
-            return subnet_ids
+        def load():
+            ec2 = client_registry.aws_client("ec2", self.region)
+            response = ec2.describe_regions()
+            return sorted(r["RegionName"] for r in response.get("Regions", []))
 
-        except Exception as e:
-            logger.error(f"Error fetching subnet IDs: {e}")
-            raise
+        return _regions_cache.get_or_set(
+            config.AWS_ACCESS_KEY_ID,
+            load,
+            ttl=get_config_value("AWS_REGIONS_CACHE_TTL", 3600),
+        )
 
-    def _get_security_group_id(self, sec_group_name):
+    def list_instances_in_regions(self, regions, params_dict=None, limit=None):
         """
-        Get the security group ID for the VPC.
+        List EC2 instances in several regions concurrently, on a pool of at most
+        ``AWS_REGION_CONCURRENCY`` threads (default 8) sharing the registry's clients.
+        Every instance gets a ``region`` key. Regions that fail are reported in ``errors``
+        (region -> message) instead of failing the whole listing.
         """
-        ec2_client = self.session.client("ec2")
+        regions = list(dict.fromkeys(regions))  # drop duplicates, keep the order
+        results = {}
+        errors = {}
 
-        try:
-            # Describe security groups in the VPC
-            response = ec2_client.describe_security_groups(
-                Filters=[{"Name": "tag:Name", "Values": [sec_group_name]}]
+        def list_region(region):
+            helper = self if region == self.region else EC2Helper(region=region)
+            return helper.list_instances(params_dict, limit=limit)
+
+        if regions:
+            max_workers = min(
+                len(regions), get_config_value("AWS_REGION_CONCURRENCY", 8)
             )
-            security_groups = response["SecurityGroups"]
+            with ThreadPoolExecutor(
+                max_workers=max(1, max_workers), thread_name_prefix="ec2-regions"
+            ) as executor:
+                futures = {
+                    region: executor.submit(list_region, region) for region in regions
+                }
+                for region, future in futures.items():
+                    try:
+                        results[region] = future.result()
+                    except (
+                        botocore.exceptions.ClientError,
+                        botocore.exceptions.BotoCoreError,
+                    ) as e:
+                        logger.error(f"Unable to list EC2 instances in {region}: {e}")
+                        errors[region] = str(e)
 
-            if not security_groups:
-                raise Exception(
-                    f"No security group found with name '{sec_group_name}'."
+        instances_info = []
+        truncated = False
+        for region in regions:
+            result = results.get(region)
+            if result is None:
+                continue
+            truncated = truncated or result.get("truncated", False)
+            for instance_info in result["instances"]:
+                instance_info["region"] = region
+                instances_info.append(instance_info)
+
+        if limit and len(instances_info) > limit:
+            instances_info = instances_info[:limit]
+            truncated = True
+        merged = {"count": len(instances_info), "instances": instances_info}
+        if truncated:
+            merged["truncated"] = True
+        if errors:
+            merged["errors"] = errors
+        return merged
+
+    def instance_type_vcpus(self, instance_types) -> dict:
+        """Default vCPUs of each instance type (cached), via ``describe_instance_types``."""
+        missing = sorted(
+            {t for t in instance_types if _instance_type_vcpus.get(t) is None}
+        )
+        if missing:
+            ec2 = client_registry.aws_client("ec2", self.region)
+            # AWS takes at most 100 instance types per call
+            for start in range(0, len(missing), 100):
+                response = ec2.describe_instance_types(
+                    InstanceTypes=missing[start : start + 100]
                 )
+                for info in response.get("InstanceTypes", []):
+                    _instance_type_vcpus.set(
+                        info["InstanceType"], info["VCpuInfo"]["DefaultVCpus"]
+                    )
+        return {t: _instance_type_vcpus.get(t) for t in instance_types}
 
-            sg_id = security_groups[0]["GroupId"]
-            logger.info(
-                f"Found Security Group: {sg_id}"
-            )  # Log the security group found
-            return sg_id
+    def get_quota_usage(self) -> dict:
+        """
+        Limit and usage of the standard On-Demand vCPUs in the region, for the quota
+        preflight (see ``sdk.tools.quota``).
+        """
+        quotas = client_registry.aws_client("service-quotas", self.region)
+        response = quotas.get_service_quota(
+            ServiceCode="ec2", QuotaCode=STANDARD_VCPU_QUOTA_CODE
+        )
+        instance_types = [
+            instance["instance_type"]
+            for instance in self.list_instances({"state": "pending,running"})[
+                "instances"
+            ]
+            if is_standard_instance_type(instance["instance_type"])
+        ]
+        vcpus = self.instance_type_vcpus(instance_types)
+        return {
+            "vcpus": {
+                "limit": response["Quota"]["Value"],
+                "used": sum(vcpus[t] or 0 for t in instance_types),
+            }
+        }
 
-        except Exception as e:
-            logger.error(f"Error fetching security group ID: {e}")
-            raise  # This ensures the error is raised and traceback is preserved
+    def quota_demand(self, instance_type, count=1) -> dict:
+        """Quota that creating ``count`` instances of ``instance_type`` takes."""
+        if not is_standard_instance_type(instance_type):
+            return {}
+        vcpus = self.instance_type_vcpus([instance_type])[instance_type]
+        return {"vcpus": vcpus * count} if vcpus else {}
 
-    def create_instance(self, image_id, instance_type, key_name):
+    def create_instance(self, image_id, instance_type, key_name, wait=True, count=1):
         """
         Create an EC2 instance with the given parameters.
+        With ``wait=False`` it returns as soon as AWS accepted the launch, before the
+        instance is running (its state and public IP are then still unknown).
+        With ``count`` above 1, up to that many instances are launched by a single
+        RunInstances (MinCount=1, so AWS launches as many as capacity allows). They are
+        named ``<name>-1`` ... ``<name>-N``; "requested" in the result is ``count``. An
+        instance of such a launch that does not get to running is returned with its last
+        state and an "error" instead of failing the whole launch.
         """
         try:
-            # Get the username for tagging
-            sts = self.session.client("sts")
-            identity = sts.get_caller_identity()
+            # Identity and network topology are cached, so usually only RunInstances hits AWS
+            identity = topology_resolver.caller_identity(self.region)
             arn = identity["Arn"]
             username = (
                 arn.split("/")[-1]
@@ -178,30 +365,11 @@ class EC2Helper:
                 + "".join(random.choices(string.ascii_lowercase + string.digits, k=5))
             )
 
-            ec2_resource = self.session.resource("ec2")
-
-            # Dynamically fetch the custom VPC ID for the region
-            vpc_id = self._get_custom_vpc_id()
-            if not vpc_id:
-                logger.error("No VPC ID found.")
-                return {"count": 0, "instances": [], "error": "No VPC ID found."}
-
-            # Fetch subnet
-            subnet_ids = self._get_subnet_ids(vpc_id)
-            if not subnet_ids:
-                logger.warning("No subnets found in the specified VPC")
-                return {"count": 0, "instances": [], "error": "No subnets found."}
-            subnet_id = random.choice(subnet_ids)
-
-            # Fetch security group
-            security_group_id = self._get_security_group_id(sec_group_name="Allow SSH")
-            if not security_group_id:
-                logger.error("No Security Groups found.")
-                return {
-                    "count": 0,
-                    "instances": [],
-                    "error": "No Security Group found with name Allow SSH.",
-                }
+            ec2_resource = client_registry.aws_resource("ec2", self.region)
+
+            topology = topology_resolver.resolve(self.region)
+            subnet_id = random.choice(topology.subnet_ids)
+            security_group_id = topology.security_group_id
 
             # Define instance parameters
             instance_params = {
@@ -217,7 +385,7 @@ class EC2Helper:
                     }
                 ],
                 "MinCount": 1,
-                "MaxCount": 1,
+                "MaxCount": count,
             }
 
             # Now create the EC2 instance using the defined parameters
@@ -231,42 +399,135 @@ class EC2Helper:
                     "error": "EC2 instance creation returned no instances. This could be due to invalid parameters, lack of capacity, or AWS service issues.",
                 }
 
-            instance = instances[0]
-            instance.wait_until_running()
-            instance.reload()
-
-            logger.info(
-                f"Instance {instance.id} created successfully with name '{username}'"
-            )
-
-            instance_info = {
-                "name": username,
-                "instance_id": instance.id,
-                "key_name": key_name,
-                "instance_type": instance_type,
-                "public_ip": instance.public_ip_address,
-            }
+            names = [username]
+            if count > 1:
+                instances = sorted(instances, key=lambda i: i.ami_launch_index or 0)
+                names = self._name_instances(instances, username)
+                if len(instances) < count:
+                    logger.warning(
+                        f"Only {len(instances)} of {count} EC2 instances were launched"
+                    )
+
+            instances_info = []
+            for instance, name in zip(instances, names):
+                instance_info = {
+                    "name": name,
+                    "instance_id": instance.id,
+                    "key_name": key_name,
+                    "instance_type": instance_type,
+                    "state": "pending",
+                    "public_ip": "N/A",
+                }
+                instances_info.append(instance_info)
+                if wait:
+                    try:
+                        self._wait_until_running(instance)
+                    except WaitError as e:
+                        if count == 1:
+                            raise
+                        logger.error(f"EC2 instance {instance.id} is not running: {e}")
+                        instance_info.update(
+                            state=(instance.state or {}).get("Name", "unknown"),
+                            error=str(e),
+                        )
+                    else:
+                        instance_info.update(
+                            state="running", public_ip=instance.public_ip_address
+                        )
+                if "error" not in instance_info:
+                    logger.info(
+                        f"Instance {instance.id} created successfully with name '{name}'"
+                    )
+                instance_inventory.record(
+                    self.region,
+                    instance.id,
+                    name=name,
+                    image_id=image_id,
+                    key_name=key_name,
+                    instance_type=instance_type,
+                    state=instance_info["state"],
+                )
 
-            return {
-                "count": 1,
-                "instances": [instance_info],
+            result = {
+                "count": len(instances_info),
+                "instances": instances_info,
             }
+            if count > 1:
+                result["requested"] = count
+            return result
 
         except Exception as e:
             logger.error(f"An error occurred creating the EC2 instance: {e}")
             logger.debug(traceback.format_exc())
+            if isinstance(e, botocore.exceptions.ClientError) and e.response.get(
+                "Error", {}
+            ).get("Code", "").endswith(".NotFound"):
+                # e.g. InvalidSubnetID.NotFound: the cached topology is stale
+                topology_resolver.invalidate(region=self.region)
             return {
                 "count": 0,
                 "instances": [],
                 "error": str(e),
             }
 
+    def _name_instances(self, instances, base_name) -> list:
+        """
+        Tag the instances of one launch ``<base_name>-1`` ... ``<base_name>-N`` (in launch
+        order) and return the names. Instances that could not be tagged keep ``base_name``.
+        """
+        ec2_client = client_registry.aws_client("ec2", self.region)
+        names = []
+        for number, instance in enumerate(instances, start=1):
+            name = f"{base_name}-{number}"
+            try:
+                ec2_client.create_tags(
+                    Resources=[instance.id], Tags=[{"Key": "Name", "Value": name}]
+                )
+            except (
+                botocore.exceptions.ClientError,
+                botocore.exceptions.BotoCoreError,
+            ) as e:
+                logger.warning(f"Unable to name EC2 instance {instance.id}: {e}")
+                name = base_name
+            names.append(name)
+        return names
+
+    @staticmethod
+    def _wait_until_running(instance):
+        """
+        Poll ``instance`` (a boto3 Instance) until it is running and, with ``WAIT_FOR_SSH``,
+        accepts SSH connections. Raises a ``WaitError`` if it does not get there.
+        """
+
+        def poll():
+            instance.reload()
+            return instance
+
+        def is_failed(inst):
+            state = inst.state["Name"]
+            return (
+                state in ("shutting-down", "terminated") and f"The instance is {state}."
+            )
+
+        return wait_for(
+            poll,
+            is_ready=lambda inst: inst.state["Name"] == "running",
+            is_failed=is_failed,
+            reachable=(
+                (lambda inst: tcp_reachable(inst.public_ip_address))
+                if wait_for_ssh()
+                else None
+            ),
+            timeout=INSTANCE_RUNNING_TIMEOUT,
+            description=f"EC2 instance {instance.id}",
+        )
+
     def create_keypair(self, key_name: str):
         """
         Function to create a keypair on aws and return the private key.
         It will default to RSA algorithm instead of ED25519 because Windows only supports ED25519
         """
-        client = self.session.client("ec2")
+        client = client_registry.aws_client("ec2", self.region)
         new_key = client.create_key_pair(
             KeyName=key_name,
             # default to RSA because ED25519 is not supported on Windows
@@ -277,12 +538,36 @@ class EC2Helper:
 
         return new_key
 
+    def import_keypair(self, key_name: str, public_key: str):
+        """
+        Import the OpenSSH ``public_key`` as keypair ``key_name`` (see ``sdk.tools.keys``).
+        EC2 cannot overwrite a keypair, so an existing one of that name is deleted and the
+        import retried. Returns a dictionary with `KeyName` and `KeyFingerprint` keys
+        """
+        client = client_registry.aws_client("ec2", self.region)
+        try:
+            response = client.import_key_pair(
+                KeyName=key_name, PublicKeyMaterial=public_key.encode()
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "InvalidKeyPair.Duplicate":
+                raise
+            logger.debug(f"Replacing existing keypair {key_name}")
+            client.delete_key_pair(KeyName=key_name)
+            response = client.import_key_pair(
+                KeyName=key_name, PublicKeyMaterial=public_key.encode()
+            )
+        return {
+            "KeyName": response["KeyName"],
+            "KeyFingerprint": response["KeyFingerprint"],
+        }
+
     def describe_keypair(self, key_name: str = None):
         """
         Function to return a list of all the keypairs or it will return the specific keypair if `key_name` is specified
         Returns a dictionary with `KeyName` and `KeyFingerprint` keys
         """
-        client = self.session.client("ec2")
+        client = client_registry.aws_client("ec2", self.region)
         try:
             if key_name:
                 # Ideally single key should be passed
@@ -304,7 +589,7 @@ class EC2Helper:
         """
         Function to delete the keypair specified
         """
-        client = self.session.client("ec2")
+        client = client_registry.aws_client("ec2", self.region)
         result = client.delete_key_pair(KeyName=key_name, DryRun=False)
         if result.get("Return", None):
             logger.debug(f"Delete keypair result: {result}")
@@ -323,7 +608,7 @@ class EC2Helper:
         :return: Dictionary with operation status and details
         """
         try:
-            ec2_client = self.session.client("ec2")
+            ec2_client = client_registry.aws_client("ec2", self.region)
 
             response = ec2_client.describe_instances(InstanceIds=[instance_id])
 
@@ -348,14 +633,14 @@ class EC2Helper:
             response = ec2_client.stop_instances(InstanceIds=[instance_id])
 
             logger.info(f"Successfully initiated stop for instance {instance_id}")
+            new_state = response["StoppingInstances"][0]["CurrentState"]["Name"]
+            instance_inventory.record(self.region, instance_id, state=new_state)
 
             return {
                 "success": True,
                 "instance_id": instance_id,
                 "previous_state": current_state,
-                "current_state": response["StoppingInstances"][0]["CurrentState"][
-                    "Name"
-                ],
+                "current_state": new_state,
             }
 
         except botocore.exceptions.ClientError as e:
@@ -369,6 +654,143 @@ class EC2Helper:
             logger.error(f"Unexpected error stopping instance {instance_id}: {str(e)}")
             return {"success": False, "error": f"Unexpected error: {str(e)}"}
 
+    def stop_instances(self, instance_ids):
+        """
+        Stop several EC2 instances: one ``describe_instances`` checks their states and one
+        ``stop_instances`` stops all that can be stopped.
+
+        :param instance_ids: IDs of the instances to stop
+        :return: List of per-instance results shaped like ``stop_instance``'s (plus
+            "instance_id" and "instance_name"), in the order of ``instance_ids``
+        """
+        return self._change_instance_states(instance_ids, "stop")
+
+    def terminate_instances(self, instance_ids):
+        """
+        Terminate several EC2 instances with one ``describe_instances`` and one
+        ``terminate_instances``; see ``stop_instances``.
+        """
+        return self._change_instance_states(instance_ids, "terminate")
+
+    def _change_instance_states(self, instance_ids, action):
+        results = {
+            instance_id: {
+                "success": False,
+                "instance_id": instance_id,
+                "error": f"Instance {instance_id} not found",
+            }
+            for instance_id in instance_ids
+        }
+        try:
+            ec2_client = client_registry.aws_client("ec2", self.region)
+
+            # A filter (unlike InstanceIds) does not fail the whole call on unknown IDs
+            eligible = []
+            request = {"Filters": [{"Name": "instance-id", "Values": list(results)}]}
+            while True:
+                response = ec2_client.describe_instances(**request)
+                for reservation in response.get("Reservations", []):
+                    for instance in reservation.get("Instances", []):
+                        result = self._check_state_change(instance, action)
+                        results[instance["InstanceId"]] = result
+                        if "error" not in result:
+                            eligible.append(instance["InstanceId"])
+                if not response.get("NextToken"):
+                    break
+                request["NextToken"] = response["NextToken"]
+
+            if eligible:
+                for instance_id, state in self._apply_state_change(
+                    ec2_client, eligible, action
+                ).items():
+                    result = results[instance_id]
+                    if isinstance(state, Exception):
+                        error_message = state.response["Error"]["Message"]
+                        result.update(
+                            success=False, error=f"AWS API error: {error_message}"
+                        )
+                    else:
+                        result.update(success=True, current_state=state)
+                        instance_inventory.record(self.region, instance_id, state=state)
+                logger.info(f"Initiated {action} for instances {', '.join(eligible)}")
+
+        except botocore.exceptions.ClientError as e:
+            error_message = e.response["Error"]["Message"]
+            logger.error(
+                f"AWS API error on {action} of {instance_ids}: {error_message}"
+            )
+            for result in results.values():
+                if not result["success"]:
+                    result["error"] = f"AWS API error: {error_message}"
+        except Exception as e:
+            logger.exception(f"Unexpected error on {action} of {instance_ids}")
+            for result in results.values():
+                if not result["success"]:
+                    result["error"] = f"Unexpected error: {e!s}"
+        return [results[instance_id] for instance_id in instance_ids]
+
+    @staticmethod
+    def _check_state_change(instance, action) -> dict:
+        """Result entry for one described instance; has "error" if ``action`` cannot apply."""
+        instance_id = instance["InstanceId"]
+        current_state = instance["State"]["Name"]
+        instance_name = next(
+            (
+                tag.get("Value", "")
+                for tag in instance.get("Tags", [])
+                if tag.get("Key") == "Name"
+            ),
+            "",
+        )
+        result = {
+            "success": False,
+            "instance_id": instance_id,
+            "instance_name": instance_name,
+            "previous_state": current_state,
+        }
+        if action == "stop" and current_state == "stopped":
+            result["error"] = f"Instance {instance_id} is already stopped"
+        elif action == "stop" and current_state not in ("running", "pending"):
+            result["error"] = (
+                f"Instance {instance_id} is in state '{current_state}' "
+                "and cannot be stopped"
+            )
+        elif action == "terminate" and current_state == "terminated":
+            result["error"] = f"Instance {instance_id} is already terminated"
+        elif action == "terminate" and current_state == "shutting-down":
+            result["error"] = f"Instance {instance_id} is already being terminated"
+        return result
+
+    @staticmethod
+    def _apply_state_change(ec2_client, instance_ids, action) -> dict:
+        """
+        Stop or terminate ``instance_ids`` in one call. AWS rejects the whole call if one of
+        them cannot change state, so then each is retried alone to isolate the failure.
+        Returns ``{instance_id: new state or the exception}``.
+        """
+        call, key = {
+            "stop": (ec2_client.stop_instances, "StoppingInstances"),
+            "terminate": (ec2_client.terminate_instances, "TerminatingInstances"),
+        }[action]
+        try:
+            response = call(InstanceIds=instance_ids)
+            return {
+                change["InstanceId"]: change["CurrentState"]["Name"]
+                for change in response[key]
+            }
+        except botocore.exceptions.ClientError as e:
+            if len(instance_ids) == 1:
+                return {instance_ids[0]: e}
+            logger.warning(f"Batched {action} failed ({e}), retrying one by one")
+        states = {}
+        for instance_id in instance_ids:
+            try:
+                response = call(InstanceIds=[instance_id])
+                states[instance_id] = response[key][0]["CurrentState"]["Name"]
+            except botocore.exceptions.ClientError as e:
+                states[instance_id] = e
+        return states
+
     def terminate_instance(self, instance_id: str):
         """
         Terminate (delete) a specific EC2 instance by ID.
@@ -377,7 +799,7 @@ class EC2Helper:
         :return: Dictionary with operation status and details
         """
         try:
-            ec2_client = self.session.client("ec2")
+            ec2_client = client_registry.aws_client("ec2", self.region)
 
             response = ec2_client.describe_instances(InstanceIds=[instance_id])
 
@@ -411,14 +833,15 @@ class EC2Helper:
                 f"Successfully initiated termination for instance {instance_id} (name: {instance_name})"
             )
 
+            new_state = response["TerminatingInstances"][0]["CurrentState"]["Name"]
+            instance_inventory.record(self.region, instance_id, state=new_state)
+
             return {
                 "success": True,
                 "instance_id": instance_id,
                 "instance_name": instance_name,
                 "previous_state": current_state,
-                "current_state": response["TerminatingInstances"][0]["CurrentState"][
-                    "Name"
-                ],
+                "current_state": new_state,
             }
 
         except botocore.exceptions.ClientError as e:
@@ -0,0 +1,276 @@
+"""
+In-memory index of the EC2 instances per region, kept fresh in the background.
+
+A live ``describe_instances`` takes seconds on a large account, and ``aws vm list`` (or the
+API's ``/aws/vms``) pays that on every call. ``InstanceInventory`` keeps one snapshot per
+region, indexed by instance ID, Name tag, key name, VPC, state and instance type, so a listing
+is answered from memory. With ``AWS_INVENTORY_REFRESH_INTERVAL`` set (seconds, 0 = off):
+
+* a region is loaded the first time it is listed, then refreshed by a background thread every
+  interval;
+* a snapshot older than ``AWS_INVENTORY_MAX_AGE`` (default twice the interval) is still served,
+  but triggers an immediate refresh in the background (stale-while-revalidate);
+* instances the bot creates, stops or terminates are updated in the index right away, and a
+  refresh that was already running when that happened does not undo it.
+
+Every result carries ``snapshot_age`` in seconds; ``--fresh`` bypasses the index.
+"""
+
+import fnmatch
+import logging
+import threading
+import time
+
+from sdk.tools.helpers import (
+    get_config_value,
+    get_list_of_values_for_key_in_dict_of_parameters,
+)
+
+logger = logging.getLogger(__name__)
+
+# Index name -> (instance info key, list parameter it answers)
+_INDEXES = {
+    "name": ("name", "name"),
+    "key_name": ("key_name", "key"),
+    "vpc_id": ("vpc_id", "vpc"),
+    "state": ("state", "state"),
+    "instance_type": ("instance_type", "type"),
+}
+
+
+class _Snapshot:
+    """The instances of one region at ``taken_at``, with an index per attribute."""
+
+    def __init__(self, instances, taken_at):
+        self.taken_at = taken_at
+        self.by_id = {}
+        self.indexes = {index: {} for index in _INDEXES}
+        for instance in instances:
+            self.put(instance)
+
+    def put(self, instance):
+        instance_id = instance["instance_id"]
+        self.drop(instance_id)
+        self.by_id[instance_id] = instance
+        for index, (key, _) in _INDEXES.items():
+            self.indexes[index].setdefault(instance.get(key, ""), set()).add(
+                instance_id
+            )
+
+    def drop(self, instance_id):
+        old = self.by_id.pop(instance_id, None)
+        if old is None:
+            return
+        for index, (key, _) in _INDEXES.items():
+            ids = self.indexes[index].get(old.get(key, ""))
+            if ids is not None:
+                ids.discard(instance_id)
+                if not ids:
+                    del self.indexes[index][old.get(key, "")]
+
+    def lookup(self, index, values) -> set:
+        """IDs whose attribute matches one of ``values`` (``*`` and ``?`` wildcards allowed)."""
+        ids = set()
+        for value in values:
+            if "*" in value or "?" in value:
+                for indexed, indexed_ids in self.indexes[index].items():
+                    if fnmatch.fnmatchcase(indexed, value):
+                        ids |= indexed_ids
+            else:
+                ids |= self.indexes[index].get(value, set())
+        return ids
+
+
+class InstanceInventory:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._snapshots = {}  # region -> _Snapshot
+        self._refreshing = set()  # regions with a refresh in flight
+        # region -> {instance_id: (changed_at, instance info)}, replayed over older snapshots
+        self._changes = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def refresh_interval(self) -> float:
+        return get_config_value("AWS_INVENTORY_REFRESH_INTERVAL", 0, cast=float)
+
+    @property
+    def enabled(self) -> bool:
+        return self.refresh_interval > 0
+
+    @property
+    def max_age(self) -> float:
+        return get_config_value(
+            "AWS_INVENTORY_MAX_AGE", 2 * self.refresh_interval, cast=float
+        )
+
+    def list_instances(self, region, params_dict=None, limit=None) -> dict:
+        """
+        Instances of ``region`` matching the ``state``, ``type``, ``name``, ``owner``,
+        ``key``, ``vpc`` and ``instance-ids`` parameters (see
+        ``EC2Helper._filters_from_params``), shaped like ``EC2Helper.list_instances``'s
+        result plus ``snapshot_age``.
+        The region is loaded first if it was never listed.
+        """
+        params_dict = params_dict or {}
+        with self._lock:
+            snapshot = self._snapshots.get(region)
+        if snapshot is None:
+            snapshot = self.refresh(region)
+        elif self._clock() - snapshot.taken_at > self.max_age:
+            self.refresh_async(region)
+
+        with self._lock:
+            ids = None
+            instance_ids = get_list_of_values_for_key_in_dict_of_parameters(
+                "instance-ids", params_dict
+            )
+            if instance_ids:
+                ids = set(instance_ids) & snapshot.by_id.keys()
+            owners = get_list_of_values_for_key_in_dict_of_parameters(
+                "owner", params_dict
+            )
+            lookups = [("name", [f"{owner}-*" for owner in owners])]
+            for index, (_, param) in _INDEXES.items():
+                lookups.append(
+                    (
+                        index,
+                        get_list_of_values_for_key_in_dict_of_parameters(
+                            param, params_dict
+                        ),
+                    )
+                )
+            for index, values in lookups:
+                if values:
+                    matches = snapshot.lookup(index, values)
+                    ids = matches if ids is None else ids & matches
+            instances = [
+                dict(instance)
+                for instance_id, instance in snapshot.by_id.items()
+                if ids is None or instance_id in ids
+            ]
+            age = self._clock() - snapshot.taken_at
+
+        result = {"count": len(instances), "instances": instances}
+        if limit and len(instances) > limit:
+            result.update(count=limit, instances=instances[:limit], truncated=True)
+        result["snapshot_age"] = age
+        return result
+
+    def refresh(self, region):
+        """Load every instance of ``region`` with a live listing and index them."""
+        # Imported here because sdk.aws.ec2 imports this module
+        from sdk.aws.ec2 import EC2Helper
+
+        started = self._clock()
+        instances = list(EC2Helper(region=region).iter_instances())
+        snapshot = _Snapshot(instances, taken_at=started)
+        with self._lock:
+            # Changes made by the bot while the listing ran are newer than what it saw
+            changes = self._changes.get(region, {})
+            for instance_id, (changed_at, instance) in list(changes.items()):
+                if changed_at >= started:
+                    snapshot.put(instance)
+                else:
+                    del changes[instance_id]
+            current = self._snapshots.get(region)
+            if current is None or current.taken_at <= started:
+                self._snapshots[region] = snapshot
+            else:
+                snapshot = current
+        logger.info(
+            f"EC2 inventory of {region} refreshed: {len(snapshot.by_id)} instances in "
+            f"{self._clock() - started:.1f}s"
+        )
+        return snapshot
+
+    def refresh_async(self, region):
+        """Refresh ``region`` in a background thread, unless a refresh is already running."""
+        with self._lock:
+            if region in self._refreshing:
+                return
+            self._refreshing.add(region)
+
+        def run():
+            try:
+                self.refresh(region)
+            except Exception as e:
+                logger.warning(
+                    f"Refresh of the EC2 inventory of {region} failed: {e}",
+                    exc_info=True,
+                )
+            finally:
+                with self._lock:
+                    self._refreshing.discard(region)
+
+        threading.Thread(
+            target=run, name=f"ec2-inventory-{region}", daemon=True
+        ).start()
+
+    def record(self, region, instance_id, **changes):
+        """
+        Apply a change made by the bot (e.g. ``state="stopping"``) to an indexed instance,
+        or add the instance if it is new. Does nothing for regions that are not indexed.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(region)
+            if snapshot is None:
+                return
+            instance = dict(snapshot.by_id.get(instance_id, {}))
+            if not instance:
+                instance = {
+                    "name": "",
+                    "architecture": "",
+                    "instance_id": instance_id,
+                    "image_id": "",
+                    "instance_type": "",
+                    "key_name": "",
+                    "vpc_id": "",
+                    "public_ip": "N/A",
+                    "private_ip": "N/A",
+                    "state": "pending",
+                }
+            instance.update(changes)
+            snapshot.put(instance)
+            self._changes.setdefault(region, {})[instance_id] = (
+                self._clock(),
+                instance,
+            )
+
+    def start(self, regions=()):
+        """
+        Load ``regions`` and keep every indexed region refreshed in a background thread.
+        Does nothing when ``AWS_INVENTORY_REFRESH_INTERVAL`` is not set.
+        """
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+
+        def run():
+            for region in regions:
+                self.refresh_async(region)
+            while not self._stop.wait(self.refresh_interval):
+                with self._lock:
+                    due = [
+                        region
+                        for region, snapshot in self._snapshots.items()
+                        if self._clock() - snapshot.taken_at >= self.refresh_interval
+                    ]
+                for region in due:
+                    self.refresh_async(region)
+
+        self._thread = threading.Thread(target=run, name="ec2-inventory", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._changes.clear()
+
+
+instance_inventory = InstanceInventory()
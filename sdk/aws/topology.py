@@ -0,0 +1,146 @@
+"""
+Cached AWS identity and network topology lookups.
+
+Launching an instance needs the caller's identity (for the Name tag), the custom VPC, its
+subnets and the SSH security group. These hardly ever change, yet looking them up costs four
+round trips before ``RunInstances``. ``TopologyResolver`` keeps them in a ``TTLCache``:
+
+* the identity per access key, for ``AWS_IDENTITY_CACHE_TTL`` seconds (default one hour);
+* the topology per (region, VPC name, security group name), for ``AWS_TOPOLOGY_CACHE_TTL``
+  seconds (default 15 minutes).
+
+``invalidate`` drops entries, e.g. when AWS reports that a cached subnet or group is gone.
+``warm`` fills the cache so that the first create after startup does not pay either.
+"""
+
+import logging
+from typing import NamedTuple
+
+from config import config
+from sdk.tools.cache import TTLCache
+from sdk.tools.client_registry import client_registry
+from sdk.tools.helpers import get_config_value
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VPC_NAME = "openshift-sustaining-vpc"
+DEFAULT_SECURITY_GROUP_NAME = "Allow SSH"
+
+
+class TopologyNotFound(LookupError):
+    """The VPC, its subnets or the security group do not exist in the region."""
+
+
+class NetworkTopology(NamedTuple):
+    region: str
+    vpc_id: str
+    subnet_ids: list
+    security_group_id: str
+
+
+class TopologyResolver:
+    def __init__(self, maxsize=64):
+        self._identities = TTLCache(maxsize=maxsize)
+        self._topologies = TTLCache(maxsize=maxsize)
+
+    def caller_identity(self, region) -> dict:
+        """STS ``get_caller_identity`` for the configured credentials."""
+        return self._identities.get_or_set(
+            config.AWS_ACCESS_KEY_ID,
+            lambda: client_registry.aws_client("sts", region).get_caller_identity(),
+            ttl=get_config_value("AWS_IDENTITY_CACHE_TTL", 3600),
+        )
+
+    def resolve(
+        self,
+        region,
+        vpc_name=DEFAULT_VPC_NAME,
+        sec_group_name=DEFAULT_SECURITY_GROUP_NAME,
+    ) -> NetworkTopology:
+        """VPC, subnets and security group used to launch instances in ``region``."""
+        return self._topologies.get_or_set(
+            (region, vpc_name, sec_group_name),
+            lambda: self._lookup(region, vpc_name, sec_group_name),
+            ttl=get_config_value("AWS_TOPOLOGY_CACHE_TTL", 900),
+        )
+
+    def invalidate(self, region=None, vpc_name=None, sec_group_name=None):
+        """
+        Forget cached topologies matching the given region / VPC / security group (all of
+        them when called without arguments, the identities included).
+        """
+        if region is None and vpc_name is None and sec_group_name is None:
+            self._identities.clear()
+            self._topologies.clear()
+            return
+        for key in self._topologies:
+            if (
+                (region is None or key[0] == region)
+                and (vpc_name is None or key[1] == vpc_name)
+                and (sec_group_name is None or key[2] == sec_group_name)
+            ):
+                self._topologies.pop(key)
+        logger.info(f"Invalidated cached AWS topology for {region or 'all regions'}")
+
+    def warm(self, region, vpc_name=DEFAULT_VPC_NAME) -> bool:
+        """Resolve the identity and topology of ``region`` now. Returns False if that failed."""
+        try:
+            self.caller_identity(region)
+            self.resolve(region, vpc_name)
+            return True
+        except Exception as e:
+            logger.warning(
+                f"Warm-up of the AWS topology for {region} failed: {e}", exc_info=True
+            )
+            return False
+
+    @staticmethod
+    def _lookup(region, vpc_name, sec_group_name) -> NetworkTopology:
+        ec2_client = client_registry.aws_client("ec2", region)
+
+        # Describe VPCs and filter by Name tag (or any other criteria)
+        try:
+            response = ec2_client.describe_vpcs(
+                Filters=[{"Name": "tag:Name", "Values": [vpc_name]}]
+            )
+            vpcs = response.get("Vpcs", [])
+            if not vpcs:
+                raise TopologyNotFound(f"No VPC found with name/tag '{vpc_name}'.")
+            vpc_id = vpcs[0]["VpcId"]
+        except Exception as e:
+            logger.error(f"Error fetching custom VPC ID: {e}")
+            raise
+
+        # Describe subnets in the VPC
+        try:
+            response = ec2_client.describe_subnets(
+                Filters=[{"Name": "vpc-id", "Values": [vpc_id]}]
+            )
+            if not response["Subnets"]:
+                raise TopologyNotFound(f"No subnets found for VPC '{vpc_id}'.")
+            subnet_ids = [subnet["SubnetId"] for subnet in response["Subnets"]]
+            logger.info(f"Found subnets: {subnet_ids}")
+        except Exception as e:
+            logger.error(f"Error fetching subnet IDs: {e}")
+            raise
+
+        # Describe security groups by Name tag
+        try:
+            response = ec2_client.describe_security_groups(
+                Filters=[{"Name": "tag:Name", "Values": [sec_group_name]}]
+            )
+            security_groups = response["SecurityGroups"]
+            if not security_groups:
+                raise TopologyNotFound(
+                    f"No security group found with name '{sec_group_name}'."
+                )
+            security_group_id = security_groups[0]["GroupId"]
+            logger.info(f"Found Security Group: {security_group_id}")
+        except Exception as e:
+            logger.error(f"Error fetching security group ID: {e}")
+            raise
+
+        return NetworkTopology(region, vpc_id, subnet_ids, security_group_id)
+
+
+topology_resolver = TopologyResolver()
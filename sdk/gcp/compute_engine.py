@@ -1,24 +1,49 @@
 import logging
 import re
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from config import _GCP_DEFAULT_DISK_SIZES, config
 from google.api_core import exceptions as google_exceptions
 from google.cloud import compute_v1
-from google.oauth2 import service_account
-from sdk.tools.helpers import get_list_of_values_for_key_in_dict_of_parameters
+from sdk.tools.cache import TTLCache
+from sdk.tools.client_registry import client_registry
+from sdk.tools.helpers import (
+    get_config_value,
+    get_list_of_values_for_key_in_dict_of_parameters,
+)
+from sdk.tools.waiter import WaitError, tcp_reachable, wait_for, wait_for_ssh
 
 logger = logging.getLogger(__name__)
 
+# Seconds to wait for an instance to be created, and for a stop or delete to finish
+CREATE_TIMEOUT = 300
+OPERATION_TIMEOUT = 120
+
+# CPUs per (zone, machine type), from MachineTypesClient.get (they do not change)
+_machine_type_cpus = TTLCache(maxsize=256, ttl=24 * 3600)
+
+# Zone names per (project, region), from RegionsClient.get
+_region_zones = TTLCache(maxsize=64)
+
+# Only the fields ``_instance_to_info`` reads, as a system-parameter field mask
+LIST_FIELD_MASK = (
+    "items(id,name,status,machineType,labels,disks(boot,source),"
+    "networkInterfaces(networkIP,network,accessConfigs(type,natIP))),nextPageToken"
+)
+
+
+def _wildcard_to_re2(pattern) -> str:
+    """``web-*`` style pattern (``*`` and ``?``) as an RE2 expression."""
+    return re.escape(pattern).replace(r"\*", ".*").replace(r"\?", ".")
+
 
 class GCPHelper:
     def __init__(self):
         self.region = getattr(config, "GCP_DEFAULT_REGION", "asia-south1")
         _info = dict(config["GOOGLE_CLOUD_CREDS"])
-        self._credentials = service_account.Credentials.from_service_account_info(
-            _info,
-            scopes=["https://www.googleapis.com/auth/cloud-platform"],
-        )
+        self._credentials = client_registry.gcp_credentials()
         self.project_id = _info.get("project_id", "")
         network = getattr(config, "GCP_NETWORK", None) or "default"
         # network = "slackbot-vpc"
@@ -97,42 +122,221 @@ class GCPHelper:
         if not instance_name or not instance_name.strip():
             return None, "Instance name is required"
         instance_name = instance_name.strip()
+        zones, errors = self._get_zones_by_instance_names([instance_name])
+        return zones.get(instance_name), errors.get(instance_name)
+
+    def _get_zones_by_instance_names(self, instance_names):
+        """
+        Resolve the zones of several instances (in self.region) with one aggregated list,
+        filtered server-side to those names.
+        Returns ({name: zone}, {name: error message}) covering every name.
+        """
+        zones = {}
         try:
-            client = compute_v1.InstancesClient(credentials=self._credentials)
+            client = client_registry.gcp_client(compute_v1.InstancesClient)
             request = compute_v1.AggregatedListInstancesRequest()
             request.project = self.project_id
             request.max_results = 500
+            # RE2 `eq` alternation, as in ``_list_filter``: it must match the whole name
+            alternation = "|".join(re.escape(name) for name in instance_names)
+            request.filter = f'(name eq "{alternation}")'
             zone_prefix = f"zones/{self.region}"
             for zone_key, response in client.aggregated_list(request=request):
                 if not response.instances or not zone_key.startswith(zone_prefix):
                     continue
                 for instance in response.instances:
-                    if instance.name == instance_name:
-                        zone_name = zone_key.split("/")[-1]
-                        return zone_name, None
-            return None, f"Instance '{instance_name}' not found in region {self.region}"
+                    if instance.name in instance_names:
+                        zones[instance.name] = zone_key.split("/")[-1]
         except Exception as e:
             logger.error(f"Error resolving instance zone: {e}")
-            return None, str(e)
+            return {}, {name: str(e) for name in instance_names}
+        errors = {
+            name: f"Instance '{name}' not found in region {self.region}"
+            for name in instance_names
+            if name not in zones
+        }
+        return zones, errors
+
+    def get_operation(self, zone, operation_name):
+        """
+        Progress of a zone operation, e.g. the insert started by ``create_instance(wait=False)``.
+
+        :return: (done, error message); the message is empty unless the operation failed.
+        """
+        client = client_registry.gcp_client(compute_v1.ZoneOperationsClient)
+        operation = client.get(
+            project=self.project_id, zone=zone, operation=operation_name
+        )
+        done = operation.status == compute_v1.Operation.Status.DONE
+        error = ""
+        if operation.error and operation.error.errors:
+            error = "; ".join(e.message for e in operation.error.errors)
+        return done, error
+
+    def _wait_for_operation(self, zone, operation_name, timeout):
+        """Poll a zone operation until it is done; raises ``WaitError`` if it failed."""
+        return wait_for(
+            lambda: self.get_operation(zone, operation_name),
+            is_ready=lambda status: status[0],
+            is_failed=lambda status: status[1],
+            timeout=timeout,
+            description=f"GCP operation {operation_name}",
+        )
+
+    def get_quota_usage(self) -> dict:
+        """
+        Regional quotas (e.g. ``CPUS``, ``N2_CPUS``, ``INSTANCES``, ``IN_USE_ADDRESSES``) with
+        their limit and usage, for the quota preflight (see ``sdk.tools.quota``).
+        """
+        client = client_registry.gcp_client(compute_v1.RegionsClient)
+        region = client.get(project=self.project_id, region=self.region)
+        return {
+            quota.metric: {"limit": quota.limit, "used": quota.usage}
+            for quota in region.quotas
+        }
+
+    def quota_demand(self, instance_type, count=1, zone=None) -> dict:
+        """
+        Quota that creating ``count`` VMs of ``instance_type`` takes: CPUs (on the family's
+        own quota where it has one, e.g. ``N2_CPUS``), instances and external addresses.
+        """
+        zone = zone or self.default_zone()
+
+        def load():
+            client = client_registry.gcp_client(compute_v1.MachineTypesClient)
+            return client.get(
+                project=self.project_id, zone=zone, machine_type=instance_type
+            ).guest_cpus
+
+        cpus = _machine_type_cpus.get_or_set((zone, instance_type), load)
+        family = instance_type.split("-")[0].upper()
+        metric = "CPUS" if family in ("E2", "N1", "F1", "G1") else f"{family}_CPUS"
+        return {
+            metric: cpus * count,
+            "INSTANCES": count,
+            "IN_USE_ADDRESSES": count,
+        }
+
+    def modify_instances(self, instance_names, action, wait=False):
+        """
+        Stop or delete several instances. Their zones are resolved with one aggregated
+        list, then the per-instance calls run concurrently on ``VM_MODIFY_CONCURRENCY``
+        threads (default 8).
+
+        :param instance_names: Names of the instances
+        :param action: "stop" or "delete"
+        :param wait: Passed to ``stop_instance``/``delete_instance``.
+        :return: List of per-instance results shaped like ``stop_instance``'s (always with
+            "instance_name"), in the order of ``instance_names``
+        """
+        modify = {"stop": self.stop_instance, "delete": self.delete_instance}[action]
+        if not instance_names:
+            return []
+        zones, errors = self._get_zones_by_instance_names(instance_names)
+
+        def modify_one(name):
+            if name in errors:
+                return {"success": False, "error": errors[name]}
+            return modify(name, wait=wait, zone=zones[name])
+
+        workers = min(len(instance_names), get_config_value("VM_MODIFY_CONCURRENCY", 8))
+        with ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="gcp-modify"
+        ) as executor:
+            results = list(executor.map(modify_one, instance_names))
+        return [
+            dict(result, instance_name=name)
+            for name, result in zip(instance_names, results)
+        ]
+
+    def _bulk_insert(
+        self, client, zone, names, instance_type, attached_disk, network_interface
+    ):
+        """Start one ``bulkInsert`` creating an instance for each of ``names``."""
+        properties = compute_v1.InstanceProperties()
+        # Unlike insert, bulkInsert takes the plain machine type name
+        properties.machine_type = instance_type
+        properties.disks = [attached_disk]
+        properties.network_interfaces = [network_interface]
+
+        resource = compute_v1.BulkInsertInstanceResource()
+        resource.count = len(names)
+        resource.min_count = 1  # create what the quota allows rather than nothing
+        resource.instance_properties = properties
+        resource.per_instance_properties = {
+            name: compute_v1.BulkInsertInstanceResourcePerInstanceProperties(name=name)
+            for name in names
+        }
+
+        request = compute_v1.BulkInsertInstanceRequest()
+        request.project = self.project_id
+        request.zone = zone
+        request.bulk_insert_instance_resource_resource = resource
+        return client.bulk_insert(request=request)
 
-    def stop_instance(self, instance_name):
+    def _wait_until_running(self, client, zone, instance_name, timeout):
+        """
+        Poll an instance until it is RUNNING and, with ``WAIT_FOR_SSH``, accepts SSH
+        connections. Returns the Instance; raises ``NotFound`` if it does not exist.
+        """
+        return wait_for(
+            lambda: client.get(
+                project=self.project_id,
+                zone=zone,
+                instance=instance_name,
+            ),
+            is_ready=lambda inst: inst.status == "RUNNING",
+            is_failed=lambda inst: (
+                inst.status in ("STOPPING", "TERMINATED")
+                and f"The instance is {inst.status.lower()}."
+            ),
+            reachable=(
+                (lambda inst: tcp_reachable(_nat_ip(inst))) if wait_for_ssh() else None
+            ),
+            timeout=timeout,
+            description=f"GCP instance {instance_name}",
+        ).value
+
+    def get_instance_info(self, instance_name, zone):
+        """Instance info dict (see ``list_instances``), or None if the instance does not exist."""
+        client = client_registry.gcp_client(compute_v1.InstancesClient)
+        try:
+            instance = client.get(
+                project=self.project_id, zone=zone, instance=instance_name
+            )
+        except google_exceptions.NotFound:
+            return None
+        return self._instance_to_info(instance, f"zones/{zone}")
+
+    def stop_instance(self, instance_name, wait=True, zone=None):
         """
         Stop a GCP VM instance by name.
 
         :param instance_name: The name of the instance to stop.
+        :param wait: Wait for the operation to finish. If False, return once it was
+            accepted; the result then has "operation" (see ``get_operation``).
+        :param zone: Zone of the instance, if known (saves looking it up).
         :return: Dict with "success" (bool) and optionally "error" (str).
         """
-        zone, err = self._get_zone_by_instance_name(instance_name)
-        if err:
-            return {"success": False, "error": err}
+        if zone is None:
+            zone, err = self._get_zone_by_instance_name(instance_name)
+            if err:
+                return {"success": False, "error": err}
         try:
-            client = compute_v1.InstancesClient(credentials=self._credentials)
+            client = client_registry.gcp_client(compute_v1.InstancesClient)
             operation = client.stop(
                 project=self.project_id,
                 zone=zone,
                 instance=instance_name,
             )
-            operation.result(timeout=120)
+            if not wait:
+                return {
+                    "success": True,
+                    "instance_name": instance_name,
+                    "zone": zone,
+                    "operation": operation.name,
+                }
+            self._wait_for_operation(zone, operation.name, OPERATION_TIMEOUT)
             logger.info(f"Successfully stopped instance {instance_name} in zone {zone}")
             return {"success": True, "instance_name": instance_name, "zone": zone}
         except google_exceptions.NotFound:
@@ -142,24 +346,35 @@ class GCPHelper:
             logger.debug(traceback.format_exc())
             return {"success": False, "error": str(e)}
 
-    def delete_instance(self, instance_name):
+    def delete_instance(self, instance_name, wait=True, zone=None):
         """
         Delete a GCP VM instance by name.
 
         :param instance_name: The name of the instance to delete.
+        :param wait: Wait for the operation to finish. If False, return once it was
+            accepted; the result then has "operation" (see ``get_operation``).
+        :param zone: Zone of the instance, if known (saves looking it up).
         :return: Dict with "success" (bool) and optionally "error" (str).
         """
-        zone, err = self._get_zone_by_instance_name(instance_name)
-        if err:
-            return {"success": False, "error": err}
+        if zone is None:
+            zone, err = self._get_zone_by_instance_name(instance_name)
+            if err:
+                return {"success": False, "error": err}
         try:
-            client = compute_v1.InstancesClient(credentials=self._credentials)
+            client = client_registry.gcp_client(compute_v1.InstancesClient)
             operation = client.delete(
                 project=self.project_id,
                 zone=zone,
                 instance=instance_name,
             )
-            operation.result(timeout=120)
+            if not wait:
+                return {
+                    "success": True,
+                    "instance_name": instance_name,
+                    "zone": zone,
+                    "operation": operation.name,
+                }
+            self._wait_for_operation(zone, operation.name, OPERATION_TIMEOUT)
             logger.info(f"Successfully deleted instance {instance_name} in zone {zone}")
             return {"success": True, "instance_name": instance_name, "zone": zone}
         except google_exceptions.NotFound:
@@ -169,10 +384,83 @@ class GCPHelper:
             logger.debug(traceback.format_exc())
             return {"success": False, "error": str(e)}
 
+    def region_zones(self) -> list:
+        """
+        Zones of ``self.region``, cached for ``GCP_ZONES_CACHE_TTL`` seconds (default one
+        hour) since they hardly ever change.
+        """
+
+        def load():
+            client = client_registry.gcp_client(compute_v1.RegionsClient)
+            region = client.get(project=self.project_id, region=self.region)
+            return sorted(zone.split("/")[-1] for zone in region.zones)
+
+        return _region_zones.get_or_set(
+            (self.project_id, self.region),
+            load,
+            ttl=get_config_value("GCP_ZONES_CACHE_TTL", 3600),
+        )
+
+    def default_zone(self) -> str:
+        """
+        Zone of creates that do not name one: the first zone of the region, as not every
+        region has an ``-a`` zone (e.g. europe-west1).
+        """
+        try:
+            zones = self.region_zones()
+        except google_exceptions.GoogleAPICallError as e:
+            logger.warning(f"Unable to list the zones of {self.region}: {e}")
+            zones = []
+        return zones[0] if zones else f"{self.region}-a"
+
+    @staticmethod
+    def _list_filter(params_dict) -> str:
+        """
+        The ``state``, ``type``, ``name`` and ``instance-ids`` (names only) parameters as a
+        Compute list ``filter``: one parenthesized ``eq`` expression per field, which are
+        ANDed, with an RE2 alternation that must match the whole value.
+        """
+        expressions = []
+        states = get_list_of_values_for_key_in_dict_of_parameters("state", params_dict)
+        if states:
+            expressions.append(
+                ("status", "|".join(re.escape(s.upper()) for s in states))
+            )
+        types = get_list_of_values_for_key_in_dict_of_parameters("type", params_dict)
+        if types:
+            # machineType is a URL ending in the type
+            alternation = "|".join(re.escape(t.lower()) for t in types)
+            expressions.append(("machineType", f".*/({alternation})"))
+        names = get_list_of_values_for_key_in_dict_of_parameters("name", params_dict)
+        if names:
+            expressions.append(("name", "|".join(_wildcard_to_re2(n) for n in names)))
+        instance_ids = get_list_of_values_for_key_in_dict_of_parameters(
+            "instance-ids", params_dict
+        )
+        # Numeric values may be IDs, which cannot be ORed with names in one filter
+        if instance_ids and not any(value.isdigit() for value in instance_ids):
+            expressions.append(("name", "|".join(re.escape(n) for n in instance_ids)))
+        return " ".join(f'({field} eq "{value}")' for field, value in expressions)
+
+    def _list_zone(self, client, zone, list_filter) -> list:
+        request = compute_v1.ListInstancesRequest(
+            project=self.project_id, zone=zone, max_results=500
+        )
+        if list_filter:
+            request.filter = list_filter
+        metadata = ()
+        if get_config_value("GCP_LIST_FIELD_MASK", True, cast=bool):
+            metadata = (("x-goog-fieldmask", LIST_FIELD_MASK),)
+        return list(client.list(request=request, metadata=metadata))
+
     def list_instances(self, params_dict=None):
         """
         get all GCP instances in the specified region.
         returns a dictionary with information on server instances (EC2-style shape).
+
+        The zones of the region (see ``region_zones``) are listed concurrently on up to
+        ``GCP_LIST_CONCURRENCY`` threads (default 8), with the filters applied by Compute
+        (see ``_list_filter``) and only the fields that are shown (``LIST_FIELD_MASK``).
         """
         if params_dict is None:
             params_dict = {}
@@ -185,27 +473,33 @@ class GCPHelper:
         instance_type_filters = get_list_of_values_for_key_in_dict_of_parameters(
             "type", params_dict
         )
+        name_filters = get_list_of_values_for_key_in_dict_of_parameters(
+            "name", params_dict
+        )
         if state_filters:
             state_filters = {s.lower() for s in state_filters}
         if instance_type_filters:
             instance_type_filters = {t.lower() for t in instance_type_filters}
+        name_patterns = [re.compile(_wildcard_to_re2(n)) for n in name_filters]
 
         try:
-            client = compute_v1.InstancesClient(credentials=self._credentials)
-            request = compute_v1.AggregatedListInstancesRequest()
-            request.project = self.project_id
-            request.max_results = 500
-            agg_list = client.aggregated_list(request=request)
+            client = client_registry.gcp_client(compute_v1.InstancesClient)
+            zones = self.region_zones()
+            list_filter = self._list_filter(params_dict)
+            workers = min(len(zones), get_config_value("GCP_LIST_CONCURRENCY", 8))
+            with ThreadPoolExecutor(
+                max_workers=max(1, workers), thread_name_prefix="gcp-list"
+            ) as executor:
+                per_zone = list(
+                    executor.map(
+                        lambda zone: self._list_zone(client, zone, list_filter), zones
+                    )
+                )
 
             instances_info = []
-            # Restrict to zones in self.region (e.g. us-central1-a, us-central1-b)
-            zone_prefix = f"zones/{self.region}"
-            for zone_key, response in agg_list:
-                if not response.instances:
-                    continue
-                if not zone_key.startswith(zone_prefix):
-                    continue
-                for instance in response.instances:
+            # Compute already applied the filters; checked again as they are cheap here
+            for zone, instances in zip(zones, per_zone):
+                for instance in instances:
                     state = (instance.status or "").lower()
                     if state_filters and state not in state_filters:
                         continue
@@ -217,12 +511,16 @@ class GCPHelper:
                         and machine_type not in instance_type_filters
                     ):
                         continue
+                    if name_patterns and not any(
+                        p.fullmatch(instance.name or "") for p in name_patterns
+                    ):
+                        continue
                     if instance_ids:
                         name_ok = instance.name in instance_ids
                         id_ok = str(instance.id) in instance_ids
                         if not (name_ok or id_ok):
                             continue
-                    info = self._instance_to_info(instance, zone_key)
+                    info = self._instance_to_info(instance, f"zones/{zone}")
                     instances_info.append(info)
 
             return {"count": len(instances_info), "instances": instances_info}
@@ -248,6 +546,8 @@ class GCPHelper:
         disk_gb_override=None,
         zone=None,
         network=None,
+        wait=True,
+        count=1,
     ):
         """
         Create a GCP VM instance with the given parameters
@@ -262,17 +562,25 @@ class GCPHelper:
                 must match [a-z]([-a-z0-9]*[a-z0-9])?).
             disk_gb_override: Optional boot disk size in GB; must be in
                 ``_GCP_DEFAULT_DISK_SIZES``. If None, uses ``config.GCP_BOOT_DISK_SIZE_GB``.
-            zone: Optional zone (e.g. asia-south1-a). Defaults to <region>-a.
+            zone: Optional zone (e.g. asia-south1-a). Defaults to ``default_zone()``.
             network: Optional network name or URL (e.g. default, or
                 projects/PROJECT/global/networks/VPC). Uses config.GCP_NETWORK
                 if not set, then global/networks/default.
+            wait: Wait for the insert operation to finish. If False, return as soon as
+                it was accepted; the result then also has "operation" (see
+                ``get_operation``) and no public IP yet.
+            count: Number of VMs. Above 1 they are named ``<instance_name>-1`` ...
+                ``<instance_name>-N`` and created by one ``bulkInsert`` with
+                ``min_count=1``, so as many as the quota allows are created; the
+                result then also has "requested". A VM of such a batch that does not
+                get to RUNNING is returned with its last "status" and an "error".
 
         Returns:
             {"count": 1, "instances": [{"name", "instance_id", "instance_type", "zone",
                 "disk_gb", "public_ip"}]}
             or on error {"count": 0, "instances": [], "error": "..."}.
         """
-        zone = zone or f"{self.region}-a"
+        zone = zone or self.default_zone()
         instance_name = (instance_name or "").strip().lower()
         if not instance_name:
             return {
@@ -280,11 +588,12 @@ class GCPHelper:
                 "instances": [],
                 "error": "instance_name is required",
             }
-        if len(instance_name) > 63:
+        max_length = 63 if count == 1 else 62 - len(str(count))  # room for "-<n>"
+        if len(instance_name) > max_length:
             return {
                 "count": 0,
                 "instances": [],
-                "error": "instance_name must be at most 63 characters",
+                "error": f"instance_name must be at most {max_length} characters",
             }
         if not re.match(r"^[a-z]([-a-z0-9]*[a-z0-9])?$", instance_name):
             return {
@@ -315,7 +624,7 @@ class GCPHelper:
             disk_gb = int(config.GCP_BOOT_DISK_SIZE_GB)
 
         try:
-            client = compute_v1.InstancesClient(credentials=self._credentials)
+            client = client_registry.gcp_client(compute_v1.InstancesClient)
 
             # Resolve image: if not a full path, treat as image family
             if image_id.startswith("projects/"):
@@ -346,45 +655,99 @@ class GCPHelper:
             access.network_tier = "PREMIUM"
             network_interface.access_configs = [access]
 
-            instance_resource = compute_v1.Instance()
-            instance_resource.name = instance_name
-            instance_resource.machine_type = (
-                f"zones/{zone}/machineTypes/{instance_type}"
-            )
-            instance_resource.disks = [attached_disk]
-            instance_resource.network_interfaces = [network_interface]
-
-            request = compute_v1.InsertInstanceRequest()
-            request.project = self.project_id
-            request.zone = zone
-            request.instance_resource = instance_resource
-
-            operation = client.insert(request=request)
-            operation.result(timeout=300)
+            if count == 1:
+                names = [instance_name]
+                instance_resource = compute_v1.Instance()
+                instance_resource.name = instance_name
+                instance_resource.machine_type = (
+                    f"zones/{zone}/machineTypes/{instance_type}"
+                )
+                instance_resource.disks = [attached_disk]
+                instance_resource.network_interfaces = [network_interface]
+
+                request = compute_v1.InsertInstanceRequest()
+                request.project = self.project_id
+                request.zone = zone
+                request.instance_resource = instance_resource
+
+                operation = client.insert(request=request)
+            else:
+                names = [f"{instance_name}-{n}" for n in range(1, count + 1)]
+                operation = self._bulk_insert(
+                    client, zone, names, instance_type, attached_disk, network_interface
+                )
 
-            created = client.get(
-                project=self.project_id,
-                zone=zone,
-                instance=instance_name,
-            )
-            public_ip = "N/A"
-            if created.network_interfaces:
-                ni = created.network_interfaces[0]
-                for ac in getattr(ni, "access_configs", []) or []:
-                    if getattr(ac, "nat_i_p", None):
-                        public_ip = ac.nat_i_p
-                        break
-
-            instance_info = {
-                "name": instance_name,
-                "instance_id": str(created.id) if created.id else instance_name,
-                "instance_type": instance_type,
-                "zone": zone,
-                "disk_gb": disk_gb,
-                "public_ip": public_ip,
-            }
-            logger.info(f"Instance {instance_name} created successfully in {zone}")
-            return {"count": 1, "instances": [instance_info]}
+            instances_info = []
+            if not wait:
+                logger.info(f"Instances {', '.join(names)} submitted in {zone}")
+                for name in names:
+                    instances_info.append(
+                        {
+                            "name": name,
+                            "instance_id": name,
+                            "instance_type": instance_type,
+                            "zone": zone,
+                            "disk_gb": disk_gb,
+                            "public_ip": "N/A",
+                            "operation": operation.name,
+                        }
+                    )
+            else:
+                started = time.monotonic()
+                try:
+                    self._wait_for_operation(zone, operation.name, CREATE_TIMEOUT)
+                except WaitError as e:
+                    if count == 1:
+                        raise
+                    # Part of the batch may still exist: look at every instance
+                    logger.error(f"GCP bulkInsert {operation.name} in {zone}: {e}")
+                for name in names:
+                    instance_info = {
+                        "name": name,
+                        "instance_id": name,
+                        "instance_type": instance_type,
+                        "zone": zone,
+                        "disk_gb": disk_gb,
+                        "public_ip": "N/A",
+                    }
+                    try:
+                        created = self._wait_until_running(
+                            client,
+                            zone,
+                            name,
+                            max(1, CREATE_TIMEOUT - (time.monotonic() - started)),
+                        )
+                    except google_exceptions.NotFound:
+                        if count == 1:
+                            raise
+                        # bulkInsert with min_count=1 may create fewer than requested
+                        logger.warning(f"Instance {name} was not created")
+                        continue
+                    except (WaitError, google_exceptions.GoogleAPICallError) as e:
+                        if count == 1:
+                            raise
+                        logger.error(f"GCP instance {name} is not running: {e}")
+                        last = getattr(e, "value", None)
+                        instance_info.update(
+                            instance_id=str(last.id)
+                            if getattr(last, "id", None)
+                            else name,
+                            status=getattr(last, "status", None) or "UNKNOWN",
+                            error=str(e),
+                        )
+                        instances_info.append(instance_info)
+                        continue
+                    instance_info.update(
+                        instance_id=str(created.id) if created.id else name,
+                        public_ip=_nat_ip(created) or "N/A",
+                    )
+                    instances_info.append(instance_info)
+                    logger.info(f"Instance {name} created successfully in {zone}")
+
+            result = {"count": len(instances_info), "instances": instances_info}
+            if count > 1:
+                result["requested"] = count
+            return result
         except google_exceptions.Forbidden as e:
             logger.error(f"GCP Compute API Forbidden (403): {e}")
             return {
@@ -400,3 +763,14 @@ class GCPHelper:
             logger.error(f"An error occurred creating the GCP instance: {e}")
             logger.debug(traceback.format_exc())
             return {"count": 0, "instances": [], "error": str(e)}
+
+
+def _nat_ip(instance):
+    """External (NAT) IP of the first network interface of ``instance``, or None."""
+    if not instance.network_interfaces:
+        return None
+    ni = instance.network_interfaces[0]
+    for ac in getattr(ni, "access_configs", []) or []:
+        if getattr(ac, "nat_i_p", None):
+            return ac.nat_i_p
+    return None
@@ -3,16 +3,20 @@ try:
 except ModuleNotFoundError:
     from slack_worker.config import config
 
-import gspread
-import re
 import logging
+import re
 from datetime import date
 
+from sdk.tools.lazy import LazyObject
+
 logger = logging.getLogger(__name__)
 
 
 class GSheet:
     def __init__(self, token: dict = config.ROTA_SERVICE_ACCOUNT):
+        # gspread (and the Google auth stack behind it) is only needed once we connect
+        import gspread
+
         account = gspread.service_account_from_dict(token)
         self._rota_sheet = account.open(config.ROTA_SHEET)
         self._assignment_wsheet = self._rota_sheet.worksheet(config.ASSIGNMENT_WSHEET)
@@ -116,8 +120,6 @@ class GSheet:
             self._assignment_wsheet.update_acell(cell_a1, user)
 
 
-try:
-    gsheet = GSheet()
-except Exception as ex:
-    gsheet = None
-    logging.info(f"Error in call to Gsheet : {repr(ex)}")
+# Connected on first use rather than at import, so importing this module needs no network.
+# A failed connection raises at the call site and is retried on the next use.
+gsheet = LazyObject(GSheet, name="gsheet")
@@ -0,0 +1,148 @@
+"""
+Cached catalog of the OpenStack flavors, images and networks.
+
+``create_servers`` resolved the flavor and the image with ``find_flavor``/``find_image`` on
+every create, and each of them can end in a full listing when the value is a name. The
+catalog lists each kind once and keeps it in a ``TTLCache`` for ``OS_CATALOG_TTL`` seconds
+(default 10 minutes), indexed by ID and by name, so that:
+
+* `openstack vm create` rejects an unknown flavor, image or network before any API call;
+* ``create_servers`` resolves names to IDs from memory;
+* the help of `openstack vm create` lists the project's real flavors.
+
+A value that is not in the catalog reloads that kind, at most once a minute, in case it was
+added since. If the catalog cannot be loaded, the lookups fall back to the ``find_*`` calls.
+"""
+
+import logging
+import time
+from typing import NamedTuple
+
+from sdk.tools.cache import TTLCache
+from sdk.tools.client_registry import client_registry
+from sdk.tools.helpers import get_config_value
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("flavor", "image", "network")
+
+# Least seconds between two reloads of a kind caused by an unknown value
+RELOAD_ON_MISS_INTERVAL = 60
+
+# Names listed in the error for an unknown value
+MAX_LISTED_NAMES = 20
+
+
+class _Index(NamedTuple):
+    by_id: dict
+    by_name: dict  # only the names that are unique within the kind
+    names: list  # sorted
+    loaded_at: float
+
+
+class OpenStackCatalog:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._indexes = TTLCache(maxsize=len(KINDS), clock=clock)
+
+    @staticmethod
+    def _list(kind) -> list:
+        conn = client_registry.openstack_connection()
+        if kind == "flavor":
+            return list(conn.compute.flavors())
+        if kind == "image":
+            # Without it, Glance leaves out the community images the project can boot
+            return list(conn.image.images(visibility="all"))
+        return list(conn.network.networks())
+
+    def _load(self, kind) -> _Index:
+        resources = self._list(kind)
+        by_name, duplicates = {}, set()
+        for resource in resources:
+            if resource.name in by_name:
+                duplicates.add(resource.name)
+            by_name[resource.name] = resource
+        for name in duplicates:
+            del by_name[name]
+        index = _Index(
+            by_id={resource.id: resource for resource in resources},
+            by_name=by_name,
+            names=sorted({resource.name for resource in resources if resource.name}),
+            loaded_at=self._clock(),
+        )
+        self._indexes.set(kind, index, ttl=get_config_value("OS_CATALOG_TTL", 600))
+        logger.info(f"Loaded {len(resources)} OpenStack {kind}s into the catalog")
+        return index
+
+    def index(self, kind) -> _Index:
+        index = self._indexes.get(kind)
+        return index if index is not None else self._load(kind)
+
+    def find(self, kind, name_or_id):
+        """The ``kind`` resource with that ID or unique name, or None if there is none."""
+        index = self.index(kind)
+        resource = index.by_id.get(name_or_id) or index.by_name.get(name_or_id)
+        if (
+            resource is None
+            and self._clock() - index.loaded_at >= RELOAD_ON_MISS_INTERVAL
+        ):
+            index = self._load(kind)
+            resource = index.by_id.get(name_or_id) or index.by_name.get(name_or_id)
+        return resource
+
+    def names(self, kind, load=True) -> list:
+        """Sorted names of ``kind``; empty if not loaded yet and ``load`` is False."""
+        index = self._indexes.get(kind)
+        if index is None and load:
+            index = self._load(kind)
+        return list(index.names) if index else []
+
+    def validate(self, **refs) -> list:
+        """
+        Messages for the ``kind=name_or_id`` arguments that do not exist, e.g.
+        ``validate(flavor="m1.small", network=network_id)``. Empty if all of them exist or
+        the catalog cannot be loaded (the create then reports the error itself).
+        """
+        problems = []
+        for kind, value in refs.items():
+            if not value:
+                continue
+            try:
+                if self.find(kind, value) is not None:
+                    continue
+                names = self.names(kind)
+            except Exception as e:
+                logger.warning(
+                    f"Unable to check the OpenStack {kind} `{value}`: {e}",
+                    exc_info=True,
+                )
+                continue
+            available = ", ".join(names[:MAX_LISTED_NAMES])
+            if len(names) > MAX_LISTED_NAMES:
+                available += ", ..."
+            problems.append(
+                f"Unknown {kind} `{value}`. Available {kind}s: {available or 'none'}"
+            )
+        return problems
+
+    def invalidate(self, kind=None):
+        """Forget the cached ``kind`` (every kind without arguments)."""
+        if kind is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(kind)
+
+    def warm(self) -> bool:
+        """Load every kind now. Returns False if that failed."""
+        try:
+            for kind in KINDS:
+                self._load(kind)
+            return True
+        except Exception as e:
+            logger.warning(
+                f"Warm-up of the OpenStack catalog failed: {e}", exc_info=True
+            )
+            return False
+
+
+openstack_catalog = OpenStackCatalog()
@@ -1,12 +1,36 @@
-from openstack import connection
-from openstack.exceptions import ResourceFailure, ConflictException
-from config import config
-from sdk.tools.helpers import get_list_of_values_for_key_in_dict_of_parameters
+import heapq
+import itertools
 import logging
+import re
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from openstack.exceptions import ConflictException, NotFoundException, ResourceFailure
+
+from sdk.openstack.catalog import openstack_catalog
+from sdk.openstack.inventory import ServerQuery, server_inventory
+from sdk.tools.client_registry import client_registry
+from sdk.tools.helpers import (
+    get_config_value,
+    get_list_of_values_for_key_in_dict_of_parameters,
+    parse_since,
+)
+from sdk.tools.waiter import (
+    WaitError,
+    WaitFailed,
+    tcp_reachable,
+    wait_for,
+    wait_for_ssh,
+)
 
 logger = logging.getLogger(__name__)
 
+# Same limit as openstacksdk's ``wait_for_server``
+SERVER_ACTIVE_TIMEOUT = 120
+
+# Status each lifecycle action ends in; None: the server is gone
+_LIFECYCLE_FINAL_STATUSES = {"stop": "SHUTOFF", "start": "ACTIVE", "delete": None}
+
 
 class OpenStackHelper:
     def __init__(
@@ -16,70 +40,217 @@ class OpenStackHelper:
         application_credential_id=None,
         application_credential_secret=None,
     ):
-        self.conn = connection.Connection(
-            auth_url=config.OS_AUTH_URL,
-            application_credential_id=config.OS_APP_CRED_ID,
-            application_credential_secret=config.OS_APP_CRED_SECRET,
-            region_name=config.OS_REGION_NAME,
-            interface=config.OS_INTERFACE,
-            identity_api_version=config.OS_ID_API_VERSION,
-            auth_type=config.OS_AUTH_TYPE,
+        # One authenticated connection is shared by every helper in the process
+        self.conn = client_registry.openstack_connection()
+
+    def _resolve(self, kind, name_or_id, ignore_missing=False):
+        """
+        Flavor or image by ID or name, from the catalog. Falls back to Nova when it is not
+        there (e.g. a duplicate name) or the catalog failed to load.
+        """
+        try:
+            resource = openstack_catalog.find(kind, name_or_id)
+            if resource is not None:
+                return resource
+        except Exception as e:
+            logger.warning(
+                f"OpenStack catalog lookup of {kind} {name_or_id} failed: {e}",
+                exc_info=True,
+            )
+        find = {
+            "flavor": self.conn.compute.find_flavor,
+            "image": self.conn.compute.find_image,
+        }[kind]
+        return find(name_or_id, ignore_missing=ignore_missing)
+
+    @staticmethod
+    def _server_to_info(server):
+        """Map a Nova server to the server info dict."""
+        # Initialize IP-related fields
+        networks = server.addresses or {}
+        ip_addr, net_name = None, None
+
+        # Prioritize floating IP, fallback to fixed if not available
+        for net, ips in networks.items():
+            for ip_info in ips:
+                if ip_info.get("OS-EXT-IPS:type") == "floating":
+                    ip_addr = ip_info.get("addr")
+                    net_name = net
+                    break
+                elif not ip_addr and ip_info.get("OS-EXT-IPS:type") == "fixed":
+                    ip_addr = ip_info.get("addr")
+                    net_name = net
+
+        return {
+            "name": server.name,
+            "server_id": server.id,
+            "flavor": server.flavor.get("original_name") or server.flavor.get("id"),
+            "network": net_name,
+            "private_ip": ip_addr,
+            "key_name": getattr(server, "key_name", "N/A"),
+            "status": server.status,
+        }
+
+    def _servers_page(self, status, page_size, marker=None, query=None) -> list:
+        """One ``GET /servers/detail`` of at most ``page_size`` servers in ``status``."""
+        params = dict(query.nova_params()) if query else {}
+        params.update(status=status, limit=page_size, paginated=False)
+        if marker:
+            params["marker"] = marker
+        return list(self.conn.compute.servers(**params))
+
+    def server_query(self, params_dict) -> ServerQuery | None:
+        """
+        The ``name`` (regular expression), ``flavor``, ``image``, ``key`` and
+        ``changed-since`` (age like ``2h`` or ISO 8601) parameters as a ``ServerQuery``.
+        Flavor and image names are resolved to the IDs Nova filters on; None if one of them
+        does not exist, since no server can match then.
+        """
+        flavor = image = None
+        if params_dict.get("flavor"):
+            flavor = self._resolve("flavor", params_dict["flavor"], ignore_missing=True)
+            if flavor is None:
+                return None
+        if params_dict.get("image"):
+            image = self._resolve("image", params_dict["image"], ignore_missing=True)
+            if image is None:
+                return None
+        changes_since = None
+        if params_dict.get("changed-since"):
+            changes_since = parse_since(params_dict["changed-since"]).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            )
+        return ServerQuery(
+            name=params_dict.get("name") or None,
+            flavor_id=flavor.id if flavor else None,
+            flavor_name=flavor.name if flavor else None,
+            image_id=image.id if image else None,
+            key_name=params_dict.get("key") or None,
+            changes_since=changes_since,
         )
 
+    def iter_servers(
+        self,
+        statuses=("ACTIVE",),
+        limit=None,
+        marker=None,
+        page_size=None,
+        query=None,
+    ):
+        """
+        Yield the servers in any of ``statuses`` as info dicts, newest first (Nova's order).
+
+        Nova filters on one status per request, so every status is paged through on its
+        own, ``page_size`` servers per request (default ``OS_LIST_PAGE_SIZE``), and the
+        streams are merged. The first page of each status is fetched concurrently, and the
+        next page of a status is fetched in the background while the current one is read.
+        Pages are only requested as the caller consumes them, so ``limit`` (or stopping
+        early) skips the rest of the project.
+
+        :param marker: ID of the last server of the previous page, to continue after it.
+            Nova only accepts it for the status that server has, so it needs a single status.
+        :param query: ``ServerQuery`` sent along with every request. Nova ignores
+            ``key_name`` for non-admin users, so that one is checked here as well.
+        """
+        statuses = list(dict.fromkeys(status.upper() for status in statuses))
+        if marker and len(statuses) > 1:
+            raise ValueError("A marker can only be used with a single status")
+        if page_size is None:
+            page_size = get_config_value("OS_LIST_PAGE_SIZE", 1000)
+        if limit:
+            page_size = min(page_size, limit)
+
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, len(statuses)), thread_name_prefix="openstack-list"
+        )
+
+        def stream(status, future):
+            fetched = 0
+            while future is not None:
+                page = future.result()
+                future = None
+                fetched += len(page)
+                # No status can contribute more than ``limit`` servers to the merge
+                if len(page) == page_size and not (limit and fetched >= limit):
+                    future = executor.submit(
+                        self._servers_page, status, page_size, page[-1].id, query
+                    )
+                yield from page
+
+        try:
+            # Submitted up front so that the first pages are fetched concurrently
+            first_pages = [
+                executor.submit(self._servers_page, status, page_size, marker, query)
+                for status in statuses
+            ]
+            streams = [
+                stream(status, future) for status, future in zip(statuses, first_pages)
+            ]
+            merged = heapq.merge(
+                *streams,
+                key=lambda server: (str(server.created_at or ""), str(server.id)),
+                reverse=True,
+            )
+            if query and query.key_name:
+                merged = (s for s in merged if s.key_name == query.key_name)
+            for server in itertools.islice(merged, limit):
+                yield self._server_to_info(server)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def list_servers(self, params_dict=None):
         """
-        List all OpenStack VMs, optionally filtered by status (e.g., 'ACTIVE', 'SHUTOFF').
+        List OpenStack VMs, filtered by status (e.g. 'ACTIVE,SHUTOFF', default ACTIVE) and
+        the ``name``, ``flavor``, ``image``, ``key`` and ``changed-since`` parameters, which
+        Nova applies (see ``server_query``).
+        With ``limit``, only page ``page`` (from 1) of that many servers is returned, and
+        ``truncated`` is set when more servers follow.
+        With ``OS_INVENTORY_REFRESH_INTERVAL`` set, the servers come from the inventory kept
+        current with ``changes-since`` and ``snapshot_age`` is set, unless ``fresh`` is passed.
         Returns a list of dictionaries with basic VM info.
         """
         if params_dict is None:
             params_dict = {}
 
-        try:
-            # Extract status filters as a list
-            status_filter = get_list_of_values_for_key_in_dict_of_parameters(
+        # Extract status filters as a list, defaulting to ACTIVE
+        status_filter = [
+            status.upper()
+            for status in get_list_of_values_for_key_in_dict_of_parameters(
                 "status", params_dict
             )
+        ] or ["ACTIVE"]
 
-            # Default to ACTIVE if no status filter provided
-            status_filter = status_filter[0].upper() if status_filter else "ACTIVE"
-
-            servers_info = []
-            # Iterate through all servers
-            for server in self.conn.compute.servers(status=status_filter):
-                # Initialize IP-related fields
-                networks = server.addresses or {}
-                ip_addr, net_name = None, None
-
-                # Prioritize floating IP, fallback to fixed if not available
-                for net, ips in networks.items():
-                    for ip_info in ips:
-                        if ip_info.get("OS-EXT-IPS:type") == "floating":
-                            ip_addr = ip_info.get("addr")
-                            net_name = net
-                            break
-                        elif not ip_addr and ip_info.get("OS-EXT-IPS:type") == "fixed":
-                            ip_addr = ip_info.get("addr")
-                            net_name = net
-
-                # Collect server details
-                servers_info.append(
-                    {
-                        "name": server.name,
-                        "server_id": server.id,
-                        "flavor": server.flavor.get("original_name")
-                        or server.flavor.get("id"),
-                        "network": net_name,
-                        "private_ip": ip_addr,
-                        "key_name": getattr(server, "key_name", "N/A"),
-                        "status": server.status,
-                    }
+        try:
+            limit = int(params_dict.get("limit") or 0)
+            page = int(params_dict.get("page") or 1)
+            query = self.server_query(params_dict)
+            if query is None:
+                # Unknown flavor or image
+                servers_info = []
+            elif server_inventory.enabled and not params_dict.get("fresh"):
+                return server_inventory.list_servers(status_filter, query, limit, page)
+            elif limit:
+                # One extra server tells whether another page follows
+                offset = (page - 1) * limit
+                servers = self.iter_servers(
+                    status_filter, limit=offset + limit + 1, query=query
                 )
+                servers_info = list(itertools.islice(servers, offset, None))
+            else:
+                servers_info = list(self.iter_servers(status_filter, query=query))
 
             # Log the number of servers retrieved
             logger.info(
                 f"Retrieved {len(servers_info)} servers with status filter '{status_filter}'."
             )
-            return {"count": len(servers_info), "instances": servers_info}
+            result = {"count": len(servers_info), "instances": servers_info}
+            if limit:
+                result["page"] = page
+                if len(servers_info) > limit:
+                    result.update(
+                        count=limit, instances=servers_info[:limit], truncated=True
+                    )
+            return result
 
         except Exception as e:
             # Log the exception that occurred during the listing process
@@ -88,7 +259,9 @@ class OpenStackHelper:
             )
             raise e
 
-    def create_servers(self, name, image_id, flavor, key_name, network=None):
+    def create_servers(
+        self, name, image_id, flavor, key_name, network=None, wait=True, count=1
+    ):
         """
         Create an OpenStack VM with the specified parameters provided as a dictionary.
         :param name: Name of the VM.
@@ -96,7 +269,14 @@ class OpenStackHelper:
         :param flavor: Flavor name (size) of the VM.
         :param key_name: Name of the SSH keypair to associate.
         :param network: (Optional) Network UUID to attach the instance to.
-        :return: dictionary containing instance details.
+        :param wait: Wait until the VM is ACTIVE. If False, return right after Nova accepted
+            the request (status BUILD, usually no IP yet); see ``get_server``.
+        :param count: Number of VMs. Above 1 they are created by one Nova request with
+            ``min_count=1``/``max_count=count`` (Nova creates as many as the quota allows)
+            and Nova names them ``<name>-1`` ... ``<name>-N``. A VM of such a batch that
+            goes into ERROR or is not ACTIVE in time is returned with its last status and
+            an "error" instead of raising.
+        :return: dictionary containing instance details ("requested" is set for batches).
         """
 
         logger.info(
@@ -104,11 +284,22 @@ class OpenStackHelper:
             f"network {network}, key_name {key_name}"
         )
 
+        if network:
+            # A network name known to the catalog becomes its UUID; Nova checks the rest
+            try:
+                network = getattr(
+                    openstack_catalog.find("network", network), "id", network
+                )
+            except Exception as e:
+                logger.warning(
+                    f"OpenStack catalog lookup of network {network} failed: {e}",
+                    exc_info=True,
+                )
         networks_param = [{"uuid": network}] if network else []
 
-        # Validate the provided key_name
-        available_keys = [kp.name for kp in self.conn.compute.keypairs()]
-        if key_name not in available_keys:
+        # Validate the provided key_name; the full listing is only needed for the error
+        if self.conn.compute.find_keypair(key_name) is None:
+            available_keys = [kp.name for kp in self.conn.compute.keypairs()]
             logger.error(
                 f"Invalid key_name '{key_name}' provided. Available keypairs: {available_keys}"
             )
@@ -118,57 +309,85 @@ class OpenStackHelper:
 
         try:
             # Resolve flavor by name
-            flavor = self.conn.compute.find_flavor(flavor, ignore_missing=False)
+            flavor = self._resolve("flavor", flavor)
             if not flavor:
                 raise ValueError(f"Flavor '{flavor}' not found in OpenStack.")
 
             # Optionally validate image exists
-            image = self.conn.compute.find_image(image_id, ignore_missing=False)
+            image = self._resolve("image", image_id)
             if not image:
                 raise ValueError(f"Image '{image_id}' not found in OpenStack.")
 
+            batch_args = {"min_count": 1, "max_count": count} if count > 1 else {}
             server = self.conn.compute.create_server(
                 name=name,
                 image_id=image.id,
                 flavor_id=flavor.id,
                 networks=networks_param,
                 key_name=key_name,
+                **batch_args,
             )
+            server_inventory.mark_dirty()
+            servers = [server]
+            if count > 1:
+                servers = self._servers_of_batch(server, name, key_name)
+                if len(servers) < count:
+                    logger.warning(
+                        f"Only {len(servers)} of {count} OpenStack VMs were created"
+                    )
 
-            # Wait for VM to become ACTIVE
-            server = self.conn.compute.wait_for_server(server)
-
-            logger.info(f"VM {server.name} created successfully in OpenStack!")
-
-            # Extract the first fixed (private) IP address
-            private_ip = None
-            for addr_list in server.addresses.values():
-                for addr in addr_list:
-                    if addr.get("OS-EXT-IPS:type") == "fixed":
-                        private_ip = addr.get("addr")
-                        break
-                if private_ip:
-                    break
+            servers_info = []
+            for server in servers:
+                server_info = {
+                    "name": server.name or name,
+                    "server_id": server.id,
+                    "status": server.status or "BUILD",
+                    "flavor": flavor.name,
+                    "network": network or "Default Network",
+                    "key_name": key_name,
+                    "private_ip": "N/A",
+                }
+                servers_info.append(server_info)
+                if not wait:
+                    logger.info(
+                        f"VM {server_info['name']} ({server.id}) submitted to OpenStack"
+                    )
+                    continue
+
+                # Wait for VM to become ACTIVE
+                try:
+                    server = self._wait_until_active(server)
+                except WaitError as e:
+                    if count == 1:
+                        raise
+                    logger.error(f"OpenStack VM {server.id} is not ACTIVE: {e}")
+                    server_info.update(
+                        status=getattr(e.value, "status", None) or "ERROR",
+                        error=str(e),
+                    )
+                    continue
+
+                logger.info(f"VM {server.name} created successfully in OpenStack!")
+
+                private_ip = _fixed_ip(server)
+
+                logger.info(f"VM {server.name} is ACTIVE with private IP: {private_ip}")
+
+                server_info.update(
+                    name=server.name,
+                    status=server.status,
+                    private_ip=private_ip or "N/A",
+                )
 
-            logger.info(f"VM {server.name} is ACTIVE with private IP: {private_ip}")
-
-            # Construct response dictionary
-            server_info = {
-                "name": server.name,
-                "server_id": server.id,
-                "status": server.status,
-                "flavor": flavor.name,
-                "network": network or "Default Network",
-                "key_name": key_name,
-                "private_ip": private_ip or "N/A",
+            result = {
+                "count": len(servers_info),
+                "instances": servers_info,
             }
+            if count > 1:
+                result["requested"] = count
+            return result
 
-            return {
-                "count": 1,
-                "instances": [server_info],
-            }
-
-        except ResourceFailure as rf:
+        except (ResourceFailure, WaitFailed) as rf:
             logger.error(f"OpenStack VM transitioned to ERROR state: {str(rf)}")
             raise RuntimeError(
                 "OpenStack VM provisioning failed. Please verify image/flavor/network configuration."
@@ -179,6 +398,90 @@ class OpenStackHelper:
             logger.error(traceback.format_exc())
             raise e
 
+    def _servers_of_batch(self, first, name, key_name) -> list:
+        """
+        Servers created by one multi-create request, ordered by their number: Nova names
+        them ``<name>-<n>`` but only returns the first one. The servers of the batch share
+        its reservation ID; Nova only shows that to admins by default, so otherwise they
+        are the servers named like the batch that were created no earlier than the first.
+        """
+        first = self.conn.compute.get_server(first.id)
+        pattern = re.compile(rf"^{re.escape(name)}-(\d+)$")
+        batch = {first.id: first}
+        if first.reservation_id:
+            candidates = self.conn.compute.servers(reservation_id=first.reservation_id)
+
+            def belongs(server):
+                return server.reservation_id == first.reservation_id
+
+        else:
+            # Nova's name filter is a regular expression; changes-since (updated at or
+            # after) keeps all servers created since the first one
+            query = {"name": f"^{re.escape(name)}-[0-9]+$"}
+            if first.created_at:
+                query["changes_since"] = first.created_at
+            candidates = self.conn.compute.servers(**query)
+
+            def belongs(server):
+                # Nova timestamps are ISO 8601 in UTC, so they compare as strings
+                return server.key_name == key_name and (server.created_at or "") >= (
+                    first.created_at or ""
+                )
+
+        for server in candidates:
+            if belongs(server) and pattern.match(server.name or ""):
+                batch[server.id] = server
+
+        def number(server):
+            match = pattern.match(server.name or "")
+            return int(match.group(1)) if match else 0
+
+        return sorted(batch.values(), key=number)
+
+    def _wait_until_active(self, server):
+        """
+        Poll ``server`` until it is ACTIVE and, with ``WAIT_FOR_SSH``, accepts SSH
+        connections. Returns the refreshed server; raises a ``WaitError`` otherwise.
+        """
+
+        def is_failed(srv):
+            if srv.status != "ERROR":
+                return False
+            fault = getattr(srv, "fault", None) or {}
+            return (fault.get("message") if isinstance(fault, dict) else "") or (
+                f"Server {srv.id} went into ERROR state."
+            )
+
+        return wait_for(
+            lambda: self.conn.compute.get_server(server.id),
+            is_ready=lambda srv: srv.status == "ACTIVE",
+            is_failed=is_failed,
+            reachable=(
+                (lambda srv: tcp_reachable(_fixed_ip(srv))) if wait_for_ssh() else None
+            ),
+            timeout=SERVER_ACTIVE_TIMEOUT,
+            description=f"OpenStack server {server.id}",
+        ).value
+
+    def get_server(self, server_id: str):
+        """
+        Current status of a server, e.g. one created with ``wait=False``.
+        :return: dictionary with "name", "server_id", "status", "private_ip" and "fault",
+            or None if the server does not exist.
+        """
+        try:
+            server = self.conn.compute.get_server(server_id)
+        except NotFoundException:
+            return None
+        fault = getattr(server, "fault", None) or {}
+        return {
+            "name": server.name,
+            "server_id": server.id,
+            "status": server.status,
+            "private_ip": _fixed_ip(server) or "N/A",
+            "fault": fault.get("message", "") if isinstance(fault, dict) else "",
+        }
+
     def create_keypair(self, key_name: str):
         """
         Function to create keypair on Openstack and return the private key.
@@ -201,6 +504,20 @@ class OpenStackHelper:
 
         return new_key
 
+    def import_keypair(self, key_name: str, public_key: str):
+        """
+        Import the OpenSSH ``public_key`` as keypair ``key_name`` (see ``sdk.tools.keys``),
+        replacing an existing keypair of that name.
+        Returns a dictionary with `KeyName` and `KeyFingerprint` keys
+        """
+        try:
+            key = self.conn.compute.create_keypair(name=key_name, public_key=public_key)
+        except ConflictException:
+            logger.debug(f"Replacing existing keypair {key_name}")
+            self.conn.compute.delete_keypair(key_name, ignore_missing=True)
+            key = self.conn.compute.create_keypair(name=key_name, public_key=public_key)
+        return {"KeyName": key.name, "KeyFingerprint": key.fingerprint}
+
     def delete_keypair(self, key_name: str):
         """
         Function to delete keypair on Openstack.
@@ -219,12 +536,13 @@ class OpenStackHelper:
         key = {}
         try:
             if key_name:
-                ret_keys = self.conn.list_keypairs({"name": key_name})
-                if not ret_keys or not isinstance(ret_keys, list):
+                # A GET of the one keypair, rather than listing all and filtering
+                ret_key = self.conn.compute.find_keypair(key_name)
+                if ret_key is None:
                     return None
 
-                key["KeyName"] = ret_keys[0].name
-                key["KeyFingerprint"] = ret_keys[0].fingerprint
+                key["KeyName"] = ret_key.name
+                key["KeyFingerprint"] = ret_key.fingerprint
             else:
                 ret_keys = self.conn.list_keypairs()
                 if not ret_keys or not isinstance(ret_keys, list):
@@ -237,16 +555,18 @@ class OpenStackHelper:
 
         return key
 
-    def stop_server(self, server_id: str):
+    def stop_server(self, server_id: str, server=None):
         """
         Stop a specific OpenStack server by ID.
 
         :param server_id: The ID of the server to stop
+        :param server: The server, if already fetched (e.g. by ``find_servers``)
         :return: Dictionary with operation status and details
         """
         try:
             # Get server details first to validate it exists
-            server = self.conn.compute.find_server(server_id, ignore_missing=False)
+            if server is None:
+                server = self.conn.compute.find_server(server_id, ignore_missing=False)
             if not server:
                 return {"success": False, "error": f"Server {server_id} not found"}
 
@@ -266,6 +586,7 @@ class OpenStackHelper:
 
             # Stop the server
             self.conn.compute.stop_server(server)
+            server_inventory.mark_dirty()
 
             logger.info(f"Successfully initiated stop for server {server_id}")
 
@@ -282,16 +603,18 @@ class OpenStackHelper:
             logger.error(traceback.format_exc())
             return {"success": False, "error": f"Failed to stop server: {str(e)}"}
 
-    def start_server(self, server_id: str):
+    def start_server(self, server_id: str, server=None):
         """
         Start a specific OpenStack server by ID.
 
         :param server_id: The ID of the server to start
+        :param server: The server, if already fetched (e.g. by ``find_servers``)
         :return: Dictionary with operation status and details
         """
         try:
             # Get server details first to validate it exists
-            server = self.conn.compute.find_server(server_id, ignore_missing=False)
+            if server is None:
+                server = self.conn.compute.find_server(server_id, ignore_missing=False)
             if not server:
                 return {"success": False, "error": f"Server {server_id} not found"}
 
@@ -311,6 +634,7 @@ class OpenStackHelper:
 
             # Start the server
             self.conn.compute.start_server(server)
+            server_inventory.mark_dirty()
 
             logger.info(f"Successfully initiated start for server {server_id}")
 
@@ -327,16 +651,18 @@ class OpenStackHelper:
             logger.error(traceback.format_exc())
             return {"success": False, "error": f"Failed to start server: {str(e)}"}
 
-    def delete_server(self, server_id: str):
+    def delete_server(self, server_id: str, server=None):
         """
         Delete (terminate) a specific OpenStack server by ID.
 
         :param server_id: The ID of the server to delete
+        :param server: The server, if already fetched (e.g. by ``find_servers``)
         :return: Dictionary with operation status and details
         """
         try:
             # Get server details first to validate it exists
-            server = self.conn.compute.find_server(server_id, ignore_missing=False)
+            if server is None:
+                server = self.conn.compute.find_server(server_id, ignore_missing=False)
             if not server:
                 return {"success": False, "error": f"Server {server_id} not found"}
 
@@ -351,6 +677,7 @@ class OpenStackHelper:
 
             # Delete the server
             self.conn.compute.delete_server(server)
+            server_inventory.mark_dirty()
 
             logger.info(
                 f"Successfully initiated deletion for server {server_id} (name: {server_name})"
@@ -368,3 +695,140 @@ class OpenStackHelper:
             logger.error(f"Error deleting server {server_id}: {str(e)}")
             logger.error(traceback.format_exc())
             return {"success": False, "error": f"Failed to delete server: {str(e)}"}
+
+    def get_quota_usage(self) -> dict:
+        """
+        Limits and usage of instances, cores, RAM (MB) and ports in the project, for the
+        quota preflight (see ``sdk.tools.quota``).
+        """
+        limits = self.conn.compute.get_limits().absolute
+        usage = {
+            "instances": {"limit": limits.instances, "used": limits.instances_used},
+            "cores": {"limit": limits.total_cores, "used": limits.total_cores_used},
+            "ram_mb": {"limit": limits.total_ram, "used": limits.total_ram_used},
+        }
+        try:
+            ports = self.conn.network.get_quota(
+                self.conn.current_project_id, details=True
+            ).ports
+            usage["ports"] = {
+                "limit": ports["limit"],
+                "used": ports["used"] + ports.get("reserved", 0),
+            }
+        except Exception as e:
+            logger.warning(f"Unable to get the network quota: {e}", exc_info=True)
+        return usage
+
+    def quota_demand(self, flavor, count=1) -> dict:
+        """Quota that creating ``count`` servers of ``flavor`` takes (one port each)."""
+        flavor = self._resolve("flavor", flavor)
+        return {
+            "instances": count,
+            "cores": flavor.vcpus * count,
+            "ram_mb": flavor.ram * count,
+            "ports": count,
+        }
+
+    def find_servers(self, name_prefix=None, statuses=None, key_name=None) -> list:
+        """
+        The servers whose name starts with ``name_prefix``, in any of ``statuses`` and with
+        ``key_name``, resolved with one (paginated) listing for a bulk ``modify_servers``.
+        """
+        name = None
+        if name_prefix:
+            # Nova matches the name as a regular expression
+            name = "^" + re.sub(r"([.^$*+?{}\[\]\\|()])", r"\\\1", name_prefix)
+        query = ServerQuery(name=name, key_name=key_name)
+        params = query.nova_params()
+        statuses = {status.upper() for status in statuses or ()}
+        if len(statuses) == 1:
+            params["status"] = next(iter(statuses))
+        return [
+            server
+            for server in self.conn.compute.servers(**params)
+            if (not statuses or server.status in statuses) and query.matches(server)
+        ]
+
+    def _wait_for_lifecycle(self, action, server_id) -> dict:
+        """
+        Wait until the server reached the final status of ``action`` (up to
+        ``OS_BULK_WAIT_TIMEOUT`` seconds, default 600). Returns the result fields to update.
+        """
+        final_status = _LIFECYCLE_FINAL_STATUSES[action]
+
+        def is_ready(srv):
+            if final_status is None:
+                return srv is None
+            return srv is not None and srv.status == final_status
+
+        def is_failed(srv):
+            if srv is None:
+                return final_status is not None and f"Server {server_id} is gone."
+            return (
+                srv.status == "ERROR" and f"Server {server_id} went into ERROR state."
+            )
+
+        try:
+            server = wait_for(
+                lambda: self.conn.compute.find_server(server_id),
+                is_ready=is_ready,
+                is_failed=is_failed,
+                timeout=get_config_value("OS_BULK_WAIT_TIMEOUT", 600),
+                description=f"OpenStack server {server_id}",
+            ).value
+        except WaitError as e:
+            return {"success": False, "error": str(e)}
+        return {"current_status": server.status if server else "DELETED"}
+
+    def modify_servers(self, servers, action, wait=False, on_result=None):
+        """
+        Stop, start or delete several servers. Nova has no batch call for these, so the
+        per-server calls run concurrently on ``VM_MODIFY_CONCURRENCY`` threads (default 8).
+
+        :param servers: IDs of the servers, or the servers themselves (``find_servers``),
+            which saves looking each one up again
+        :param action: "stop", "start" or "delete"
+        :param wait: Also wait until each server is SHUTOFF, ACTIVE or gone;
+            "current_status" is then the final status
+        :param on_result: Called with each result as soon as it is known (from the worker
+            threads), e.g. to update a progress message
+        :return: List of per-server results shaped like ``stop_server``'s (always with
+            "server_id"), in the order of ``servers``
+        """
+        modify = {
+            "stop": self.stop_server,
+            "start": self.start_server,
+            "delete": self.delete_server,
+        }[action]
+        if not servers:
+            return []
+
+        def run(target):
+            server = None if isinstance(target, str) else target
+            server_id = target if server is None else server.id
+            result = dict(modify(server_id, server=server), server_id=server_id)
+            if wait and result["success"]:
+                result.update(self._wait_for_lifecycle(action, server_id))
+            if on_result is not None:
+                try:
+                    on_result(result)
+                except Exception as e:
+                    logger.warning(
+                        f"Progress callback failed for {server_id}: {e}", exc_info=True
+                    )
+            return result
+
+        workers = min(len(servers), get_config_value("VM_MODIFY_CONCURRENCY", 8))
+        with ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="openstack-modify"
+        ) as executor:
+            return list(executor.map(run, servers))
+
+
+def _fixed_ip(server):
+    """First fixed (private) IP address of ``server``, or None."""
+    for addr_list in (server.addresses or {}).values():
+        for addr in addr_list:
+            if addr.get("OS-EXT-IPS:type") == "fixed":
+                return addr.get("addr")
+    return None
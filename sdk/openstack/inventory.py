@@ -0,0 +1,201 @@
+"""
+In-memory copy of the project's OpenStack servers, kept current with ``changes-since``.
+
+Listing a large project means paging through every server on each ``openstack vm list``.
+``ServerInventory`` loads the project once, then asks Nova only for the servers changed
+since the previous sync (``GET /servers/detail?changes-since=...``, which also returns
+servers deleted since, with status DELETED), so a repeated listing costs one small request.
+With ``OS_INVENTORY_REFRESH_INTERVAL`` set (seconds, 0 = off):
+
+* the project is loaded the first time it is listed;
+* a listing whose copy is older than the interval syncs the deltas first;
+* servers the bot creates, stops, starts or deletes make the next listing sync right away.
+
+Every result carries ``snapshot_age`` in seconds; ``--fresh`` lists live from Nova.
+"""
+
+import logging
+import re
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from typing import NamedTuple
+
+from sdk.tools.helpers import get_config_value
+
+logger = logging.getLogger(__name__)
+
+# ``changes-since`` is compared with Nova's clock, so the next sync overlaps the previous one
+# by this many seconds; servers seen twice are simply replaced.
+SYNC_OVERLAP = 60
+
+_GONE_STATUSES = {"DELETED", "SOFT_DELETED"}
+
+
+def _parse_time(value) -> datetime | None:
+    """Nova's ``2024-05-01T10:00:00Z`` (or ``...+00:00``) as an aware datetime."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(str(value))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
+class ServerQuery(NamedTuple):
+    """Server filters of ``openstack vm list``, with flavor and image already resolved."""
+
+    name: str | None = None  # regular expression, matched anywhere in the name
+    flavor_id: str | None = None
+    flavor_name: str | None = None
+    image_id: str | None = None
+    key_name: str | None = None
+    changes_since: str | None = None  # ISO 8601, UTC
+
+    def nova_params(self) -> dict:
+        """The filters as ``compute.servers`` query parameters."""
+        params = {
+            "name": self.name,
+            "flavor": self.flavor_id,
+            "image": self.image_id,
+            "key_name": self.key_name,
+            "changes_since": self.changes_since,
+        }
+        return {key: value for key, value in params.items() if value}
+
+    def matches(self, server) -> bool:
+        """Whether ``server`` passes every filter, the way Nova applies them."""
+        if self.name and not re.search(self.name, server.name or ""):
+            return False
+        flavor = server.flavor or {}
+        if (
+            self.flavor_id
+            and self.flavor_id != flavor.get("id")
+            and (
+                not self.flavor_name or self.flavor_name != flavor.get("original_name")
+            )
+        ):
+            return False
+        if self.image_id and self.image_id != (server.image or {}).get("id"):
+            return False
+        if self.key_name and self.key_name != server.key_name:
+            return False
+        if self.changes_since:
+            updated = _parse_time(server.updated_at)
+            if updated is None or updated < _parse_time(self.changes_since):
+                return False
+        return True
+
+
+class ServerInventory:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()  # one sync at a time
+        self._servers = None  # server ID -> server, None until the first load
+        self._since = None  # ``changes-since`` of the next sync
+        self._synced_at = None
+        self._dirty = False
+
+    @property
+    def refresh_interval(self) -> float:
+        return get_config_value("OS_INVENTORY_REFRESH_INTERVAL", 0, cast=float)
+
+    @property
+    def enabled(self) -> bool:
+        return self.refresh_interval > 0
+
+    def list_servers(self, statuses, query=None, limit=None, page=1) -> dict:
+        """
+        Servers in any of ``statuses`` matching ``query``, newest first, shaped like
+        ``OpenStackHelper.list_servers``'s result plus ``snapshot_age``.
+        Syncs the deltas first if the copy is older than the refresh interval.
+        """
+        # Imported here because sdk.openstack.core imports this module
+        from sdk.openstack.core import OpenStackHelper
+
+        with self._lock:
+            due = (
+                self._servers is None
+                or self._dirty
+                or self._clock() - self._synced_at >= self.refresh_interval
+            )
+        if due:
+            self.sync()
+
+        query = query or ServerQuery()
+        statuses = {status.upper() for status in statuses}
+        with self._lock:
+            servers = [
+                server
+                for server in self._servers.values()
+                if server.status in statuses and query.matches(server)
+            ]
+            age = self._clock() - self._synced_at
+        servers.sort(
+            key=lambda server: (str(server.created_at or ""), str(server.id)),
+            reverse=True,
+        )
+
+        result = {}
+        if limit:
+            offset = (page - 1) * limit
+            result["page"] = page
+            if len(servers) > offset + limit:
+                result["truncated"] = True
+            servers = servers[offset : offset + limit]
+        instances = [OpenStackHelper._server_to_info(server) for server in servers]
+        result.update(count=len(instances), instances=instances, snapshot_age=age)
+        return result
+
+    def sync(self):
+        """
+        Load every server of the project, or only those changed since the last sync.
+        Returns the number of servers Nova returned.
+        """
+        from sdk.openstack.core import OpenStackHelper
+
+        with self._sync_lock:
+            started = self._clock()
+            since = datetime.now(UTC) - timedelta(seconds=SYNC_OVERLAP)
+            with self._lock:
+                full = self._servers is None
+                changes_since = self._since
+                self._dirty = False
+
+            compute = OpenStackHelper().conn.compute
+            if full:
+                servers = list(compute.servers())
+            else:
+                servers = list(compute.servers(changes_since=changes_since))
+
+            with self._lock:
+                if full:
+                    self._servers = {}
+                for server in servers:
+                    if server.status in _GONE_STATUSES:
+                        self._servers.pop(server.id, None)
+                    else:
+                        self._servers[server.id] = server
+                self._since = since.strftime("%Y-%m-%dT%H:%M:%SZ")
+                self._synced_at = started
+                total = len(self._servers)
+
+        logger.info(
+            f"OpenStack inventory {'loaded' if full else 'synced'}: {len(servers)} "
+            f"servers fetched, {total} in the project, in {self._clock() - started:.1f}s"
+        )
+        return len(servers)
+
+    def mark_dirty(self):
+        """Sync before the next listing, e.g. after the bot changed a server."""
+        with self._lock:
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._servers = None
+            self._since = None
+            self._synced_at = None
+            self._dirty = False
+
+
+server_inventory = ServerInventory()
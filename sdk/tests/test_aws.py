@@ -1,8 +1,26 @@
+import itertools
 import unittest.mock as mock
-import botocore.exceptions
 from unittest.mock import Mock
 
+import botocore.exceptions
+import pytest
+
 from sdk.aws.ec2 import EC2Helper
+from sdk.aws.inventory import instance_inventory
+from sdk.aws.topology import topology_resolver
+from sdk.tools.client_registry import client_registry
+
+
+@pytest.fixture(autouse=True)
+def clear_client_registry():
+    """Every test patches the SDK entry points, so it must not get a client cached by another test."""
+    client_registry.clear()
+    topology_resolver.invalidate()
+    instance_inventory.clear()
+    yield
+    client_registry.clear()
+    topology_resolver.invalidate()
+    instance_inventory.clear()
 
 
 @mock.patch("boto3.Session")
@@ -17,7 +35,9 @@ def test_list_instances_empty(mock_boto3_session):
     assert result == {"count": 0, "instances": []}
 
     mock_boto3_session.assert_called_once()
-    mock_boto3_session.return_value.client.assert_called_once_with("ec2")
+    mock_boto3_session.return_value.client.assert_called_once_with(
+        "ec2", config=mock.ANY
+    )
     mock_client.describe_instances.assert_called_once()
 
 
@@ -61,7 +81,9 @@ def test_list_instances(mock_boto3_session):
     assert instances[1]["state"] == "stopped"
 
     mock_boto3_session.assert_called_once()
-    mock_boto3_session.return_value.client.assert_called_once_with("ec2")
+    mock_boto3_session.return_value.client.assert_called_once_with(
+        "ec2", config=mock.ANY
+    )
     mock_client.describe_instances.assert_called_once()
 
 
@@ -132,6 +154,151 @@ def test_create_instance_success(mock_boto3_session, mock_boto3_client):
     )
 
 
+@mock.patch("boto3.Session")
+def test_create_instance_reuses_cached_topology(mock_boto3_session):
+    """Test that a second create skips the identity and network lookups."""
+    mock_resource = mock.MagicMock()
+    mock_resource.create_instances.return_value = [
+        Mock(id="i-1", state={"Name": "running"})
+    ]
+    mock_boto3_session.return_value.resource.return_value = mock_resource
+
+    mock_client = mock.MagicMock()
+    mock_client.get_caller_identity.return_value = {"Arn": "test-arn/redhat"}
+    mock_client.describe_vpcs.return_value = {"Vpcs": [{"VpcId": "vpc-1"}]}
+    mock_client.describe_subnets.return_value = {"Subnets": [{"SubnetId": "subnet-1"}]}
+    mock_client.describe_security_groups.return_value = {
+        "SecurityGroups": [{"GroupId": "sg-1"}]
+    }
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="ca-central-1")
+    for _ in range(2):
+        result = ec2_helper.create_instance("rhel-10", "t2.nano", "test-key-pair")
+        assert result["count"] == 1
+
+    assert mock_resource.create_instances.call_count == 2
+    mock_client.get_caller_identity.assert_called_once()
+    mock_client.describe_vpcs.assert_called_once()
+    mock_client.describe_subnets.assert_called_once()
+    mock_client.describe_security_groups.assert_called_once()
+
+
+@mock.patch("boto3.Session")
+def test_create_instance_with_count_names_instances_in_launch_order(
+    mock_boto3_session,
+):
+    """Test that count=N is one RunInstances and the instances are named -1 ... -N."""
+    mock_resource = mock.MagicMock()
+    mock_resource.create_instances.return_value = [
+        mock.MagicMock(id="i-b", ami_launch_index=1),
+        mock.MagicMock(id="i-a", ami_launch_index=0),
+    ]
+    mock_boto3_session.return_value.resource.return_value = mock_resource
+    mock_client = mock.MagicMock()
+    mock_client.get_caller_identity.return_value = {"Arn": "test-arn/redhat"}
+    mock_client.describe_subnets.return_value = {"Subnets": [{"SubnetId": "subnet-1"}]}
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="ca-central-1")
+    result = ec2_helper.create_instance(
+        "rhel-10", "t2.nano", "key", wait=False, count=3
+    )
+
+    mock_resource.create_instances.assert_called_once()
+    launch = mock_resource.create_instances.call_args.kwargs
+    assert launch["MinCount"] == 1 and launch["MaxCount"] == 3
+    assert result["count"] == 2 and result["requested"] == 3
+    names = [instance["name"] for instance in result["instances"]]
+    assert [instance["instance_id"] for instance in result["instances"]] == [
+        "i-a",
+        "i-b",
+    ]
+    assert names[0].startswith("redhat-") and names[0].endswith("-1")
+    assert names[1] == names[0][:-1] + "2"
+    tagged = [c.kwargs["Resources"] for c in mock_client.create_tags.call_args_list]
+    assert tagged == [["i-a"], ["i-b"]]
+
+
+@mock.patch("sdk.aws.ec2.wait_for_ssh", return_value=False)
+@mock.patch("boto3.Session")
+def test_create_instance_with_count_reports_an_instance_that_failed(
+    mock_boto3_session, mock_wait_for_ssh
+):
+    """Test that one instance not getting to running does not hide the others."""
+    running = mock.MagicMock(
+        id="i-a",
+        ami_launch_index=0,
+        state={"Name": "running"},
+        public_ip_address="1.2.3.4",
+    )
+    terminated = mock.MagicMock(
+        id="i-b", ami_launch_index=1, state={"Name": "terminated"}
+    )
+    mock_resource = mock.MagicMock()
+    mock_resource.create_instances.return_value = [running, terminated]
+    mock_boto3_session.return_value.resource.return_value = mock_resource
+    mock_client = mock.MagicMock()
+    mock_client.get_caller_identity.return_value = {"Arn": "test-arn/redhat"}
+    mock_client.describe_subnets.return_value = {"Subnets": [{"SubnetId": "subnet-1"}]}
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    result = EC2Helper(region="ca-central-1").create_instance(
+        "rhel-10", "t2.nano", "key", count=2
+    )
+
+    assert "error" not in result
+    assert result["count"] == 2 and result["requested"] == 2
+    first, second = result["instances"]
+    assert first["state"] == "running" and first["public_ip"] == "1.2.3.4"
+    assert "error" not in first
+    assert second["instance_id"] == "i-b"
+    assert second["state"] == "terminated"
+    assert second["error"] == "The instance is terminated."
+
+
+@mock.patch("boto3.Session")
+def test_create_instance_without_waiting(mock_boto3_session):
+    """Test that wait=False returns right after the launch was accepted."""
+    mock_instance = mock.MagicMock(id="i-1")
+    mock_resource = mock.MagicMock()
+    mock_resource.create_instances.return_value = [mock_instance]
+    mock_boto3_session.return_value.resource.return_value = mock_resource
+    mock_client = mock.MagicMock()
+    mock_client.get_caller_identity.return_value = {"Arn": "test-arn/redhat"}
+    mock_client.describe_subnets.return_value = {"Subnets": [{"SubnetId": "subnet-1"}]}
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="ca-central-1")
+    result = ec2_helper.create_instance("rhel-10", "t2.nano", "key", wait=False)
+
+    assert result["instances"][0]["instance_id"] == "i-1"
+    assert result["instances"][0]["public_ip"] == "N/A"
+    mock_instance.wait_until_running.assert_not_called()
+
+
+@mock.patch("boto3.Session")
+def test_create_instance_stale_topology_is_invalidated(mock_boto3_session):
+    """Test that a NotFound error from RunInstances drops the cached topology."""
+    mock_resource = mock.MagicMock()
+    mock_resource.create_instances.side_effect = botocore.exceptions.ClientError(
+        {"Error": {"Code": "InvalidSubnetID.NotFound", "Message": "gone"}},
+        "RunInstances",
+    )
+    mock_boto3_session.return_value.resource.return_value = mock_resource
+    mock_client = mock.MagicMock()
+    mock_client.describe_vpcs.return_value = {"Vpcs": [{"VpcId": "vpc-1"}]}
+    mock_client.describe_subnets.return_value = {"Subnets": [{"SubnetId": "subnet-1"}]}
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="ca-central-1")
+    result = ec2_helper.create_instance("rhel-10", "t2.nano", "test-key-pair")
+    assert "InvalidSubnetID.NotFound" in result["error"]
+
+    ec2_helper.create_instance("rhel-10", "t2.nano", "test-key-pair")
+    assert mock_client.describe_subnets.call_count == 2
+
+
 @mock.patch("boto3.Session")
 def test_create_instance_unable_create(mock_boto3_session):
     """Test unable to create an EC2 instance."""
@@ -412,3 +579,597 @@ def test_stop_instance_api_error(mock_boto3_session):
     assert result["success"] is False
     assert "AWS API error" in result["error"]
     assert "not authorized" in result["error"]
+
+
+@mock.patch("boto3.Session")
+def test_stop_instances_describes_and_stops_in_one_call_each(mock_boto3_session):
+    """Test that several instances are checked and stopped with one call each."""
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.return_value = {
+        "Reservations": [
+            {
+                "Instances": [
+                    {
+                        "InstanceId": "i-1",
+                        "State": {"Name": "running"},
+                        "Tags": [{"Key": "Name", "Value": "vm-1"}],
+                    },
+                    {"InstanceId": "i-2", "State": {"Name": "stopped"}},
+                    {"InstanceId": "i-3", "State": {"Name": "pending"}},
+                ]
+            }
+        ]
+    }
+    mock_client.stop_instances.return_value = {
+        "StoppingInstances": [
+            {"InstanceId": "i-1", "CurrentState": {"Name": "stopping"}},
+            {"InstanceId": "i-3", "CurrentState": {"Name": "stopping"}},
+        ]
+    }
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+    results = ec2_helper.stop_instances(["i-1", "i-2", "i-3", "i-404"])
+
+    assert [r["instance_id"] for r in results] == ["i-1", "i-2", "i-3", "i-404"]
+    assert [r["success"] for r in results] == [True, False, True, False]
+    assert results[0]["instance_name"] == "vm-1"
+    assert results[0]["current_state"] == "stopping"
+    assert "already stopped" in results[1]["error"]
+    assert "not found" in results[3]["error"]
+    mock_client.describe_instances.assert_called_once_with(
+        Filters=[{"Name": "instance-id", "Values": ["i-1", "i-2", "i-3", "i-404"]}]
+    )
+    mock_client.stop_instances.assert_called_once_with(InstanceIds=["i-1", "i-3"])
+
+
+@mock.patch("boto3.Session")
+def test_terminate_instances_isolates_the_instance_aws_rejects(mock_boto3_session):
+    """Test that a rejected batch is retried per instance so only the bad one fails."""
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.return_value = _page(["i-1", "i-2"])
+    error = botocore.exceptions.ClientError(
+        {"Error": {"Code": "OperationNotPermitted", "Message": "protected"}},
+        "TerminateInstances",
+    )
+
+    def terminate(InstanceIds):
+        if "i-2" in InstanceIds:
+            raise error
+        return {
+            "TerminatingInstances": [
+                {"InstanceId": "i-1", "CurrentState": {"Name": "shutting-down"}}
+            ]
+        }
+
+    mock_client.terminate_instances.side_effect = terminate
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+    results = ec2_helper.terminate_instances(["i-1", "i-2"])
+
+    assert results[0]["success"] is True
+    assert results[0]["current_state"] == "shutting-down"
+    assert results[1]["success"] is False
+    assert "protected" in results[1]["error"]
+    assert mock_client.terminate_instances.call_count == 3
+
+
+def _page(instance_ids, next_token=None):
+    page = {
+        "Reservations": [
+            {"Instances": [{"InstanceId": i, "State": {"Name": "running"}}]}
+            for i in instance_ids
+        ]
+    }
+    if next_token:
+        page["NextToken"] = next_token
+    return page
+
+
+@mock.patch("boto3.Session")
+def test_iter_instances_follows_next_token(mock_boto3_session):
+    """Test that every page is read and the page size is sent as MaxResults."""
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.side_effect = [
+        _page(["i-1", "i-2"], next_token="page-2"),
+        _page(["i-3"]),
+    ]
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+    instance_ids = [i["instance_id"] for i in ec2_helper.iter_instances(page_size=2)]
+
+    assert instance_ids == ["i-1", "i-2", "i-3"]
+    first, second = mock_client.describe_instances.call_args_list
+    assert first.kwargs["MaxResults"] == 5  # AWS minimum
+    assert "NextToken" not in first.kwargs
+    assert second.kwargs["NextToken"] == "page-2"
+
+
+@mock.patch("boto3.Session")
+def test_iter_instances_with_instance_ids_has_no_page_size(mock_boto3_session):
+    """Test that MaxResults is not combined with InstanceIds (AWS rejects it)."""
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.return_value = _page(["i-1"])
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+    result = ec2_helper.list_instances({"instance-ids": "i-1"})
+
+    assert result == {"count": 1, "instances": [mock.ANY]}
+    mock_client.describe_instances.assert_called_once_with(
+        InstanceIds=["i-1"], Filters=[]
+    )
+
+
+@mock.patch("boto3.Session")
+def test_list_instances_limit_stops_early(mock_boto3_session):
+    """Test that a limit only reads the pages it needs and reports truncation."""
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.side_effect = [
+        _page(["i-1", "i-2", "i-3"], next_token="page-2"),
+        _page(["i-4"]),
+    ]
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+    result = ec2_helper.list_instances(limit=2)
+
+    assert result["count"] == 2
+    assert result["truncated"] is True
+    assert [i["instance_id"] for i in result["instances"]] == ["i-1", "i-2"]
+    mock_client.describe_instances.assert_called_once()
+
+
+@mock.patch("boto3.Session")
+def test_list_regions_is_cached(mock_boto3_session):
+    """Test that describe_regions is only called once while the result is cached."""
+    from sdk.aws.ec2 import _regions_cache
+
+    _regions_cache.clear()
+    mock_client = mock.MagicMock()
+    mock_client.describe_regions.return_value = {
+        "Regions": [{"RegionName": "us-west-2"}, {"RegionName": "eu-west-1"}]
+    }
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+    assert ec2_helper.list_regions() == ["eu-west-1", "us-west-2"]
+    assert ec2_helper.list_regions() == ["eu-west-1", "us-west-2"]
+
+    mock_client.describe_regions.assert_called_once()
+    _regions_cache.clear()
+
+
+@mock.patch("boto3.Session")
+def test_list_instances_in_regions_reports_failing_regions(mock_boto3_session):
+    """Test that regions are merged with a region key and a failing region is reported."""
+    clients = {
+        "us-east-1": mock.MagicMock(),
+        "eu-west-1": mock.MagicMock(),
+        "ap-south-1": mock.MagicMock(),
+    }
+    clients["us-east-1"].describe_instances.return_value = _page(["i-1"])
+    clients[
+        "eu-west-1"
+    ].describe_instances.side_effect = botocore.exceptions.ClientError(
+        {"Error": {"Code": "AuthFailure", "Message": "not enabled"}},
+        "DescribeInstances",
+    )
+    clients["ap-south-1"].describe_instances.return_value = _page(["i-2", "i-3"])
+
+    def session(region_name, **kwargs):
+        s = mock.MagicMock()
+        s.client.return_value = clients[region_name]
+        return s
+
+    mock_boto3_session.side_effect = session
+
+    ec2_helper = EC2Helper(region="us-east-1")
+    result = ec2_helper.list_instances_in_regions(
+        ["us-east-1", "eu-west-1", "ap-south-1"]
+    )
+
+    assert result["count"] == 3
+    assert [(i["region"], i["instance_id"]) for i in result["instances"]] == [
+        ("us-east-1", "i-1"),
+        ("ap-south-1", "i-2"),
+        ("ap-south-1", "i-3"),
+    ]
+    assert list(result["errors"]) == ["eu-west-1"]
+    assert "AuthFailure" in result["errors"]["eu-west-1"]
+
+
+def test_iter_instances_large_account_with_moto(monkeypatch):
+    """
+    Test completeness of a 5,000 instance listing against moto, then replay the same pages
+    under tracemalloc to check that streaming does not hold the whole listing in memory.
+    """
+    import tracemalloc
+
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+
+    # Only the AMI we register; the default catalogue makes every launch much slower
+    monkeypatch.setenv("MOTO_EC2_LOAD_DEFAULT_AMIS", "false")
+    monkeypatch.setattr(
+        "sdk.tools.client_registry.config",
+        Mock(AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing"),
+    )
+
+    total, per_reservation = 5000, 50
+    with moto.mock_aws():
+        ec2 = boto3.client(
+            "ec2",
+            region_name="us-east-1",
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+        )
+        image_id = ec2.register_image(Name="bench")["ImageId"]
+        for _ in range(total // per_reservation):
+            ec2.run_instances(
+                ImageId=image_id,
+                MinCount=per_reservation,
+                MaxCount=per_reservation,
+                InstanceType="t2.micro",
+            )
+
+        ec2_helper = EC2Helper(region="us-east-1")
+        client = client_registry.aws_client("ec2", "us-east-1")
+        pages = []
+        real_describe = client.describe_instances
+
+        def recording_describe(**kwargs):
+            response = real_describe(**kwargs)
+            pages.append(response)
+            return response
+
+        monkeypatch.setattr(client, "describe_instances", recording_describe)
+        # moto pages by reservation: 20 reservations (1,000 instances) per page
+        instance_ids = [
+            i["instance_id"] for i in ec2_helper.iter_instances(page_size=20)
+        ]
+
+    assert len(pages) == 5
+    assert len(instance_ids) == total
+    assert len(set(instance_ids)) == total
+
+    # Replay the recorded pages, keyed by the NextToken that requests them
+    pages_by_token = {None: pages[0]}
+    for page, next_page in itertools.pairwise(pages):
+        pages_by_token[page["NextToken"]] = next_page
+    replay = mock.MagicMock()
+    replay.describe_instances.side_effect = lambda **kwargs: pages_by_token[
+        kwargs.get("NextToken")
+    ]
+
+    def peak_bytes(consume):
+        tracemalloc.start()
+        try:
+            consume()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    with mock.patch.object(client_registry, "aws_client", return_value=replay):
+        streamed = peak_bytes(
+            lambda: sum(1 for _ in ec2_helper.iter_instances(page_size=20))
+        )
+        listed = peak_bytes(lambda: ec2_helper.list_instances())
+
+    # Streaming keeps one instance at a time; the full listing keeps all 5,000
+    assert streamed * 20 < listed
+
+
+@mock.patch("sdk.tools.helpers.config")
+@mock.patch("boto3.Session")
+def test_inventory_serves_listings_from_memory(mock_boto3_session, mock_config):
+    """Test that the inventory lists once, filters in memory and sees the bot's changes."""
+    mock_config.AWS_INVENTORY_REFRESH_INTERVAL = 60
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.return_value = {
+        "Reservations": [
+            {
+                "Instances": [
+                    {
+                        "InstanceId": "i-1",
+                        "State": {"Name": "running"},
+                        "InstanceType": "t2.micro",
+                    },
+                    {
+                        "InstanceId": "i-2",
+                        "State": {"Name": "stopped"},
+                        "InstanceType": "t3.small",
+                    },
+                ]
+            }
+        ]
+    }
+    mock_client.stop_instances.return_value = {
+        "StoppingInstances": [
+            {"InstanceId": "i-1", "CurrentState": {"Name": "stopping"}}
+        ]
+    }
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+    running = ec2_helper.list_instances({"state": "running"})
+    micro = ec2_helper.list_instances({"type": "t2.micro,m5.large"})
+
+    assert [i["instance_id"] for i in running["instances"]] == ["i-1"]
+    assert [i["instance_id"] for i in micro["instances"]] == ["i-1"]
+    assert running["snapshot_age"] >= 0
+    assert mock_client.describe_instances.call_count == 1
+
+    mock_client.describe_instances.return_value = {
+        "Reservations": [
+            {"Instances": [{"InstanceId": "i-1", "State": {"Name": "running"}}]}
+        ]
+    }
+    assert ec2_helper.stop_instance("i-1")["success"] is True
+    stopping = ec2_helper.list_instances({"state": "stopping"})
+    assert [i["instance_id"] for i in stopping["instances"]] == ["i-1"]
+    assert ec2_helper.list_instances({"state": "running"})["count"] == 0
+
+    live = ec2_helper.list_instances({"state": "running", "fresh": True})
+    assert "snapshot_age" not in live
+    assert mock_client.describe_instances.call_count == 3
+
+
+@mock.patch("sdk.tools.helpers.config")
+@mock.patch("boto3.Session")
+def test_inventory_refresh_keeps_changes_made_while_it_ran(
+    mock_boto3_session, mock_config
+):
+    """Test that a refresh started before a stop does not bring back the old state."""
+    mock_config.AWS_INVENTORY_REFRESH_INTERVAL = 60
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.return_value = _page(["i-1"])
+    mock_boto3_session.return_value.client.return_value = mock_client
+    EC2Helper(region="us-east-1").list_instances()
+
+    def describe_during_stop(**kwargs):
+        instance_inventory.record("us-east-1", "i-1", state="stopping")
+        return _page(["i-1"])
+
+    mock_client.describe_instances.side_effect = describe_during_stop
+    instance_inventory.refresh("us-east-1")
+
+    result = instance_inventory.list_instances("us-east-1")
+    assert result["instances"][0]["state"] == "stopping"
+
+
+@mock.patch("sdk.tools.helpers.config")
+@mock.patch("boto3.Session")
+def test_job_checker_reads_aws_not_the_inventory(mock_boto3_session, mock_config):
+    """Test that a provisioning job sees the live state of an instance it launched."""
+    from slack_handlers.provisioning import CREATE, READY, check_aws_instance
+
+    mock_config.AWS_INVENTORY_REFRESH_INTERVAL = 3600
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.return_value = {
+        "Reservations": [
+            {"Instances": [{"InstanceId": "i-1", "State": {"Name": "pending"}}]}
+        ]
+    }
+    mock_boto3_session.return_value.client.return_value = mock_client
+    EC2Helper(region="us-east-1").list_instances()
+    instance_inventory.record("us-east-1", "i-1", state="pending")
+
+    mock_client.describe_instances.return_value = {
+        "Reservations": [
+            {
+                "Instances": [
+                    {
+                        "InstanceId": "i-1",
+                        "State": {"Name": "running"},
+                        "PublicIpAddress": "203.0.113.10",
+                    }
+                ]
+            }
+        ]
+    }
+    state, info = check_aws_instance(
+        CREATE, {"region": "us-east-1", "instance_id": "i-1"}
+    )
+
+    assert state == READY
+    assert info["public_ip"] == "203.0.113.10"
+    assert mock_client.describe_instances.call_count == 2
+    # The snapshot itself is left for the next refresh
+    snapshot = instance_inventory.list_instances("us-east-1")
+    assert snapshot["instances"][0]["state"] == "pending"
+
+
+def test_filters_from_params_combination_rules():
+    """Test how the list parameters turn into describe_instances filters."""
+    filters = EC2Helper._filters_from_params(
+        {
+            "state": "running,stopped",
+            "owner": "jdoe",
+            "key": "U123",
+            "vpc": "vpc-1",
+            "tag": "team=qe,team=ci,env",
+        }
+    )
+
+    assert filters == [
+        {"Name": "instance-state-name", "Values": ["running", "stopped"]},
+        {"Name": "key-name", "Values": ["U123"]},
+        {"Name": "vpc-id", "Values": ["vpc-1"]},
+        {"Name": "tag:Name", "Values": ["jdoe-*"]},
+        {"Name": "tag:team", "Values": ["qe", "ci"]},
+        {"Name": "tag-key", "Values": ["env"]},
+    ]
+    assert EC2Helper._filters_from_params({}) == []
+
+
+@mock.patch("boto3.Session")
+def test_list_instances_with_name_and_owner_checks_owner_locally(mock_boto3_session):
+    """Test that --name is sent to AWS and --owner is then applied to its result."""
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.return_value = {
+        "Reservations": [
+            {
+                "Instances": [
+                    {
+                        "InstanceId": f"i-{n}",
+                        "State": {"Name": "running"},
+                        "Tags": [{"Key": "Name", "Value": name}],
+                    }
+                    for n, name in enumerate(["jdoe-web", "asmith-web"])
+                ]
+            }
+        ]
+    }
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+    result = ec2_helper.list_instances({"name": "*-web", "owner": "jdoe"})
+
+    assert [i["name"] for i in result["instances"]] == ["jdoe-web"]
+    _, kwargs = mock_client.describe_instances.call_args
+    assert kwargs["Filters"] == [{"Name": "tag:Name", "Values": ["*-web"]}]
+
+
+@mock.patch("sdk.tools.helpers.config")
+@mock.patch("boto3.Session")
+def test_inventory_matches_name_and_owner_wildcards(mock_boto3_session, mock_config):
+    """Test that the inventory applies the same name, owner and key filters."""
+    mock_config.AWS_INVENTORY_REFRESH_INTERVAL = 60
+    mock_client = mock.MagicMock()
+    mock_client.describe_instances.return_value = {
+        "Reservations": [
+            {
+                "Instances": [
+                    {
+                        "InstanceId": f"i-{n}",
+                        "State": {"Name": "running"},
+                        "KeyName": key,
+                        "Tags": [{"Key": "Name", "Value": name}],
+                    }
+                    for n, (name, key) in enumerate(
+                        [("jdoe-web", "U1"), ("jdoe-db", "U2"), ("asmith-web", "U1")]
+                    )
+                ]
+            }
+        ]
+    }
+    mock_boto3_session.return_value.client.return_value = mock_client
+    ec2_helper = EC2Helper(region="us-east-1")
+
+    def names(params):
+        return [i["name"] for i in ec2_helper.list_instances(params)["instances"]]
+
+    assert names({"name": "*-web"}) == ["jdoe-web", "asmith-web"]
+    assert names({"owner": "jdoe", "key": "U1"}) == ["jdoe-web"]
+    assert names({"name": "j?oe-d*,asmith-web"}) == ["jdoe-db", "asmith-web"]
+    assert mock_client.describe_instances.call_count == 1
+
+
+@mock.patch("boto3.Session")
+def test_get_quota_usage_sums_standard_vcpus(mock_boto3_session):
+    """Test that the vCPU usage counts running standard instances by instance type."""
+    mock_client = mock.MagicMock()
+    mock_client.get_service_quota.return_value = {"Quota": {"Value": 64.0}}
+    mock_client.describe_instances.return_value = {
+        "Reservations": [
+            {
+                "Instances": [
+                    {"InstanceId": "i-1", "InstanceType": "t3.large"},
+                    {"InstanceId": "i-2", "InstanceType": "m5.xlarge"},
+                    {"InstanceId": "i-3", "InstanceType": "p3.2xlarge"},
+                ]
+            }
+        ]
+    }
+    mock_client.describe_instance_types.return_value = {
+        "InstanceTypes": [
+            {"InstanceType": "t3.large", "VCpuInfo": {"DefaultVCpus": 2}},
+            {"InstanceType": "m5.xlarge", "VCpuInfo": {"DefaultVCpus": 4}},
+        ]
+    }
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+
+    assert ec2_helper.get_quota_usage() == {"vcpus": {"limit": 64.0, "used": 6}}
+    assert ec2_helper.quota_demand("t3.large", count=3) == {"vcpus": 6}
+    assert ec2_helper.quota_demand("p3.2xlarge") == {}
+    mock_client.describe_instance_types.assert_called_once_with(
+        InstanceTypes=["m5.xlarge", "t3.large"]
+    )
+
+
+def test_is_standard_instance_type_matches_the_family_prefix():
+    """Test that only the A, C, D, H, I, M, R, T and Z families count as standard."""
+    from sdk.aws.ec2 import is_standard_instance_type
+
+    standard = ["t3.micro", "m5.large", "m7i-flex.large", "c7gn.xlarge", "r6id.large"]
+    standard += ["a1.medium", "d3en.xlarge", "h1.2xlarge", "i4i.large", "im4gn.large"]
+    standard += ["is4gen.large", "z1d.large"]
+    assert all(is_standard_instance_type(t) for t in standard)
+
+    others = ["mac1.metal", "mac2-m2pro.metal", "trn1.2xlarge", "inf2.xlarge"]
+    others += ["dl1.24xlarge", "hpc7g.4xlarge", "p4d.24xlarge", "g5.xlarge"]
+    others += ["f1.2xlarge", "vt1.3xlarge", "x2idn.16xlarge", "u-6tb1.metal", ""]
+    assert not any(is_standard_instance_type(t) for t in others)
+
+
+@mock.patch("boto3.Session")
+def test_quota_skips_instance_types_with_their_own_quota(mock_boto3_session):
+    """Test that mac, trn, inf, dl and hpc instances do not count as standard vCPUs."""
+    mock_client = mock.MagicMock()
+    mock_client.get_service_quota.return_value = {"Quota": {"Value": 32.0}}
+    mock_client.describe_instances.return_value = {
+        "Reservations": [
+            {
+                "Instances": [
+                    {"InstanceId": f"i-{n}", "InstanceType": instance_type}
+                    for n, instance_type in enumerate(
+                        ["m5.large", "mac1.metal", "trn1.2xlarge", "hpc6a.48xlarge"]
+                    )
+                ]
+            }
+        ]
+    }
+    mock_client.describe_instance_types.return_value = {
+        "InstanceTypes": [
+            {"InstanceType": "m5.large", "VCpuInfo": {"DefaultVCpus": 2}},
+        ]
+    }
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    ec2_helper = EC2Helper(region="us-east-1")
+
+    assert ec2_helper.get_quota_usage() == {"vcpus": {"limit": 32.0, "used": 2}}
+    for instance_type in ("mac2.metal", "inf2.xlarge", "dl1.24xlarge"):
+        assert ec2_helper.quota_demand(instance_type, count=4) == {}
+    mock_client.describe_instance_types.assert_called_once_with(
+        InstanceTypes=["m5.large"]
+    )
+
+
+@mock.patch("boto3.Session")
+def test_import_keypair_replaces_duplicate(mock_boto3_session):
+    """Test that a keypair of the same name is deleted and the public key imported again."""
+    mock_client = mock.MagicMock()
+    duplicate = botocore.exceptions.ClientError(
+        {"Error": {"Code": "InvalidKeyPair.Duplicate", "Message": "exists"}},
+        "ImportKeyPair",
+    )
+    mock_client.import_key_pair.side_effect = [
+        duplicate,
+        {"KeyName": "U1", "KeyFingerprint": "aa:bb"},
+    ]
+    mock_boto3_session.return_value.client.return_value = mock_client
+
+    result = EC2Helper(region="us-east-1").import_keypair("U1", "ssh-rsa AAAA")
+
+    assert result == {"KeyName": "U1", "KeyFingerprint": "aa:bb"}
+    mock_client.delete_key_pair.assert_called_once_with(KeyName="U1")
+    mock_client.import_key_pair.assert_called_with(
+        KeyName="U1", PublicKeyMaterial=b"ssh-rsa AAAA"
+    )
+    mock_client.create_key_pair.assert_not_called()
@@ -0,0 +1,176 @@
+from unittest import mock
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+from google.cloud import compute_v1
+
+from sdk.gcp import compute_engine
+from sdk.gcp.compute_engine import GCPHelper
+from sdk.tools.client_registry import client_registry
+from sdk.tools.waiter import WaitTimeout
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Zones and machine types are cached per module, so no test sees another's."""
+    compute_engine._region_zones.clear()
+    compute_engine._machine_type_cpus.clear()
+    yield
+    compute_engine._region_zones.clear()
+    compute_engine._machine_type_cpus.clear()
+
+
+def make_helper(region="europe-west1"):
+    # __init__ reads the service account from config
+    helper = GCPHelper.__new__(GCPHelper)
+    helper.project_id = "my-project"
+    helper.region = region
+    return helper
+
+
+def region_with_zones(*zones):
+    return mock.Mock(
+        zones=[
+            f"https://www.googleapis.com/compute/v1/projects/my-project/zones/{zone}"
+            for zone in zones
+        ]
+    )
+
+
+def listed_instances(*names):
+    instances = []
+    for name in names:
+        instance = mock.Mock()
+        instance.name = name  # a Mock constructor argument, not an attribute
+        instances.append(instance)
+    return mock.Mock(instances=instances)
+
+
+@mock.patch.object(client_registry, "gcp_client")
+def test_quota_demand_uses_a_zone_of_the_region(mock_gcp_client):
+    """europe-west1 has no "-a" zone: the machine type is read from its first zone."""
+    regions = mock.MagicMock()
+    regions.get.return_value = region_with_zones(
+        "europe-west1-d", "europe-west1-b", "europe-west1-c"
+    )
+    machine_types = mock.MagicMock()
+    machine_types.get.return_value = mock.Mock(guest_cpus=4)
+    mock_gcp_client.side_effect = {
+        compute_v1.RegionsClient: regions,
+        compute_v1.MachineTypesClient: machine_types,
+    }.get
+
+    demand = make_helper().quota_demand("n2-standard-4", count=2)
+
+    assert demand == {"N2_CPUS": 8, "INSTANCES": 2, "IN_USE_ADDRESSES": 2}
+    machine_types.get.assert_called_once_with(
+        project="my-project", zone="europe-west1-b", machine_type="n2-standard-4"
+    )
+
+
+@mock.patch.object(client_registry, "gcp_client")
+def test_default_zone_falls_back_when_the_zones_cannot_be_listed(mock_gcp_client):
+    mock_gcp_client.return_value.get.side_effect = google_exceptions.Forbidden("no")
+
+    assert make_helper("us-central1").default_zone() == "us-central1-a"
+
+
+@mock.patch.object(client_registry, "gcp_client")
+def test_zone_lookup_filters_on_every_name(mock_gcp_client):
+    """One `eq` alternation of the escaped names, as list_instances sends."""
+    instances = mock.MagicMock()
+    instances.aggregated_list.return_value = [
+        ("zones/europe-west1-b", listed_instances("web-1", "db.2")),
+        ("zones/us-central1-a", listed_instances("web-3")),
+    ]
+    mock_gcp_client.return_value = instances
+
+    zones, errors = make_helper()._get_zones_by_instance_names(
+        ["web-1", "db.2", "web-3"]
+    )
+
+    request = instances.aggregated_list.call_args.kwargs["request"]
+    assert request.filter == r'(name eq "web\-1|db\.2|web\-3")'
+    assert zones == {"web-1": "europe-west1-b", "db.2": "europe-west1-b"}
+    assert errors == {"web-3": "Instance 'web-3' not found in region europe-west1"}
+
+
+@mock.patch.object(client_registry, "gcp_client")
+def test_list_instances_filters_names_in_every_zone(mock_gcp_client):
+    regions = mock.MagicMock()
+    regions.get.return_value = region_with_zones("europe-west1-b", "europe-west1-c")
+    instances = mock.MagicMock()
+    instances.list.return_value = []
+    mock_gcp_client.side_effect = {
+        compute_v1.RegionsClient: regions,
+        compute_v1.InstancesClient: instances,
+    }.get
+
+    result = make_helper().list_instances(
+        {"instance-ids": "web-1,db.2,web-3", "state": "running"}
+    )
+
+    assert result == {"count": 0, "instances": []}
+    requests = [call.kwargs["request"] for call in instances.list.call_args_list]
+    assert sorted(request.zone for request in requests) == [
+        "europe-west1-b",
+        "europe-west1-c",
+    ]
+    for request in requests:
+        assert request.filter == (
+            r'(status eq "RUNNING") (name eq "web\-1|db\.2|web\-3")'
+        )
+
+
+@mock.patch("sdk.gcp.compute_engine.wait_for_ssh", return_value=False)
+@mock.patch.object(client_registry, "gcp_client")
+def test_bulk_create_reports_every_instance_that_exists(
+    mock_gcp_client, mock_wait_for_ssh
+):
+    """A bulkInsert that timed out still returns the VMs it created, each with its status."""
+    statuses = {"web-1": "RUNNING", "web-2": "STAGING"}
+
+    def get_instance(project, zone, instance):
+        if instance not in statuses:
+            raise google_exceptions.NotFound(instance)
+        return mock.Mock(
+            id=len(instance), status=statuses[instance], network_interfaces=[]
+        )
+
+    instances = mock.MagicMock()
+    instances.get.side_effect = get_instance
+    mock_gcp_client.return_value = instances
+    helper = make_helper()
+    helper.network = "default"
+    helper.subnetwork = None
+
+    with (
+        mock.patch.object(
+            helper, "_bulk_insert", return_value=mock.Mock()
+        ) as bulk_insert,
+        mock.patch.object(
+            helper,
+            "_wait_for_operation",
+            side_effect=WaitTimeout("GCP operation op-1 was not ready after 600s"),
+        ),
+        mock.patch("sdk.gcp.compute_engine.CREATE_TIMEOUT", 0),
+        # config is a Mock under the test runner
+        mock.patch("sdk.gcp.compute_engine._GCP_DEFAULT_DISK_SIZES", (20,)),
+    ):
+        result = helper.create_instance(
+            "debian-12",
+            "e2-small",
+            "web",
+            disk_gb_override=20,
+            zone="europe-west1-b",
+            count=3,
+        )
+
+    bulk_insert.assert_called_once()
+    assert "error" not in result
+    assert result["count"] == 2 and result["requested"] == 3
+    running, staging = result["instances"]
+    assert running["name"] == "web-1" and "error" not in running
+    assert staging["name"] == "web-2"
+    assert staging["status"] == "STAGING"
+    assert "web-2" in staging["error"]
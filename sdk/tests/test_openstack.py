@@ -2,9 +2,24 @@ import unittest.mock as mock
 from unittest.mock import Mock, PropertyMock
 
 import pytest
-from openstack.exceptions import ResourceFailure
+from openstack.exceptions import ConflictException, ResourceFailure
 
+from sdk.openstack.catalog import OpenStackCatalog, openstack_catalog
 from sdk.openstack.core import OpenStackHelper
+from sdk.openstack.inventory import ServerInventory, ServerQuery, server_inventory
+from sdk.tools.client_registry import client_registry
+
+
+@pytest.fixture(autouse=True)
+def clear_client_registry():
+    """Every test patches the SDK entry points, so it must not get a client cached by another test."""
+    client_registry.clear()
+    server_inventory.clear()
+    openstack_catalog.invalidate()
+    yield
+    client_registry.clear()
+    server_inventory.clear()
+    openstack_catalog.invalidate()
 
 
 @mock.patch("openstack.connection.Connection")
@@ -117,7 +132,221 @@ def test_list_vms_with_status_filter(mock_openstack):
     assert instances[0].get("status") == "SHUTOFF"
 
     mock_openstack.assert_called_once()
-    mock_compute.servers.assert_called_once_with(status="SHUTOFF")
+    mock_compute.servers.assert_called_once_with(
+        status="SHUTOFF", limit=1000, paginated=False
+    )
+
+
+def _fake_servers(count, statuses=("ACTIVE", "SHUTOFF")):
+    """Servers spread over ``statuses``, and a Nova-like ``compute.servers``."""
+    servers = []
+    for i in range(count):
+        server = Mock(
+            id=f"id-{i:03}",
+            created_at=f"2024-01-01T00:00:{i:02}Z",
+            flavor={"original_name": "m1.small"},
+            addresses={},
+            key_name="key",
+            status=statuses[i % len(statuses)],
+        )
+        type(server).name = PropertyMock(return_value=f"server-{i}")
+        servers.append(server)
+
+    def list_servers(status, limit, paginated, marker=None):
+        matching = [s for s in reversed(servers) if s.status == status]
+        if marker:
+            matching = matching[[s.id for s in matching].index(marker) + 1 :]
+        return matching[:limit]
+
+    return servers, list_servers
+
+
+@mock.patch("openstack.connection.Connection")
+def test_list_vms_merges_statuses_newest_first(mock_openstack):
+    """Every status is paged through and the streams merged in creation order."""
+    mock_compute = mock.MagicMock()
+    _, mock_compute.servers.side_effect = _fake_servers(9)
+    mock_openstack.return_value.compute = mock_compute
+
+    with mock.patch(
+        "sdk.openstack.core.get_config_value", side_effect=lambda key, default: 2
+    ):
+        result = OpenStackHelper().list_servers({"status": "active,shutoff"})
+
+    assert result["count"] == 9
+    assert [i["server_id"] for i in result["instances"]] == [
+        f"id-{i:03}" for i in reversed(range(9))
+    ]
+    statuses = {c.kwargs["status"] for c in mock_compute.servers.call_args_list}
+    assert statuses == {"ACTIVE", "SHUTOFF"}
+    # 5 ACTIVE in pages of 2 -> 3 requests, 4 SHUTOFF -> 3 (the last one empty)
+    assert mock_compute.servers.call_count == 6
+
+
+@mock.patch("openstack.connection.Connection")
+def test_list_vms_page_fetches_only_what_it_needs(mock_openstack):
+    """A page of ``limit`` servers stops paging once the page (plus one) is read."""
+    mock_compute = mock.MagicMock()
+    _, mock_compute.servers.side_effect = _fake_servers(50, statuses=("ACTIVE",))
+    mock_openstack.return_value.compute = mock_compute
+
+    helper = OpenStackHelper()
+    result = helper.list_servers({"status": "ACTIVE", "limit": "5", "page": "2"})
+
+    assert result["page"] == 2
+    assert result["truncated"] is True
+    assert [i["server_id"] for i in result["instances"]] == [
+        f"id-{i:03}" for i in range(44, 39, -1)
+    ]
+    mock_compute.servers.assert_called_once_with(
+        status="ACTIVE", limit=11, paginated=False
+    )
+
+
+@mock.patch("openstack.connection.Connection")
+def test_iter_servers_marker(mock_openstack):
+    """The marker continues a single-status listing and is refused for several."""
+    mock_compute = mock.MagicMock()
+    _, mock_compute.servers.side_effect = _fake_servers(10, statuses=("ACTIVE",))
+    mock_openstack.return_value.compute = mock_compute
+
+    helper = OpenStackHelper()
+    servers = list(helper.iter_servers(["ACTIVE"], limit=3, marker="id-007"))
+
+    assert [s["server_id"] for s in servers] == ["id-006", "id-005", "id-004"]
+    mock_compute.servers.assert_called_once_with(
+        status="ACTIVE", limit=3, paginated=False, marker="id-007"
+    )
+    with pytest.raises(ValueError):
+        list(helper.iter_servers(["ACTIVE", "ERROR"], marker="id-007"))
+
+
+@mock.patch("openstack.connection.Connection")
+def test_list_vms_pushes_filters_down_to_nova(mock_openstack):
+    """Name, flavor, image and key become Nova query parameters of every page."""
+    mock_compute = mock.MagicMock()
+    mock_compute.find_flavor.return_value = Mock(id="f-1")
+    mock_compute.find_image.return_value = Mock(id="img-1")
+    mock_compute.servers.return_value = []
+    mock_openstack.return_value.compute = mock_compute
+
+    OpenStackHelper().list_servers(
+        {
+            "status": "ACTIVE",
+            "name": "^payments-",
+            "flavor": "ci.cpu.small",
+            "image": "fedora",
+            "key": "my-key",
+        }
+    )
+
+    mock_compute.servers.assert_called_once_with(
+        name="^payments-",
+        flavor="f-1",
+        image="img-1",
+        key_name="my-key",
+        status="ACTIVE",
+        limit=1000,
+        paginated=False,
+    )
+
+
+@mock.patch("openstack.connection.Connection")
+def test_list_vms_unknown_flavor_lists_nothing(mock_openstack):
+    """A flavor that does not exist matches no server, so Nova is not asked."""
+    mock_compute = mock.MagicMock()
+    mock_compute.find_flavor.return_value = None
+    mock_openstack.return_value.compute = mock_compute
+
+    result = OpenStackHelper().list_servers({"flavor": "nope"})
+
+    assert result == {"count": 0, "instances": []}
+    mock_compute.servers.assert_not_called()
+
+
+def test_server_query_matches_like_nova():
+    """The inventory applies the filters the way Nova does."""
+    server = Mock(
+        flavor={"original_name": "ci.cpu.small"},
+        image={"id": "img-1"},
+        key_name="my-key",
+        updated_at="2024-05-01T10:00:00Z",
+    )
+    type(server).name = PropertyMock(return_value="team-payments-1")
+
+    assert ServerQuery(
+        name="payments-\\d", flavor_id="f-1", flavor_name="ci.cpu.small"
+    ).matches(server)
+    assert ServerQuery(image_id="img-1", changes_since="2024-05-01T09:00:00Z").matches(
+        server
+    )
+    assert not ServerQuery(name="^payments").matches(server)
+    assert not ServerQuery(key_name="other").matches(server)
+    assert not ServerQuery(changes_since="2024-05-01T11:00:00Z").matches(server)
+
+
+@mock.patch("openstack.connection.Connection")
+def test_inventory_syncs_only_changes(mock_openstack):
+    """After the first load, a sync asks for the changes since the last one."""
+    mock_compute = mock.MagicMock()
+    mock_openstack.return_value.compute = mock_compute
+    servers, _ = _fake_servers(3, statuses=("ACTIVE",))
+    deleted = Mock(id=servers[0].id, status="DELETED")
+    stopped = Mock(
+        id=servers[1].id,
+        created_at=servers[1].created_at,
+        flavor={},
+        addresses={},
+        key_name="key",
+        status="SHUTOFF",
+    )
+    type(stopped).name = PropertyMock(return_value="server-1")
+    mock_compute.servers.side_effect = [servers, [deleted, stopped]]
+    now = [100.0]
+    inventory = ServerInventory(clock=lambda: now[0])
+
+    with mock.patch("sdk.openstack.inventory.get_config_value", return_value=30):
+        first = inventory.list_servers(["ACTIVE"])
+        now[0] += 10
+        cached = inventory.list_servers(["ACTIVE", "SHUTOFF"])
+        now[0] += 30
+        synced = inventory.list_servers(["ACTIVE", "SHUTOFF"])
+
+    assert [i["server_id"] for i in first["instances"]] == [
+        "id-002",
+        "id-001",
+        "id-000",
+    ]
+    assert cached["count"] == 3 and cached["snapshot_age"] == 10
+    assert [(i["server_id"], i["status"]) for i in synced["instances"]] == [
+        ("id-002", "ACTIVE"),
+        ("id-001", "SHUTOFF"),
+    ]
+    assert synced["snapshot_age"] == 0
+    assert mock_compute.servers.call_args_list[0] == mock.call()
+    assert "changes_since" in mock_compute.servers.call_args_list[1].kwargs
+
+
+@mock.patch("openstack.connection.Connection")
+def test_inventory_syncs_after_the_bot_changes_a_server(mock_openstack):
+    """Stopping a server makes the next listing sync even within the interval."""
+    mock_compute = mock.MagicMock()
+    mock_openstack.return_value.compute = mock_compute
+    mock_compute.servers.return_value = []
+    mock_compute.find_server.return_value = Mock(status="ACTIVE")
+
+    with mock.patch("sdk.openstack.inventory.get_config_value", return_value=300):
+        helper = OpenStackHelper()
+        helper.list_servers({"status": "ACTIVE"})
+        helper.list_servers({"status": "ACTIVE"})
+        assert mock_compute.servers.call_count == 1
+        helper.stop_server("42")
+        helper.list_servers({"status": "ACTIVE"})
+        helper.list_servers({"status": "ACTIVE", "fresh": True})
+
+    assert mock_compute.servers.call_count == 3
+    assert "changes_since" in mock_compute.servers.call_args_list[1].kwargs
+    assert mock_compute.servers.call_args_list[2].kwargs["paginated"] is False
 
 
 @mock.patch("openstack.connection.Connection")
@@ -147,7 +376,7 @@ def test_create_servers_success(mock_openstack):
     mock_compute.find_image.return_value = mock_image
 
     mock_compute.create_server.return_value = mock_server
-    mock_compute.wait_for_server.return_value = mock_server
+    mock_compute.get_server.return_value = mock_server
 
     mock_openstack.return_value.compute = mock_compute
 
@@ -179,7 +408,268 @@ def test_create_servers_success(mock_openstack):
         networks=[{"uuid": "network-id-123"}],
         key_name="test-key",
     )
-    mock_compute.wait_for_server.assert_called_once()
+    mock_compute.get_server.assert_called_once_with("server-id-789")
+
+
+def _named(name, **attrs):
+    resource = Mock(**attrs)
+    resource.name = name
+    return resource
+
+
+@mock.patch("openstack.connection.Connection")
+def test_catalog_finds_by_id_or_unique_name(mock_openstack):
+    """Each kind is listed once; duplicate names are left to Nova to resolve."""
+    mock_conn = mock_openstack.return_value
+    mock_conn.compute.flavors.return_value = [
+        _named("m1.small", id="f-1"),
+        _named("dup", id="f-2"),
+        _named("dup", id="f-3"),
+    ]
+    now = [1000.0]
+    catalog = OpenStackCatalog(clock=lambda: now[0])
+
+    assert catalog.find("flavor", "m1.small").id == "f-1"
+    assert catalog.find("flavor", "f-3").id == "f-3"
+    assert catalog.find("flavor", "dup") is None
+    assert catalog.find("flavor", "m1.huge") is None
+    assert mock_conn.compute.flavors.call_count == 1
+
+    # An unknown value reloads the kind, at most once a minute
+    now[0] += 61
+    assert catalog.find("flavor", "m1.huge") is None
+    assert catalog.find("flavor", "m1.huge") is None
+    assert mock_conn.compute.flavors.call_count == 2
+    assert catalog.names("flavor") == ["dup", "m1.small"]
+
+
+@mock.patch("openstack.connection.Connection")
+def test_catalog_validate_lists_what_exists(mock_openstack):
+    """Unknown values are reported with the available names, known ones pass."""
+    mock_conn = mock_openstack.return_value
+    mock_conn.compute.flavors.return_value = [_named("m1.small", id="f-1")]
+    mock_conn.network.networks.return_value = [_named("private", id="net-1")]
+
+    problems = OpenStackCatalog().validate(flavor="m1.smal", network="net-1")
+
+    assert problems == ["Unknown flavor `m1.smal`. Available flavors: m1.small"]
+
+
+@mock.patch("openstack.connection.Connection")
+def test_catalog_validate_fails_open(mock_openstack):
+    """If the catalog cannot be listed, the create is left to report errors."""
+    mock_openstack.return_value.image.images.side_effect = RuntimeError("forbidden")
+
+    assert OpenStackCatalog().validate(image="img-1") == []
+
+
+@mock.patch("openstack.connection.Connection")
+def test_create_servers_resolves_from_catalog(mock_openstack):
+    """Flavor, image and network names are resolved from the catalog, not Nova."""
+    mock_conn = mock_openstack.return_value
+    mock_conn.compute.flavors.return_value = [_named("m1.small", id="f-1")]
+    mock_conn.image.images.return_value = [_named("fedora", id="img-1")]
+    mock_conn.network.networks.return_value = [_named("private", id="net-1")]
+    mock_conn.compute.create_server.return_value = _named(
+        "vm", id="s-1", status="BUILD"
+    )
+
+    OpenStackHelper().create_servers(
+        "vm", "fedora", "m1.small", "key", network="private", wait=False
+    )
+
+    mock_conn.compute.find_flavor.assert_not_called()
+    mock_conn.compute.find_image.assert_not_called()
+    mock_conn.image.images.assert_called_once_with(visibility="all")
+    mock_conn.compute.create_server.assert_called_once_with(
+        name="vm",
+        image_id="img-1",
+        flavor_id="f-1",
+        networks=[{"uuid": "net-1"}],
+        key_name="key",
+    )
+
+
+@mock.patch("openstack.connection.Connection")
+def test_create_servers_without_waiting(mock_openstack):
+    """Test that wait=False returns the BUILD server without waiting for it."""
+    mock_compute = mock.MagicMock()
+    mock_flavor = Mock(id="flavor-id-123")
+    mock_flavor.name = "rhel-10"
+    mock_keypair = Mock()
+    mock_keypair.name = "test-key"
+    mock_compute.keypairs.return_value = [mock_keypair]
+    mock_compute.find_flavor.return_value = mock_flavor
+    mock_compute.find_image.return_value = Mock(id="image-id-456")
+    mock_compute.create_server.return_value = Mock(id="server-id-789", status="BUILD")
+    mock_openstack.return_value.compute = mock_compute
+
+    openstack_helper = OpenStackHelper()
+    result = openstack_helper.create_servers(
+        "test-server", "image-id-456", "rhel-10", "test-key", wait=False
+    )
+
+    instance = result["instances"][0]
+    assert instance["server_id"] == "server-id-789"
+    assert instance["status"] == "BUILD"
+    mock_compute.get_server.assert_not_called()
+
+
+@mock.patch("openstack.connection.Connection")
+def test_get_server(mock_openstack):
+    """Test reading the status, private IP and fault of a server."""
+    from openstack.exceptions import NotFoundException
+
+    mock_compute = mock.MagicMock()
+    mock_server = Mock(
+        id="server-id-789",
+        status="ERROR",
+        addresses={"private": [{"OS-EXT-IPS:type": "fixed", "addr": "10.0.0.5"}]},
+        fault={"message": "No valid host was found."},
+    )
+    mock_server.name = "test-server"
+    mock_compute.get_server.side_effect = [mock_server, NotFoundException()]
+    mock_openstack.return_value.compute = mock_compute
+
+    openstack_helper = OpenStackHelper()
+    assert openstack_helper.get_server("server-id-789") == {
+        "name": "test-server",
+        "server_id": "server-id-789",
+        "status": "ERROR",
+        "private_ip": "10.0.0.5",
+        "fault": "No valid host was found.",
+    }
+    assert openstack_helper.get_server("gone") is None
+
+
+@mock.patch("openstack.connection.Connection")
+def test_create_servers_with_count_uses_one_multi_create(mock_openstack):
+    """Test that count=N sends min_count/max_count and returns the whole batch."""
+    mock_compute = mock.MagicMock()
+    mock_keypair = Mock()
+    mock_keypair.name = "test-key"
+    mock_compute.keypairs.return_value = [mock_keypair]
+    mock_flavor = Mock(id="flavor-id-123")
+    mock_flavor.name = "rhel-10"
+    mock_compute.find_flavor.return_value = mock_flavor
+    mock_compute.find_image.return_value = Mock(id="image-id-456")
+    mock_compute.create_server.return_value = Mock(id="id-1", status="BUILD")
+
+    batch = []
+    for server_id, name, key_name, created_at in [
+        ("id-2", "vm-2", "test-key", "2026-10-17T10:00:01Z"),
+        ("id-1", "vm-1", "test-key", "2026-10-17T10:00:00Z"),
+        # same name pattern, someone else's VM
+        ("id-9", "vm-10", "other-key", "2026-10-17T10:00:01Z"),
+        # same name and key, from an earlier batch
+        ("id-0", "vm-3", "test-key", "2026-10-16T09:00:00Z"),
+    ]:
+        server = Mock(
+            id=server_id,
+            status="BUILD",
+            key_name=key_name,
+            created_at=created_at,
+            reservation_id=None,  # admin-only by default
+        )
+        server.name = name
+        batch.append(server)
+    mock_compute.get_server.return_value = batch[1]
+    mock_compute.servers.return_value = batch
+    mock_openstack.return_value.compute = mock_compute
+
+    openstack_helper = OpenStackHelper()
+    result = openstack_helper.create_servers(
+        name="vm",
+        image_id="image-id-456",
+        flavor="rhel-10",
+        key_name="test-key",
+        wait=False,
+        count=3,
+    )
+
+    create_kwargs = mock_compute.create_server.call_args.kwargs
+    assert create_kwargs["min_count"] == 1 and create_kwargs["max_count"] == 3
+    assert result["count"] == 2 and result["requested"] == 3
+    assert [i["name"] for i in result["instances"]] == ["vm-1", "vm-2"]
+    assert [i["server_id"] for i in result["instances"]] == ["id-1", "id-2"]
+    mock_compute.servers.assert_called_once_with(
+        name="^vm-[0-9]+$", changes_since="2026-10-17T10:00:00Z"
+    )
+
+
+@mock.patch("openstack.connection.Connection")
+def test_create_servers_batch_found_by_reservation_id(mock_openstack):
+    """Test that a visible reservation ID selects exactly the servers of the batch."""
+    mock_compute = mock.MagicMock()
+    mock_compute.find_flavor.return_value = Mock(id="flavor-id-123")
+    mock_compute.find_image.return_value = Mock(id="image-id-456")
+    mock_compute.create_server.return_value = Mock(id="id-1", status="BUILD")
+
+    batch = []
+    for server_id, name, reservation_id in [
+        ("id-1", "vm-1", "r-new"),
+        ("id-2", "vm-2", "r-new"),
+        ("id-0", "vm-2", "r-old"),
+    ]:
+        server = Mock(id=server_id, status="BUILD", reservation_id=reservation_id)
+        server.name = name
+        batch.append(server)
+    mock_compute.get_server.return_value = batch[0]
+    mock_compute.servers.return_value = batch
+    mock_openstack.return_value.compute = mock_compute
+
+    result = OpenStackHelper().create_servers(
+        name="vm",
+        image_id="image-id-456",
+        flavor="rhel-10",
+        key_name="test-key",
+        wait=False,
+        count=2,
+    )
+
+    mock_compute.servers.assert_called_once_with(reservation_id="r-new")
+    assert [i["server_id"] for i in result["instances"]] == ["id-1", "id-2"]
+
+
+@mock.patch("sdk.openstack.core.wait_for_ssh", return_value=False)
+@mock.patch("openstack.connection.Connection")
+def test_create_servers_batch_reports_a_server_not_active_in_time(
+    mock_openstack, mock_wait_for_ssh
+):
+    """Test that one server timing out does not hide the rest of the batch."""
+    mock_compute = mock.MagicMock()
+    mock_compute.find_flavor.return_value = Mock(id="flavor-id-123")
+    mock_compute.find_image.return_value = Mock(id="image-id-456")
+    mock_compute.create_server.return_value = Mock(id="id-1", status="BUILD")
+
+    servers = {}
+    for server_id, status in [("id-1", "ACTIVE"), ("id-2", "BUILD")]:
+        server = Mock(
+            id=server_id,
+            status=status,
+            reservation_id="r-1",
+            addresses={"net": [{"addr": "10.0.0.1", "OS-EXT-IPS:type": "fixed"}]},
+        )
+        server.name = f"vm-{server_id[-1]}"
+        servers[server_id] = server
+    mock_compute.get_server.side_effect = lambda server_id: servers[server_id]
+    mock_compute.servers.return_value = list(servers.values())
+    mock_openstack.return_value.compute = mock_compute
+
+    with mock.patch("sdk.openstack.core.SERVER_ACTIVE_TIMEOUT", 0):
+        result = OpenStackHelper().create_servers(
+            name="vm",
+            image_id="image-id-456",
+            flavor="rhel-10",
+            key_name="test-key",
+            count=2,
+        )
+
+    assert result["count"] == 2
+    active, building = result["instances"]
+    assert active["status"] == "ACTIVE" and "error" not in active
+    assert building["status"] == "BUILD"
+    assert "id-2" in building["error"]
 
 
 @mock.patch("openstack.connection.Connection")
@@ -189,6 +679,7 @@ def test_create_servers_invalid_key_name(mock_openstack):
     mock_keypair = Mock()
     mock_keypair.name = "valid-key"
     mock_compute.keypairs.return_value = [mock_keypair]
+    mock_compute.find_keypair.return_value = None
 
     mock_openstack.return_value.compute = mock_compute
 
@@ -293,6 +784,40 @@ def test_create_servers_resource_failure(mock_openstack):
     assert "OpenStack VM provisioning failed" in str(exc_info.value)
 
 
+@mock.patch("openstack.connection.Connection")
+def test_create_servers_polls_until_active(mock_openstack):
+    """Test that create_servers polls get_server until the server leaves BUILD."""
+    mock_compute = mock.MagicMock()
+    mock_keypair = Mock()
+    mock_keypair.name = "test-key"
+    mock_compute.keypairs.return_value = [mock_keypair]
+    mock_compute.find_flavor.return_value = Mock(id="flavor-id-123")
+    mock_compute.find_image.return_value = Mock(id="image-id-456")
+    mock_compute.create_server.return_value = Mock(id="server-id-789", status="BUILD")
+    mock_compute.get_server.side_effect = [
+        Mock(id="server-id-789", status="BUILD"),
+        Mock(id="server-id-789", status="ERROR", fault={"message": "No valid host"}),
+    ]
+    mock_openstack.return_value.compute = mock_compute
+
+    openstack_helper = OpenStackHelper()
+    with (
+        mock.patch("threading.Event.wait") as mock_sleep,
+        pytest.raises(RuntimeError) as exc_info,
+    ):
+        openstack_helper.create_servers(
+            name="test-server",
+            image_id="image-id-456",
+            flavor="rhel-10",
+            key_name="test-key",
+        )
+
+    assert "OpenStack VM provisioning failed" in str(exc_info.value)
+    assert "No valid host" in str(exc_info.value.__cause__)
+    assert mock_compute.get_server.call_count == 2
+    mock_sleep.assert_called_once()
+
+
 @mock.patch("openstack.connection.Connection")
 def test_create_servers_general_exception(mock_openstack):
     """Test VM creation with general exception."""
@@ -349,7 +874,7 @@ def test_create_servers_no_network(mock_openstack):
     mock_compute.find_flavor.return_value = mock_flavor
     mock_compute.find_image.return_value = mock_image
     mock_compute.create_server.return_value = mock_server
-    mock_compute.wait_for_server.return_value = mock_server
+    mock_compute.get_server.return_value = mock_server
 
     mock_openstack.return_value.compute = mock_compute
 
@@ -408,7 +933,7 @@ def test_create_servers_floating_ip_priority(mock_openstack):
     mock_compute.find_flavor.return_value = mock_flavor
     mock_compute.find_image.return_value = mock_image
     mock_compute.create_server.return_value = mock_server
-    mock_compute.wait_for_server.return_value = mock_server
+    mock_compute.get_server.return_value = mock_server
 
     mock_openstack.return_value.compute = mock_compute
 
@@ -459,6 +984,104 @@ def test_stop_server_success(mock_openstack):
     mock_compute.stop_server.assert_called_once_with(mock_server)
 
 
+@mock.patch("openstack.connection.Connection")
+def test_modify_servers_returns_results_in_order(mock_openstack):
+    """Test that stopping several servers reports each one, in the given order."""
+    servers = {
+        "id-1": mock.MagicMock(id="id-1", status="ACTIVE"),
+        "id-2": mock.MagicMock(id="id-2", status="SHUTOFF"),
+    }
+    mock_compute = mock.MagicMock()
+    mock_compute.find_server.side_effect = lambda server_id, **kwargs: servers[
+        server_id
+    ]
+    mock_openstack.return_value.compute = mock_compute
+
+    openstack_helper = OpenStackHelper()
+    results = openstack_helper.modify_servers(["id-1", "id-2"], "stop")
+
+    assert [r["server_id"] for r in results] == ["id-1", "id-2"]
+    assert results[0]["success"] is True
+    assert results[1]["success"] is False
+    assert "already stopped" in results[1]["error"]
+    mock_compute.stop_server.assert_called_once_with(servers["id-1"])
+
+
+@mock.patch("openstack.connection.Connection")
+def test_find_servers_resolves_targets_with_one_listing(mock_openstack):
+    """The name prefix is anchored and escaped for Nova; several statuses are matched here."""
+    servers = [
+        _named("ci-1.a", id="id-1", status="ACTIVE", key_name="k"),
+        _named("ci-1.b", id="id-2", status="ERROR", key_name="k"),
+        _named("ci-1.c", id="id-3", status="BUILD", key_name="k"),
+        _named("ci-1.d", id="id-4", status="ACTIVE", key_name="other"),
+    ]
+    mock_compute = mock_openstack.return_value.compute
+    mock_compute.servers.return_value = servers
+
+    found = OpenStackHelper().find_servers(
+        name_prefix="ci-1.", statuses=["active", "error"], key_name="k"
+    )
+
+    assert [server.id for server in found] == ["id-1", "id-2"]
+    mock_compute.servers.assert_called_once_with(name="^ci-1\\.", key_name="k")
+
+
+@mock.patch("openstack.connection.Connection")
+def test_modify_servers_waits_and_reports_each_result(mock_openstack):
+    """Found servers are acted on without another lookup and waited for until gone."""
+    servers = [
+        _named("a", id="id-1", status="ACTIVE"),
+        _named("b", id="id-2", status="SHUTOFF"),
+    ]
+    mock_compute = mock_openstack.return_value.compute
+    mock_compute.find_server.return_value = None  # deleted
+    reported = []
+
+    results = OpenStackHelper().modify_servers(
+        servers, "delete", wait=True, on_result=reported.append
+    )
+
+    assert [r["current_status"] for r in results] == ["DELETED", "DELETED"]
+    assert sorted(r["server_id"] for r in reported) == ["id-1", "id-2"]
+    assert mock_compute.delete_server.call_count == 2
+    # Only the waits looked the servers up
+    assert all(
+        c.kwargs.get("ignore_missing") is None
+        for c in mock_compute.find_server.call_args_list
+    )
+
+
+@mock.patch("openstack.connection.Connection")
+def test_modify_servers_wait_reports_error_state(mock_openstack):
+    """A server that goes into ERROR while starting is reported as failed."""
+    server = _named("a", id="id-1", status="SHUTOFF")
+    mock_compute = mock_openstack.return_value.compute
+    mock_compute.find_server.return_value = _named("a", id="id-1", status="ERROR")
+
+    (result,) = OpenStackHelper().modify_servers([server], "start", wait=True)
+
+    assert result["success"] is False
+    assert "went into ERROR state" in result["error"]
+
+
+@mock.patch("openstack.connection.Connection")
+def test_import_keypair_replaces_existing_key(mock_openstack):
+    """Test that importing over an existing keypair deletes it and imports again."""
+    mock_compute = mock.MagicMock()
+    imported = Mock(fingerprint="aa:bb")
+    imported.name = "U1"
+    mock_compute.create_keypair.side_effect = [ConflictException("exists"), imported]
+    mock_openstack.return_value.compute = mock_compute
+
+    result = OpenStackHelper().import_keypair("U1", "ssh-rsa AAAA")
+
+    assert result == {"KeyName": "U1", "KeyFingerprint": "aa:bb"}
+    mock_compute.delete_keypair.assert_called_once_with("U1", ignore_missing=True)
+    mock_compute.create_keypair.assert_called_with(name="U1", public_key="ssh-rsa AAAA")
+    mock_compute.keypairs.assert_not_called()
+
+
 @mock.patch("openstack.connection.Connection")
 def test_stop_server_already_stopped(mock_openstack):
     """Test stopping a server that is already stopped."""
@@ -0,0 +1,110 @@
+"""
+Small thread-safe caches shared by the bot and the cloud helpers.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire ``ttl`` seconds after they were set.
+
+    All operations take a lock, so one instance can be shared between worker threads.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key, now):
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _set_locked(self, key, value, ttl, now):
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (None if ttl is None else now + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get_locked(key, self._clock())
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None):
+        """Store ``value``; ``ttl`` overrides the cache default for this entry."""
+        with self._lock:
+            self._set_locked(key, value, ttl, self._clock())
+
+    def add(self, key, value=True, ttl=None) -> bool:
+        """Store ``value`` only if ``key`` is absent or expired. Returns True if it was stored."""
+        with self._lock:
+            now = self._clock()
+            if self._get_locked(key, now) is not _MISSING:
+                return False
+            self._set_locked(key, value, ttl, now)
+            return True
+
+    def get_or_set(self, key, loader, ttl=None):
+        """
+        Return the cached value for ``key``, calling ``loader()`` to fill it on a miss.
+        The loader runs outside the lock, so concurrent misses may both load.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def keys(self) -> list:
+        """Snapshot of the keys that have not expired, oldest use first."""
+        with self._lock:
+            now = self._clock()
+            return [k for k, (exp, _) in self._data.items() if exp is None or exp > now]
+
+    def __iter__(self):
+        """Iterates over a snapshot, so entries may be popped while iterating."""
+        return iter(self.keys())
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._get_locked(key, self._clock()) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            now = self._clock()
+            expired = [
+                k
+                for k, (exp, _) in self._data.items()
+                if exp is not None and exp <= now
+            ]
+            for k in expired:
+                del self._data[k]
+            return len(self._data)
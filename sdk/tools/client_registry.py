@@ -0,0 +1,229 @@
+"""
+Process-wide registry of cloud SDK clients.
+
+Building a boto3 Session (botocore loads its service models), an OpenStack Connection
+(Keystone authentication) or a GCP client (credential parsing, transport setup) costs more
+than most of the calls the bot makes with it. The registry creates each client once per
+(cloud, region/project, credential) and hands the same object to every helper:
+
+* AWS: one Session per (region, access key) and one client per service, with botocore
+  ``max_pool_connections`` set from ``AWS_MAX_POOL_CONNECTIONS``. boto3 clients are
+  thread-safe; Sessions and resources are not, so they are only touched under the lock.
+* OpenStack: one Connection per (auth URL, region, application credential), its HTTP pool sized
+  by ``OPENSTACK_MAX_POOL_CONNECTIONS``. The Keystone token is renewed when it expires within
+  ``CLOUD_TOKEN_REFRESH_MARGIN`` seconds, instead of on the first failing call.
+* GCP: service-account credentials per (project, service account), refreshed the same way,
+  and one ``compute_v1`` client per client class.
+
+``stats()`` reports how many clients of each kind were created, reused and refreshed.
+The cloud SDKs are imported on first use, so using one cloud does not load the others.
+"""
+
+import datetime
+import logging
+import threading
+from collections import defaultdict
+
+from config import config
+from sdk.tools.helpers import get_config_value
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._clients = {}
+        self._counters = defaultdict(int)
+
+    def _get_or_create(self, kind, key, factory):
+        with self._lock:
+            client = self._clients.get((kind, key))
+            if client is None:
+                client = factory()
+                self._clients[(kind, key)] = client
+                self._counters[f"created.{kind}"] += 1
+                logger.info(
+                    f"Created {kind} client ({key[0]}); "
+                    f"{self._counters[f'created.{kind}']} created so far"
+                )
+            else:
+                self._counters[f"reused.{kind}"] += 1
+            return client
+
+    # AWS
+
+    def aws_session(self, region):
+        import boto3
+
+        key = (region, config.AWS_ACCESS_KEY_ID)
+        return self._get_or_create(
+            "aws_session",
+            key,
+            lambda: boto3.Session(
+                aws_access_key_id=config.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
+                region_name=region,
+            ),
+        )
+
+    def aws_client(self, service, region):
+        """Shared, thread-safe boto3 client for ``service`` in ``region``."""
+        from botocore.config import Config as BotoConfig
+
+        key = (region, config.AWS_ACCESS_KEY_ID, service)
+        return self._get_or_create(
+            f"aws_{service}",
+            key,
+            lambda: self.aws_session(region).client(
+                service,
+                config=BotoConfig(
+                    max_pool_connections=get_config_value(
+                        "AWS_MAX_POOL_CONNECTIONS", 20
+                    )
+                ),
+            ),
+        )
+
+    def aws_resource(self, service, region):
+        """
+        New boto3 resource built from the shared Session. Resources are not thread-safe, so
+        they are not shared, but the Session's loaded service models are.
+        """
+        with self._lock:
+            self._counters[f"created.aws_{service}_resource"] += 1
+            return self.aws_session(region).resource(service)
+
+    # OpenStack
+
+    def openstack_connection(self):
+        """Shared OpenStack Connection; its token is renewed shortly before it expires."""
+        from openstack import connection
+
+        key = (config.OS_AUTH_URL, config.OS_REGION_NAME, config.OS_APP_CRED_ID)
+
+        def create():
+            conn = connection.Connection(
+                auth_url=config.OS_AUTH_URL,
+                application_credential_id=config.OS_APP_CRED_ID,
+                application_credential_secret=config.OS_APP_CRED_SECRET,
+                region_name=config.OS_REGION_NAME,
+                interface=config.OS_INTERFACE,
+                identity_api_version=config.OS_ID_API_VERSION,
+                auth_type=config.OS_AUTH_TYPE,
+            )
+            _size_openstack_pool(
+                conn, get_config_value("OPENSTACK_MAX_POOL_CONNECTIONS", 20)
+            )
+            return conn
+
+        conn = self._get_or_create("openstack", key, create)
+        self._refresh_openstack_token(conn)
+        return conn
+
+    def _refresh_openstack_token(self, conn):
+        auth = getattr(conn.session, "auth", None)
+        auth_ref = getattr(auth, "auth_ref", None)
+        margin = get_config_value("CLOUD_TOKEN_REFRESH_MARGIN", 300)
+        if auth_ref is None or not auth_ref.will_expire_soon(margin):
+            return
+        with self._refresh_lock:
+            if auth.auth_ref is None or not auth.auth_ref.will_expire_soon(margin):
+                return  # another thread renewed it
+            try:
+                auth.invalidate()
+                conn.authorize()
+                self._counters["refreshed.openstack"] += 1
+                logger.info("Renewed OpenStack token before expiry")
+            except Exception as e:
+                # The connection re-authenticates on its own on the next call
+                logger.warning(
+                    f"Proactive OpenStack token renewal failed: {e}", exc_info=True
+                )
+
+    # GCP
+
+    def gcp_credentials(self):
+        """Shared service-account credentials from ``GOOGLE_CLOUD_CREDS``."""
+        from google.oauth2 import service_account
+
+        info = dict(config["GOOGLE_CLOUD_CREDS"])
+        key = (info.get("project_id", ""), info.get("client_email", ""))
+        credentials = self._get_or_create(
+            "gcp_credentials",
+            key,
+            lambda: service_account.Credentials.from_service_account_info(
+                info,
+                scopes=["https://www.googleapis.com/auth/cloud-platform"],
+            ),
+        )
+        self._refresh_gcp_credentials(credentials)
+        return credentials
+
+    def _refresh_gcp_credentials(self, credentials):
+        # Never fetched yet: the first API call fetches a token anyway
+        if not credentials.token or not credentials.expiry:
+            return
+        margin = datetime.timedelta(
+            seconds=get_config_value("CLOUD_TOKEN_REFRESH_MARGIN", 300)
+        )
+        # google-auth keeps ``expiry`` as a naive UTC datetime
+        now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+        if credentials.expiry - now > margin:
+            return
+        from google.auth.transport.requests import Request
+
+        with self._refresh_lock:
+            if credentials.expiry - now > margin:
+                return
+            try:
+                credentials.refresh(Request())
+                self._counters["refreshed.gcp"] += 1
+                logger.info("Renewed GCP access token before expiry")
+            except Exception as e:
+                logger.warning(
+                    f"Proactive GCP token renewal failed: {e}", exc_info=True
+                )
+
+    def gcp_client(self, client_class):
+        """Shared ``compute_v1`` client, e.g. ``gcp_client(compute_v1.InstancesClient)``."""
+        credentials = self.gcp_credentials()
+        key = (
+            getattr(credentials, "project_id", ""),
+            getattr(credentials, "service_account_email", ""),
+            client_class.__name__,
+        )
+        return self._get_or_create(
+            f"gcp_{client_class.__name__}",
+            key,
+            lambda: client_class(credentials=credentials),
+        )
+
+    # Introspection
+
+    def stats(self) -> dict:
+        """Created / reused / refreshed counters per client kind."""
+        with self._lock:
+            return dict(self._counters)
+
+    def clear(self):
+        """Forget every client and counter (the next lookup creates new ones)."""
+        with self._lock:
+            self._clients.clear()
+            self._counters.clear()
+
+
+def _size_openstack_pool(conn, pool_size):
+    """Mount an HTTP adapter with ``pool_size`` connections per host on the Keystone session."""
+    from requests.adapters import HTTPAdapter
+
+    http_session = getattr(conn.session, "session", None)
+    if http_session is None:
+        return
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+
+
+client_registry = ClientRegistry()
@@ -20,6 +20,21 @@ COMMAND_REGISTRY: Dict[str, Callable] = {}
 # Cached help text for performance
 _CACHED_HELP_TEXT: Optional[str] = None
 
+# Bumped whenever COMMAND_REGISTRY changes so cached parsers know to rebuild
+_REGISTRY_VERSION = 0
+
+
+def _registry_changed():
+    """Invalidate everything derived from COMMAND_REGISTRY."""
+    global _CACHED_HELP_TEXT, _REGISTRY_VERSION
+    _CACHED_HELP_TEXT = None
+    _REGISTRY_VERSION += 1
+
+
+def get_registry_version() -> int:
+    """Return a counter that changes every time a command or alias is registered."""
+    return _REGISTRY_VERSION
+
 
 def command_meta(
     name: str,
@@ -61,6 +76,8 @@ def command_meta(
             for alias in aliases:
                 COMMAND_REGISTRY[alias] = func
 
+        _registry_changed()
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             return func(*args, **kwargs)
@@ -114,7 +131,15 @@ def get_openstack_statuses():
 
 
 def get_openstack_flavors():
-    """Get common OpenStack flavors."""
+    """
+    OpenStack flavors of the project from the cached catalog, or common flavors until the
+    catalog has been loaded (help must not wait for OpenStack).
+    """
+    from sdk.openstack.catalog import openstack_catalog
+
+    flavors = openstack_catalog.names("flavor", load=False)
+    if flavors:
+        return flavors
     return [
         # Standard m1.* flavors
         "m1.tiny",
@@ -437,6 +462,8 @@ def register_command(name: str, handler: Callable, meta: Dict[str, Any]):
     for alias in meta.get("aliases", []):
         COMMAND_REGISTRY[alias] = handler
 
+    _registry_changed()
+
 
 def get_command_handler(command_name: str) -> Optional[Callable]:
     """
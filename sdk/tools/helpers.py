@@ -1,10 +1,14 @@
-import shlex
 import logging
 import re
+import shlex
+import threading
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from re import Match
+from typing import NamedTuple
 
-from typing_extensions import Match
-
-from sdk.tools.help_system import COMMAND_REGISTRY
+from config import config
+from sdk.tools.help_system import COMMAND_REGISTRY, get_registry_version
 
 logger = logging.getLogger(__name__)
 
@@ -90,11 +94,18 @@ def get_named_and_positional_params(command_line: str) -> tuple[dict, list]:
     if not command_line:
         return {}, []
 
+    return parse_parameters_line(get_parameters_line(command_line))
+
+
+def parse_parameters_line(parameters_line: str | None) -> tuple[dict, list]:
+    """
+    Parse the parameters part of a command line (everything after the base command) into
+    named and positional parameters. See ``get_named_and_positional_params`` for the formats.
+    Use this directly when the parameters line is already known, e.g. from ``match_command``.
+    """
     named_params = {}
     positional_params = []
 
-    parameters_line = get_parameters_line(command_line)
-
     if not parameters_line:
         return {}, []
 
@@ -219,6 +230,69 @@ def get_list_of_values_for_key_in_dict_of_parameters(
     return cleaned_value.split(",") if cleaned_value else []
 
 
+def get_config_value(key_name: str, default, cast=int):
+    """
+    Read an optional scalar setting from config, falling back to ``default`` when the key is
+    unset or its value cannot be converted with ``cast`` (int, float, bool or str).
+
+    Examples:
+        >>> get_config_value("BOT_WORKER_POOL_SIZE", 8)  # BOT_WORKER_POOL_SIZE=16 in .env
+        16
+        >>> get_config_value("SOME_FLAG", False, cast=bool)  # SOME_FLAG=true in .env
+        True
+    """
+    value = getattr(config, key_name, None)
+    if not isinstance(value, (str, int, float, bool)):
+        return default
+
+    try:
+        if cast is bool:
+            if isinstance(value, str):
+                lowered = value.strip().lower()
+                if lowered in ("1", "true", "yes", "on"):
+                    return True
+                if lowered in ("0", "false", "no", "off"):
+                    return False
+                return default
+            return bool(value)
+        if isinstance(value, bool):
+            return default
+        return cast(value)
+    except (TypeError, ValueError):
+        logger.warning(
+            f"{key_name}={value!r} is not a valid {cast.__name__}; using {default}"
+        )
+        return default
+
+
+_AGE_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_since(value: str) -> datetime:
+    """
+    Parse a point in time given as an age (``30m``, ``2h``, ``7d``...) or as an ISO 8601 date
+    or timestamp (UTC unless it has an offset). Raises ValueError for anything else.
+
+    Examples:
+        >>> parse_since("2024-05-01T10:00:00Z")
+        datetime.datetime(2024, 5, 1, 10, 0, tzinfo=datetime.timezone.utc)
+        >>> parse_since("2h")  # two hours ago
+        datetime.datetime(...)
+    """
+    value = str(value).strip()
+    age = re.fullmatch(r"(\d+)([smhdw])", value.lower())
+    if age:
+        delta = timedelta(**{_AGE_UNITS[age.group(2)]: int(age.group(1))})
+        return datetime.now(UTC) - delta
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(
+            f"'{value}' is neither an age like 2h nor an ISO 8601 date"
+        ) from None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
 def _clean_comma_separated_value(value: str) -> str:
     """
     Clean up comma-separated values by removing extra whitespace and empty values.
@@ -234,18 +308,87 @@ def _clean_comma_separated_value(value: str) -> str:
     return ",".join(parts)
 
 
+class CommandMatch(NamedTuple):
+    """Result of routing a command line: base command, the rest of the line and its handler."""
+
+    base_command: str
+    params_line: str
+    handler: Callable | None
+
+
+class CommandRouter:
+    """
+    Matches command lines against the registered command names and aliases.
+
+    The alternation regex over ``COMMAND_REGISTRY`` is compiled once and reused for every
+    message; it is rebuilt only when ``register_command`` / ``command_meta`` add something.
+    A router given a registry of its own rebuilds when the names in it change.
+    """
+
+    def __init__(self, registry=None):
+        self._registry = COMMAND_REGISTRY if registry is None else registry
+        self._lock = threading.Lock()
+        self._version = None
+        self._pattern = None
+
+    def _registry_version(self):
+        if self._registry is COMMAND_REGISTRY:
+            return get_registry_version()
+        # Other registries have no version counter; the regex only depends on the names
+        return frozenset(self._registry)
+
+    @property
+    def pattern(self) -> re.Pattern:
+        version = self._registry_version()
+        pattern = self._pattern
+        if pattern is None or self._version != version:
+            with self._lock:
+                if self._pattern is None or self._version != version:
+                    self._pattern = self._compile()
+                    self._version = version
+                    logger.debug(
+                        f"Compiled command router for {len(self._registry)} commands"
+                    )
+                pattern = self._pattern
+        return pattern
+
+    def _compile(self) -> re.Pattern:
+        # Longest names first so "vm list all" wins over a registered "vm list"
+        names = sorted(self._registry, key=len, reverse=True)
+        commands_pattern = "|".join(map(re.escape, names))
+        return re.compile(
+            r"^(?P<base_command>help$|"
+            r"(?:(help\s)?"
+            r"(?P<command>" + commands_pattern + r")"
+            r"(\s(?:help|h))?)"
+            r")\b"
+            r"(?P<params>.*)"
+        )
+
+    def match(self, command_line: str) -> CommandMatch | None:
+        """Route a command line in one pass. Returns None if no registered command matches."""
+        match_command = self.pattern.match(command_line)
+        if not match_command:
+            return None
+
+        groups = match_command.groupdict()
+        return CommandMatch(
+            base_command=(groups.get("base_command") or "").strip(),
+            params_line=(groups.get("params") or "").strip(),
+            handler=self._registry.get(groups.get("command")),
+        )
+
+
+command_router = CommandRouter()
+
+
+def match_command(command_line: str) -> CommandMatch | None:
+    """Route a command line with the shared, precompiled ``command_router``."""
+    return command_router.match(command_line)
+
+
 def _get_match_command_line(command_line: str) -> Match[str] | None:
-    commands_pattern = "|".join(map(re.escape, COMMAND_REGISTRY))
-    pattern = re.compile(
-        r"^(?P<base_command>help$|"
-        r"(?:(help\s)?"
-        r"(" + commands_pattern + r")"
-        r"(\s(?:help|h))?)"
-        r")\b"
-        r"(?P<params>.*)"
-    )
-
-    return pattern.match(command_line)
+    return command_router.pattern.match(command_line)
 
 
 def get_base_command(command_line: str) -> str | None:
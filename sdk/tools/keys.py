@@ -0,0 +1,55 @@
+"""
+SSH keypairs generated by the bot, for `vm create --key_pair=new`.
+
+The key is generated locally and only its public half is imported into the cloud
+(``import_key_pair`` on EC2, ``create_keypair`` with ``public_key`` on OpenStack), so one
+round trip replaces the create-and-download of a cloud-generated key. Keys are RSA, in PEM,
+because ED25519 is not supported on Windows and PEM works everywhere (PPK is PuTTY only).
+
+``keypair_cache`` remembers the keypair in use per (cloud, scope, user) for
+``KEYPAIR_CACHE_TTL`` seconds (default one hour), so `--key_pair=existing` does not need to
+look it up again.
+"""
+
+import base64
+import hashlib
+from typing import NamedTuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from sdk.tools.cache import TTLCache
+
+RSA_KEY_SIZE = 2048
+
+keypair_cache = TTLCache(maxsize=1024)
+
+
+class GeneratedKey(NamedTuple):
+    private_key: str  # PEM, sent to the user
+    public_key: str  # OpenSSH, imported into the cloud
+    fingerprint: str  # MD5 of the public key, as EC2 and Nova show it for imported keys
+
+
+def public_key_fingerprint(public_key) -> str:
+    """Colon-separated MD5 of an OpenSSH public key (``ssh-rsa AAAA...``)."""
+    blob = base64.b64decode(public_key.split()[1])
+    digest = hashlib.md5(blob, usedforsecurity=False).hexdigest()
+    return ":".join(digest[i : i + 2] for i in range(0, len(digest), 2))
+
+
+def generate_keypair() -> GeneratedKey:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=RSA_KEY_SIZE)
+    private_key = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.TraditionalOpenSSL,
+        serialization.NoEncryption(),
+    ).decode()
+    public_key = (
+        key.public_key()
+        .public_bytes(
+            serialization.Encoding.OpenSSH, serialization.PublicFormat.OpenSSH
+        )
+        .decode()
+    )
+    return GeneratedKey(private_key, public_key, public_key_fingerprint(public_key))
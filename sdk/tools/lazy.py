@@ -0,0 +1,99 @@
+"""
+Deferred creation of expensive module-level objects.
+
+The cloud SDKs (boto3, openstacksdk, google-cloud-compute) take well over a second to import
+and the ROTA sheet connection needs a network round trip. ``LazyObject`` stands in for such an
+object and creates it on first use, so a process only pays for what it actually uses.
+``warm_up`` creates them in a background thread right after startup, so the first command
+does not pay either.
+"""
+
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class LazyObject:
+    """
+    Proxy for the result of ``factory()``, called on first attribute access or call.
+    A failing factory is retried on the next use.
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", repr(factory))
+        self._value = _UNSET
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        value = self._value
+        if value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    self._value = self._factory()
+                value = self._value
+        return value
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not _UNSET
+
+    def warm(self) -> bool:
+        """Create the object now. Returns False (and logs) if the factory failed."""
+        try:
+            self._resolve()
+            return True
+        except Exception as e:
+            logger.warning(f"Warm-up of {self._name} failed: {e}", exc_info=True)
+            return False
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyObject {self._name} ({state})>"
+
+
+def lazy_import(module_name, attribute=None) -> LazyObject:
+    """Lazy ``module_name`` or ``module_name.attribute``, imported on first use."""
+
+    def load():
+        module = importlib.import_module(module_name)
+        return getattr(module, attribute) if attribute else module
+
+    name = f"{module_name}.{attribute}" if attribute else module_name
+    return LazyObject(load, name=name)
+
+
+def warm_up(*objects, delay=0.0) -> threading.Thread:
+    """
+    Resolve ``objects`` one by one in a daemon thread, after ``delay`` seconds. Plain
+    callables are called instead, e.g. to pre-fill a cache.
+    """
+
+    def run():
+        if delay:
+            time.sleep(delay)
+        start = time.monotonic()
+        for obj in objects:
+            if isinstance(obj, LazyObject):
+                obj.warm()
+            elif callable(obj):
+                try:
+                    obj()
+                except Exception as e:
+                    logger.warning(f"Warm-up step {obj!r} failed: {e}", exc_info=True)
+        logger.info(f"Warm-up finished in {time.monotonic() - start:.2f}s")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,98 @@
+"""
+Quota preflight for VM creates.
+
+A create that exceeds the EC2 vCPU limit, an OpenStack compute or network quota or a GCP
+regional CPU quota only fails after the keypair work and a slow provisioning attempt.
+``QuotaService`` keeps the limits and usage of each cloud scope (AWS region, OpenStack
+project, GCP region) in a ``TTLCache`` for ``QUOTA_CACHE_TTL`` seconds (default 60), so a
+create can be checked against them with a few dict lookups before anything is provisioned.
+
+The limits are fetched by a loader per cloud (``register``), which returns
+``{resource: {"limit": n, "used": n}}``; a negative limit means unlimited. After a create
+succeeds, ``consume`` adds what it took to the cached usage so that the next check does not
+need to wait for the cache to expire. If the limits cannot be fetched, creates are allowed.
+"""
+
+import logging
+import threading
+
+from sdk.tools.cache import TTLCache
+from sdk.tools.helpers import get_config_value
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaService:
+    def __init__(self, maxsize=64):
+        self._loaders = {}  # cloud -> loader(scope)
+        self._usage = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def register(self, cloud, loader):
+        """``loader(scope)`` returns the limits and usage of ``cloud`` in ``scope``."""
+        self._loaders[cloud] = loader
+
+    def usage(self, cloud, scope) -> dict:
+        """Cached limits and usage of ``cloud`` in ``scope``; empty if they are unknown."""
+        loader = self._loaders.get(cloud)
+        if loader is None:
+            return {}
+
+        def load():
+            usage = loader(scope)
+            if not isinstance(usage, dict):
+                raise TypeError(f"quota loader returned {type(usage).__name__}")
+            return usage
+
+        try:
+            return self._usage.get_or_set(
+                (cloud, scope), load, ttl=get_config_value("QUOTA_CACHE_TTL", 60)
+            )
+        except Exception as e:
+            logger.warning(
+                f"Unable to fetch the {cloud} quotas of {scope}: {e}", exc_info=True
+            )
+            return {}
+
+    def check(self, cloud, scope, demand) -> list:
+        """
+        The resources that ``demand`` (``{resource: amount}``) would take beyond their limit,
+        as messages like "vcpus: needs 8, 4 of 32 left". Empty if the create fits.
+        """
+        if not demand:
+            return []
+        usage = self.usage(cloud, scope)
+        shortfalls = []
+        with self._lock:
+            for resource, amount in demand.items():
+                quota = usage.get(resource)
+                if not quota or not isinstance(amount, (int, float)):
+                    continue
+                limit, used = quota["limit"], quota["used"]
+                if limit >= 0 and used + amount > limit:
+                    left = max(0, limit - used)
+                    shortfalls.append(
+                        f"{resource}: needs {amount:g}, {left:g} of {limit:g} left"
+                    )
+        return shortfalls
+
+    def consume(self, cloud, scope, demand):
+        """Count a successful create in the cached usage of ``scope``."""
+        usage = self._usage.get((cloud, scope))
+        if not usage:
+            return
+        with self._lock:
+            for resource, amount in demand.items():
+                if resource in usage and isinstance(amount, (int, float)):
+                    usage[resource]["used"] += amount
+
+    def invalidate(self, cloud=None, scope=None):
+        """Forget the cached quotas of ``cloud``/``scope`` (all of them without arguments)."""
+        for key in self._usage:
+            if (cloud is None or key[0] == cloud) and (
+                scope is None or key[1] == scope
+            ):
+                self._usage.pop(key)
+
+
+quota_service = QuotaService()
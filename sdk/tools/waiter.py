@@ -0,0 +1,176 @@
+"""
+Adaptive waiting for cloud resources, shared by the AWS, OpenStack and GCP helpers.
+
+The SDK waiters poll at a fixed pace: boto3's ``wait_until_running`` every 15 seconds,
+openstacksdk's ``wait_for_server`` every 2 seconds, and GCP's ``operation.result`` on its own
+opaque schedule. ``wait_for`` polls quickly at first and then backs off exponentially, so a VM
+that is up after 20 seconds is reported after about 20 seconds, while one that takes ten
+minutes costs a few dozen API calls rather than hundreds.
+
+What "done" means is given by the caller: ``poll`` fetches the resource, ``is_ready`` and
+``is_failed`` judge it. An optional ``reachable`` check (e.g. ``tcp_reachable`` on the SSH
+port) must also pass before the resource is reported as ready. The wait ends at its deadline
+or when its ``cancel`` event is set, and the returned ``WaitResult`` tells how long each phase
+took.
+"""
+
+import logging
+import random
+import socket
+import threading
+import time
+from typing import NamedTuple
+
+from sdk.tools.helpers import get_config_value
+
+logger = logging.getLogger(__name__)
+
+SSH_PORT = 22
+
+
+class WaitError(Exception):
+    """The resource did not reach the expected state."""
+
+    def __init__(self, message, value=None):
+        super().__init__(message)
+        self.value = value  # last value returned by ``poll``
+
+
+class WaitTimeout(WaitError):
+    pass
+
+
+class WaitCancelled(WaitError):
+    pass
+
+
+class WaitFailed(WaitError):
+    pass
+
+
+class Backoff:
+    """
+    Delays between polls: ``fast_polls`` delays of ``initial`` seconds, then growing by
+    ``factor`` up to ``max_delay``. Each delay is spread by +/- ``jitter`` (a fraction) so
+    that many waiters started together do not poll in lockstep.
+    """
+
+    def __init__(
+        self, initial=2.0, factor=2.0, max_delay=15.0, fast_polls=3, jitter=0.1
+    ):
+        self.initial = initial
+        self.factor = factor
+        self.max_delay = max(initial, max_delay)
+        self.fast_polls = fast_polls
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, max_delay=None):
+        """Backoff from ``WAIT_INITIAL_DELAY`` and ``WAIT_MAX_DELAY``."""
+        return cls(
+            initial=get_config_value("WAIT_INITIAL_DELAY", 2.0, cast=float),
+            max_delay=(
+                get_config_value("WAIT_MAX_DELAY", 15.0, cast=float)
+                if max_delay is None
+                else max_delay
+            ),
+        )
+
+    def delay(self, attempt) -> float:
+        """Seconds to wait after poll number ``attempt`` (counted from 0)."""
+        if attempt < self.fast_polls:
+            delay = self.initial
+        else:
+            exponent = min(attempt - self.fast_polls + 1, 32)
+            delay = min(self.initial * self.factor**exponent, self.max_delay)
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
+
+
+class WaitResult(NamedTuple):
+    value: object
+    polls: int
+    timings: dict  # phase ("ready", "reachable") -> seconds since the wait started
+
+
+def tcp_reachable(host, port=SSH_PORT, timeout=3.0) -> bool:
+    """True if a TCP connection to ``host:port`` can be opened."""
+    if not host or host == "N/A":
+        return False
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_for_ssh() -> bool:
+    """Whether waits should also check the SSH port (``WAIT_FOR_SSH``, off by default)."""
+    return get_config_value("WAIT_FOR_SSH", False, cast=bool)
+
+
+def wait_for(
+    poll,
+    is_ready,
+    is_failed=None,
+    reachable=None,
+    timeout=600,
+    backoff=None,
+    cancel=None,
+    description="resource",
+    clock=time.monotonic,
+    sleep=None,
+) -> WaitResult:
+    """
+    Call ``poll()`` until ``is_ready(value)`` (and then ``reachable(value)``) is true.
+
+    :param poll: Fetches the current state of the resource.
+    :param is_ready: ``value -> bool``, e.g. the instance is running.
+    :param is_failed: ``value -> error message`` (or False) when the resource can no longer
+        become ready, e.g. it went into ERROR state.
+    :param reachable: Optional ``value -> bool``, e.g. its SSH port accepts connections.
+    :param timeout: Seconds after which ``WaitTimeout`` is raised.
+    :param backoff: ``Backoff`` for the delays between polls (``Backoff.from_config()``).
+    :param cancel: ``threading.Event`` that aborts the wait with ``WaitCancelled``.
+    :param description: Name of the resource in log and error messages.
+    :return: ``WaitResult`` with the last polled value, number of polls and phase timings.
+    """
+    backoff = backoff or Backoff.from_config()
+    cancel = cancel or threading.Event()
+    sleep = sleep or cancel.wait
+    started = clock()
+    deadline = started + timeout
+    timings = {}
+    attempt = 0
+    value = None
+    while True:
+        if cancel.is_set():
+            raise WaitCancelled(f"Waiting for {description} was cancelled", value)
+        value = poll()
+        attempt += 1
+        if "ready" not in timings:
+            error = is_failed(value) if is_failed else False
+            if error:
+                raise WaitFailed(
+                    error if isinstance(error, str) else f"{description} failed", value
+                )
+            if is_ready(value):
+                timings["ready"] = clock() - started
+        if "ready" in timings and (reachable is None or reachable(value)):
+            if reachable is not None:
+                timings["reachable"] = clock() - started
+            logger.info(
+                f"{description} ready after "
+                + ", ".join(f"{phase} {secs:.1f}s" for phase, secs in timings.items())
+                + f" ({attempt} polls)"
+            )
+            return WaitResult(value, attempt, timings)
+
+        remaining = deadline - clock()
+        if remaining <= 0:
+            phase = "reachable" if "ready" in timings else "ready"
+            raise WaitTimeout(
+                f"{description} was not {phase} after {timeout:.0f}s", value
+            )
+        sleep(min(backoff.delay(attempt - 1), remaining))
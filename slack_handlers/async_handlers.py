@@ -0,0 +1,220 @@
+"""
+Awaitable variants of the command handlers, used by the async bot (``slack_main_async.py``).
+
+The handlers in ``handlers.py`` are synchronous and call blocking cloud SDKs, so each
+``async_handle_*`` variant runs its handler on a bounded thread pool. Slack calls are not made
+on that thread: ``say`` (and ``app``) hand them to the event loop, where they are awaited in
+order on the async client while the handler carries on. A command therefore holds a pool
+thread only while its own code and SDK calls run, and its last posts are awaited after the
+thread is released. Only a result the handler reads (e.g. the ``ts`` of a message it edits
+later) makes the thread wait for Slack.
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from slack_bolt.async_app import AsyncApp
+
+from sdk.tools.help_system import handle_help_command
+from sdk.tools.helpers import get_config_value
+from slack_handlers.handlers import (
+    handle_aws_modify_vm,
+    handle_create_aws_vm,
+    handle_create_gcp_vm,
+    handle_create_openstack_vm,
+    handle_gcp_modify_vm,
+    handle_hello,
+    handle_help,
+    handle_list_aws_vms,
+    handle_list_gcp_vms,
+    handle_list_openstack_vms,
+    handle_list_team_links,
+    handle_openstack_modify_vm,
+    handle_rota,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds a handler thread waits for a Slack call made through the event loop
+SLACK_CALL_TIMEOUT = 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """The shared pool that runs blocking handler code, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, get_config_value("BOT_ASYNC_EXECUTOR_SIZE", 64)),
+                thread_name_prefix="bot-async-command",
+            )
+        return _executor
+
+
+def shutdown_executor(wait=True):
+    """Wait for running handlers and release the pool (a new one is created on next use)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _on_loop(loop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class SlackCalls:
+    """
+    The Slack calls of one command, awaited one after another on ``loop`` in the order they
+    were made, so its messages are posted in order.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._futures = []
+
+    def submit(self, awaitable) -> "PendingResult":
+        """Schedule ``awaitable`` after the previous call and return without waiting."""
+        with self._lock:
+            previous = self._futures[-1] if self._futures else None
+            future = asyncio.run_coroutine_threadsafe(
+                _await_after(previous, awaitable), self._loop
+            )
+            self._futures.append(future)
+        return PendingResult(future, self._loop)
+
+    async def drain(self):
+        """Wait for every call made so far; raises the first error, if any."""
+        with self._lock:
+            futures = list(self._futures)
+        results = await asyncio.gather(
+            *(asyncio.wrap_future(future) for future in futures),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+
+async def _await_after(previous, awaitable):
+    if previous is not None:
+        # Only the order matters here; an error is raised by drain()
+        await asyncio.wait([asyncio.wrap_future(previous)])
+    return await awaitable
+
+
+class PendingResult:
+    """
+    Result of a Slack call that is still running on the event loop. Reading it (``get``,
+    ``[...]`` or any attribute) waits for the call, up to ``SLACK_CALL_TIMEOUT`` seconds.
+    """
+
+    def __init__(self, future, loop):
+        self._future = future
+        self._loop = loop
+
+    def result(self):
+        if not self._future.done() and _on_loop(self._loop):
+            raise RuntimeError(
+                "A pending Slack call must not be waited for on the event loop thread"
+            )
+        return self._future.result(timeout=SLACK_CALL_TIMEOUT)
+
+    def __getattr__(self, name):
+        return getattr(self.result(), name)
+
+    def __getitem__(self, key):
+        return self.result()[key]
+
+
+class BlockingBridge:
+    """
+    Wrap an async Slack object (``say``, ``AsyncApp``, ``AsyncWebClient``) for use from a
+    worker thread. Calls that return a coroutine are handed to ``calls`` and return a
+    ``PendingResult`` at once; attributes are wrapped the same way, so
+    ``app.client.chat_postMessage(...)`` works unchanged in the sync handlers.
+    """
+
+    def __init__(self, target, calls):
+        self._target = target
+        self._calls = calls
+
+    def _resolve(self, result):
+        if not inspect.isawaitable(result):
+            return result
+        return self._calls.submit(result)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve(self._target(*args, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if callable(attr):
+            return lambda *args, **kwargs: self._resolve(attr(*args, **kwargs))
+        if isinstance(attr, (str, int, float, bool, type(None), dict, list)):
+            return attr
+        return BlockingBridge(attr, self._calls)
+
+
+def make_async(handler):
+    """
+    Return an awaitable variant of a sync ``handler(say, ...)``. It runs on the shared
+    executor with ``say`` and any ``AsyncApp`` argument wrapped in a ``BlockingBridge``; the
+    Slack calls still running when it returns are awaited after its thread is released.
+    """
+
+    @functools.wraps(handler)
+    async def async_handler(say, *args, **kwargs):
+        calls = SlackCalls(asyncio.get_running_loop())
+        args = [
+            BlockingBridge(arg, calls) if isinstance(arg, AsyncApp) else arg
+            for arg in args
+        ]
+        kwargs = {
+            key: BlockingBridge(value, calls) if isinstance(value, AsyncApp) else value
+            for key, value in kwargs.items()
+        }
+        call = functools.partial(handler, BlockingBridge(say, calls), *args, **kwargs)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                get_executor(), call
+            )
+        finally:
+            await calls.drain()
+        return result.result() if isinstance(result, PendingResult) else result
+
+    return async_handler
+
+
+@functools.lru_cache(maxsize=256)
+def async_variant(handler):
+    """The awaitable variant of ``handler``, made once per handler."""
+    return make_async(handler)
+
+
+async_handle_help = make_async(handle_help)
+async_handle_help_command = make_async(handle_help_command)
+async_handle_create_openstack_vm = make_async(handle_create_openstack_vm)
+async_handle_list_openstack_vms = make_async(handle_list_openstack_vms)
+async_handle_hello = make_async(handle_hello)
+async_handle_create_aws_vm = make_async(handle_create_aws_vm)
+async_handle_create_gcp_vm = make_async(handle_create_gcp_vm)
+async_handle_list_gcp_vms = make_async(handle_list_gcp_vms)
+async_handle_list_aws_vms = make_async(handle_list_aws_vms)
+async_handle_aws_modify_vm = make_async(handle_aws_modify_vm)
+async_handle_gcp_modify_vm = make_async(handle_gcp_modify_vm)
+async_handle_list_team_links = make_async(handle_list_team_links)
+async_handle_rota = make_async(handle_rota)
+async_handle_openstack_modify_vm = make_async(handle_openstack_modify_vm)
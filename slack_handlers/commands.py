@@ -0,0 +1,140 @@
+"""
+Mention parsing shared by the sync (``slack_main.py``) and async (``slack_main_async.py``)
+entry points.
+
+``parse_mention`` does everything that happens before a handler runs: authorization,
+validation, routing and parameter parsing. It never talks to Slack itself; when the mention
+should not run a command it returns the reply to post instead, so each entry point can send
+it with its own (sync or async) ``say``. The handler comes from the router in the same pass,
+and ``command_arguments`` is how both entry points call it.
+"""
+
+import functools
+import inspect
+from collections.abc import Callable
+from typing import NamedTuple
+
+from config import config
+from sdk.tools.help_system import check_help_flag
+from sdk.tools.helpers import (
+    get_config_value,
+    match_command,
+    parse_parameters_line,
+    remove_bot_username,
+    validate_command,
+)
+from slack_handlers.dedup import EventDeduplicator
+from slack_handlers.rate_limit import RateLimiter
+
+
+class ParsedCommand(NamedTuple):
+    user: str | None
+    base_command: str | None
+    named_params: dict
+    is_help: bool = False
+    reply: str | None = None
+    handler: Callable | None = None
+
+
+def build_deduplicator() -> EventDeduplicator:
+    # Drops the second copy of a mention (`app_mention` + `message`) and Slack retries.
+    # Set SLACK_DEDUP_DB_PATH to share seen events between bot processes.
+    return EventDeduplicator(
+        ttl=get_config_value("SLACK_DEDUP_TTL", 600),
+        max_entries=get_config_value("SLACK_DEDUP_MAX_ENTRIES", 10000),
+        db_path=get_config_value("SLACK_DEDUP_DB_PATH", None, cast=str),
+    )
+
+
+def build_rate_limiter() -> RateLimiter:
+    # Token buckets per user, per command class and global; override with RATE_LIMITS (JSON).
+    # Set RATE_LIMIT_DB_PATH to charge the same buckets from several bot processes.
+    return RateLimiter(
+        limits=getattr(config, "RATE_LIMITS", None),
+        stats_log_interval=get_config_value("BOT_STATS_LOG_INTERVAL", 300),
+        db_path=get_config_value("RATE_LIMIT_DB_PATH", None, cast=str),
+    )
+
+
+def is_user_allowed(user_id: str) -> bool:
+    return user_id in config.ALLOWED_SLACK_USERS.values()
+
+
+def not_understood_reply(user) -> str:
+    return f"Hello <@{user}>! I couldn't understand your request. Please try again or type 'help' for assistance."
+
+
+def rate_limited_reply(user, base_command, retry_after) -> str:
+    return f"Sorry <@{user}>, you're sending `{base_command}` commands too quickly. Please try again in {retry_after} s."
+
+
+def parse_mention(body: dict) -> ParsedCommand:
+    """
+    Turn a Slack event body into a routed command.
+    If ``reply`` is set on the result, post it and do not run anything.
+    """
+    user = body.get("event", {}).get("user")
+
+    # Authorization check
+    if config.ALLOW_ALL_WORKSPACE_USERS and not is_user_allowed(user):
+        return ParsedCommand(
+            user,
+            None,
+            {},
+            reply=f"Sorry <@{user}>, you're not authorized to use this bot.Contact ocp-sustaining-admin@redhat.com for assistance.",
+        )
+
+    command_line = body.get("event", {}).get("text", "").strip()
+
+    if not validate_command(command_line):
+        return ParsedCommand(user, None, {}, reply=not_understood_reply(user))
+
+    command_line = remove_bot_username(command_line)
+
+    # Route once: base command and parameters come from a single precompiled match
+    match = match_command(command_line)
+    base_command = match.base_command if match else None
+
+    # Extract parameters using the utility function
+    named_params, _ = parse_parameters_line(match.params_line if match else None)
+
+    # Check if this is a help request for a specific command
+    return ParsedCommand(
+        user,
+        base_command,
+        named_params,
+        is_help=check_help_flag(command_line),
+        handler=match.handler if match else None,
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _handler_parameters(handler) -> tuple:
+    return tuple(
+        name
+        for name, parameter in inspect.signature(handler).parameters.items()
+        if parameter.default is inspect.Parameter.empty
+    )
+
+
+def command_arguments(handler, say, user, region, app, named_params) -> list:
+    """
+    Positional arguments of a command handler, picked by the names of its parameters
+    without a default: ``say``, ``user``, ``region``, ``app`` and ``params_dict``.
+    E.g. ``handle_hello(say, user)`` gets ``[say, user]``.
+    """
+    available = {
+        "say": say,
+        "user": user,
+        "region": region,
+        "app": app,
+        "params_dict": named_params,
+    }
+    arguments = []
+    for name in _handler_parameters(handler):
+        if name not in available:
+            raise TypeError(
+                f"Command handler {handler!r} takes unknown argument {name}"
+            )
+        arguments.append(available[name])
+    return arguments
@@ -0,0 +1,146 @@
+"""
+Idempotency layer for incoming Slack events.
+
+A channel mention reaches the bot twice (``app_mention`` and ``message``) and Slack redelivers
+an event when the ack is late. ``EventDeduplicator.claim`` returns True only for the first
+delivery of a message, so duplicates are dropped before any parsing or cloud work.
+
+Each event is identified by every key it carries: ``event_id`` (same across retries),
+``client_msg_id`` and ``channel`` + ``ts`` (same for the ``app_mention`` / ``message`` pair).
+An event is a duplicate if any of its keys has been seen within the TTL.
+
+The default backend is an in-process LRU/TTL cache. Set a SQLite path to share the seen keys
+between several bot processes or replicas on the same volume.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+
+from sdk.tools.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def event_keys(body: dict) -> list[str]:
+    """Return the identity keys of a Slack event body (may be empty for malformed bodies)."""
+    event = body.get("event", {}) or {}
+    keys = []
+    if body.get("event_id"):
+        keys.append(f"event:{body['event_id']}")
+    if event.get("client_msg_id"):
+        keys.append(f"msg:{event['client_msg_id']}")
+    if event.get("channel") and event.get("ts"):
+        keys.append(f"ts:{event['channel']}:{event['ts']}")
+    return keys
+
+
+class MemoryDedupBackend:
+    """Seen keys kept in a bounded in-process LRU with expiry."""
+
+    def __init__(self, ttl=600, max_entries=10000):
+        self._seen = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def claim(self, keys: list[str]) -> bool:
+        with self._lock:
+            if any(key in self._seen for key in keys):
+                return False
+            for key in keys:
+                self._seen.set(key, True)
+        return True
+
+
+class SQLiteDedupBackend:
+    """Seen keys kept in a SQLite file so that several processes share them."""
+
+    def __init__(self, path, ttl=600, max_entries=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_events "
+            "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS seen_events_expiry ON seen_events (expires_at)"
+        )
+        self._claims = 0
+
+    def claim(self, keys: list[str]) -> bool:
+        now = time.time()
+        placeholders = ",".join("?" for _ in keys)
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                seen = cur.execute(
+                    f"SELECT 1 FROM seen_events WHERE key IN ({placeholders}) AND expires_at > ?",
+                    (*keys, now),
+                ).fetchone()
+                if seen:
+                    cur.execute("COMMIT")
+                    return False
+                cur.executemany(
+                    "INSERT OR REPLACE INTO seen_events (key, expires_at) VALUES (?, ?)",
+                    [(key, now + self.ttl) for key in keys],
+                )
+                self._claims += 1
+                if self._claims % 100 == 0:
+                    self._prune(cur, now)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return True
+
+    def _prune(self, cur, now):
+        """Drop expired keys and cap the table at ``max_entries`` (oldest first)."""
+        cur.execute("DELETE FROM seen_events WHERE expires_at <= ?", (now,))
+        cur.execute(
+            "DELETE FROM seen_events WHERE key IN (SELECT key FROM seen_events "
+            "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class EventDeduplicator:
+    def __init__(self, ttl=600, max_entries=10000, db_path=None):
+        """
+        :param ttl: Seconds a delivered event is remembered.
+        :param max_entries: Upper bound on remembered keys.
+        :param db_path: Optional SQLite file shared between processes; in-memory if not set.
+        """
+        if db_path:
+            self.backend = SQLiteDedupBackend(db_path, ttl=ttl, max_entries=max_entries)
+            logger.info(f"Slack event de-duplication shared through {db_path}")
+        else:
+            self.backend = MemoryDedupBackend(ttl=ttl, max_entries=max_entries)
+        self.duplicates = 0
+
+    def claim(self, body: dict) -> bool:
+        """
+        Return True if this is the first delivery of the event and it should be processed.
+        Events without any identity keys are always processed.
+        """
+        keys = event_keys(body)
+        if not keys:
+            return True
+
+        try:
+            first = self.backend.claim(keys)
+        except Exception:
+            # Never drop a command because the shared store is unavailable
+            logger.exception("Event de-duplication failed, processing event anyway")
+            return True
+
+        if not first:
+            self.duplicates += 1
+            logger.debug(f"Dropping duplicate Slack event: {keys}")
+        return first
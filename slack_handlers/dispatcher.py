@@ -0,0 +1,207 @@
+"""
+Bounded, per-user fair dispatch of bot commands.
+
+The Slack listener hands each command to ``CommandDispatcher.submit`` and returns straight
+away, so the event is acknowledged immediately. Commands then run on a fixed-size thread pool.
+Every user gets their own FIFO queue and at most ``max_per_user`` commands running at once,
+which keeps one user's slow ``vm create`` from holding every worker while other users'
+``vm list`` or ``rota check`` wait behind it.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Number of recent queue wait times kept for the percentile figures in ``stats()``
+_WAIT_SAMPLES = 1000
+
+
+class DispatcherClosed(RuntimeError):
+    """Raised by ``submit`` once the dispatcher is shutting down."""
+
+
+class CommandDispatcher:
+    def __init__(
+        self,
+        max_workers=8,
+        max_per_user=1,
+        max_queued_per_user=10,
+        stats_log_interval=300,
+    ):
+        """
+        :param max_workers: Size of the shared worker pool.
+        :param max_per_user: Commands a single user may have running at the same time.
+        :param max_queued_per_user: Commands a single user may have waiting; further submits are rejected.
+        :param stats_log_interval: Seconds between INFO stats lines (0 disables them).
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.max_per_user = max(1, int(max_per_user))
+        self.max_queued_per_user = max(0, int(max_queued_per_user))
+        self.stats_log_interval = stats_log_interval
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="bot-command"
+        )
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._queues = {}  # user -> deque of (enqueued_at, func, args, kwargs)
+        self._running = {}  # user -> number of commands currently running
+        self._pending = 0  # submitted but not started (user queues + pool queue)
+        self._in_flight = 0
+        self._waits = deque(maxlen=_WAIT_SAMPLES)
+        self._last_stats_log = time.monotonic()
+        self._closed = False
+        self._counters = {
+            "submitted": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "max_queue_depth": 0,
+            "max_wait_s": 0.0,
+            "total_wait_s": 0.0,
+        }
+
+    def submit(self, user, func, *args, **kwargs) -> bool:
+        """
+        Queue ``func(*args, **kwargs)`` on behalf of ``user``.
+        Returns False if the user already has ``max_queued_per_user`` commands waiting.
+        Raises ``DispatcherClosed`` if the dispatcher is shutting down.
+        """
+        with self._lock:
+            if self._closed:
+                logger.warning(
+                    f"Dispatcher is shutting down, dropping command for {user}"
+                )
+                raise DispatcherClosed("dispatcher is shutting down")
+
+            queue = self._queues.setdefault(user, deque())
+            running = self._running.get(user, 0)
+            if running >= self.max_per_user and len(queue) >= self.max_queued_per_user:
+                self._counters["rejected"] += 1
+                logger.warning(
+                    f"Rejecting command for {user}: {running} running, {len(queue)} queued"
+                )
+                return False
+
+            queue.append((time.monotonic(), func, args, kwargs))
+            self._counters["submitted"] += 1
+            self._pending += 1
+            self._counters["max_queue_depth"] = max(
+                self._counters["max_queue_depth"], self._pending
+            )
+            self._schedule_locked(user)
+        return True
+
+    def _schedule_locked(self, user):
+        """Move the user's next queued command to the pool if they have a free slot."""
+        queue = self._queues.get(user)
+        while queue and self._running.get(user, 0) < self.max_per_user:
+            enqueued_at, func, args, kwargs = queue.popleft()
+            self._running[user] = self._running.get(user, 0) + 1
+            self._in_flight += 1
+            self._executor.submit(self._run, user, enqueued_at, func, args, kwargs)
+        if not queue:
+            self._queues.pop(user, None)
+
+    def _run(self, user, enqueued_at, func, args, kwargs):
+        wait = time.monotonic() - enqueued_at
+        with self._lock:
+            self._pending -= 1
+            self._waits.append(wait)
+            self._counters["total_wait_s"] += wait
+            self._counters["max_wait_s"] = max(self._counters["max_wait_s"], wait)
+            queue_depth = self._pending
+        logger.debug(
+            f"Starting command for {user} after {wait:.3f}s in queue (queue depth {queue_depth})"
+        )
+
+        failed = False
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            failed = True
+            logger.exception(f"Unhandled error in dispatched command for {user}")
+        finally:
+            with self._lock:
+                self._counters["failed" if failed else "completed"] += 1
+                self._in_flight -= 1
+                running = self._running.get(user, 1) - 1
+                if running > 0:
+                    self._running[user] = running
+                else:
+                    self._running.pop(user, None)
+                self._schedule_locked(user)
+                if self._in_flight == 0 and self._pending == 0:
+                    self._idle.notify_all()
+            self._maybe_log_stats()
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth, wait times and throughput counters."""
+        with self._lock:
+            waits = sorted(self._waits)
+            started = self._counters["completed"] + self._counters["failed"]
+            started += self._in_flight
+            snapshot = dict(self._counters)
+            snapshot.update(
+                {
+                    "workers": self.max_workers,
+                    "in_flight": self._in_flight,
+                    "queue_depth": self._pending,
+                    "queued_users": len(self._queues),
+                    "avg_wait_s": (
+                        self._counters["total_wait_s"] / started if started else 0.0
+                    ),
+                    "p50_wait_s": _percentile(waits, 50),
+                    "p95_wait_s": _percentile(waits, 95),
+                }
+            )
+        return snapshot
+
+    def _maybe_log_stats(self):
+        if not self.stats_log_interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_stats_log < self.stats_log_interval:
+                return
+            self._last_stats_log = now
+        s = self.stats()
+        logger.info(
+            f"Dispatcher stats: workers={s['workers']} in_flight={s['in_flight']} "
+            f"queue_depth={s['queue_depth']} max_queue_depth={s['max_queue_depth']} "
+            f"wait avg={s['avg_wait_s']:.3f}s p95={s['p95_wait_s']:.3f}s max={s['max_wait_s']:.3f}s "
+            f"completed={s['completed']} failed={s['failed']} rejected={s['rejected']}"
+        )
+
+    def wait_idle(self, timeout=None) -> bool:
+        """Block until nothing is queued or running. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._in_flight or self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=None) -> bool:
+        """
+        Stop accepting commands and drain the ones already queued or running.
+        Returns False if they did not finish within ``timeout`` seconds.
+        """
+        with self._lock:
+            self._closed = True
+        drained = self.wait_idle(timeout)
+        self._executor.shutdown(wait=drained)
+        return drained
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
@@ -1,6 +1,3 @@
-from sdk.aws.ec2 import EC2Helper
-from sdk.gcp.compute_engine import GCPHelper
-from sdk.openstack.core import OpenStackHelper
 from config import _GCP_DEFAULT_DISK_SIZES, config
 from sdk.tools.help_system import (
     command_meta,
@@ -16,8 +13,22 @@ from sdk.tools.help_system import (
     get_gcp_instance_types,
     get_gcp_os_names,
 )
-from sdk.gsheet.gsheet import gsheet
+from sdk.tools.helpers import (
+    get_config_value,
+    get_list_of_values_for_key_in_dict_of_parameters,
+    parse_since,
+)
+from sdk.tools.keys import generate_keypair, keypair_cache
+from sdk.tools.lazy import lazy_import, warm_up
+from sdk.tools.quota import quota_service
+from slack_handlers.provisioning import (
+    submit_batch_from_handler,
+    submit_from_handler,
+)
 import logging
+import re
+import threading
+import time
 import traceback
 import functools
 from datetime import datetime
@@ -25,6 +36,62 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# The cloud SDKs and the ROTA sheet are loaded on first use (or by the startup warm-up),
+# so importing the handlers stays fast and a pod only loads the clouds it serves.
+EC2Helper = lazy_import("sdk.aws.ec2", "EC2Helper")
+GCPHelper = lazy_import("sdk.gcp.compute_engine", "GCPHelper")
+OpenStackHelper = lazy_import("sdk.openstack.core", "OpenStackHelper")
+gsheet = lazy_import("sdk.gsheet.gsheet", "gsheet")
+aws_topology = lazy_import("sdk.aws.topology", "topology_resolver")
+aws_inventory = lazy_import("sdk.aws.inventory", "instance_inventory")
+openstack_catalog = lazy_import("sdk.openstack.catalog", "openstack_catalog")
+
+# Limits and usage checked by the `vm create` quota preflight, per region or project
+quota_service.register("aws", lambda region: EC2Helper(region=region).get_quota_usage())
+quota_service.register("openstack", lambda project: OpenStackHelper().get_quota_usage())
+quota_service.register("gcp", lambda region: GCPHelper().get_quota_usage())
+
+
+def _warm_aws_topology():
+    region = get_config_value("AWS_DEFAULT_REGION", None, cast=str)
+    if region:
+        aws_topology.warm(region)
+
+
+def _start_aws_inventory():
+    region = get_config_value("AWS_DEFAULT_REGION", None, cast=str)
+    aws_inventory.start([region] if region else [])
+
+
+def _warm_openstack_catalog():
+    if get_config_value("OS_AUTH_URL", None, cast=str):
+        openstack_catalog.warm()
+
+
+def _warm_gsheet():
+    # ``gsheet`` resolves to the module's own LazyObject, which connects on its first use
+    from sdk.gsheet.gsheet import gsheet as rota_sheet
+
+    rota_sheet.warm()
+
+
+def start_warm_up():
+    """
+    Import the cloud SDKs, connect to the ROTA sheet, resolve the AWS network topology
+    used by `aws vm create`, load the EC2 inventory and the OpenStack flavor, image and
+    network catalog, in a background thread.
+    """
+    return warm_up(
+        EC2Helper,
+        OpenStackHelper,
+        GCPHelper,
+        _warm_gsheet,
+        _warm_aws_topology,
+        _start_aws_inventory,
+        _warm_openstack_catalog,
+    )
+
+
 # Shown in `help gcp vm create` and after successful VM creation (Google OS Login).
 GCP_VM_OS_LOGIN_HELP = (
     "*SSH (Google OS Login):*\n"
@@ -83,9 +150,16 @@ def handle_help(say, user, command_name=None):
             "type": "str",
             "choices": ["new", "existing"],
         },
+        "count": {
+            "description": "Number of identical VMs, named <name>-1 ... <name>-N",
+            "required": False,
+            "type": "int",
+            "default": 1,
+        },
     },
     examples=[
-        "openstack vm create --name=myvm --os_name=fedora --flavor=ci.cpu.small --key_pair=new"
+        "openstack vm create --name=myvm --os_name=fedora --flavor=ci.cpu.small --key_pair=new",
+        "openstack vm create --name=myvm --os_name=fedora --flavor=ci.cpu.small --key_pair=existing --count=3",
     ],
 )
 def handle_create_openstack_vm(say, user, app, params_dict):
@@ -148,11 +222,33 @@ def handle_create_openstack_vm(say, user, app, params_dict):
             logger.debug(f"invalid `key_pair` value: {key_pair}")
             return
 
+        count = _helper_parse_count(params_dict, say)
+        if count is None:
+            return
+
+        # Answered from the cached catalog, so a typo fails before any OpenStack call
+        problems = openstack_catalog.validate(
+            flavor=flavor, image=image_id, network=network_id
+        )
+        if problems:
+            say(":x: " + "\n".join(problems))
+            return
+
         say(
             ":hourglass_flowing_sand: Now processing your request for an OpenStack VM... Please wait."
         )
         openstack_helper = OpenStackHelper()
 
+        quota_scope = getattr(config, "OS_PROJECT_ID", "")
+        demand = _helper_check_quota(
+            say,
+            "openstack",
+            quota_scope,
+            lambda: openstack_helper.quota_demand(flavor, count),
+        )
+        if demand is None:
+            return
+
         key_pair = _helper_select_keypair(
             key_pair, user, app, "OpenStack", image_id, flavor, say, openstack_helper
         )
@@ -164,51 +260,67 @@ def handle_create_openstack_vm(say, user, app, params_dict):
             say("Some problem occurred during keypair selection. Aborting VM creation")
             return
 
+        # Returns once Nova accepted the request; readiness is tracked in the background
         response = openstack_helper.create_servers(
-            name, image_id, flavor, key_pair["KeyName"], network_id
+            name,
+            image_id,
+            flavor,
+            key_pair["KeyName"],
+            network_id,
+            wait=False,
+            count=count,
         )
 
         # Extract result from response
         instances = response.get("instances", [])
-        if instances:
-            instance_info = instances[0]
-
-            say(":white_check_mark: *Successfully created OpenStack VM!*\n")
-
-            # Format and display instance metadata as table
-            print_keys = [
-                "name",
-                "server_id",
-                "key_name",
-                "flavor",
-                "network",
-                "status",
-                "private_ip",
-            ]
-            block_message = "Here are the details of your new OpenStack VM:"
-            helper_display_dict_output_as_table(
-                {"instances": [instance_info]}, print_keys, say, block_message
+        _helper_consume_quota("openstack", quota_scope, demand, len(instances), count)
+        ready_text = (
+            ":key: *Access Instructions (Linux/Unix):*\n"
+            "Use the following command to SSH into your instance:\n"
+            f"`ssh -i <path_to_your_private_key.pem> {config.OS_DEFAULT_SSH_USER}@{{private_ip}}`\n"
+            "Make sure your key file has the correct permissions: `chmod 400 <path_to_your_private_key.pem>`\n"
+            "\n"
+            ":warning: *Key Pair Access:*\n"
+            f"To access this instance via SSH, you should have the private key with fingerprint `{key_pair['KeyFingerprint']}`.\n"
+            "If you don't have it, please contact the admin for access."
+        )
+        if instances and count > 1:
+            _helper_report_bulk_create(
+                say,
+                "openstack",
+                user,
+                instances,
+                count,
+                lambda instance: {
+                    "server_id": instance["server_id"],
+                    "name": instance["name"],
+                },
+                ["name", "server_id", "flavor", "status"],
+                ready_text,
             )
-
-            # Provide SSH access instructions for user
-            say(
-                f"\n\n"
-                ":key: *Access Instructions (Linux/Unix):*\n"
-                "Use the following command to SSH into your instance:\n"
-                f"`ssh -i <path_to_your_private_key.pem> {config.OS_DEFAULT_SSH_USER}@{instance_info.get('private_ip', '<Private_IP>')}`\n"
-                "Make sure your key file has the correct permissions: `chmod 400 <path_to_your_private_key.pem>`\n"
-                "\n\n"
-                ":warning: *Key Pair Access:*\n"
-                f"To access this instance via SSH, you should have the private key with fingerprint `{key_pair['KeyFingerprint']}`.\n"
-                "If you don't have it, please contact the admin for access."
+        elif instances:
+            instance_info = instances[0]
+            server_id = instance_info.get("server_id", "unknown")
+            submit_from_handler(
+                say,
+                "openstack",
+                user,
+                {"server_id": server_id, "name": instance_info.get("name", name)},
+                text=(
+                    f":rocket: OpenStack VM `{name}` (`{server_id}`, "
+                    f"{instance_info.get('flavor', flavor)}) is building, job `{{job_id}}`. "
+                    "This message is updated and you get a DM once it is ACTIVE."
+                ),
+                ready_text=ready_text,
             )
-
         else:
             say(":x: VM creation failed. No instance details returned.")
             logger.error(f"OpenStack VM creation failed: {response}")
 
     except Exception as e:
         logger.error(f"Error during OpenStack VM creation: {e}")
+        # The cached keypair may be gone, look it up again next time
+        keypair_cache.pop(_keypair_cache_key("OpenStack", None, user))
         logger.error(traceback.format_exc())
         say(
             ":x: An internal error occurred while creating the OpenStack VM. Please contact the administrator."
@@ -226,12 +338,57 @@ def handle_create_openstack_vm(say, user, app, params_dict):
             "type": "str",
             "choices": get_openstack_statuses,
             "default": "ACTIVE",
-        }
+        },
+        "limit": {
+            "description": "Show at most this many VMs per page",
+            "required": False,
+            "type": "int",
+        },
+        "page": {
+            "description": "Page to show with `--limit`, from 1",
+            "required": False,
+            "type": "int",
+            "default": 1,
+        },
+        "name": {
+            "description": "Filter by name (regular expression, e.g. `^payments-`)",
+            "required": False,
+            "type": "str",
+        },
+        "flavor": {
+            "description": "Filter by flavor name or ID",
+            "required": False,
+            "type": "str",
+        },
+        "image": {
+            "description": "Filter by image name or ID",
+            "required": False,
+            "type": "str",
+        },
+        "key": {
+            "description": "Filter by key pair name",
+            "required": False,
+            "type": "str",
+        },
+        "changed-since": {
+            "description": "Only VMs changed since then: an age (`30m`, `2h`, `7d`) or an ISO 8601 date",
+            "required": False,
+            "type": "str",
+        },
+        "fresh": {
+            "description": "List live from OpenStack instead of the inventory",
+            "required": False,
+            "type": "bool",
+        },
     },
     examples=[
         "openstack vm list",
         "openstack vm list --status=ACTIVE",
         "openstack vm list --status=SHUTOFF",
+        "openstack vm list --status=ACTIVE,SHUTOFF,ERROR",
+        "openstack vm list --status=ACTIVE --limit=50 --page=2",
+        "openstack vm list --name=^payments- --flavor=ci.cpu.small",
+        "openstack vm list --status=ACTIVE,SHUTOFF --key=my-key --changed-since=2h",
     ],
 )
 def handle_list_openstack_vms(say, params_dict):
@@ -244,14 +401,40 @@ def handle_list_openstack_vms(say, params_dict):
         # Define valid status filters
         VALID_STATUSES = {"ACTIVE", "SHUTOFF", "ERROR"}
         # Default to ACTIVE if no status filter provided
-        status_filter = params_dict.get("status", "ACTIVE").upper()
-
-        if status_filter not in VALID_STATUSES:
-            logger.error(f"Received unsupported status filter: {status_filter}.")
-            say(
-                f":warning: Invalid status filter *{status_filter}*. Supported values are: {', '.join(sorted(VALID_STATUSES))}"
+        statuses = [
+            status.upper()
+            for status in get_list_of_values_for_key_in_dict_of_parameters(
+                "status", params_dict
             )
-            return
+        ] or ["ACTIVE"]
+        status_filter = ",".join(statuses)
+
+        for status in statuses:
+            if status not in VALID_STATUSES:
+                logger.error(f"Received unsupported status filter: {status}.")
+                say(
+                    f":warning: Invalid status filter *{status}*. Supported values are: {', '.join(sorted(VALID_STATUSES))}"
+                )
+                return
+
+        for key in ("limit", "page"):
+            value = params_dict.get(key)
+            if value is not None and (not str(value).isdigit() or int(value) < 1):
+                say(f":x: `--{key}` must be a positive whole number.")
+                return
+
+        if params_dict.get("name"):
+            try:
+                re.compile(params_dict["name"])
+            except re.error as e:
+                say(f":x: `--name` is not a valid regular expression: {e}")
+                return
+        if params_dict.get("changed-since"):
+            try:
+                parse_since(params_dict["changed-since"])
+            except ValueError as e:
+                say(f":x: `--changed-since`: {e}")
+                return
 
         # Log the status filter being used
         logger.info(f"Filtering OpenStack VMs with status filter: {status_filter}.")
@@ -265,6 +448,12 @@ def handle_list_openstack_vms(say, params_dict):
             return
 
         if servers["count"] == 0:
+            filters = ("name", "flavor", "image", "key", "changed-since")
+            if any(params_dict.get(key) for key in filters):
+                say(
+                    f":no_entry_sign: No VMs in the *{status_filter}* state match the filters in OpenStack."
+                )
+                return
             say(
                 f":no_entry_sign: There are currently no VMs in the *{status_filter}* state in OpenStack."
             )
@@ -287,6 +476,16 @@ def handle_list_openstack_vms(say, params_dict):
                 say,
                 block_message=" Here are the requested VM instances:",
             )
+            if servers.get("truncated"):
+                say(
+                    f"Showing page {servers['page']} ({servers['count']} VMs), more "
+                    f"follow. Add `--page={servers['page'] + 1}` to see the next one."
+                )
+            if servers.get("snapshot_age") is not None:
+                say(
+                    f"From the inventory synced {servers['snapshot_age']:.0f}s ago. "
+                    "Add `--fresh` to list live from OpenStack."
+                )
 
     except Exception as e:
         # Log the error for debugging purposes
@@ -323,10 +522,17 @@ def handle_hello(say, user):
             "type": "str",
             "choices": ["new", "existing"],
         },
+        "count": {
+            "description": "Number of identical instances, named <name>-1 ... <name>-N",
+            "required": False,
+            "type": "int",
+            "default": 1,
+        },
     },
     examples=[
         "aws vm create --os_name=linux --instance_type=t2.micro --key_pair=new",
         "aws vm create --os_name=linux --instance_type=t3.small --key_pair=existing",
+        "aws vm create --os_name=linux --instance_type=t3.small --key_pair=existing --count=5",
     ],
 )
 def handle_create_aws_vm(say, user, region, app, params_dict):
@@ -366,6 +572,10 @@ def handle_create_aws_vm(say, user, region, app, params_dict):
             say(":warning: `key_pair` should be either `new` or `existing`")
             return
 
+        count = _helper_parse_count(params_dict, say)
+        if count is None:
+            return
+
         os_name_lower = os_name.strip().lower() if os_name else ""
         aws_ami_map = getattr(config, "AWS_AMI_MAP", {"linux": "ami-0402e56c0a7afb78f"})
         ami_id = aws_ami_map.get(os_name_lower)
@@ -380,6 +590,15 @@ def handle_create_aws_vm(say, user, region, app, params_dict):
             # Create EC2 instance using the helper
             ec2_helper = EC2Helper(region=region)
 
+            demand = _helper_check_quota(
+                say,
+                "aws",
+                ec2_helper.region,
+                lambda: ec2_helper.quota_demand(instance_type, count),
+            )
+            if demand is None:
+                return
+
             # Select key to use
             key_to_use = _helper_select_keypair(
                 key_pair, user, app, "AWS", os_name, instance_type, say, ec2_helper
@@ -389,10 +608,13 @@ def handle_create_aws_vm(say, user, region, app, params_dict):
                 logger.error("Aborting VM creation because returned keypair was empty.")
                 return
 
+            # Returns once AWS accepted the launch; readiness is tracked in the background
             server_status_dict = ec2_helper.create_instance(
                 ami_id,
                 instance_type,
                 key_to_use["KeyName"],
+                wait=False,
+                count=count,
             )
 
             # Log the server creation response for debugging
@@ -402,55 +624,60 @@ def handle_create_aws_vm(say, user, region, app, params_dict):
             if "error" in server_status_dict:
                 error_msg = server_status_dict["error"]
                 logger.error(f"EC2 instance creation failed: {error_msg}")
+                # The cached keypair may be gone, look it up again next time
+                keypair_cache.pop(_keypair_cache_key("AWS", ec2_helper.region, user))
                 say(":x: *EC2 instance creation failed.*")
                 return
 
             # Check for successful instance creation and provide details
             servers_created = server_status_dict.get("instances", [])
-            if servers_created:
-                instance = servers_created[0]
-
-                instance_dict = {
-                    "instances": [
-                        {
-                            "name": instance.get("name", "unknown"),
-                            "instance_id": instance.get("instance_id", "unknown"),
-                            "key_name": instance.get("key_name", "unknown"),
-                            "instance_type": instance.get("instance_type", "unknown"),
-                            "public_ip": instance.get("public_ip", "unknown"),
-                        }
-                    ]
-                }
-
-                # Define the keys to display in the table
-                print_keys = [
-                    "name",
-                    "instance_id",
-                    "key_name",
-                    "instance_type",
-                    "public_ip",
-                ]
-
-                say(":white_check_mark: *Successfully created EC2 instance!*\n\n")
-
-                # Use the helper function to display the instance details as a table
-                helper_display_dict_output_as_table(
-                    instance_dict,
-                    print_keys,
+            _helper_consume_quota(
+                "aws", ec2_helper.region, demand, len(servers_created), count
+            )
+            ready_text = (
+                ":key: *Access Instructions (Linux/Unix):*\n"
+                "Use the following command to SSH into your instance:\n"
+                "`ssh -i <path_to_your_private_key.pem> ec2-user@{public_ip}`\n"
+                "Make sure your key file has the correct permissions: `chmod 400 <path_to_your_private_key.pem>`\n"
+                "\n"
+                ":warning: *Key Pair Access:*\n"
+                f"To access this instance via SSH, you should have the private key with fingerprint: `{key_to_use['KeyFingerprint']}`.\n"
+                "If you don't have it, please contact the admin for access."
+            )
+            if servers_created and count > 1:
+                _helper_report_bulk_create(
                     say,
-                    block_message=" Here are the requested VM instances:",
+                    "aws",
+                    user,
+                    servers_created,
+                    count,
+                    lambda instance: {
+                        "region": ec2_helper.region,
+                        "instance_id": instance["instance_id"],
+                        "name": instance["name"],
+                    },
+                    ["name", "instance_id", "instance_type"],
+                    ready_text,
                 )
-
-                say(
-                    "\n\n"
-                    ":key: *Access Instructions (Linux/Unix):*\n"
-                    "Use the following command to SSH into your instance:\n"
-                    "`ssh -i <path_to_your_private_key.pem> ec2-user@<Public_IP>`\n"
-                    "Make sure your key file has the correct permissions: `chmod 400 <path_to_your_private_key.pem>`\n"
-                    "\n\n"
-                    ":warning: *Key Pair Access:*\n"
-                    f"To access this instance via SSH, you should have the private key with fingerprint: `{key_to_use['KeyFingerprint']}`.\n"
-                    "If you don't have it, please contact the admin for access."
+            elif servers_created:
+                instance = servers_created[0]
+                instance_id = instance.get("instance_id", "unknown")
+                submit_from_handler(
+                    say,
+                    "aws",
+                    user,
+                    {
+                        "region": ec2_helper.region,
+                        "instance_id": instance_id,
+                        "name": instance.get("name", ""),
+                    },
+                    text=(
+                        f":rocket: EC2 instance `{instance_id}` "
+                        f"({instance.get('instance_type', instance_type)}) is launching, "
+                        "job `{job_id}`. This message is updated and you get a DM "
+                        "once it is running."
+                    ),
+                    ready_text=ready_text,
                 )
             else:
                 say(":x: *EC2 instance creation failed.* No instance returned.")
@@ -499,9 +726,16 @@ def handle_create_aws_vm(say, user, region, app, params_dict):
             "type": "str",
             "choices": get_gcp_boot_disk_size_choices_gb,
         },
+        "count": {
+            "description": "Number of identical VMs, named <name>-1 ... <name>-N",
+            "required": False,
+            "type": "int",
+            "default": 1,
+        },
     },
     examples=[
         "gcp vm create name=vm-test-123 --os_name=debian-12",
+        "gcp vm create name=vm-test --os_name=debian-12 --count=3",
         "gcp vm create name=vm-test-123 --os_name=debian-12 --instance-type=n2-standard-4",
         "gcp vm create name=vm-test-123 --os_name=debian-12 --instance_type=e2-medium --disk-size-gb=20",
         "gcp vm create name=vm-test-123 --os_name=linux --instance_type=n1-standard-1",
@@ -588,16 +822,31 @@ def handle_create_gcp_vm(say, user, params_dict):
             logger.info(
                 f"User: {user}, Operating System selected: {os_name}, image: {image_id}"
             )
+            count = _helper_parse_count(params_dict, say)
+            if count is None:
+                return
             say(
                 ":hourglass_flowing_sand: Now processing your request for a GCP VM... Please wait."
             )
 
             gcp_helper = GCPHelper()
+            demand = _helper_check_quota(
+                say,
+                "gcp",
+                gcp_helper.region,
+                lambda: gcp_helper.quota_demand(instance_type, count),
+            )
+            if demand is None:
+                return
+
+            # Returns once the insert was accepted; readiness is tracked in the background
             server_status_dict = gcp_helper.create_instance(
                 image_id,
                 instance_type,
                 name,
                 disk_gb_override=disk_gb_override,
+                wait=False,
+                count=count,
             )
 
             logger.debug(f"Server creation response: {server_status_dict}")
@@ -609,38 +858,45 @@ def handle_create_gcp_vm(say, user, params_dict):
                 return
 
             servers_created = server_status_dict.get("instances", [])
-            if servers_created:
-                instance = servers_created[0]
-                instance_dict = {
-                    "instances": [
-                        {
-                            "name": instance.get("name", "unknown"),
-                            "instance_id": instance.get("instance_id", "unknown"),
-                            "instance_type": instance.get("instance_type", "unknown"),
-                            "zone": instance.get("zone", "unknown"),
-                            "disk_gb": instance.get("disk_gb", "unknown"),
-                            "public_ip": instance.get("public_ip", "unknown"),
-                        }
-                    ]
-                }
-                print_keys = [
-                    "name",
-                    "instance_id",
-                    "instance_type",
-                    "zone",
-                    "disk_gb",
-                    "public_ip",
-                ]
-                say(":white_check_mark: *Successfully created GCP VM instance!*\n\n")
-                helper_display_dict_output_as_table(
-                    instance_dict,
-                    print_keys,
+            _helper_consume_quota(
+                "gcp", gcp_helper.region, demand, len(servers_created), count
+            )
+            if servers_created and count > 1:
+                _helper_report_bulk_create(
                     say,
-                    block_message=" Here are the requested VM instances:",
+                    "gcp",
+                    user,
+                    servers_created,
+                    count,
+                    lambda instance: {
+                        "name": instance["name"],
+                        "zone": instance.get("zone"),
+                        "operation": instance.get("operation"),
+                    },
+                    ["name", "instance_type", "zone", "disk_gb"],
+                    f":key: *Access Instructions (OS Login):*\n{GCP_VM_OS_LOGIN_HELP}\n",
                 )
-                say(
-                    "\n\n:key: *Access Instructions (OS Login):*\n"
-                    f"{GCP_VM_OS_LOGIN_HELP}\n"
+            elif servers_created:
+                instance = servers_created[0]
+                instance_name = instance.get("name", name)
+                submit_from_handler(
+                    say,
+                    "gcp",
+                    user,
+                    {
+                        "name": instance_name,
+                        "zone": instance.get("zone"),
+                        "operation": instance.get("operation"),
+                    },
+                    text=(
+                        f":rocket: GCP VM `{instance_name}` ({instance_type}, "
+                        f"{instance.get('disk_gb', 'unknown')} GB, {instance.get('zone', 'unknown')}) "
+                        "is being created, job `{job_id}`. This message is updated and "
+                        "you get a DM once it is running."
+                    ),
+                    ready_text=(
+                        f":key: *Access Instructions (OS Login):*\n{GCP_VM_OS_LOGIN_HELP}\n"
+                    ),
                 )
             else:
                 say(":x: *GCP instance creation failed.* No instance returned.")
@@ -719,6 +975,34 @@ def helper_setup_slack_header_line(header_text, emoji_name="ledger"):
     ]
 
 
+def helper_format_instances_table(instances, print_keys):
+    """
+    given a list of instance information dictionaries, return the ``print_keys`` columns as a "table" (see
+    helper_create_table)
+    """
+    max_column_widths = {}
+    rows = []
+
+    # for each column of data (including the column header name), calculate the max width of each columns data
+    # storing it in a dictionary
+
+    # initially set the max length for each column to the column header name
+    for data_key_name in print_keys:
+        max_column_widths[data_key_name] = len(data_key_name)
+
+    for instance_info in instances:
+        row = []
+        for data_key_name in print_keys:
+            column_value_raw = instance_info.get(data_key_name, "unknown")
+            column_value = str(column_value_raw)
+            current_max_len = max_column_widths.get(data_key_name, 0)
+            if len(column_value) > current_max_len:
+                max_column_widths[data_key_name] = len(column_value)
+            row.append(column_value)
+        rows.append(row)
+    return helper_create_table(rows, print_keys, max_column_widths)
+
+
 def helper_display_dict_output_as_table(instances_dict, print_keys, say, block_message):
     """
     given a dictionary containing instance information for servers, set up a header line and then display the data in
@@ -729,27 +1013,11 @@ def helper_display_dict_output_as_table(instances_dict, print_keys, say, block_m
             text=".",
             blocks=helper_setup_slack_header_line(block_message),
         )
-        max_column_widths = {}
-        rows = []
-
-        # for each column of data (including the column header name), calculate the max width of each columns data
-        # storing it in a dictionary
-
-        # initially set the max length for each column to the column header name
-        for data_key_name in print_keys:
-            max_column_widths[data_key_name] = len(data_key_name)
-
-        for instance_info in instances_dict.get("instances", []):
-            row = []
-            for data_key_name in print_keys:
-                column_value_raw = instance_info.get(data_key_name, "unknown")
-                column_value = str(column_value_raw)
-                current_max_len = max_column_widths.get(data_key_name, 0)
-                if len(column_value) > current_max_len:
-                    max_column_widths[data_key_name] = len(column_value)
-                row.append(column_value)
-            rows.append(row)
-        say(helper_create_table(rows, print_keys, max_column_widths))
+        say(
+            helper_format_instances_table(
+                instances_dict.get("instances", []), print_keys
+            )
+        )
 
 
 # Helper function to list GCP VM instances
@@ -769,6 +1037,11 @@ def helper_display_dict_output_as_table(instances_dict, print_keys, say, block_m
             "type": "str",
             "choices": get_gcp_instance_types,
         },
+        "name": {
+            "description": "Comma-separated instance names, `*` matches any characters",
+            "required": False,
+            "type": "str",
+        },
         "instance-ids": {
             "description": "Comma-separated list of instance IDs",
             "required": False,
@@ -779,6 +1052,7 @@ def helper_display_dict_output_as_table(instances_dict, print_keys, say, block_m
         "gcp vm list",
         "gcp vm list --state=running,stopped",
         "gcp vm list --type=t2.micro,t3.small",
+        "gcp vm list --name=web-*",
         "gcp vm list --instance-ids=i-123456,i-789012",
     ],
 )
@@ -843,12 +1117,59 @@ def handle_list_gcp_vms(say, user, params_dict):
             "required": False,
             "type": "str",
         },
+        "name": {
+            "description": "Filter by Name tag (wildcards `*` and `?` allowed)",
+            "required": False,
+            "type": "str",
+        },
+        "owner": {
+            "description": "Filter by the owner prefix of the Name tag (`<owner>-...`)",
+            "required": False,
+            "type": "str",
+        },
+        "key": {
+            "description": "Filter by key pair name",
+            "required": False,
+            "type": "str",
+        },
+        "tag": {
+            "description": "Filter by tag, as `key=value` or just `key`",
+            "required": False,
+            "type": "str",
+        },
+        "vpc": {
+            "description": "Filter by VPC ID",
+            "required": False,
+            "type": "str",
+        },
+        "limit": {
+            "description": "Show at most this many instances",
+            "required": False,
+            "type": "int",
+        },
+        "region": {
+            "description": "Comma-separated list of regions to search, or `all`",
+            "required": False,
+            "type": "str",
+        },
+        "fresh": {
+            "description": "List live from AWS instead of the inventory snapshot",
+            "required": False,
+            "type": "bool",
+        },
     },
     examples=[
         "aws vm list",
         "aws vm list --state=running,stopped",
         "aws vm list --type=t2.micro,t3.small",
         "aws vm list --instance-ids=i-123456,i-789012",
+        "aws vm list --state=running --limit=50",
+        "aws vm list --region=us-east-1,eu-west-1",
+        "aws vm list --region=all --state=running",
+        "aws vm list --state=running --fresh",
+        "aws vm list --name=payments-*",
+        "aws vm list --owner=jdoe --state=running",
+        "aws vm list --tag=team=qe,env=ci --vpc=vpc-0123456789abcdef0",
     ],
 )
 def handle_list_aws_vms(say, region, user, params_dict):
@@ -858,15 +1179,37 @@ def handle_list_aws_vms(say, region, user, params_dict):
                 "Invalid parameter params_dict passed to handle_list_aws_vms"
             )
 
+        limit = params_dict.get("limit")
+        if limit is not None:
+            if not str(limit).isdigit() or int(limit) < 1:
+                say(":x: `--limit` must be a positive whole number.")
+                return
+            limit = int(limit)
+
         ec2_helper = EC2Helper(region=region)  # Set your region
-        instances_dict = ec2_helper.list_instances(params_dict)
+        regions = get_list_of_values_for_key_in_dict_of_parameters(
+            "region", params_dict
+        )
+        if "all" in (r.lower() for r in regions):
+            regions = ec2_helper.list_regions()
+
+        if regions:
+            # Regions are queried concurrently; failing ones are listed in "errors"
+            instances_dict = ec2_helper.list_instances_in_regions(
+                regions, params_dict, limit=limit
+            )
+        else:
+            # Pages are fetched lazily, so a limit stops the listing after the pages it needs
+            instances_dict = ec2_helper.list_instances(params_dict, limit=limit)
         count_servers = instances_dict.get("count", 0)
+        region_errors = instances_dict.get("errors", {})
         if count_servers == 0:
-            msg = (
-                "There are currently no EC2 instances available that match the specified criteria"
-                if len(params_dict) > 0
-                else "There are currently no EC2 instances to retrieve"
-            )
+            if region_errors and len(region_errors) == len(regions):
+                msg = "Unable to list EC2 instances in any of the requested regions"
+            elif len(params_dict) > 0:
+                msg = "There are currently no EC2 instances available that match the specified criteria"
+            else:
+                msg = "There are currently no EC2 instances to retrieve"
             say(msg)
         else:
             print_keys = [
@@ -877,12 +1220,29 @@ def handle_list_aws_vms(say, region, user, params_dict):
                 "public_ip",
                 "private_ip",
             ]
+            if regions:
+                print_keys.insert(0, "region")
             helper_display_dict_output_as_table(
                 instances_dict,
                 print_keys,
                 say,
                 block_message=" Here are the requested VM instances:",
             )
+            if instances_dict.get("truncated"):
+                say(
+                    f"Showing the first {count_servers} instances, more match. "
+                    "Narrow the filters or raise `--limit` to see more."
+                )
+            if instances_dict.get("snapshot_age") is not None:
+                say(
+                    f"From the inventory snapshot of {instances_dict['snapshot_age']:.0f}s "
+                    "ago. Add `--fresh` to list live from AWS."
+                )
+        if region_errors:
+            failed = "\n".join(
+                f"• `{r}`: {error}" for r, error in region_errors.items()
+            )
+            say(f":warning: Could not list instances in these regions:\n{failed}")
     except Exception as e:
         logger.error(f"An error occurred listing the EC2 instances: {e}")
         say("An internal error occurred, please contact administrator.")
@@ -893,7 +1253,7 @@ def handle_list_aws_vms(say, region, user, params_dict):
     description="Stop or delete AWS EC2 instances",
     arguments={
         "vm-id": {
-            "description": "Instance ID to modify",
+            "description": "Instance ID to modify, or comma-separated IDs",
             "required": True,
             "type": "str",
         },
@@ -907,6 +1267,7 @@ def handle_list_aws_vms(say, region, user, params_dict):
     examples=[
         "aws vm modify --stop --vm-id=i-1234567890abcdef0",
         "aws vm modify --delete --vm-id=i-1234567890abcdef0",
+        "aws vm modify --stop --vm-id=i-1234567890abcdef0,i-0fedcba0987654321",
     ],
 )
 def handle_aws_modify_vm(say, region, user, params_dict):
@@ -939,8 +1300,35 @@ def handle_aws_modify_vm(say, region, user, params_dict):
             )
             return
 
+        vm_ids = _helper_parse_vm_ids("vm-id", params_dict, say)
+        if vm_ids is None:
+            return
+
         ec2_helper = EC2Helper(region=region)
 
+        if len(vm_ids) > 1:
+            operation = "stop" if stop_action else "delete"
+            logger.info(f"User {user} requested to {operation} instances {vm_ids}")
+            _helper_announce_batch_modify(say, operation, "instances", vm_ids)
+            if stop_action:
+                results = ec2_helper.stop_instances(vm_ids)
+            else:
+                results = ec2_helper.terminate_instances(vm_ids)
+            _helper_report_batch_modify(
+                say,
+                "aws",
+                user,
+                operation,
+                results,
+                lambda result: {
+                    "region": ec2_helper.region,
+                    "instance_id": result["instance_id"],
+                },
+                ["instance_id", "instance_name", "previous_state", "current_state"],
+            )
+            return
+        vm_id = vm_ids[0] if vm_ids else vm_id
+
         if stop_action:
             logger.info(f"User {user} requested to stop instance {vm_id}")
             say(f":hourglass_flowing_sand: Attempting to stop instance `{vm_id}`...")
@@ -948,11 +1336,19 @@ def handle_aws_modify_vm(say, region, user, params_dict):
             result = ec2_helper.stop_instance(vm_id)
 
             if result["success"]:
-                say(
-                    f":white_check_mark: *Successfully initiated stop for instance `{vm_id}`*\n"
-                    f"• Previous state: `{result['previous_state']}`\n"
-                    f"• Current state: `{result['current_state']}`\n"
-                    f"\n:information_source: The instance will take a moment to fully stop."
+                submit_from_handler(
+                    say,
+                    "aws",
+                    user,
+                    {"region": ec2_helper.region, "instance_id": vm_id},
+                    text=(
+                        f":white_check_mark: *Successfully initiated stop for instance `{vm_id}`*\n"
+                        f"• Previous state: `{result['previous_state']}`\n"
+                        f"• Current state: `{result['current_state']}`\n"
+                        "\n:information_source: The instance will take a moment to fully stop. "
+                        "Job `{job_id}`: this message is updated once it has stopped."
+                    ),
+                    operation="stop",
                 )
             else:
                 logger.error(
@@ -973,12 +1369,20 @@ def handle_aws_modify_vm(say, region, user, params_dict):
 
             if result["success"]:
                 instance_name = result.get("instance_name", "N/A")
-                say(
-                    f":white_check_mark: *Successfully initiated termination for instance `{vm_id}`*\n"
-                    f"• Instance name: `{instance_name}`\n"
-                    f"• Previous state: `{result['previous_state']}`\n"
-                    f"• Current state: `{result['current_state']}`\n"
-                    f"\n:information_source: The instance is being terminated and will be permanently deleted."
+                submit_from_handler(
+                    say,
+                    "aws",
+                    user,
+                    {"region": ec2_helper.region, "instance_id": vm_id},
+                    text=(
+                        f":white_check_mark: *Successfully initiated termination for instance `{vm_id}`*\n"
+                        f"• Instance name: `{instance_name}`\n"
+                        f"• Previous state: `{result['previous_state']}`\n"
+                        f"• Current state: `{result['current_state']}`\n"
+                        "\n:information_source: The instance is being terminated and will be permanently deleted. "
+                        "Job `{job_id}`: this message is updated once it is gone."
+                    ),
+                    operation="delete",
                 )
             else:
                 logger.error(
@@ -999,7 +1403,7 @@ def handle_aws_modify_vm(say, region, user, params_dict):
     description="Stop or delete GCP VM instances (by instance name)",
     arguments={
         "vm-name": {
-            "description": "Instance name to modify (e.g. vm-abc12345)",
+            "description": "Instance name to modify (e.g. vm-abc12345), or comma-separated names",
             "required": True,
             "type": "str",
         },
@@ -1013,6 +1417,7 @@ def handle_aws_modify_vm(say, region, user, params_dict):
     examples=[
         "gcp vm modify --stop --vm-name=vm-abc12345",
         "gcp vm modify --delete --vm-name=vm-abc12345",
+        "gcp vm modify --stop --vm-name=vm-abc12345,vm-def67890",
     ],
 )
 def handle_gcp_modify_vm(say, user, params_dict):
@@ -1047,20 +1452,57 @@ def handle_gcp_modify_vm(say, user, params_dict):
             )
             return
 
+        vm_names = _helper_parse_vm_ids("vm-name", params_dict, say)
+        if vm_names is None:
+            return
+
         gcp_helper = GCPHelper()
 
+        if len(vm_names) > 1:
+            operation = "stop" if stop_action else "delete"
+            logger.info(
+                f"User {user} requested to {operation} GCP instances {vm_names}"
+            )
+            _helper_announce_batch_modify(say, operation, "instances", vm_names)
+            # Returns once GCP accepted each operation; completion is reported by the jobs
+            results = gcp_helper.modify_instances(vm_names, operation, wait=False)
+            _helper_report_batch_modify(
+                say,
+                "gcp",
+                user,
+                operation,
+                results,
+                lambda result: {
+                    "name": result["instance_name"],
+                    "zone": result["zone"],
+                    "operation": result["operation"],
+                },
+                ["instance_name", "zone"],
+            )
+            return
+        vm_name = vm_names[0] if vm_names else vm_name
+
         if stop_action:
             logger.info(f"User {user} requested to stop GCP instance {vm_name}")
             say(f":hourglass_flowing_sand: Attempting to stop instance `{vm_name}`...")
 
-            result = gcp_helper.stop_instance(vm_name)
+            # Returns once GCP accepted the stop; completion is reported by the job
+            result = gcp_helper.stop_instance(vm_name, wait=False)
 
             if result["success"]:
                 zone = result.get("zone", "N/A")
-                say(
-                    f":white_check_mark: *Successfully stopped instance `{vm_name}`*\n"
-                    f"• Zone: `{zone}`\n"
-                    f"\n:information_source: The instance has been stopped."
+                submit_from_handler(
+                    say,
+                    "gcp",
+                    user,
+                    {"name": vm_name, "zone": zone, "operation": result["operation"]},
+                    text=(
+                        f":white_check_mark: *Successfully initiated stop for instance `{vm_name}`*\n"
+                        f"• Zone: `{zone}`\n"
+                        "\n:information_source: Job `{job_id}`: this message is updated "
+                        "once the instance has stopped."
+                    ),
+                    operation="stop",
                 )
             else:
                 logger.error(
@@ -1076,14 +1518,23 @@ def handle_gcp_modify_vm(say, user, params_dict):
                 f":hourglass_flowing_sand: Proceeding with deletion..."
             )
 
-            result = gcp_helper.delete_instance(vm_name)
+            # Returns once GCP accepted the delete; completion is reported by the job
+            result = gcp_helper.delete_instance(vm_name, wait=False)
 
             if result["success"]:
                 zone = result.get("zone", "N/A")
-                say(
-                    f":white_check_mark: *Successfully deleted instance `{vm_name}`*\n"
-                    f"• Zone: `{zone}`\n"
-                    f"\n:information_source: The instance has been permanently deleted."
+                submit_from_handler(
+                    say,
+                    "gcp",
+                    user,
+                    {"name": vm_name, "zone": zone, "operation": result["operation"]},
+                    text=(
+                        f":white_check_mark: *Successfully initiated deletion of instance `{vm_name}`*\n"
+                        f"• Zone: `{zone}`\n"
+                        "\n:information_source: Job `{job_id}`: this message is updated "
+                        "once the instance has been permanently deleted."
+                    ),
+                    operation="delete",
                 )
             else:
                 logger.error(
@@ -1384,8 +1835,23 @@ def _helper_date_cmp(start: str, end: str) -> str:
     description="Stop, start, or delete OpenStack VMs",
     arguments={
         "vm-id": {
-            "description": "Server ID to modify",
-            "required": True,
+            "description": "Server ID to modify, or comma-separated IDs (or use the filters below)",
+            "required": False,
+            "type": "str",
+        },
+        "name-prefix": {
+            "description": "Act on the servers whose name starts with this",
+            "required": False,
+            "type": "str",
+        },
+        "status": {
+            "description": "Act on the servers in these statuses (comma-separated)",
+            "required": False,
+            "type": "str",
+        },
+        "key": {
+            "description": "Act on the servers with this key pair",
+            "required": False,
             "type": "str",
         },
         "stop": {"description": "Stop the server", "required": False, "type": "bool"},
@@ -1395,11 +1861,19 @@ def _helper_date_cmp(start: str, end: str) -> str:
             "required": False,
             "type": "bool",
         },
+        "wait": {
+            "description": "Wait until every server is stopped, running or deleted",
+            "required": False,
+            "type": "bool",
+        },
     },
     examples=[
         "openstack vm modify --stop --vm-id=abc123-def456-ghi789",
         "openstack vm modify --start --vm-id=abc123-def456-ghi789",
         "openstack vm modify --delete --vm-id=abc123-def456-ghi789",
+        "openstack vm modify --stop --vm-id=abc123-def456-ghi789,jkl012-mno345-pqr678",
+        "openstack vm modify --delete --name-prefix=ci-run-42- --wait",
+        "openstack vm modify --stop --status=ACTIVE --key=my-key",
     ],
 )
 def handle_openstack_modify_vm(say, user, params_dict):
@@ -1416,15 +1890,28 @@ def handle_openstack_modify_vm(say, user, params_dict):
         start_action = params_dict.get("start", False)
         delete_action = params_dict.get("delete", False)
         vm_id = params_dict.get("vm-id")
+        filters = {
+            key: params_dict[key]
+            for key in ("name-prefix", "status", "key")
+            if isinstance(params_dict.get(key), str) and params_dict[key].strip()
+        }
 
-        if not vm_id:
+        if not vm_id and not filters:
             say(
                 ":warning: Missing required parameter `--vm-id`. "
-                "Usage: `openstack vm modify --<action> --vm-id=<id>`\n"
+                "Usage: `openstack vm modify --<action> --vm-id=<id>`, or select the "
+                "servers with `--name-prefix`, `--status` and `--key`\n"
                 "Available actions: --stop, --start, --delete"
             )
             return
 
+        if vm_id and filters:
+            say(
+                ":warning: Give either `--vm-id` or the filters "
+                "(`--name-prefix`, `--status`, `--key`), not both."
+            )
+            return
+
         # Count the number of actions specified
         actions = [stop_action, start_action, delete_action]
         action_count = sum(bool(action) for action in actions)
@@ -1441,8 +1928,82 @@ def handle_openstack_modify_vm(say, user, params_dict):
             )
             return
 
+        operation = "stop" if stop_action else "start" if start_action else "delete"
+        wait = bool(params_dict.get("wait"))
         openstack_helper = OpenStackHelper()
 
+        if filters:
+            # One listing resolves every target, so the servers are not looked up again
+            targets = openstack_helper.find_servers(
+                name_prefix=filters.get("name-prefix"),
+                statuses=get_list_of_values_for_key_in_dict_of_parameters(
+                    "status", filters
+                ),
+                key_name=filters.get("key"),
+            )
+            if not targets:
+                say(":no_entry_sign: No OpenStack servers match the filters.")
+                return
+            max_count = get_config_value("VM_MODIFY_MAX_COUNT", 20)
+            if len(targets) > max_count:
+                say(
+                    f":warning: {len(targets)} servers match the filters, but `vm modify` "
+                    f"takes at most {max_count} at a time. Narrow the filters."
+                )
+                return
+            labels = [f"{server.name} ({server.id})" for server in targets]
+        else:
+            targets = _helper_parse_vm_ids("vm-id", params_dict, say)
+            if targets is None:
+                return
+            labels = targets
+
+        if filters or wait or len(targets) > 1:
+            logger.info(f"User {user} requested to {operation} servers {labels}")
+            _helper_announce_batch_modify(say, operation, "servers", labels)
+            print_keys = [
+                "server_id",
+                "server_name",
+                "previous_status",
+                "current_status",
+            ]
+            results = openstack_helper.modify_servers(
+                targets,
+                operation,
+                wait=wait,
+                on_result=_helper_progress_table(
+                    say, operation, len(targets), print_keys
+                ),
+            )
+            if not wait:
+                _helper_report_batch_modify(
+                    say,
+                    "openstack",
+                    user,
+                    operation,
+                    results,
+                    lambda result: {
+                        "server_id": result["server_id"],
+                        "name": result["server_name"],
+                    },
+                    print_keys,
+                )
+                return
+            rows = [
+                {key: result.get(key) or "-" for key in print_keys + ["error"]}
+                for result in results
+            ]
+            done = sum(result["success"] for result in results)
+            helper_display_dict_output_as_table(
+                {"count": len(rows), "instances": rows},
+                print_keys + ["error"],
+                say,
+                block_message=f" {operation.capitalize()} finished for {done} of "
+                f"{len(results)} VMs:",
+            )
+            return
+        vm_id = targets[0] if targets else vm_id
+
         if stop_action:
             logger.info(f"User {user} requested to stop server {vm_id}")
             say(f":hourglass_flowing_sand: Attempting to stop server `{vm_id}`...")
@@ -1450,12 +2011,20 @@ def handle_openstack_modify_vm(say, user, params_dict):
             result = openstack_helper.stop_server(vm_id)
 
             if result["success"]:
-                say(
-                    f":white_check_mark: *Successfully initiated stop for server `{vm_id}`*\n"
-                    f"• Server name: `{result['server_name']}`\n"
-                    f"• Previous status: `{result['previous_status']}`\n"
-                    f"• Current status: `{result['current_status']}`\n"
-                    f"\n:information_source: The server will take a moment to fully stop."
+                submit_from_handler(
+                    say,
+                    "openstack",
+                    user,
+                    {"server_id": vm_id, "name": result["server_name"]},
+                    text=(
+                        f":white_check_mark: *Successfully initiated stop for server `{vm_id}`*\n"
+                        f"• Server name: `{result['server_name']}`\n"
+                        f"• Previous status: `{result['previous_status']}`\n"
+                        f"• Current status: `{result['current_status']}`\n"
+                        "\n:information_source: The server will take a moment to fully stop. "
+                        "Job `{job_id}`: this message is updated once it has stopped."
+                    ),
+                    operation="stop",
                 )
             else:
                 logger.error(
@@ -1470,12 +2039,20 @@ def handle_openstack_modify_vm(say, user, params_dict):
             result = openstack_helper.start_server(vm_id)
 
             if result["success"]:
-                say(
-                    f":white_check_mark: *Successfully initiated start for server `{vm_id}`*\n"
-                    f"• Server name: `{result['server_name']}`\n"
-                    f"• Previous status: `{result['previous_status']}`\n"
-                    f"• Current status: `{result['current_status']}`\n"
-                    f"\n:information_source: The server will take a moment to fully start."
+                submit_from_handler(
+                    say,
+                    "openstack",
+                    user,
+                    {"server_id": vm_id, "name": result["server_name"]},
+                    text=(
+                        f":white_check_mark: *Successfully initiated start for server `{vm_id}`*\n"
+                        f"• Server name: `{result['server_name']}`\n"
+                        f"• Previous status: `{result['previous_status']}`\n"
+                        f"• Current status: `{result['current_status']}`\n"
+                        "\n:information_source: The server will take a moment to fully start. "
+                        "Job `{job_id}`: this message is updated once it is running."
+                    ),
+                    operation="start",
                 )
             else:
                 logger.error(
@@ -1495,12 +2072,20 @@ def handle_openstack_modify_vm(say, user, params_dict):
             result = openstack_helper.delete_server(vm_id)
 
             if result["success"]:
-                say(
-                    f":white_check_mark: *Successfully initiated deletion for server `{vm_id}`*\n"
-                    f"• Server name: `{result['server_name']}`\n"
-                    f"• Previous status: `{result['previous_status']}`\n"
-                    f"• Current status: `{result['current_status']}`\n"
-                    f"\n:information_source: The server is being deleted and will be permanently removed."
+                submit_from_handler(
+                    say,
+                    "openstack",
+                    user,
+                    {"server_id": vm_id, "name": result["server_name"]},
+                    text=(
+                        f":white_check_mark: *Successfully initiated deletion for server `{vm_id}`*\n"
+                        f"• Server name: `{result['server_name']}`\n"
+                        f"• Previous status: `{result['previous_status']}`\n"
+                        f"• Current status: `{result['current_status']}`\n"
+                        "\n:information_source: The server is being deleted and will be permanently removed. "
+                        "Job `{job_id}`: this message is updated once it is gone."
+                    ),
+                    operation="delete",
                 )
             else:
                 logger.error(
@@ -1516,52 +2101,260 @@ def handle_openstack_modify_vm(say, user, params_dict):
         )
 
 
+def _keypair_cache_key(cloud_type, region, user):
+    # The keypair in use is cached per cloud, region (None for OpenStack) and user
+    return (cloud_type, region, user)
+
+
 def _helper_select_keypair(
     key_option, user, app, cloud_type, os_name, instance_type, say, cloud_sdk_obj
 ):
-    key_to_use = {}
-
-    existing_key = cloud_sdk_obj.describe_keypair(key_name=user)
-    if existing_key:
-        logger.debug(f"Found existing key: {existing_key['KeyFingerprint']}")
-    else:
-        logger.debug("No existing keys found.")
+    cache_key = _keypair_cache_key(
+        cloud_type, getattr(cloud_sdk_obj, "region", None), user
+    )
+    cache_ttl = get_config_value("KEYPAIR_CACHE_TTL", 3600)
 
     if key_option == "new":
-        # Delete old key since we want to maintain only one key per user (per cloud)
-        if existing_key:
-            success = cloud_sdk_obj.delete_keypair(key_name=user)
-            if not success:
-                say("Some error occurred while deleting old key.")
-                return
-            logger.debug("Deleted old key.")
-
-        new_key = cloud_sdk_obj.create_keypair(key_name=user)
-        logger.debug(f"Created new key: {new_key['KeyFingerprint']}")
+        # Generated here; only the public key goes to the cloud, replacing the old keypair
+        # since we want to maintain only one key per user (per cloud)
+        new_key = generate_keypair()
+        try:
+            key_to_use = cloud_sdk_obj.import_keypair(user, new_key.public_key)
+        except Exception:
+            logger.exception(f"Importing the keypair of {user} failed")
+            keypair_cache.pop(cache_key)
+            say("Some error occurred while creating the new key.")
+            return
+        logger.debug(f"Imported new key: {key_to_use['KeyFingerprint']}")
 
         # DM user with private key
         app.client.chat_postMessage(
             channel=user,
-            text=f"""New key created:\n```{new_key["KeyMaterial"]}```
+            text=f"""New key created:\n```{new_key.private_key}```
                   Cloud: {cloud_type}, OS: {os_name}, Instance: {instance_type}""",
         )
         logger.debug("Sent private key in user DM.")
         say("Please check DM for the newly generated private key.")
 
-        key_to_use = {
-            "KeyName": new_key["KeyName"],
-            "KeyFingerprint": new_key["KeyFingerprint"],
-        }
-
+        keypair_cache.set(cache_key, key_to_use, ttl=cache_ttl)
         return key_to_use
 
     else:
+        key_to_use = keypair_cache.get(cache_key)
+        if key_to_use:
+            logger.debug(f"Using cached key: {key_to_use['KeyFingerprint']}")
+            return key_to_use
+
+        existing_key = cloud_sdk_obj.describe_keypair(key_name=user)
         if not existing_key:
             logger.debug("Existing key not found")
             say(":warning: You do not have any existing keys.")
             return
 
-        key_to_use = existing_key
+        key_to_use = {
+            "KeyName": existing_key["KeyName"],
+            "KeyFingerprint": existing_key["KeyFingerprint"],
+        }
+        keypair_cache.set(cache_key, key_to_use, ttl=cache_ttl)
         logger.debug(f"Using existing key: {key_to_use['KeyFingerprint']}")
 
         return key_to_use
+
+
+def _helper_parse_count(params_dict, say):
+    """
+    ``--count`` of a create command (1 if absent), or None after telling the user it is
+    not a number between 1 and ``VM_CREATE_MAX_COUNT``.
+    """
+    max_count = get_config_value("VM_CREATE_MAX_COUNT", 10)
+    raw_count = params_dict.get("count")
+    if raw_count in (None, "", True):
+        return 1
+    try:
+        count = int(str(raw_count).strip())
+    except ValueError:
+        count = 0
+    if not 1 <= count <= max_count:
+        say(f":warning: `--count` must be a number from 1 to {max_count}.")
+        return None
+    return count
+
+
+def _helper_report_bulk_create(
+    say, cloud, user, instances, requested, resource_of, print_keys, ready_text
+):
+    """
+    Track every VM of a ``--count`` create in the background and list them, with their job
+    IDs, in one table. The user gets a DM for each VM once it is ready.
+    """
+    jobs = submit_batch_from_handler(
+        say,
+        cloud,
+        user,
+        [resource_of(instance) for instance in instances],
+        ready_text=ready_text,
+    )
+    for instance, job in zip(instances, jobs):
+        instance["job_id"] = job.job_id
+    if len(instances) < requested:
+        header = (
+            f" Only {len(instances)} of {requested} VMs could be created "
+            "(quota or capacity). They are being set up:"
+        )
+    else:
+        header = f" {len(instances)} VMs are being set up:"
+    helper_display_dict_output_as_table(
+        {"count": len(instances), "instances": instances},
+        ["job_id"] + print_keys,
+        say,
+        block_message=header,
+    )
+    say("You get a DM for each VM once it is ready, with its access details.")
+
+
+def _helper_parse_vm_ids(key, params_dict, say):
+    """
+    The VM IDs (or names) given as ``--<key>=a,b,c``, without duplicates, or None after
+    telling the user there are more than ``VM_MODIFY_MAX_COUNT``.
+    """
+    vm_ids = list(
+        dict.fromkeys(
+            vm_id.strip()
+            for vm_id in get_list_of_values_for_key_in_dict_of_parameters(
+                key, params_dict
+            )
+            if vm_id.strip()
+        )
+    )
+    max_count = get_config_value("VM_MODIFY_MAX_COUNT", 20)
+    if len(vm_ids) > max_count:
+        say(f":warning: `--{key}` takes at most {max_count} VMs at a time.")
+        return None
+    return vm_ids
+
+
+def _helper_announce_batch_modify(say, operation, noun, vm_ids):
+    if operation == "delete":
+        say(
+            f":warning: *Deletion Warning*\n"
+            f"You are about to permanently delete {len(vm_ids)} {noun}: "
+            f"{', '.join(f'`{vm_id}`' for vm_id in vm_ids)}. This action cannot be undone.\n"
+            f":hourglass_flowing_sand: Proceeding with deletion..."
+        )
+    else:
+        say(
+            f":hourglass_flowing_sand: Attempting to {operation} {len(vm_ids)} {noun}..."
+        )
+
+
+def _helper_report_batch_modify(
+    say, cloud, user, operation, results, resource_of, print_keys
+):
+    """
+    Track the VMs that a multi-VM ``vm modify`` acted on in the background and list the
+    result for every VM, with the job IDs, in one table. The user gets a DM for each VM
+    once the operation has finished.
+    """
+    succeeded = [result for result in results if result["success"]]
+    jobs = submit_batch_from_handler(
+        say,
+        cloud,
+        user,
+        [resource_of(result) for result in succeeded],
+        operation=operation,
+    )
+    for result, job in zip(succeeded, jobs):
+        result["job_id"] = job.job_id
+    rows = [
+        {key: result.get(key) or "-" for key in ["job_id"] + print_keys + ["error"]}
+        for result in results
+    ]
+    helper_display_dict_output_as_table(
+        {"count": len(rows), "instances": rows},
+        ["job_id"] + print_keys + ["error"],
+        say,
+        block_message=f" {operation.capitalize()} requested for {len(succeeded)} of "
+        f"{len(results)} VMs:",
+    )
+    if succeeded:
+        say(f"You get a DM for each VM once the {operation} has finished.")
+
+
+def _helper_progress_table(say, operation, total, print_keys):
+    """
+    Post one progress message for a multi-VM ``vm modify`` and return an ``on_result``
+    callback that edits it into a table of the VMs done so far, at most once a second
+    (``chat.update`` is rate limited) and once more when all ``total`` are done. Where the
+    message cannot be edited, the callback does nothing and only the final table is shown.
+    """
+    reply = say(
+        f":hourglass_flowing_sand: {operation.capitalize()}: 0 of {total} VMs done..."
+    )
+    client = getattr(say, "client", None)
+    try:
+        channel, ts = reply.get("channel"), reply.get("ts")
+    except AttributeError:
+        channel = ts = None
+    if client is None or not isinstance(channel, str) or not isinstance(ts, str):
+        return None
+
+    rows = []
+    lock = threading.Lock()
+    last_update = [0.0]
+
+    def on_result(result):
+        with lock:
+            rows.append({key: result.get(key) or "-" for key in print_keys + ["error"]})
+            now = time.monotonic()
+            if len(rows) < total and now - last_update[0] < 1.0:
+                return
+            last_update[0] = now
+            text = (
+                f":hourglass_flowing_sand: {operation.capitalize()}: {len(rows)} of "
+                f"{total} VMs done\n"
+                + helper_format_instances_table(rows, print_keys + ["error"])
+            )
+            client.chat_update(channel=channel, ts=ts, text=text)
+
+    return on_result
+
+
+def _helper_check_quota(say, cloud, scope, demand_of):
+    """
+    What a create takes from the quotas of ``cloud`` in ``scope`` (see ``sdk.tools.quota``),
+    or None after telling the user that it would exceed them. A create whose demand or
+    quotas cannot be worked out is let through, and the cloud decides.
+    """
+    if not get_config_value("QUOTA_PREFLIGHT", True, cast=bool):
+        return {}
+    try:
+        demand = demand_of()
+    except Exception as e:
+        logger.warning(
+            f"Unable to work out the {cloud} quota a create takes: {e}", exc_info=True
+        )
+        return {}
+    if not isinstance(demand, dict):
+        return {}
+    shortfalls = quota_service.check(cloud, scope, demand)
+    if shortfalls:
+        logger.info(f"{cloud} create in {scope} rejected by quota: {shortfalls}")
+        say(
+            ":x: *Not enough quota for this VM*, nothing was created:\n"
+            + "\n".join(f"• {shortfall}" for shortfall in shortfalls)
+        )
+        return None
+    return demand
+
+
+def _helper_consume_quota(cloud, scope, demand, created, requested):
+    """Count the ``created`` of ``requested`` VMs in the cached quota usage."""
+    if demand and created:
+        quota_service.consume(
+            cloud,
+            scope,
+            {
+                resource: amount * created / requested
+                for resource, amount in demand.items()
+            },
+        )
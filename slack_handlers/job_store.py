@@ -0,0 +1,152 @@
+"""
+Durable storage for the background cloud jobs of ``slack_handlers.provisioning``.
+
+Without it a pending VM create, stop, start or delete is forgotten when the bot restarts and
+the user never hears back. With ``PROVISIONING_DB_PATH`` set, every job is written to a SQLite
+file when it is submitted and whenever its state changes. On startup the engine reloads the
+jobs that are still pending and resumes polling them.
+
+Several bot processes may share the file (see ``slack_handlers.supervisor``). A process only
+polls the jobs it holds a lease on. It renews its leases while running, and the jobs of a
+process that died are taken over once their lease has expired.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs are kept this long for troubleshooting, then pruned
+FINISHED_RETENTION = 7 * 24 * 3600
+
+_COLUMNS = (
+    "job_id",
+    "cloud",
+    "operation",
+    "user",
+    "channel",
+    "ts",
+    "resource",
+    "ready_text",
+    "state",
+    "info",
+    "error",
+    "retries",
+    "checks",
+    "phases",
+    "submitted_at",
+    "deadline",
+)
+_JSON_COLUMNS = ("resource", "info", "phases")
+# Columns added after the first release of the table, with their SQL type
+_ADDED_COLUMNS = {"phases": "TEXT"}
+
+
+class SQLiteJobStore:
+    """Jobs kept in a SQLite file, leased to the process that polls them."""
+
+    def __init__(self, path, lease_seconds=120):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, cloud TEXT NOT NULL, operation TEXT NOT NULL, "
+            "user TEXT, channel TEXT, ts TEXT, resource TEXT NOT NULL, ready_text TEXT, "
+            "state TEXT NOT NULL, info TEXT, error TEXT, retries INTEGER DEFAULT 0, "
+            "checks INTEGER DEFAULT 0, phases TEXT, submitted_at REAL NOT NULL, deadline REAL NOT NULL, "
+            "updated_at REAL NOT NULL, owner TEXT, lease_until REAL)"
+        )
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, sql_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {sql_type}")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_until)"
+        )
+
+    def save(self, record: dict, owner: str):
+        """Insert or update a job and lease it to ``owner``."""
+        now = time.time()
+        values = [
+            json.dumps(record[c]) if c in _JSON_COLUMNS else record[c] for c in _COLUMNS
+        ]
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(_COLUMNS)}, updated_at, owner, "
+                f"lease_until) VALUES ({', '.join('?' for _ in _COLUMNS)}, ?, ?, ?)",
+                (*values, now, owner, now + self.lease_seconds),
+            )
+
+    def claim_pending(self, owner: str, states) -> list:
+        """
+        Lease every job in one of ``states`` that is not leased by a live process, and
+        return them as records.
+        """
+        now = time.time()
+        placeholders = ",".join("?" for _ in states)
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                rows = cur.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE state IN ({placeholders}) "
+                    "AND (owner IS NULL OR owner = ? OR lease_until IS NULL OR lease_until < ?)",
+                    (*states, owner, now),
+                ).fetchall()
+                cur.executemany(
+                    "UPDATE jobs SET owner = ?, lease_until = ? WHERE job_id = ?",
+                    [(owner, now + self.lease_seconds, row[0]) for row in rows],
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return [self._to_record(row) for row in rows]
+
+    def renew(self, owner: str):
+        """Extend the leases of ``owner``'s jobs."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ?",
+                (time.time() + self.lease_seconds, owner),
+            )
+
+    def release(self, owner: str):
+        """Give up ``owner``'s leases so another process can take the jobs over right away."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET owner = NULL, lease_until = NULL WHERE owner = ?",
+                (owner,),
+            )
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._to_record(row) if row else None
+
+    def prune(self, finished_states, older_than=FINISHED_RETENTION) -> int:
+        """Delete jobs in ``finished_states`` last updated more than ``older_than`` s ago."""
+        placeholders = ",".join("?" for _ in finished_states)
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM jobs WHERE state IN ({placeholders}) AND updated_at < ?",
+                (*finished_states, time.time() - older_than),
+            )
+        return cur.rowcount
+
+    @staticmethod
+    def _to_record(row) -> dict:
+        record = dict(zip(_COLUMNS, row))
+        for column in _JSON_COLUMNS:
+            record[column] = json.loads(record[column]) if record[column] else {}
+        return record
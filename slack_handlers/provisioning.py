@@ -0,0 +1,671 @@
+"""
+Background tracking of long-running cloud operations (VM create, stop, start and delete).
+
+``aws``/``gcp``/``openstack vm create`` used to block their handler thread until the VM was
+up, often for minutes. Now a handler only submits the operation, posts a message with a job
+ID and hands the job to the ``ProvisioningEngine``. A poller thread hands the jobs that are
+due to a pool of ``PROVISIONING_WORKERS`` threads, so any number of jobs can be waiting while
+only that many threads make cloud calls. Each job is checked on a ``Backoff`` schedule: every
+``PROVISIONING_FIRST_POLL`` seconds at first, then less and less often, up to every
+``PROVISIONING_POLL_INTERVAL`` seconds. When a job finishes, fails or is still not done after
+``PROVISIONING_TIMEOUT`` seconds, the original message is updated with ``chat.update`` and the
+user gets a DM. With ``WAIT_FOR_SSH`` a new or started VM is only reported once its SSH port
+accepts connections.
+
+State checks are registered per cloud with ``register_checker``. A checker takes the job's
+operation and ``resource`` dict and returns ``(state, info)``, where ``info`` describes the
+VM and holds an ``error`` message when the state is ``FAILED``. A check that raises counts as
+a retry; after ``PROVISIONING_MAX_RETRIES`` failed checks in a row the job fails.
+
+With ``PROVISIONING_DB_PATH`` set, jobs are kept in a ``SQLiteJobStore`` and the pending ones
+are resumed when the bot starts again.
+"""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from slack_sdk.errors import SlackClientError
+
+from sdk.tools.helpers import get_config_value
+from sdk.tools.lazy import lazy_import
+from sdk.tools.waiter import Backoff, tcp_reachable, wait_for_ssh
+from slack_handlers.job_store import SQLiteJobStore
+
+logger = logging.getLogger(__name__)
+
+EC2Helper = lazy_import("sdk.aws.ec2", "EC2Helper")
+GCPHelper = lazy_import("sdk.gcp.compute_engine", "GCPHelper")
+OpenStackHelper = lazy_import("sdk.openstack.core", "OpenStackHelper")
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+CREATE = "create"
+STOP = "stop"
+START = "start"
+DELETE = "delete"
+
+CLOUD_LABELS = {"aws": "EC2", "gcp": "GCP", "openstack": "OpenStack"}
+
+_DONE_WORDS = {
+    CREATE: "is ready",
+    STOP: "is stopped",
+    START: "is running",
+    DELETE: "is deleted",
+}
+
+
+class _KeepMissing(dict):
+    """``str.format_map`` mapping that leaves unknown placeholders as they are."""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+class ProvisioningJob:
+    def __init__(
+        self,
+        job_id,
+        cloud,
+        user,
+        resource,
+        operation=CREATE,
+        channel=None,
+        ts=None,
+        ready_text="",
+        timeout=900,
+        client=None,
+    ):
+        """
+        :param job_id: Short ID shown to the user.
+        :param cloud: Key of the state checker, e.g. ``"aws"``.
+        :param user: Slack user ID that is sent the DM.
+        :param resource: What the checker needs to find the VM and the cloud operation,
+            e.g. region and instance ID, or zone and operation name.
+        :param operation: ``CREATE``, ``STOP``, ``START`` or ``DELETE``.
+        :param channel: Channel of the message to update when the job finishes.
+        :param ts: Timestamp of that message.
+        :param ready_text: Extra text for the "done" message; ``{public_ip}`` and other
+            keys of the checker's ``info`` are filled in.
+        :param timeout: Seconds after which an operation that is not done counts as failed.
+        :param client: Slack WebClient for the notifications (the engine's by default).
+        """
+        self.job_id = job_id
+        self.cloud = cloud
+        self.operation = operation
+        self.user = user
+        self.resource = resource
+        self.channel = channel
+        self.ts = ts
+        self.ready_text = ready_text
+        self.client = client
+        self.submitted_at = time.time()
+        self.deadline = self.submitted_at + timeout
+        self.state = PENDING
+        self.info = {}
+        self.error = ""
+        self.retries = 0  # failed checks in a row
+        self.checks = 0
+        self.checking = False
+        self.next_check = self.submitted_at
+        self.phases = {}  # "ready"/"ssh" -> seconds after submission
+
+    @property
+    def name(self) -> str:
+        return self.resource.get("name") or self.info.get("name") or self.job_id
+
+    def to_record(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "cloud": self.cloud,
+            "operation": self.operation,
+            "user": self.user,
+            "channel": self.channel,
+            "ts": self.ts,
+            "resource": self.resource,
+            "ready_text": self.ready_text,
+            "state": self.state,
+            "info": self.info,
+            "error": self.error,
+            "retries": self.retries,
+            "checks": self.checks,
+            "phases": self.phases,
+            "submitted_at": self.submitted_at,
+            "deadline": self.deadline,
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(
+            record["job_id"],
+            record["cloud"],
+            record["user"],
+            record["resource"],
+            operation=record["operation"],
+            channel=record["channel"],
+            ts=record["ts"],
+            ready_text=record["ready_text"] or "",
+        )
+        job.submitted_at = record["submitted_at"]
+        job.deadline = record["deadline"]
+        job.state = record["state"]
+        job.info = record["info"] or {}
+        job.error = record["error"] or ""
+        job.retries = record["retries"] or 0
+        job.checks = record["checks"] or 0
+        job.phases = record.get("phases") or {}
+        return job
+
+    def __repr__(self):
+        return f"<ProvisioningJob {self.job_id} {self.cloud} {self.operation} {self.state}>"
+
+
+class ProvisioningEngine:
+    def __init__(
+        self,
+        client=None,
+        poll_interval=10,
+        timeout=900,
+        max_workers=4,
+        max_retries=20,
+        store=None,
+        backoff=None,
+        check_ssh=False,
+    ):
+        """
+        :param client: Default Slack WebClient for notifications.
+        :param poll_interval: Longest delay between two state checks of a job.
+        :param timeout: Default seconds a job may take before it counts as failed.
+        :param max_workers: Threads making state checks at the same time.
+        :param max_retries: Failed checks in a row after which a job fails.
+        :param store: Optional ``SQLiteJobStore`` that keeps jobs across restarts.
+        :param backoff: ``Backoff`` for the delays between the checks of a job; by default
+            2 seconds at first, growing up to ``poll_interval``.
+        :param check_ssh: Report a created or started VM only once its SSH port is reachable.
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_workers = max(1, int(max_workers))
+        self.max_retries = max_retries
+        self.store = store
+        self.backoff = backoff or Backoff(
+            initial=min(2.0, poll_interval), max_delay=poll_interval
+        )
+        self.check_ssh = check_ssh
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._checkers = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def register_checker(self, cloud, checker):
+        """``checker(operation, resource) -> (state, info)`` decides whether a job is done."""
+        self._checkers[cloud] = checker
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex[:8]
+
+    def submit(
+        self,
+        cloud,
+        user,
+        resource,
+        operation=CREATE,
+        job_id=None,
+        channel=None,
+        ts=None,
+        ready_text="",
+        client=None,
+        timeout=None,
+    ) -> ProvisioningJob:
+        """Track an operation that ``cloud`` accepted. Starts the poller if needed."""
+        if cloud not in self._checkers:
+            raise ValueError(f"No state checker registered for {cloud!r}")
+        job = ProvisioningJob(
+            job_id or self.new_job_id(),
+            cloud,
+            user,
+            resource,
+            operation=operation,
+            channel=channel,
+            ts=ts,
+            ready_text=ready_text,
+            timeout=self.timeout if timeout is None else timeout,
+            client=client,
+        )
+        job.next_check = job.submitted_at + self.backoff.delay(0)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._persist(job)
+        logger.info(f"Job {job.job_id} submitted: {cloud} {operation} {job.resource}")
+        self.start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, user=None, state=None) -> list:
+        with self._lock:
+            return [
+                job
+                for job in self._jobs.values()
+                if (user is None or job.user == user)
+                and (state is None or job.state == state)
+            ]
+
+    def resume(self) -> int:
+        """
+        Load the store's pending jobs that no live process holds a lease on, e.g. those
+        of a bot process that restarted or died. Returns the number of jobs taken over.
+        """
+        if self.store is None:
+            return 0
+        try:
+            records = self.store.claim_pending(self.owner, (PENDING,))
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Unable to reload pending jobs: {e}")
+            return 0
+        resumed = 0
+        with self._lock:
+            for record in records:
+                if record["job_id"] in self._jobs:
+                    continue
+                self._jobs[record["job_id"]] = ProvisioningJob.from_record(record)
+                resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} pending jobs")
+        return resumed
+
+    def start(self, client=None):
+        """
+        Start the poller (if not running) after resuming stored jobs. ``client`` becomes
+        the default client, used for resumed jobs.
+        """
+        if client is not None:
+            self.client = client
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="provisioning"
+                )
+            self._thread = threading.Thread(
+                target=self._run, name="provisioning-poller", daemon=True
+            )
+        if self.store is not None:
+            try:
+                self.store.prune((READY, FAILED))
+            except sqlite3.Error as e:
+                logger.error(f"Unable to prune finished jobs: {e}")
+        self.resume()
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop polling. Stored jobs stay pending and are released for another process (or
+        the next start); without a store they are no longer tracked.
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if self.store is not None:
+            try:
+                self.store.release(self.owner)
+            except sqlite3.Error as e:
+                logger.error(f"Unable to release job leases: {e}")
+
+    def _run(self):
+        # Wake up often enough for the first, fast checks of new jobs
+        tick = min(self.backoff.initial, self.poll_interval)
+        last_renewal = time.monotonic()
+        while not self._stop.wait(tick):
+            try:
+                if (
+                    self.store is not None
+                    and time.monotonic() - last_renewal >= self.poll_interval
+                ):
+                    last_renewal = time.monotonic()
+                    self.store.renew(self.owner)
+                    self.resume()  # jobs of processes that died meanwhile
+                self.poll_once(due_only=True)
+            except Exception:
+                logger.exception("Provisioning poller error")
+
+    def poll_once(self, wait=True, due_only=False) -> int:
+        """
+        Check every pending job once on the worker pool; returns the number of jobs still
+        pending. With ``wait=False`` the checks are left running in the background, with
+        ``due_only`` only the jobs whose next check is due are checked.
+        """
+        futures = []
+        now = time.time()
+        with self._lock:
+            executor = self._executor
+            due = [
+                job
+                for job in self._jobs.values()
+                if job.state == PENDING
+                and not job.checking
+                and (not due_only or job.next_check <= now)
+            ]
+            for job in due:
+                job.checking = True
+        for job in due:
+            if executor is None:
+                self._check(job)
+            else:
+                futures.append(executor.submit(self._check, job))
+        if wait:
+            for future in futures:
+                future.result()
+        return len(self.jobs(state=PENDING))
+
+    def _check(self, job):
+        try:
+            self._check_job(job)
+        finally:
+            job.checking = False
+
+    def _check_job(self, job):
+        job.checks += 1
+        try:
+            state, info = self._checkers[job.cloud](job.operation, job.resource)
+            job.retries = 0
+        except Exception as e:
+            # Transient API errors (or a VM not visible yet) are retried
+            job.retries += 1
+            logger.warning(
+                f"Check {job.retries}/{self.max_retries} of job {job.job_id} failed: {e}",
+                exc_info=True,
+            )
+            state, info = PENDING, {}
+            if job.retries >= self.max_retries:
+                state, info = (
+                    FAILED,
+                    {"error": f"Gave up after {job.retries} errors: {e}"},
+                )
+
+        if info:
+            job.info = info
+        if state == READY and job.operation in (CREATE, START):
+            state = self._check_reachable(job)
+        if state == PENDING and time.time() >= job.deadline:
+            state = FAILED
+            if "ready" in job.phases:
+                error = "the VM was not reachable over SSH in time"
+            elif job.operation == CREATE:
+                error = "the VM was not ready in time"
+            else:
+                error = f"the {job.operation} did not finish in time"
+            info = {"error": error}
+        if state == PENDING:
+            job.next_check = time.time() + self.backoff.delay(job.checks)
+            self._persist(job)
+            return
+
+        job.error = info.get("error", "") if state == FAILED else ""
+        job.state = state
+        if state == READY:
+            job.phases.setdefault("ready", time.time() - job.submitted_at)
+        self._persist(job)
+        logger.info(
+            f"Job {job.job_id} {state} after "
+            f"{time.time() - job.submitted_at:.0f}s and {job.checks} checks"
+            + "".join(f", {phase} {secs:.0f}s" for phase, secs in job.phases.items())
+        )
+        self._notify(job)
+        with self._lock:
+            self._jobs.pop(job.job_id, None)
+
+    def _check_reachable(self, job):
+        """
+        With ``check_ssh``, keep a running VM pending until its SSH port accepts connections.
+        VMs without a known IP are reported as they are.
+        """
+        if not self.check_ssh:
+            return READY
+        job.phases.setdefault("ready", time.time() - job.submitted_at)
+        host = next(
+            (
+                job.info[key]
+                for key in ("public_ip", "private_ip")
+                if job.info.get(key) not in (None, "", "N/A")
+            ),
+            None,
+        )
+        if host is None or tcp_reachable(host):
+            job.phases["ssh"] = time.time() - job.submitted_at
+            return READY
+        return PENDING
+
+    def _persist(self, job):
+        if self.store is None:
+            return
+        try:
+            self.store.save(job.to_record(), self.owner)
+        except sqlite3.Error as e:
+            # Keep tracking the job in memory; it is only lost if the bot restarts
+            logger.error(f"Unable to store job {job.job_id}: {e}")
+
+    def _message(self, job) -> str:
+        label = CLOUD_LABELS.get(job.cloud, job.cloud)
+        elapsed = time.time() - job.submitted_at
+        if job.state == FAILED:
+            return (
+                f":x: *{label} VM `{job.name}`: {job.operation} failed* "
+                f"(job `{job.job_id}`).\n```{job.error}```"
+            )
+        details = "\n".join(
+            f"{key}: {value}"
+            for key, value in job.info.items()
+            if value not in (None, "") and key != "error"
+        )
+        timing = f"{elapsed:.0f}s"
+        if "ssh" in job.phases:
+            timing = (
+                f"running after {job.phases['ready']:.0f}s, "
+                f"SSH after {job.phases['ssh']:.0f}s"
+            )
+        text = (
+            f":white_check_mark: *{label} VM `{job.name}` {_DONE_WORDS[job.operation]}* "
+            f"(job `{job.job_id}`, {timing})."
+        )
+        if details:
+            text += f"\n```{details}```"
+        if job.ready_text:
+            text += "\n" + job.ready_text.format_map(_KeepMissing(job.info))
+        return text
+
+    def _notify(self, job):
+        client = job.client or self.client
+        if client is None:
+            logger.warning(f"No Slack client to report job {job.job_id}")
+            return
+        text = self._message(job)
+        if job.channel and job.ts:
+            try:
+                client.chat_update(channel=job.channel, ts=job.ts, text=text)
+            except (SlackClientError, OSError) as e:
+                logger.error(f"Unable to update the message of job {job.job_id}: {e}")
+        try:
+            client.chat_postMessage(channel=job.user, text=text)
+        except (SlackClientError, OSError) as e:
+            logger.error(f"Unable to DM {job.user} about job {job.job_id}: {e}")
+
+
+# EC2 state the operation waits for, and states in which it can no longer get there
+_AWS_TARGET_STATES = {
+    CREATE: "running",
+    START: "running",
+    STOP: "stopped",
+    DELETE: "terminated",
+}
+_AWS_FAILED_STATES = {
+    CREATE: {"shutting-down", "terminated", "stopping", "stopped"},
+    START: {"shutting-down", "terminated"},
+    STOP: {"shutting-down", "terminated"},
+    DELETE: set(),
+}
+
+
+def check_aws_instance(operation, resource):
+    # Always from AWS: the inventory snapshot keeps the state the bot recorded until
+    # its next refresh, and has no public IP for a new instance
+    result = EC2Helper(region=resource["region"]).list_instances(
+        {"instance-ids": resource["instance_id"], "fresh": True}
+    )
+    instances = result.get("instances", [])
+    if not instances:
+        # Not visible yet after a launch; gone after a delete
+        return (READY, {}) if operation == DELETE else (PENDING, {})
+    info = instances[0]
+    state = info.get("state", "")
+    if state == _AWS_TARGET_STATES[operation]:
+        return READY, info
+    if state in _AWS_FAILED_STATES[operation]:
+        return FAILED, dict(info, error=f"The instance is {state}.")
+    return PENDING, info
+
+
+_OPENSTACK_TARGET_STATUSES = {CREATE: "ACTIVE", START: "ACTIVE", STOP: "SHUTOFF"}
+
+
+def check_openstack_server(operation, resource):
+    info = OpenStackHelper().get_server(resource["server_id"])
+    if info is None:
+        if operation == DELETE:
+            return READY, {"server_id": resource["server_id"]}
+        return FAILED, {"error": f"Server {resource['server_id']} no longer exists."}
+    fault = info.pop("fault", "")
+    if info["status"] == "ERROR":
+        return FAILED, dict(info, error=fault or "The server went into ERROR state.")
+    if info["status"] == _OPENSTACK_TARGET_STATUSES.get(operation):
+        return READY, info
+    return PENDING, info
+
+
+def check_gcp_instance(operation, resource):
+    gcp_helper = GCPHelper()
+    if resource.get("operation"):
+        done, error = gcp_helper.get_operation(resource["zone"], resource["operation"])
+        if error:
+            return FAILED, {"error": error}
+        if not done:
+            return PENDING, {}
+    if operation != CREATE:
+        return READY, {"name": resource["name"], "zone": resource["zone"]}
+    info = gcp_helper.get_instance_info(resource["name"], resource["zone"])
+    if info is None:
+        if resource.get("operation"):
+            # The insert finished without it, e.g. a bulkInsert that hit the quota
+            return FAILED, {"error": f"Instance {resource['name']} was not created."}
+        return PENDING, {}
+    if info.get("state") == "running":
+        return READY, info
+    return PENDING, info
+
+
+def _slack_target(say, reply):
+    """(client, channel, ts) of the message ``reply`` that ``say`` posted, where known."""
+    client = getattr(say, "client", None)
+    try:
+        return client, reply.get("channel"), reply.get("ts")
+    except AttributeError:
+        return client, None, None
+
+
+def submit_from_handler(
+    say, cloud, user, resource, text, ready_text="", operation=CREATE
+):
+    """
+    Post ``text`` (with ``{job_id}`` filled in) and track the operation in the background;
+    the message is updated once it finished. Returns the job.
+    """
+    job_id = provisioning_engine.new_job_id()
+    reply = say(text.replace("{job_id}", job_id))
+    client, channel, ts = _slack_target(say, reply)
+    return provisioning_engine.submit(
+        cloud,
+        user,
+        resource,
+        operation=operation,
+        job_id=job_id,
+        channel=channel if isinstance(channel, str) else None,
+        ts=ts if isinstance(ts, str) else None,
+        ready_text=ready_text,
+        client=client,
+    )
+
+
+def submit_batch_from_handler(
+    say, cloud, user, resources, ready_text="", operation=CREATE
+):
+    """
+    Track the operations on several VMs started by one command, e.g. ``--count``. There is
+    no message per job to update; the user gets a DM for each. Returns the jobs.
+    """
+    client = getattr(say, "client", None)
+    return [
+        provisioning_engine.submit(
+            cloud,
+            user,
+            resource,
+            operation=operation,
+            ready_text=ready_text,
+            client=client,
+        )
+        for resource in resources
+    ]
+
+
+def build_job_store():
+    """SQLite job store from ``PROVISIONING_DB_PATH``, or None to keep jobs in memory."""
+    db_path = get_config_value("PROVISIONING_DB_PATH", None, cast=str)
+    if not db_path:
+        return None
+    try:
+        return SQLiteJobStore(
+            db_path,
+            lease_seconds=max(
+                60, 6 * get_config_value("PROVISIONING_POLL_INTERVAL", 10)
+            ),
+        )
+    except sqlite3.Error as e:
+        logger.error(f"Unable to open job store {db_path}, keeping jobs in memory: {e}")
+        return None
+
+
+provisioning_engine = ProvisioningEngine(
+    poll_interval=get_config_value("PROVISIONING_POLL_INTERVAL", 10),
+    timeout=get_config_value("PROVISIONING_TIMEOUT", 900),
+    max_workers=get_config_value("PROVISIONING_WORKERS", 4),
+    max_retries=get_config_value("PROVISIONING_MAX_RETRIES", 20),
+    store=build_job_store(),
+    backoff=Backoff(
+        initial=get_config_value("PROVISIONING_FIRST_POLL", 2.0, cast=float),
+        max_delay=get_config_value("PROVISIONING_POLL_INTERVAL", 10),
+    ),
+    check_ssh=wait_for_ssh(),
+)
+provisioning_engine.register_checker("aws", check_aws_instance)
+provisioning_engine.register_checker("openstack", check_openstack_server)
+provisioning_engine.register_checker("gcp", check_gcp_instance)
@@ -0,0 +1,330 @@
+"""
+Token-bucket admission control for bot commands.
+
+Every command is charged against three kinds of bucket and only runs if all of them have a
+token left:
+
+* ``user``   - all commands of one user
+* ``<class>`` - commands of one class (``read``, ``mutate``, ``create``) for one user
+* ``global`` - all commands of one class across every user (protects the cloud APIs)
+
+Limits are ``"<tokens>/<seconds>"`` strings, e.g. ``"3/300"`` allows a burst of 3 and
+refills one token every 100 seconds. They can be overridden with the ``RATE_LIMITS`` JSON
+config key, e.g. ``RATE_LIMITS={"create": "2/600", "global": "200/60"}``.
+
+The buckets are kept in process by default. Set a SQLite path (``RATE_LIMIT_DB_PATH``) to
+charge the same buckets from several bot processes, so the limits hold for the whole bot and
+not for each worker.
+"""
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+COMMAND_CLASSES = ("read", "mutate", "create")
+
+DEFAULT_LIMITS = {
+    "user": "30/60",
+    "read": "20/60",
+    "mutate": "10/60",
+    "create": "3/300",
+    "global": "300/60",
+}
+
+
+# Seconds between two sweeps of the buckets that have refilled completely
+PRUNE_INTERVAL = 60
+
+
+def classify_command(base_command: str, params=None) -> str:
+    """Map a base command (and its named parameters) to its rate-limit class."""
+    if base_command.endswith(" create"):
+        return "create"
+    if base_command.endswith(" modify"):
+        return "mutate"
+    if base_command == "rota":
+        params = params or {}
+        # `rota --check` only reads the sheet
+        if params.get("check") and not (params.get("add") or params.get("replace")):
+            return "read"
+        return "mutate"
+    return "read"
+
+
+def parse_limit(spec):
+    """Parse ``"<tokens>/<seconds>"`` into ``(capacity, refill_per_second)``."""
+    tokens, _, seconds = str(spec).partition("/")
+    try:
+        capacity = float(tokens)
+        period = float(seconds or 1)
+    except ValueError:
+        raise ValueError(
+            f"Invalid rate limit {spec!r}: expected '<tokens>/<seconds>'"
+        ) from None
+    if capacity < 1:
+        # A bucket never holding a whole token would reject every command
+        raise ValueError(f"Invalid rate limit {spec!r}: needs at least 1 token")
+    if period <= 0:
+        raise ValueError(f"Invalid rate limit {spec!r}: seconds must be positive")
+    return capacity, capacity / period
+
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_second, now):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated = now
+
+    def wait_time(self, now) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.refill_per_second
+
+    def consume(self):
+        self.tokens -= 1
+
+    def is_full(self, now) -> bool:
+        """Whether the bucket has refilled completely, i.e. is the same as a new one."""
+        elapsed = max(0.0, now - self.updated)
+        return self.tokens + elapsed * self.refill_per_second >= self.capacity
+
+
+class SQLiteBucketStore:
+    """Token buckets kept in a SQLite file so that several processes charge the same ones."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, "
+            "tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS rate_buckets_full ON rate_buckets (full_at)"
+        )
+        self._charges = 0
+
+    def charge(self, wanted, now) -> dict:
+        """
+        Take one token from each bucket of ``wanted`` (``(scope, key, capacity, refill)``
+        tuples) if all of them have one. Returns the wait in seconds per scope; nothing is
+        charged unless every wait is 0.
+        """
+        keys = {key: ":".join(map(str, key)) for _, key, _, _ in wanted}
+        placeholders = ",".join("?" for _ in keys)
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                stored = {
+                    row[0]: row[1:]
+                    for row in cur.execute(
+                        f"SELECT key, tokens, updated FROM rate_buckets WHERE key IN ({placeholders})",
+                        tuple(keys.values()),
+                    )
+                }
+                buckets = []
+                for scope, key, capacity, refill in wanted:
+                    bucket = TokenBucket(capacity, refill, now)
+                    if keys[key] in stored:
+                        bucket.tokens, bucket.updated = stored[keys[key]]
+                    buckets.append((scope, key, bucket))
+
+                waits = {scope: bucket.wait_time(now) for scope, _, bucket in buckets}
+                if max(waits.values(), default=0.0) <= 0:
+                    for _, _, bucket in buckets:
+                        bucket.consume()
+                    cur.executemany(
+                        "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated, full_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        [
+                            (
+                                keys[key],
+                                bucket.tokens,
+                                bucket.updated,
+                                now
+                                + (bucket.capacity - bucket.tokens)
+                                / bucket.refill_per_second,
+                            )
+                            for _, key, bucket in buckets
+                        ],
+                    )
+                    self._charges += 1
+                    if self._charges % 100 == 0:
+                        # A bucket that has refilled completely is the same as a new one
+                        cur.execute(
+                            "DELETE FROM rate_buckets WHERE full_at <= ?", (now,)
+                        )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return waits
+
+    def reset(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_buckets")
+
+
+class RateLimiter:
+    def __init__(self, limits=None, clock=None, stats_log_interval=300, db_path=None):
+        """
+        :param limits: ``RATE_LIMITS`` overrides of ``DEFAULT_LIMITS``.
+        :param clock: Seconds as a float; wall-clock time with ``db_path``, since the
+            buckets are shared with other processes, otherwise ``time.monotonic``.
+        :param stats_log_interval: Seconds between two ``Rate limiter stats`` log lines.
+        :param db_path: Optional SQLite file shared between processes; in-memory if not set.
+        """
+        if db_path:
+            self._store = SQLiteBucketStore(db_path)
+            logger.info(f"Rate-limit buckets shared through {db_path}")
+        else:
+            self._store = None
+        clock = clock or (time.time if db_path else time.monotonic)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._limits = {}
+        merged = dict(DEFAULT_LIMITS)
+        if isinstance(limits, dict):
+            merged.update(limits)
+        for scope, spec in merged.items():
+            try:
+                self._limits[scope] = parse_limit(spec)
+            except ValueError as e:
+                logger.warning(
+                    f"Ignoring RATE_LIMITS {scope}: {e}; using {DEFAULT_LIMITS.get(scope)}"
+                )
+                if scope in DEFAULT_LIMITS:
+                    self._limits[scope] = parse_limit(DEFAULT_LIMITS[scope])
+        self._buckets = {}
+        self._counters = defaultdict(int)
+        self.stats_log_interval = stats_log_interval
+        self._last_stats_log = clock()
+        self._last_prune = clock()
+
+    def _bucket(self, key, scope, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            capacity, refill = self._limits[scope]
+            bucket = self._buckets[key] = TokenBucket(capacity, refill, now)
+        return bucket
+
+    def _prune_locked(self, now):
+        """Drop the buckets that are full again: a new bucket would behave the same."""
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        for key in [k for k, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[key]
+
+    def acquire(self, user, base_command, params=None):
+        """
+        Charge one command. Returns ``(True, 0)`` if it may run, otherwise
+        ``(False, retry_after_seconds)`` and nothing is charged.
+        """
+        command_class = classify_command(base_command, params)
+        wanted = [
+            (scope, key)
+            for scope, key in (
+                ("user", ("user", user)),
+                (command_class, (command_class, user)),
+                ("global", ("global", command_class)),
+            )
+            if scope in self._limits
+        ]
+        if self._store is not None:
+            now = self._clock()
+            try:
+                waits = self._store.charge(
+                    [(scope, key, *self._limits[scope]) for scope, key in wanted], now
+                )
+            except Exception:
+                # Never drop a command because the shared store is unavailable
+                logger.exception("Shared rate limiting failed, allowing command")
+                waits = {}
+
+        with self._lock:
+            if self._store is None:
+                now = self._clock()
+                self._prune_locked(now)
+                buckets = [
+                    (scope, self._bucket(key, scope, now)) for scope, key in wanted
+                ]
+                waits = {scope: bucket.wait_time(now) for scope, bucket in buckets}
+                if max(waits.values(), default=0.0) <= 0:
+                    for _, bucket in buckets:
+                        bucket.consume()
+
+            retry_after = max(waits.values(), default=0.0)
+            if retry_after > 0:
+                self._counters[f"rejected.{command_class}"] += 1
+                for scope, wait in waits.items():
+                    if wait > 0:
+                        self._counters[f"rejected_by.{scope}"] += 1
+            else:
+                self._counters[f"allowed.{command_class}"] += 1
+
+        self._maybe_log_stats()
+        if retry_after > 0:
+            logger.info(
+                f"Rate limited {user} on `{base_command}` ({command_class}); retry in {retry_after:.1f}s"
+            )
+            return False, math.ceil(retry_after)
+        return True, 0
+
+    def stats(self) -> dict:
+        """Allowed/rejected counters per command class and rejections per bucket scope."""
+        with self._lock:
+            snapshot = dict(self._counters)
+        for command_class in COMMAND_CLASSES:
+            allowed = snapshot.get(f"allowed.{command_class}", 0)
+            rejected = snapshot.get(f"rejected.{command_class}", 0)
+            snapshot.setdefault(f"allowed.{command_class}", allowed)
+            snapshot.setdefault(f"rejected.{command_class}", rejected)
+            total = allowed + rejected
+            snapshot[f"rejection_rate.{command_class}"] = (
+                rejected / total if total else 0.0
+            )
+        return snapshot
+
+    def _maybe_log_stats(self):
+        if not self.stats_log_interval:
+            return
+        now = self._clock()
+        with self._lock:
+            if now - self._last_stats_log < self.stats_log_interval:
+                return
+            self._last_stats_log = now
+        s = self.stats()
+        logger.info(
+            "Rate limiter stats: "
+            + " ".join(
+                f"{c}={s[f'allowed.{c}']}/{s[f'rejected.{c}']} ({s[f'rejection_rate.{c}']:.1%} rejected)"
+                for c in COMMAND_CLASSES
+            )
+        )
+
+    def reset(self):
+        """Forget all buckets (shared ones too) and counters."""
+        with self._lock:
+            self._buckets.clear()
+            self._counters.clear()
+        if self._store is not None:
+            self._store.reset()
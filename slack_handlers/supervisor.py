@@ -0,0 +1,248 @@
+"""
+Run the bot as several worker processes, each with its own Socket Mode connection.
+
+Slack allows several Socket Mode connections per app and spreads events across them, so
+``BOT_WORKER_PROCESSES`` workers use that many CPUs and websockets. The supervisor:
+
+* spawns the workers (not forked, so no SQLite handle, socket or thread is inherited);
+* points every worker at one SQLite de-duplication store, because a Slack retry or the
+  ``app_mention`` / ``message`` pair of one mention may reach different workers, and at one
+  SQLite rate-limit store, because a user's commands are spread across the workers too;
+* restarts a worker that exits unexpectedly, backing off while it keeps crashing;
+* on SIGTERM / SIGINT stops every worker: a worker closes its connection so it gets no new
+  events, drains the commands it already accepted and exits; workers still alive after the
+  drain timeout are killed;
+* on SIGHUP replaces the workers one by one, starting the new worker before the old one drains.
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARED_DEDUP_PATH = os.path.join(
+    tempfile.gettempdir(), "ocp-sustaining-bot-dedup.sqlite3"
+)
+DEFAULT_SHARED_RATE_LIMIT_PATH = os.path.join(
+    tempfile.gettempdir(), "ocp-sustaining-bot-rate-limit.sqlite3"
+)
+
+# A worker that ran at least this long is considered healthy and its restart backoff is reset
+_HEALTHY_RUNTIME = 60
+
+
+def share_dedup_store(current_path=None) -> str:
+    """
+    Make sure worker processes share one de-duplication store. Returns the SQLite path in use;
+    if none is configured, ``DEFAULT_SHARED_DEDUP_PATH`` is exported for the workers.
+    """
+    if current_path:
+        return current_path
+    os.environ["SLACK_DEDUP_DB_PATH"] = DEFAULT_SHARED_DEDUP_PATH
+    logger.info(
+        f"SLACK_DEDUP_DB_PATH not set, workers share {DEFAULT_SHARED_DEDUP_PATH}"
+    )
+    return DEFAULT_SHARED_DEDUP_PATH
+
+
+def share_rate_limit_store(current_path=None) -> str:
+    """
+    Make sure worker processes charge the same rate-limit buckets. Returns the SQLite path in
+    use; if none is configured, ``DEFAULT_SHARED_RATE_LIMIT_PATH`` is exported for the workers.
+    """
+    if current_path:
+        return current_path
+    os.environ["RATE_LIMIT_DB_PATH"] = DEFAULT_SHARED_RATE_LIMIT_PATH
+    logger.info(
+        f"RATE_LIMIT_DB_PATH not set, workers share {DEFAULT_SHARED_RATE_LIMIT_PATH}"
+    )
+    return DEFAULT_SHARED_RATE_LIMIT_PATH
+
+
+def per_worker_limit(limit, processes) -> int:
+    """
+    Share of a per-user ``limit`` that one of ``processes`` workers enforces, rounded up: a
+    user's commands may reach any worker, so the workers together allow about ``limit``.
+    """
+    return math.ceil(limit / max(1, processes))
+
+
+def run_worker(handler, drain, drain_timeout=120, stop_event=None) -> bool:
+    """
+    Body of one bot process: connect ``handler`` (a Socket Mode handler), serve events until
+    SIGTERM / SIGINT (or ``stop_event``), then close the connection and call
+    ``drain(drain_timeout)``. Returns what ``drain`` returned.
+    """
+    stop_event = stop_event or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: stop_event.set())
+
+    handler.connect()
+    logger.info(f"Worker {os.getpid()} connected")
+    # Wake up regularly so that signal handlers run promptly
+    while not stop_event.wait(1):
+        pass
+
+    logger.info(f"Worker {os.getpid()} stopping, draining in-flight commands")
+    try:
+        handler.close()
+    except Exception:
+        logger.exception("Error while closing the Socket Mode connection")
+
+    drained = drain(drain_timeout)
+    if drained:
+        logger.info(f"Worker {os.getpid()} drained")
+    else:
+        logger.warning(
+            f"Worker {os.getpid()} still had commands running after {drain_timeout}s"
+        )
+    return drained
+
+
+class Supervisor:
+    def __init__(
+        self,
+        target,
+        args=(),
+        processes=2,
+        drain_timeout=120,
+        restart_backoff=1,
+        max_restart_backoff=60,
+        poll_interval=1,
+    ):
+        """
+        :param target: Picklable callable run in each worker process, e.g. ``slack_main.serve``.
+        :param args: Arguments for ``target``.
+        :param processes: Number of worker processes.
+        :param drain_timeout: Seconds a stopping worker gets before it is killed.
+        :param restart_backoff: Initial delay before restarting a crashed worker.
+        :param max_restart_backoff: Upper bound of the delay, which doubles on repeated crashes.
+        :param poll_interval: Seconds between worker health checks.
+        """
+        self.target = target
+        self.args = args
+        self.processes = max(1, int(processes))
+        self.drain_timeout = drain_timeout
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.poll_interval = poll_interval
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots = {}  # slot -> {"process", "started_at", "backoff", "restart_at"}
+        self._stop = threading.Event()
+        self._reload = threading.Event()
+        self.restarts = 0
+
+    def _start(self, slot):
+        process = self._ctx.Process(
+            target=self.target,
+            args=self.args,
+            name=f"bot-worker-{slot}",
+            daemon=False,
+        )
+        process.start()
+        state = self._slots.setdefault(slot, {"backoff": self.restart_backoff})
+        state.update(process=process, started_at=time.monotonic(), restart_at=None)
+        logger.info(f"Started worker {slot} (pid {process.pid})")
+        return process
+
+    def _stop_process(self, process):
+        if process.is_alive():
+            process.terminate()  # SIGTERM: close connection and drain
+        process.join(self.drain_timeout + 5)
+        if process.is_alive():
+            logger.warning(
+                f"Worker pid {process.pid} did not drain in time, killing it"
+            )
+            process.kill()
+            process.join(5)
+
+    def pids(self) -> list:
+        return [
+            state["process"].pid
+            for state in self._slots.values()
+            if state.get("process") is not None and state["process"].is_alive()
+        ]
+
+    def stop(self):
+        """Ask ``run`` to stop all workers and return."""
+        self._stop.set()
+
+    def reload(self):
+        """Ask ``run`` to replace every worker, one at a time."""
+        self._reload.set()
+
+    def _install_signal_handlers(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload())
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for slot, state in self._slots.items():
+            process = state["process"]
+            if process is not None and process.is_alive():
+                continue
+
+            if process is not None:
+                process.join(0)
+                ran_for = now - state["started_at"]
+                if ran_for >= _HEALTHY_RUNTIME:
+                    state["backoff"] = self.restart_backoff
+                logger.error(
+                    f"Worker {slot} (pid {process.pid}) exited with code {process.exitcode} "
+                    f"after {ran_for:.0f}s, restarting in {state['backoff']}s"
+                )
+                state["process"] = None
+                state["restart_at"] = now + state["backoff"]
+                state["backoff"] = min(state["backoff"] * 2, self.max_restart_backoff)
+
+            if state["restart_at"] is not None and now >= state["restart_at"]:
+                self.restarts += 1
+                self._start(slot)
+
+    def _rolling_restart(self):
+        logger.info("Replacing workers one at a time")
+        for slot in list(self._slots):
+            old = self._slots[slot]["process"]
+            self._start(slot)
+            if old is not None:
+                self._stop_process(old)
+            if self._stop.is_set():
+                return
+
+    def run(self):
+        """Start the workers and supervise them until stopped. Blocks."""
+        self._install_signal_handlers()
+        for slot in range(self.processes):
+            self._start(slot)
+
+        try:
+            while not self._stop.wait(self.poll_interval):
+                if self._reload.is_set():
+                    self._reload.clear()
+                    self._rolling_restart()
+                self._check_workers()
+        finally:
+            logger.info("Stopping workers")
+            processes = [
+                state["process"]
+                for state in self._slots.values()
+                if state.get("process") is not None
+            ]
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in processes:
+                self._stop_process(process)
+            logger.info("All workers stopped")
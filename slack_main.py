@@ -1,117 +1,141 @@
+import logging
+
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+
 from config import config
-from sdk.tools.helpers import (
-    get_named_and_positional_params,
-    validate_command,
-    remove_bot_username,
-    get_base_command,
+from sdk.tools.help_system import handle_help_command
+from sdk.tools.helpers import get_config_value
+from slack_handlers.commands import (
+    build_deduplicator,
+    build_rate_limiter,
+    command_arguments,
+    not_understood_reply,
+    parse_mention,
+    rate_limited_reply,
 )
-from sdk.tools.help_system import handle_help_command, check_help_flag
-import logging
-
-from slack_handlers.handlers import (
-    handle_create_openstack_vm,
-    handle_list_openstack_vms,
-    handle_hello,
-    handle_create_aws_vm,
-    handle_list_aws_vms,
-    handle_list_team_links,
-    handle_aws_modify_vm,
-    handle_rota,
-    handle_openstack_modify_vm,
-    handle_list_gcp_vms,
-    handle_create_gcp_vm,
-    handle_gcp_modify_vm,
+from slack_handlers.dispatcher import CommandDispatcher, DispatcherClosed
+from slack_handlers.handlers import start_warm_up
+from slack_handlers.provisioning import provisioning_engine
+from slack_handlers.supervisor import (
+    Supervisor,
+    per_worker_limit,
+    run_worker,
+    share_dedup_store,
+    share_rate_limit_store,
 )
 
 logger = logging.getLogger(__name__)
 
 app = App(token=config.SLACK_BOT_TOKEN)
 
+# Commands run on a bounded pool with a FIFO queue per user, so a slow `vm create`
+# never holds the listener or starves other users' commands. With BOT_WORKER_PROCESSES
+# workers, each one takes its share of the per-user limits.
+worker_processes = get_config_value("BOT_WORKER_PROCESSES", 1)
+dispatcher = CommandDispatcher(
+    max_workers=get_config_value("BOT_WORKER_POOL_SIZE", 8),
+    max_per_user=per_worker_limit(
+        get_config_value("BOT_MAX_CONCURRENT_PER_USER", 1), worker_processes
+    ),
+    max_queued_per_user=per_worker_limit(
+        get_config_value("BOT_MAX_QUEUED_PER_USER", 10), worker_processes
+    ),
+    stats_log_interval=get_config_value("BOT_STATS_LOG_INTERVAL", 300),
+)
 
-def is_user_allowed(user_id: str) -> bool:
-    return user_id in config.ALLOWED_SLACK_USERS.values()
+deduplicator = build_deduplicator()
+rate_limiter = build_rate_limiter()
 
 
-# Define the main event handler function
 @app.event("app_mention")
 @app.event("message")
-def mention_handler(body, say):
-    user = body.get("event", {}).get("user")
-
-    # Authorization check
-    if config.ALLOW_ALL_WORKSPACE_USERS:
-        if not is_user_allowed(user):
-            say(
-                f"Sorry <@{user}>, you're not authorized to use this bot.Contact ocp-sustaining-admin@redhat.com for assistance."
-            )
-            return
+def dispatch_event(body, say):
+    """
+    Slack listener: hand the event to the dispatcher and return so it is acked immediately.
+    """
+    if not deduplicator.claim(body):
+        return
 
-    command_line = body.get("event", {}).get("text", "").strip()
-    region = config.AWS_DEFAULT_REGION
+    user = body.get("event", {}).get("user")
 
-    if not validate_command(command_line):
+    try:
+        accepted = dispatcher.submit(user, mention_handler, body, say)
+    except DispatcherClosed:
+        say(f"Sorry <@{user}>, the bot is restarting. Please try again in a minute.")
+        return
+    if not accepted:
         say(
-            f"Hello <@{user}>! I couldn't understand your request. Please try again or type 'help' for assistance."
+            f"Sorry <@{user}>, you already have too many commands waiting. Please try again once they finish."
         )
-        return
 
-    command_line = remove_bot_username(command_line)
 
-    base_command = get_base_command(command_line)
+# Define the main event handler function
+def mention_handler(body, say):
+    parsed = parse_mention(body)
+    user, base_command = parsed.user, parsed.base_command
+    if parsed.reply:
+        say(parsed.reply)
+        return
 
-    # Extract parameters using the utility function
-    named_params, positional_params = get_named_and_positional_params(command_line)
+    region = config.AWS_DEFAULT_REGION
 
-    # Check if this is a help request for a specific command
-    if check_help_flag(command_line):
+    if parsed.is_help:
         handle_help_command(say, user, base_command)
         return
 
-    commands = {
-        "openstack vm create": lambda: handle_create_openstack_vm(
-            say, user, app, named_params
-        ),
-        "openstack vm list": lambda: handle_list_openstack_vms(say, named_params),
-        "openstack vm modify": lambda: handle_openstack_modify_vm(
-            say, user, named_params
-        ),
-        "hello": lambda: handle_hello(say, user),
-        "aws vm create": lambda: handle_create_aws_vm(
-            say,
-            user,
-            region,
-            app,  # pass `app` so that bot can send DM to users
-            named_params,
-        ),
-        "aws vm modify": lambda: handle_aws_modify_vm(say, region, user, named_params),
-        "aws vm list": lambda: handle_list_aws_vms(say, region, user, named_params),
-        "gcp vm list": lambda: handle_list_gcp_vms(say, user, named_params),
-        "gcp vm create": lambda: handle_create_gcp_vm(say, user, named_params),
-        "gcp vm modify": lambda: handle_gcp_modify_vm(say, user, named_params),
-        "project links list": lambda: handle_list_team_links(say, user),
-        "help": lambda: handle_help_command(say, user),
-        "rota": lambda: handle_rota(say, user, named_params),
-    }
-
-    command_function = commands.get(base_command)
-
-    if not command_function:
-        say(
-            f"Hello <@{user}>! I couldn't understand your request. Please try again or type 'help' for assistance."
-        )
+    handler = parsed.handler
+    if handler is None and base_command == "help":
+        handler = handle_help_command  # plain `help` is routed but not registered
+    if handler is None:
+        say(not_understood_reply(user))
+        return
+
+    allowed, retry_after = rate_limiter.acquire(user, base_command, parsed.named_params)
+    if not allowed:
+        say(rate_limited_reply(user, base_command, retry_after))
         return
 
     try:
-        command_function()
-    except Exception as e:
-        logger.error(f"An error occurred and it was caught at the mention_handler: {e}")
+        # `app` lets handlers DM users
+        handler(
+            *command_arguments(handler, say, user, region, app, parsed.named_params)
+        )
+    except Exception:
+        logger.exception("An error occurred and it was caught at the mention_handler")
         say("An internal error occurred, please contact administrator.")
 
 
+def serve():
+    """Run one bot process until SIGTERM/SIGINT, then drain the commands it accepted."""
+    if get_config_value("BOT_WARM_UP", True, cast=bool):
+        start_warm_up()
+    # Reports VM operations that finish in the background, including those resumed from
+    # PROVISIONING_DB_PATH
+    provisioning_engine.start(app.client)
+    try:
+        run_worker(
+            SocketModeHandler(app, config.SLACK_APP_TOKEN),
+            drain=dispatcher.shutdown,
+            drain_timeout=get_config_value("BOT_DRAIN_TIMEOUT", 120),
+        )
+    finally:
+        # Releases the leases of pending jobs, so another process can take them over
+        provisioning_engine.stop()
+
+
 # Main Entry Point
 if __name__ == "__main__":
     logger.info("Starting Slack bot...")
-    handler = SocketModeHandler(app, config.SLACK_APP_TOKEN)
-    handler.start()
+    if worker_processes > 1:
+        # Every worker has its own Socket Mode connection; duplicates must be caught and
+        # rate limits charged across them
+        share_dedup_store(get_config_value("SLACK_DEDUP_DB_PATH", None, cast=str))
+        share_rate_limit_store(get_config_value("RATE_LIMIT_DB_PATH", None, cast=str))
+        Supervisor(
+            serve,
+            processes=worker_processes,
+            drain_timeout=get_config_value("BOT_DRAIN_TIMEOUT", 120),
+        ).run()
+    else:
+        serve()
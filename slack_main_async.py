@@ -0,0 +1,147 @@
+"""
+Async entry point for the bot: ``python slack_main_async.py``.
+
+Same commands and replies as ``slack_main.py``, but on ``AsyncApp`` with the aiohttp Socket
+Mode adapter. Slack I/O is awaited on the event loop, and the handlers run on the executor in
+``slack_handlers.async_handlers``, which they hold only while their own code and cloud SDK calls
+run. Commands waiting for Slack, for a user slot or in the queue hold no thread.
+"""
+
+import asyncio
+import logging
+
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from slack_bolt.async_app import AsyncApp
+from slack_sdk import WebClient
+
+from config import config
+from sdk.tools.help_system import handle_help_command
+from sdk.tools.helpers import get_config_value
+from slack_handlers.async_handlers import (
+    async_handle_help_command,
+    async_variant,
+    shutdown_executor,
+)
+from slack_handlers.commands import (
+    build_deduplicator,
+    build_rate_limiter,
+    command_arguments,
+    not_understood_reply,
+    parse_mention,
+    rate_limited_reply,
+)
+from slack_handlers.handlers import start_warm_up
+from slack_handlers.provisioning import provisioning_engine
+
+logger = logging.getLogger(__name__)
+
+app = AsyncApp(token=config.SLACK_BOT_TOKEN)
+
+deduplicator = build_deduplicator()
+rate_limiter = build_rate_limiter()
+
+# Per-user fairness, as in the sync dispatcher: at most BOT_MAX_CONCURRENT_PER_USER commands
+# of one user run at a time and at most BOT_MAX_QUEUED_PER_USER more wait for a slot.
+max_per_user = max(1, get_config_value("BOT_MAX_CONCURRENT_PER_USER", 1))
+max_queued_per_user = max(0, get_config_value("BOT_MAX_QUEUED_PER_USER", 10))
+
+
+class UserSlots:
+    """Slots of one user's commands, with how many of them wait for a slot and hold one."""
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(max_per_user)
+        self.waiting = 0
+        self.running = 0
+
+
+# Only users with a command waiting or running have an entry
+_user_slots = {}
+
+
+def _release_user_slots(user, slots):
+    if not slots.waiting and not slots.running and _user_slots.get(user) is slots:
+        del _user_slots[user]
+
+
+@app.event("app_mention")
+@app.event("message")
+async def mention_handler(body, say):
+    # The de-duplication store may be SQLite, so it is not queried on the event loop
+    if not await asyncio.to_thread(deduplicator.claim, body):
+        return
+
+    parsed = parse_mention(body)
+    user, base_command = parsed.user, parsed.base_command
+    if parsed.reply:
+        await say(parsed.reply)
+        return
+
+    region = config.AWS_DEFAULT_REGION
+
+    if parsed.is_help:
+        await async_handle_help_command(say, user, base_command)
+        return
+
+    handler = parsed.handler
+    if handler is None and base_command == "help":
+        handler = handle_help_command  # plain `help` is routed but not registered
+    if handler is None:
+        await say(not_understood_reply(user))
+        return
+
+    # May query the shared SQLite buckets (RATE_LIMIT_DB_PATH): keep it off the event loop
+    allowed, retry_after = await asyncio.to_thread(
+        rate_limiter.acquire, user, base_command, parsed.named_params
+    )
+    if not allowed:
+        await say(rate_limited_reply(user, base_command, retry_after))
+        return
+
+    slots = _user_slots.setdefault(user, UserSlots())
+    if slots.semaphore.locked() and slots.waiting >= max_queued_per_user:
+        await say(
+            f"Sorry <@{user}>, you already have too many commands waiting. Please try again once they finish."
+        )
+        return
+
+    slots.waiting += 1
+    try:
+        await slots.semaphore.acquire()
+        slots.running += 1
+    finally:
+        slots.waiting -= 1
+        _release_user_slots(user, slots)  # if cancelled while waiting
+
+    try:
+        arguments = command_arguments(
+            handler, say, user, region, app, parsed.named_params
+        )
+        await async_variant(handler)(*arguments)
+    except Exception:
+        logger.exception("An error occurred and it was caught at the mention_handler")
+        await say("An internal error occurred, please contact administrator.")
+    finally:
+        slots.running -= 1
+        slots.semaphore.release()
+        _release_user_slots(user, slots)
+
+
+async def main():
+    logger.info("Starting Slack bot (async)...")
+    if get_config_value("BOT_WARM_UP", True, cast=bool):
+        start_warm_up()
+    # Background jobs are polled on their own thread; resumed jobs report through this client
+    provisioning_engine.start(WebClient(token=config.SLACK_BOT_TOKEN))
+    handler = AsyncSocketModeHandler(app, config.SLACK_APP_TOKEN)
+    try:
+        await handler.start_async()
+    finally:
+        await handler.close_async()
+        provisioning_engine.stop()
+        shutdown_executor()
+
+
+# Main Entry Point
+if __name__ == "__main__":
+    asyncio.run(main())
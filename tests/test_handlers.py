@@ -1,7 +1,14 @@
 import unittest.mock as mock
 from unittest.mock import MagicMock
 
-from slack_handlers.handlers import handle_aws_modify_vm, handle_openstack_modify_vm
+from sdk.tools.lazy import LazyObject
+from slack_handlers.handlers import (
+    handle_aws_modify_vm,
+    handle_list_aws_vms,
+    handle_list_openstack_vms,
+    handle_openstack_modify_vm,
+    start_warm_up,
+)
 
 
 @mock.patch("slack_handlers.handlers.EC2Helper")
@@ -484,3 +491,331 @@ def test_handle_openstack_modify_vm_with_detailed_response(mock_openstack_helper
     assert "abc123-def456-ghi789" in result_call
     assert "ACTIVE" in result_call
     assert "stopping" in result_call
+
+
+@mock.patch("slack_handlers.handlers.submit_batch_from_handler")
+@mock.patch("slack_handlers.handlers.EC2Helper")
+def test_handle_aws_modify_vm_stop_several(mock_ec2_helper, mock_submit_batch):
+    """Test that --vm-id=a,b stops both in one batch and reports one table."""
+    mock_ec2 = MagicMock()
+    mock_ec2.region = "us-east-1"
+    mock_ec2_helper.return_value = mock_ec2
+    mock_ec2.stop_instances.return_value = [
+        {
+            "success": True,
+            "instance_id": "i-1",
+            "instance_name": "vm-1",
+            "previous_state": "running",
+            "current_state": "stopping",
+        },
+        {"success": False, "instance_id": "i-2", "error": "Instance i-2 not found"},
+    ]
+    mock_submit_batch.return_value = [MagicMock(job_id="job1")]
+    mock_say = MagicMock()
+
+    handle_aws_modify_vm(
+        say=mock_say,
+        region="us-east-1",
+        user="test-user",
+        params_dict={"stop": True, "vm-id": "i-1,i-2,i-1"},
+    )
+
+    mock_ec2.stop_instances.assert_called_once_with(["i-1", "i-2"])
+    mock_ec2.stop_instance.assert_not_called()
+    args, kwargs = mock_submit_batch.call_args
+    assert args[1:] == (
+        "aws",
+        "test-user",
+        [{"region": "us-east-1", "instance_id": "i-1"}],
+    )
+    assert kwargs["operation"] == "stop"
+    assert "1 of 2 VMs" in str(mock_say.call_args_list[1].kwargs["blocks"])
+    table = mock_say.call_args_list[2][0][0]
+    assert "job1" in table and "Instance i-2 not found" in table
+
+
+@mock.patch("slack_handlers.handlers._helper_select_keypair")
+@mock.patch("slack_handlers.handlers.config")
+@mock.patch("slack_handlers.handlers.EC2Helper")
+def test_handle_create_aws_vm_rejected_by_quota(mock_ec2_helper, mock_config, mock_key):
+    """Test that a create beyond the vCPU quota stops before any keypair work."""
+    from slack_handlers.handlers import handle_create_aws_vm, quota_service
+
+    mock_config.AWS_AMI_MAP = {"linux": "ami-123"}
+    mock_ec2 = mock_ec2_helper.return_value
+    mock_ec2.region = "quota-test-region"
+    mock_ec2.quota_demand.return_value = {"vcpus": 8}
+    mock_ec2.get_quota_usage.return_value = {"vcpus": {"limit": 32, "used": 28}}
+    mock_say = MagicMock()
+
+    try:
+        handle_create_aws_vm(
+            mock_say,
+            "U1",
+            "quota-test-region",
+            MagicMock(),
+            {
+                "os_name": "linux",
+                "instance_type": "t3.xlarge",
+                "key_pair": "new",
+                "count": "2",
+            },
+        )
+    finally:
+        quota_service.invalidate("aws")
+
+    mock_ec2.quota_demand.assert_called_once_with("t3.xlarge", 2)
+    mock_key.assert_not_called()
+    mock_ec2.create_instance.assert_not_called()
+    assert "vcpus: needs 8, 4 of 32 left" in mock_say.call_args[0][0]
+
+
+def test_select_keypair_imports_a_local_key_and_caches_it():
+    """Test that a new key is generated locally, imported once and then reused."""
+    from slack_handlers.handlers import _helper_select_keypair, keypair_cache
+
+    cloud = MagicMock(region="us-east-1")
+    cloud.import_keypair.return_value = {"KeyName": "U1", "KeyFingerprint": "aa:bb"}
+    app = MagicMock()
+    mock_say = MagicMock()
+
+    try:
+        new_key = _helper_select_keypair(
+            "new", "U1", app, "AWS", "linux", "t2.micro", mock_say, cloud
+        )
+        existing_key = _helper_select_keypair(
+            "existing", "U1", app, "AWS", "linux", "t2.micro", mock_say, cloud
+        )
+    finally:
+        keypair_cache.clear()
+
+    assert new_key == existing_key == {"KeyName": "U1", "KeyFingerprint": "aa:bb"}
+    name, public_key = cloud.import_keypair.call_args[0]
+    assert name == "U1" and public_key.startswith("ssh-rsa ")
+    assert "PRIVATE KEY" in app.client.chat_postMessage.call_args.kwargs["text"]
+    cloud.describe_keypair.assert_not_called()
+    cloud.delete_keypair.assert_not_called()
+    cloud.create_keypair.assert_not_called()
+
+
+@mock.patch("slack_handlers.handlers.EC2Helper")
+def test_handle_list_aws_vms_with_limit(mock_ec2_helper):
+    """Test that --limit is passed on and a truncated listing is pointed out."""
+    mock_ec2 = MagicMock()
+    mock_ec2_helper.return_value = mock_ec2
+    mock_ec2.list_instances.return_value = {
+        "count": 1,
+        "instances": [{"instance_id": "i-1", "name": "vm", "state": "running"}],
+        "truncated": True,
+    }
+    mock_say = MagicMock()
+
+    params = {"state": "running", "limit": "1"}
+    handle_list_aws_vms(mock_say, "us-east-1", "test-user", params)
+
+    mock_ec2.list_instances.assert_called_once_with(params, limit=1)
+    assert "raise `--limit`" in mock_say.call_args_list[-1][0][0]
+
+
+@mock.patch("slack_handlers.handlers.EC2Helper")
+def test_handle_list_aws_vms_invalid_limit(mock_ec2_helper):
+    """Test that a non-numeric --limit is rejected before calling AWS."""
+    mock_say = MagicMock()
+
+    handle_list_aws_vms(mock_say, "us-east-1", "test-user", {"limit": "all"})
+
+    mock_ec2_helper.assert_not_called()
+    assert "`--limit` must be a positive whole number" in mock_say.call_args[0][0]
+
+
+@mock.patch("slack_handlers.handlers.EC2Helper")
+def test_handle_list_aws_vms_all_regions(mock_ec2_helper):
+    """Test that --region=all lists every enabled region and reports failing ones."""
+    mock_ec2 = MagicMock()
+    mock_ec2_helper.return_value = mock_ec2
+    mock_ec2.list_regions.return_value = ["eu-west-1", "us-east-1"]
+    mock_ec2.list_instances_in_regions.return_value = {
+        "count": 1,
+        "instances": [
+            {"region": "us-east-1", "instance_id": "i-1", "state": "running"}
+        ],
+        "errors": {"eu-west-1": "AuthFailure"},
+    }
+    mock_say = MagicMock()
+
+    params = {"region": "all"}
+    handle_list_aws_vms(mock_say, "us-east-1", "test-user", params)
+
+    mock_ec2.list_instances_in_regions.assert_called_once_with(
+        ["eu-west-1", "us-east-1"], params, limit=None
+    )
+    mock_ec2.list_instances.assert_not_called()
+    table = mock_say.call_args_list[1][0][0]
+    assert "region" in table and "us-east-1" in table
+    assert "`eu-west-1`: AuthFailure" in mock_say.call_args_list[-1][0][0]
+
+
+@mock.patch("slack_handlers.handlers.OpenStackHelper")
+def test_handle_list_openstack_vms_several_statuses_paged(mock_openstack_helper):
+    """Test that several statuses are accepted and the next page is pointed out."""
+    mock_openstack = MagicMock()
+    mock_openstack_helper.return_value = mock_openstack
+    mock_openstack.list_servers.return_value = {
+        "count": 1,
+        "instances": [{"server_id": "s-1", "name": "vm", "status": "SHUTOFF"}],
+        "page": 2,
+        "truncated": True,
+    }
+    mock_say = MagicMock()
+
+    params = {"status": "active,shutoff", "limit": "1", "page": "2"}
+    handle_list_openstack_vms(mock_say, params)
+
+    mock_openstack.list_servers.assert_called_once_with(params)
+    assert "`--page=3`" in mock_say.call_args_list[-1][0][0]
+
+
+@mock.patch("slack_handlers.handlers.OpenStackHelper")
+def test_handle_list_openstack_vms_invalid_status(mock_openstack_helper):
+    """Test that one unsupported status in the list is rejected before listing."""
+    mock_say = MagicMock()
+
+    handle_list_openstack_vms(mock_say, {"status": "ACTIVE,BUILD"})
+
+    mock_openstack_helper.assert_not_called()
+    assert "Invalid status filter *BUILD*" in mock_say.call_args[0][0]
+
+
+@mock.patch("slack_handlers.handlers.OpenStackHelper")
+def test_handle_list_openstack_vms_invalid_changed_since(mock_openstack_helper):
+    """Test that an unreadable --changed-since is rejected before listing."""
+    mock_say = MagicMock()
+
+    handle_list_openstack_vms(mock_say, {"changed-since": "yesterday"})
+
+    mock_openstack_helper.assert_not_called()
+    assert "`--changed-since`" in mock_say.call_args[0][0]
+
+
+@mock.patch("slack_handlers.handlers.OpenStackHelper")
+def test_handle_list_openstack_vms_points_to_fresh(mock_openstack_helper):
+    """Test that a listing from the inventory says how old it is."""
+    mock_openstack_helper.return_value.list_servers.return_value = {
+        "count": 1,
+        "instances": [{"server_id": "s-1", "name": "vm", "status": "ACTIVE"}],
+        "snapshot_age": 12.0,
+    }
+    mock_say = MagicMock()
+
+    handle_list_openstack_vms(mock_say, {"name": "^vm", "key": "my-key"})
+
+    assert "synced 12s ago" in mock_say.call_args_list[-1][0][0]
+
+
+@mock.patch("slack_handlers.handlers.openstack_catalog")
+@mock.patch("slack_handlers.handlers.config")
+@mock.patch("slack_handlers.handlers.OpenStackHelper")
+def test_handle_create_openstack_vm_unknown_flavor(
+    mock_openstack_helper, mock_config, mock_catalog
+):
+    """Test that a flavor missing from the catalog is rejected before any OpenStack call."""
+    from slack_handlers.handlers import handle_create_openstack_vm
+
+    mock_config.OS_IMAGE_MAP = {"fedora": "img-1"}
+    mock_config.OS_NETWORK_MAP = {"private": "net-1"}
+    mock_config.OS_DEFAULT_NETWORK = "private"
+    mock_catalog.validate.return_value = [
+        "Unknown flavor `m1.smal`. Available flavors: m1.small"
+    ]
+    mock_say = MagicMock()
+
+    handle_create_openstack_vm(
+        mock_say,
+        "U1",
+        MagicMock(),
+        {
+            "name": "vm",
+            "os_name": "fedora",
+            "flavor": "m1.smal",
+            "key_pair": "new",
+        },
+    )
+
+    mock_catalog.validate.assert_called_once_with(
+        flavor="m1.smal", image="img-1", network="net-1"
+    )
+    mock_openstack_helper.assert_not_called()
+    assert "Unknown flavor `m1.smal`" in mock_say.call_args[0][0]
+
+
+@mock.patch("slack_handlers.handlers.OpenStackHelper")
+def test_handle_openstack_modify_vm_by_filter_and_wait(mock_openstack_helper):
+    """Test that filters select the servers and --wait shows their final status."""
+    mock_openstack = mock_openstack_helper.return_value
+    server = MagicMock(id="id-1")
+    server.name = "ci-42-a"
+    mock_openstack.find_servers.return_value = [server]
+    mock_openstack.modify_servers.return_value = [
+        {
+            "success": True,
+            "server_id": "id-1",
+            "server_name": "ci-42-a",
+            "previous_status": "ACTIVE",
+            "current_status": "DELETED",
+        }
+    ]
+    mock_say = MagicMock()
+
+    handle_openstack_modify_vm(
+        mock_say,
+        "test_user",
+        {"delete": True, "name-prefix": "ci-42-", "status": "ACTIVE", "wait": True},
+    )
+
+    mock_openstack.find_servers.assert_called_once_with(
+        name_prefix="ci-42-", statuses=["ACTIVE"], key_name=None
+    )
+    args, kwargs = mock_openstack.modify_servers.call_args
+    assert args == ([server], "delete") and kwargs["wait"] is True
+    table = mock_say.call_args_list[-1][0][0]
+    assert "id-1" in table and "DELETED" in table
+
+
+@mock.patch("slack_handlers.handlers.OpenStackHelper")
+def test_handle_openstack_modify_vm_filter_matches_too_many(mock_openstack_helper):
+    """Test that a filter matching more than VM_MODIFY_MAX_COUNT servers is refused."""
+    mock_openstack = mock_openstack_helper.return_value
+    mock_openstack.find_servers.return_value = [MagicMock() for _ in range(21)]
+    mock_say = MagicMock()
+
+    handle_openstack_modify_vm(mock_say, "test_user", {"stop": True, "key": "k"})
+
+    mock_openstack.modify_servers.assert_not_called()
+    assert "21 servers match the filters" in mock_say.call_args[0][0]
+
+
+def test_progress_table_edits_one_message():
+    """Test that each result edits the progress message into a table."""
+    from slack_handlers.handlers import _helper_progress_table
+
+    mock_say = MagicMock(return_value={"channel": "C1", "ts": "1.0"})
+    on_result = _helper_progress_table(mock_say, "stop", 1, ["server_id"])
+
+    on_result({"success": True, "server_id": "id-1"})
+
+    mock_say.client.chat_update.assert_called_once()
+    kwargs = mock_say.client.chat_update.call_args.kwargs
+    assert kwargs["ts"] == "1.0" and "1 of 1 VMs done" in kwargs["text"]
+    assert "id-1" in kwargs["text"]
+
+
+def test_start_warm_up_connects_the_rota_sheet():
+    """The handlers' ``gsheet`` proxies the module's LazyObject, which must be built too."""
+    sheet_class = MagicMock()
+    with (
+        mock.patch("sdk.gsheet.gsheet.gsheet", LazyObject(sheet_class, name="gsheet")),
+        mock.patch("slack_handlers.handlers._start_aws_inventory"),
+    ):
+        start_warm_up().join(timeout=60)
+
+    sheet_class.assert_called_once_with()
@@ -1,15 +1,46 @@
 import os
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, create_autospec, patch
 
 os.environ["SLACK_BOT_TOKEN"] = "fake-token-for-testing"
 os.environ["SLACK_APP_TOKEN"] = "fake-token-for-testing"
 
+import sqlite3
 import sys
+import time
+
+import pytest
 
 with patch("slack_sdk.web.client.WebClient.auth_test", return_value={"ok": True}):
     if "slack_main" in sys.modules:
         del sys.modules["slack_main"]
-    from slack_main import mention_handler
+    from slack_main import mention_handler, rate_limiter
+
+from sdk.tools.help_system import COMMAND_REGISTRY, register_command
+
+
+class patch_command:
+    """
+    Like ``patch``, for the handler the router returns for a registered command: a mock with
+    the handler's signature, so the mention handler passes it the same arguments.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.handler = COMMAND_REGISTRY[name]
+        self.mock = create_autospec(self.handler)
+
+    def start(self):
+        COMMAND_REGISTRY[self.name] = self.mock
+        return self.mock
+
+    def stop(self):
+        COMMAND_REGISTRY[self.name] = self.handler
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
 
 
 class MockCommand:
@@ -19,15 +50,13 @@ class MockCommand:
     def setup_mocks():
         """Set up all necessary mocks for mention_handler testing - only command handlers"""
         return {
-            "handle_create_openstack_vm": patch(
-                "slack_main.handle_create_openstack_vm"
-            ),
-            "handle_list_openstack_vms": patch("slack_main.handle_list_openstack_vms"),
-            "handle_hello": patch("slack_main.handle_hello"),
-            "handle_create_aws_vm": patch("slack_main.handle_create_aws_vm"),
-            "handle_list_aws_vms": patch("slack_main.handle_list_aws_vms"),
-            "handle_aws_modify_vm": patch("slack_main.handle_aws_modify_vm"),
-            "handle_list_team_links": patch("slack_main.handle_list_team_links"),
+            "handle_create_openstack_vm": patch_command("openstack vm create"),
+            "handle_list_openstack_vms": patch_command("openstack vm list"),
+            "handle_hello": patch_command("hello"),
+            "handle_create_aws_vm": patch_command("aws vm create"),
+            "handle_list_aws_vms": patch_command("aws vm list"),
+            "handle_aws_modify_vm": patch_command("aws vm modify"),
+            "handle_list_team_links": patch_command("project links list"),
             "handle_help_command": patch("slack_main.handle_help_command"),
         }
 
@@ -43,6 +72,7 @@ class TestSlackCommands:
     def setup_method(self):
         self.mock_say = MagicMock()
         self.mocks = MockCommand.setup_mocks()
+        rate_limiter.reset()
 
         for mock_name, mock_patch in self.mocks.items():
             setattr(self, f"mock_{mock_name}", mock_patch.start())
@@ -148,6 +178,33 @@ class TestSlackCommands:
         call_args = self.mock_say.call_args[0][0]
         assert "couldn't understand" in call_args
 
+    def test_registered_command_runs_without_an_entry_point_table(self):
+        """Test that the handler comes from the router, with the arguments it names"""
+
+        def handle_ping(say, user, params_dict):
+            say(f"pong <@{user}> {params_dict}")
+
+        register_command("ping", handle_ping, {"description": "Ping the bot"})
+        try:
+            self.call_mention_handler("ping --count=2")
+        finally:
+            COMMAND_REGISTRY.pop("ping")
+
+        self.mock_say.assert_called_once_with("pong <@U123456> {'count': '2'}")
+
+    def test_command_arguments_follow_the_handler_parameters(self):
+        """Test that each handler gets the arguments named by its parameters, in order"""
+        from slack_handlers.commands import command_arguments
+
+        def handler(say, region, user, params_dict, command_name=None):
+            pass
+
+        arguments = command_arguments(handler, "say", "U1", "eu-west-1", "app", {})
+        assert arguments == ["say", "eu-west-1", "U1", {}]
+
+        with pytest.raises(TypeError):
+            command_arguments(lambda say, channel: None, "say", "U1", None, None, {})
+
     def test_empty_body_event(self):
         """Test handling of empty or malformed body event"""
         body = {}
@@ -159,3 +216,956 @@ class TestSlackCommands:
         body = {"event": {}}
 
         mention_handler(body, self.mock_say)
+
+
+class TestCommandDispatcher:
+    """Test class for the bounded, per-user fair command dispatcher"""
+
+    def test_dispatch_event_runs_command_via_dispatcher(self):
+        """Test that the Slack listener hands the event to the dispatcher"""
+        from slack_main import dispatch_event, dispatcher
+
+        mock_say = MagicMock()
+        with patch_command("hello") as mock_handle_hello:
+            dispatch_event(MockCommand.create_mock_body("hello"), mock_say)
+            assert dispatcher.wait_idle(timeout=5)
+
+        mock_handle_hello.assert_called_once_with(mock_say, "U123456")
+
+    def test_slow_user_does_not_block_other_users(self):
+        """Test that one user's long command does not starve another user"""
+        import threading
+
+        from slack_handlers.dispatcher import CommandDispatcher
+
+        dispatcher = CommandDispatcher(max_workers=2, max_per_user=1)
+        release = threading.Event()
+        fast_done = threading.Event()
+
+        dispatcher.submit("U1", release.wait, 5)
+        dispatcher.submit("U1", release.wait, 5)  # queued behind U1's first command
+        dispatcher.submit("U2", fast_done.set)
+
+        assert fast_done.wait(timeout=2)
+        assert dispatcher.stats()["queue_depth"] == 1
+
+        release.set()
+        assert dispatcher.shutdown(timeout=5)
+        stats = dispatcher.stats()
+        assert stats["completed"] == 3
+        assert stats["queue_depth"] == 0
+
+    def test_user_queue_limit_rejects_commands(self):
+        """Test that a user cannot queue more than max_queued_per_user commands"""
+        import threading
+
+        from slack_handlers.dispatcher import CommandDispatcher
+
+        dispatcher = CommandDispatcher(
+            max_workers=1, max_per_user=1, max_queued_per_user=1
+        )
+        release = threading.Event()
+
+        assert dispatcher.submit("U1", release.wait, 5)
+        assert dispatcher.submit("U1", release.wait, 5)
+        assert not dispatcher.submit("U1", release.wait, 5)
+
+        release.set()
+        assert dispatcher.shutdown(timeout=5)
+        assert dispatcher.stats()["rejected"] == 1
+
+    def test_submit_after_shutdown_raises(self):
+        """Test that a closed dispatcher is reported apart from a full user queue"""
+        from slack_handlers.dispatcher import CommandDispatcher, DispatcherClosed
+
+        dispatcher = CommandDispatcher(max_workers=1)
+        assert dispatcher.shutdown(timeout=5)
+
+        with pytest.raises(DispatcherClosed):
+            dispatcher.submit("U1", lambda: None)
+        assert dispatcher.stats()["rejected"] == 0
+
+    def test_dispatch_event_while_restarting_replies_restarting(self):
+        """Test that the listener tells the user the bot is restarting"""
+        from slack_handlers.dispatcher import DispatcherClosed
+
+        mock_say = MagicMock()
+        with (
+            patch("slack_main.deduplicator") as mock_dedup,
+            patch("slack_main.dispatcher") as mock_dispatcher,
+        ):
+            from slack_main import dispatch_event
+
+            mock_dedup.claim.return_value = True
+            mock_dispatcher.submit.side_effect = DispatcherClosed("closing")
+            dispatch_event(MockCommand.create_mock_body("hello"), mock_say)
+
+        reply = mock_say.call_args[0][0]
+        assert "restarting" in reply
+        assert "too many commands" not in reply
+
+    def test_failed_command_is_counted(self):
+        """Test that an exception in a command frees the user's slot"""
+        from slack_handlers.dispatcher import CommandDispatcher
+
+        dispatcher = CommandDispatcher(max_workers=1)
+
+        def boom():
+            raise RuntimeError("boom")
+
+        dispatcher.submit("U1", boom)
+        dispatcher.submit("U1", lambda: None)
+
+        assert dispatcher.shutdown(timeout=5)
+        stats = dispatcher.stats()
+        assert stats["failed"] == 1
+        assert stats["completed"] == 1
+
+
+class TestEventDeduplicator:
+    """Test class for dropping duplicate Slack event deliveries"""
+
+    @staticmethod
+    def create_event(event_id, event_type="app_mention"):
+        return {
+            "event_id": event_id,
+            "event": {
+                "type": event_type,
+                "user": "U123456",
+                "text": "hello",
+                "client_msg_id": "client-msg-1",
+                "channel": "C123",
+                "ts": "1700000000.000100",
+            },
+        }
+
+    def test_retry_is_dropped(self):
+        """Test that a redelivered event (same event_id) is processed once"""
+        from slack_handlers.dedup import EventDeduplicator
+
+        deduplicator = EventDeduplicator()
+        body = self.create_event("Ev1")
+
+        assert deduplicator.claim(body)
+        assert not deduplicator.claim(body)
+        assert deduplicator.duplicates == 1
+
+    def test_app_mention_and_message_pair_is_dropped(self):
+        """Test that the message copy of an app_mention is dropped"""
+        from slack_handlers.dedup import EventDeduplicator
+
+        deduplicator = EventDeduplicator()
+
+        assert deduplicator.claim(self.create_event("Ev1", "app_mention"))
+        assert not deduplicator.claim(self.create_event("Ev2", "message"))
+
+    def test_events_without_ids_are_processed(self):
+        """Test that malformed bodies are never dropped"""
+        from slack_handlers.dedup import EventDeduplicator
+
+        deduplicator = EventDeduplicator()
+
+        assert deduplicator.claim({})
+        assert deduplicator.claim({})
+
+    def test_entries_expire(self):
+        """Test that seen events are forgotten after the TTL"""
+        import time
+
+        from slack_handlers.dedup import EventDeduplicator
+
+        deduplicator = EventDeduplicator(ttl=0.05)
+        body = self.create_event("Ev1")
+
+        assert deduplicator.claim(body)
+        time.sleep(0.1)
+        assert deduplicator.claim(body)
+
+    def test_sqlite_backend_is_shared(self, tmp_path):
+        """Test that two deduplicators on the same SQLite file share seen events"""
+        from slack_handlers.dedup import EventDeduplicator
+
+        db_path = str(tmp_path / "dedup.sqlite")
+        replica_a = EventDeduplicator(db_path=db_path)
+        replica_b = EventDeduplicator(db_path=db_path)
+
+        assert replica_a.claim(self.create_event("Ev1"))
+        assert not replica_b.claim(self.create_event("Ev1"))
+        other_message = self.create_event("Ev3")
+        other_message["event"].update({"client_msg_id": "client-msg-2", "ts": "2.0"})
+        assert replica_b.claim(other_message)
+
+    def test_dispatch_event_drops_duplicates(self):
+        """Test that the Slack listener runs a doubly delivered mention once"""
+        from slack_main import dispatch_event, dispatcher
+
+        mock_say = MagicMock()
+        with patch_command("hello") as mock_handle_hello:
+            dispatch_event(self.create_event("EvDup1", "app_mention"), mock_say)
+            dispatch_event(self.create_event("EvDup2", "message"), mock_say)
+            assert dispatcher.wait_idle(timeout=5)
+
+        mock_handle_hello.assert_called_once()
+
+
+class TestRateLimiter:
+    """Test class for token-bucket admission control"""
+
+    def setup_method(self):
+        self.now = [0.0]
+
+    def create_limiter(self, limits):
+        from slack_handlers.rate_limit import RateLimiter
+
+        return RateLimiter(limits=limits, clock=lambda: self.now[0])
+
+    def test_classify_command(self):
+        """Test mapping of base commands to rate-limit classes"""
+        from slack_handlers.rate_limit import classify_command
+
+        assert classify_command("aws vm create") == "create"
+        assert classify_command("gcp vm modify") == "mutate"
+        assert classify_command("openstack vm list") == "read"
+        assert classify_command("hello") == "read"
+        assert classify_command("rota", {"check": True}) == "read"
+        assert classify_command("rota", {"add": True}) == "mutate"
+        assert classify_command("rota", {"replace": True, "check": True}) == "mutate"
+        assert classify_command("rota") == "mutate"
+
+    def test_per_class_limit_with_retry_after(self):
+        """Test that a user's creates are limited and report when to retry"""
+        limiter = self.create_limiter({"create": "2/60"})
+
+        assert limiter.acquire("U1", "aws vm create") == (True, 0)
+        assert limiter.acquire("U1", "gcp vm create") == (True, 0)
+        allowed, retry_after = limiter.acquire("U1", "aws vm create")
+        assert not allowed
+        assert retry_after == 30
+
+        # other classes and other users are unaffected
+        assert limiter.acquire("U1", "aws vm list")[0]
+        assert limiter.acquire("U2", "aws vm create")[0]
+
+        self.now[0] = 30
+        assert limiter.acquire("U1", "aws vm create")[0]
+
+    def test_global_limit_applies_across_users(self):
+        """Test that the global bucket is shared by every user"""
+        limiter = self.create_limiter({"global": "2/10"})
+
+        assert limiter.acquire("U1", "aws vm list")[0]
+        assert limiter.acquire("U2", "aws vm list")[0]
+        assert not limiter.acquire("U3", "aws vm list")[0]
+
+        stats = limiter.stats()
+        assert stats["allowed.read"] == 2
+        assert stats["rejected.read"] == 1
+        assert stats["rejected_by.global"] == 1
+        assert round(stats["rejection_rate.read"], 2) == 0.33
+
+    def test_rejected_command_is_not_charged(self):
+        """Test that a rejection does not consume tokens from the other buckets"""
+        limiter = self.create_limiter({"user": "5/60", "create": "1/60"})
+
+        assert limiter.acquire("U1", "aws vm create")[0]
+        for _ in range(3):
+            assert not limiter.acquire("U1", "aws vm create")[0]
+        for _ in range(4):
+            assert limiter.acquire("U1", "aws vm list")[0]
+
+    def test_invalid_limits_fall_back_to_defaults(self):
+        """Test that a malformed limit does not disable rate limiting"""
+        from slack_handlers.rate_limit import DEFAULT_LIMITS, parse_limit
+
+        limiter = self.create_limiter({"create": "lots"})
+        assert limiter._limits["create"] == parse_limit(DEFAULT_LIMITS["create"])
+
+    def test_limit_below_one_token_is_rejected(self):
+        """Test that a capacity which could never admit a command is not used"""
+        from slack_handlers.rate_limit import DEFAULT_LIMITS, parse_limit
+
+        with pytest.raises(ValueError, match="at least 1 token"):
+            parse_limit("0.5/60")
+        limiter = self.create_limiter({"read": "0.5/60"})
+        assert limiter._limits["read"] == parse_limit(DEFAULT_LIMITS["read"])
+        assert limiter.acquire("U1", "aws vm list")[0]
+
+    def test_full_idle_buckets_are_pruned(self):
+        """Test that buckets are dropped once refilled, without changing the limits"""
+        limiter = self.create_limiter({"create": "2/600"})
+
+        for user in ("U1", "U2", "U3"):
+            assert limiter.acquire(user, "aws vm create")[0]
+        assert limiter.acquire("U1", "aws vm create")[0]
+        assert len(limiter._buckets) == 7  # 3 user + 3 create + 1 global
+
+        # The user and global buckets have refilled, the create buckets have not
+        self.now[0] = 70
+        assert not limiter.acquire("U1", "aws vm create")[0]
+        assert set(limiter._buckets) == {
+            ("create", "U1"),
+            ("create", "U2"),
+            ("create", "U3"),
+            ("user", "U1"),
+            ("global", "create"),
+        }
+
+        self.now[0] = 700
+        assert limiter.acquire("U4", "aws vm list")[0]
+        assert set(limiter._buckets) == {
+            ("user", "U4"),
+            ("read", "U4"),
+            ("global", "read"),
+        }
+
+    def test_limiters_sharing_a_db_path_charge_the_same_buckets(self, tmp_path):
+        """Test that two bot processes pointed at one SQLite file enforce one limit"""
+        from slack_handlers.rate_limit import RateLimiter
+
+        db_path = str(tmp_path / "rate-limit.sqlite3")
+        first, second = (
+            RateLimiter(
+                limits={"create": "2/60"}, clock=lambda: self.now[0], db_path=db_path
+            )
+            for _ in range(2)
+        )
+
+        assert first.acquire("U1", "aws vm create") == (True, 0)
+        assert second.acquire("U1", "gcp vm create") == (True, 0)
+        assert first.acquire("U1", "aws vm create") == (False, 30)
+        assert second.acquire("U1", "aws vm create") == (False, 30)
+        # a rejection charged nothing, and other users have their own buckets
+        assert second.acquire("U2", "aws vm create")[0]
+        assert second.stats()["rejected.create"] == 1
+
+        self.now[0] = 30
+        assert second.acquire("U1", "aws vm create")[0]
+        assert not first.acquire("U1", "aws vm create")[0]
+
+    def test_unusable_shared_store_allows_commands(self, tmp_path):
+        """Test that a failing SQLite store does not block commands"""
+        from slack_handlers.rate_limit import RateLimiter
+
+        limiter = RateLimiter(
+            limits={"create": "1/60"}, db_path=str(tmp_path / "rl.sqlite3")
+        )
+        with patch.object(
+            limiter._store, "charge", side_effect=sqlite3.OperationalError("locked")
+        ):
+            assert limiter.acquire("U1", "aws vm create") == (True, 0)
+            assert limiter.acquire("U1", "aws vm create") == (True, 0)
+
+    def test_mention_handler_replies_with_retry_time(self):
+        """Test that a rate-limited command gets a clear reply and is not run"""
+        mock_say = MagicMock()
+        with (
+            patch_command("aws vm create") as mock_create,
+            patch.object(rate_limiter, "acquire", return_value=(False, 42)),
+        ):
+            mention_handler(
+                MockCommand.create_mock_body(
+                    "aws vm create --os_name=linux --instance_type=t2.micro --key_pair=new"
+                ),
+                mock_say,
+            )
+
+        mock_create.assert_not_called()
+        assert "try again in 42 s" in mock_say.call_args[0][0]
+
+
+class TestAsyncBot:
+    """Test class for the async entry point and the awaitable handler layer"""
+
+    def setup_method(self):
+        import slack_main_async
+
+        self.bot = slack_main_async
+        self.bot.rate_limiter.reset()
+
+    def run_mention(self, text, say, user="U123456"):
+        import asyncio
+
+        body = MockCommand.create_mock_body(text, user)
+        asyncio.run(self.bot.mention_handler(body, say))
+
+    def test_async_handler_posts_through_event_loop(self):
+        """Test that the sync handler runs off-loop and its Slack posts are awaited on the loop"""
+        import asyncio
+        import threading
+
+        from slack_handlers.async_handlers import make_async
+
+        threads = {}
+
+        async def async_say(text):
+            threads["say"] = threading.current_thread()
+            return {"ok": True, "text": text}
+
+        def handler(say, user):
+            threads["handler"] = threading.current_thread()
+            return say(f"Hello <@{user}>")
+
+        async def run():
+            threads["loop"] = threading.current_thread()
+            return await make_async(handler)(async_say, "U1")
+
+        result = asyncio.run(run())
+
+        assert result == {"ok": True, "text": "Hello <@U1>"}
+        assert threads["say"] is threads["loop"]
+        assert threads["handler"] is not threads["loop"]
+
+    def test_async_mention_runs_command(self):
+        """Test that a mention is routed to the awaitable handler"""
+        from unittest.mock import AsyncMock
+
+        say = AsyncMock()
+        with patch_command("hello") as mock_hello:
+            self.run_mention("hello", say)
+
+        # Run off the loop, with a `say` that hands the posts back to it
+        mock_hello.assert_called_once()
+        assert mock_hello.call_args.args[1] == "U123456"
+
+    def test_async_mention_unknown_command(self):
+        """Test that the async bot replies to unknown commands itself"""
+        from unittest.mock import AsyncMock
+
+        say = AsyncMock()
+        self.run_mention("@bot unknown param", say)
+
+        say.assert_awaited_once()
+        assert "couldn't understand" in say.call_args[0][0]
+
+    def test_many_commands_in_flight(self):
+        """Test that commands of different users run concurrently on one loop"""
+        import asyncio
+        import time
+
+        from slack_handlers.async_handlers import make_async
+
+        slow_handler = make_async(lambda say, user: time.sleep(0.2))
+
+        async def run():
+            start = time.monotonic()
+            await asyncio.gather(*(slow_handler(None, f"U{i}") for i in range(20)))
+            return time.monotonic() - start
+
+        assert asyncio.run(run()) < 2
+
+    def test_slack_posts_do_not_hold_an_executor_thread(self):
+        """Test that commands waiting for Slack leave the executor to others, in order"""
+        import asyncio
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        from slack_handlers import async_handlers
+
+        posted = []
+
+        async def slow_say(text):
+            await asyncio.sleep(0.2)
+            posted.append(text)
+
+        def handler(say, user):
+            say(f"{user} first")
+            say(f"{user} second")
+
+        async def run():
+            start = time.monotonic()
+            await asyncio.gather(
+                *(
+                    async_handlers.make_async(handler)(slow_say, f"U{i}")
+                    for i in range(10)
+                )
+            )
+            return time.monotonic() - start
+
+        with patch.object(async_handlers, "_executor", ThreadPoolExecutor(1)):
+            elapsed = asyncio.run(run())
+
+        # One thread and 20 posts of 0.2 s: only the posts of one user are serialized
+        assert elapsed < 1
+        assert posted.index("U3 first") < posted.index("U3 second")
+
+    def test_user_slots_are_forgotten_once_idle(self):
+        """Test that a user's slots are dropped when no command of theirs waits or runs"""
+        from unittest.mock import AsyncMock
+
+        with patch_command("hello"):
+            self.run_mention("hello", AsyncMock(), user="U987")
+
+        assert self.bot._user_slots == {}
+
+    def test_dedup_claim_runs_off_the_event_loop(self):
+        """Test that the (possibly SQLite) de-duplication store is not queried on the loop"""
+        import threading
+        from unittest.mock import AsyncMock
+
+        threads = []
+
+        def claim(body):
+            threads.append(threading.current_thread())
+            return False
+
+        with patch.object(self.bot.deduplicator, "claim", side_effect=claim):
+            self.run_mention("hello", AsyncMock())
+
+        assert threads
+        assert threads[0] is not threading.main_thread()
+
+
+class TestSupervisor:
+    """Test class for the multi-process Socket Mode supervisor"""
+
+    def test_worker_closes_connection_then_drains(self):
+        """Test that a stopping worker stops receiving events before draining commands"""
+        import threading
+
+        from slack_handlers.supervisor import run_worker
+
+        calls = []
+        handler = MagicMock()
+        handler.close.side_effect = lambda: calls.append("close")
+        stop = threading.Event()
+        stop.set()
+
+        def drain(timeout):
+            calls.append(("drain", timeout))
+            return True
+
+        assert run_worker(handler, drain, drain_timeout=7, stop_event=stop)
+        handler.connect.assert_called_once()
+        assert calls == ["close", ("drain", 7)]
+
+    def test_crashed_worker_is_restarted_and_all_stop(self):
+        """Test that a killed worker is replaced and stop() terminates every worker"""
+        import os
+        import signal
+        import threading
+        import time
+
+        from slack_handlers.supervisor import Supervisor
+
+        supervisor = Supervisor(
+            time.sleep,
+            args=(60,),
+            processes=2,
+            drain_timeout=5,
+            restart_backoff=0,
+            poll_interval=0.05,
+        )
+        runner = threading.Thread(target=supervisor.run)
+        runner.start()
+        try:
+            deadline = time.monotonic() + 30
+            while len(supervisor.pids()) < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            pids = supervisor.pids()
+            assert len(pids) == 2
+
+            os.kill(pids[0], signal.SIGKILL)
+            while supervisor.restarts < 1 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            while len(supervisor.pids()) < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert supervisor.restarts == 1
+            assert pids[0] not in supervisor.pids()
+            assert len(supervisor.pids()) == 2
+        finally:
+            supervisor.stop()
+            runner.join(30)
+
+        assert not runner.is_alive()
+        assert supervisor.pids() == []
+
+    def test_share_dedup_store_defaults_to_one_file(self, monkeypatch):
+        """Test that workers get a shared de-duplication store when none is configured"""
+        from slack_handlers.supervisor import (
+            DEFAULT_SHARED_DEDUP_PATH,
+            share_dedup_store,
+        )
+
+        monkeypatch.delenv("SLACK_DEDUP_DB_PATH", raising=False)
+        assert share_dedup_store("/data/dedup.db") == "/data/dedup.db"
+        assert share_dedup_store(None) == DEFAULT_SHARED_DEDUP_PATH
+        assert os.environ["SLACK_DEDUP_DB_PATH"] == DEFAULT_SHARED_DEDUP_PATH
+
+    def test_share_rate_limit_store_defaults_to_one_file(self, monkeypatch):
+        """Test that workers get shared rate-limit buckets when none are configured"""
+        from slack_handlers.supervisor import (
+            DEFAULT_SHARED_RATE_LIMIT_PATH,
+            share_rate_limit_store,
+        )
+
+        monkeypatch.delenv("RATE_LIMIT_DB_PATH", raising=False)
+        assert share_rate_limit_store("/data/rl.db") == "/data/rl.db"
+        assert share_rate_limit_store(None) == DEFAULT_SHARED_RATE_LIMIT_PATH
+        assert os.environ["RATE_LIMIT_DB_PATH"] == DEFAULT_SHARED_RATE_LIMIT_PATH
+
+    def test_per_user_limits_are_divided_between_workers(self):
+        """Test that the workers together allow about the configured per-user limits"""
+        from slack_handlers.supervisor import per_worker_limit
+
+        assert per_worker_limit(10, 1) == 10
+        assert per_worker_limit(10, 4) == 3
+        assert per_worker_limit(1, 4) == 1
+        assert per_worker_limit(0, 4) == 0
+
+
+class TestProvisioningEngine:
+    """Test class for the background VM provisioning engine"""
+
+    @staticmethod
+    def create_engine(checker, **kwargs):
+        from sdk.tools.waiter import Backoff
+        from slack_handlers.provisioning import ProvisioningEngine
+
+        kwargs.setdefault("backoff", Backoff(initial=3600, max_delay=3600))
+        engine = ProvisioningEngine(client=MagicMock(), poll_interval=3600, **kwargs)
+        engine.register_checker("test", checker)
+        return engine
+
+    def test_ready_job_updates_message_and_dms_user(self):
+        """Test that a ready VM updates the original message and DMs the user"""
+        from slack_handlers.provisioning import PENDING, READY
+
+        states = iter(
+            [(PENDING, {}), (READY, {"name": "vm1", "public_ip": "203.0.113.5"})]
+        )
+        engine = self.create_engine(lambda operation, resource: next(states))
+        job = engine.submit(
+            "test",
+            "U1",
+            {"name": "vm1"},
+            channel="C1",
+            ts="111.222",
+            ready_text="ssh ec2-user@{public_ip} -p {port}",
+        )
+
+        assert engine.poll_once() == 1
+        engine.client.chat_update.assert_not_called()
+        assert engine.poll_once() == 0
+        engine.stop()
+
+        assert job.state == READY
+        update = engine.client.chat_update.call_args.kwargs
+        assert update["channel"] == "C1" and update["ts"] == "111.222"
+        assert f"job `{job.job_id}`" in update["text"]
+        assert "ssh ec2-user@203.0.113.5 -p {port}" in update["text"]
+        dm = engine.client.chat_postMessage.call_args.kwargs
+        assert dm["channel"] == "U1"
+        assert engine.get(job.job_id) is None
+
+    def test_failed_and_timed_out_jobs_are_reported(self):
+        """Test that a failing VM and a VM that never gets ready are reported as failed"""
+        from slack_handlers.provisioning import FAILED, PENDING
+
+        engine = self.create_engine(
+            lambda operation, resource: (
+                (FAILED, {"error": "quota exceeded"})
+                if resource["fail"]
+                else (PENDING, {})
+            )
+        )
+        failing = engine.submit("test", "U1", {"fail": True})
+        slow = engine.submit("test", "U1", {"fail": False}, timeout=0)
+
+        assert engine.poll_once() == 0
+        engine.stop()
+
+        assert failing.state == FAILED and failing.error == "quota exceeded"
+        assert slow.state == FAILED and "not ready in time" in slow.error
+        texts = [
+            c.kwargs["text"] for c in engine.client.chat_postMessage.call_args_list
+        ]
+        assert any("quota exceeded" in text for text in texts)
+
+    def test_check_errors_are_retried(self):
+        """Test that an API error during a check keeps the job pending"""
+        from slack_handlers.provisioning import PENDING
+
+        def checker(operation, resource):
+            raise RuntimeError("throttled")
+
+        engine = self.create_engine(checker)
+        job = engine.submit("test", "U1", {})
+        assert engine.poll_once() == 1
+        engine.stop()
+
+        assert job.state == PENDING
+        engine.client.chat_postMessage.assert_not_called()
+
+    def test_many_jobs_share_one_poller_thread(self):
+        """Test that waiting creates do not hold a thread each"""
+        import threading
+
+        from slack_handlers.provisioning import PENDING
+
+        threads_before = threading.active_count()
+        engine = self.create_engine(lambda operation, resource: (PENDING, {}))
+        for i in range(100):
+            engine.submit("test", f"U{i}", {"name": f"vm{i}"})
+
+        assert len(engine.jobs(state=PENDING)) == 100
+        assert threading.active_count() <= threads_before + 1
+        engine.stop(timeout=5)
+
+    def test_check_errors_fail_the_job_after_max_retries(self):
+        """Test that a job fails after too many failed checks in a row"""
+        from slack_handlers.provisioning import FAILED
+
+        def checker(operation, resource):
+            raise RuntimeError("throttled")
+
+        engine = self.create_engine(checker, max_retries=2)
+        job = engine.submit("test", "U1", {})
+        engine.poll_once()
+        assert job.retries == 1
+        engine.poll_once()
+        engine.stop()
+
+        assert job.state == FAILED
+        assert "Gave up after 2 errors: throttled" in job.error
+
+    def test_jobs_are_checked_on_a_backoff_schedule(self):
+        """Test that the poller only checks jobs whose next check is due"""
+        from sdk.tools.waiter import Backoff
+        from slack_handlers.provisioning import PENDING
+
+        checker = MagicMock(return_value=(PENDING, {}))
+        engine = self.create_engine(
+            checker, backoff=Backoff(initial=60, max_delay=600, fast_polls=1, jitter=0)
+        )
+        job = engine.submit("test", "U1", {})
+        assert 59 <= job.next_check - job.submitted_at <= 61
+
+        engine.poll_once(due_only=True)
+        checker.assert_not_called()
+
+        job.next_check = 0
+        engine.poll_once(due_only=True)
+        engine.stop()
+        checker.assert_called_once_with("create", {})
+        assert 119 <= job.next_check - time.time() <= 121  # second delay is doubled
+
+    def test_ready_vm_is_reported_once_ssh_is_reachable(self):
+        """Test that with check_ssh a running VM stays pending until port 22 answers"""
+        from slack_handlers.provisioning import PENDING, READY
+
+        engine = self.create_engine(
+            lambda operation, resource: (READY, {"public_ip": "203.0.113.5"}),
+            check_ssh=True,
+        )
+        job = engine.submit("test", "U1", {"name": "vm1"})
+        with patch(
+            "slack_handlers.provisioning.tcp_reachable", side_effect=[False, True]
+        ) as mock_reachable:
+            assert engine.poll_once() == 1
+            assert job.state == PENDING and "ready" in job.phases
+            assert engine.poll_once() == 0
+        engine.stop()
+
+        mock_reachable.assert_called_with("203.0.113.5")
+        assert job.state == READY
+        assert set(job.phases) == {"ready", "ssh"}
+        assert "SSH after" in engine.client.chat_postMessage.call_args.kwargs["text"]
+
+    def test_pending_jobs_resume_after_restart(self, tmp_path):
+        """Test that a job stored by one process is finished by the next one"""
+        from slack_handlers.job_store import SQLiteJobStore
+        from slack_handlers.provisioning import PENDING, READY
+
+        path = str(tmp_path / "jobs.sqlite3")
+        first = self.create_engine(
+            lambda operation, resource: (PENDING, {}), store=SQLiteJobStore(path)
+        )
+        job = first.submit(
+            "test", "U1", {"name": "vm1"}, operation="delete", channel="C1", ts="1.2"
+        )
+        first.poll_once()
+        first.stop()  # e.g. the pod is restarted
+
+        second = self.create_engine(
+            lambda operation, resource: (READY, {"name": resource["name"]}),
+            store=SQLiteJobStore(path),
+        )
+        second.start()
+        assert [j.job_id for j in second.jobs(state=PENDING)] == [job.job_id]
+        resumed = second.get(job.job_id)
+        assert resumed.operation == "delete" and resumed.checks == 1
+
+        assert second.poll_once() == 0
+        second.stop()
+        assert "`vm1` is deleted" in second.client.chat_update.call_args.kwargs["text"]
+        assert second.store.get(job.job_id)["state"] == READY
+
+    def test_jobs_leased_by_a_live_process_are_not_taken_over(self, tmp_path):
+        """Test that two bot processes sharing the store do not poll the same job"""
+        from slack_handlers.job_store import SQLiteJobStore
+        from slack_handlers.provisioning import PENDING
+
+        path = str(tmp_path / "jobs.sqlite3")
+        first = self.create_engine(
+            lambda operation, resource: (PENDING, {}), store=SQLiteJobStore(path)
+        )
+        first.submit("test", "U1", {})
+
+        second = self.create_engine(
+            lambda operation, resource: (PENDING, {}),
+            store=SQLiteJobStore(path, lease_seconds=0),
+        )
+        assert second.resume() == 0
+        first.stop()  # releases its leases
+        assert second.resume() == 1
+        second.stop()
+
+    def test_create_handler_returns_before_vm_is_ready(self):
+        """Test that `aws vm create` submits the launch and hands readiness to the engine"""
+        from slack_handlers.handlers import handle_create_aws_vm
+        from slack_handlers.provisioning import provisioning_engine
+
+        mock_say = MagicMock()
+        mock_say.return_value = {"ok": True, "channel": "C1", "ts": "1.2"}
+        with (
+            patch("slack_handlers.handlers.config") as mock_config,
+            patch("slack_handlers.handlers.EC2Helper") as mock_ec2_helper,
+            patch("slack_handlers.handlers._helper_select_keypair") as mock_key,
+            patch.object(provisioning_engine, "submit") as mock_submit,
+        ):
+            mock_config.AWS_AMI_MAP = {"linux": "ami-123"}
+            mock_key.return_value = {"KeyName": "U1", "KeyFingerprint": "aa:bb"}
+            mock_ec2 = mock_ec2_helper.return_value
+            mock_ec2.region = "us-east-1"
+            mock_ec2.create_instance.return_value = {
+                "count": 1,
+                "instances": [{"name": "u1-abcde", "instance_id": "i-1"}],
+            }
+
+            handle_create_aws_vm(
+                mock_say,
+                "U1",
+                "us-east-1",
+                MagicMock(),
+                {"os_name": "linux", "instance_type": "t2.micro", "key_pair": "new"},
+            )
+
+        mock_ec2.create_instance.assert_called_once_with(
+            "ami-123", "t2.micro", "U1", wait=False, count=1
+        )
+        args, kwargs = mock_submit.call_args
+        assert args[:3] == (
+            "aws",
+            "U1",
+            {"region": "us-east-1", "instance_id": "i-1", "name": "u1-abcde"},
+        )
+        assert kwargs["channel"] == "C1" and kwargs["ts"] == "1.2"
+        assert f"job `{kwargs['job_id']}`" in mock_say.call_args_list[-1][0][0]
+
+    def test_create_with_count_tracks_each_vm_and_reports_one_table(self):
+        """Test that `aws vm create --count=3` lists the launched VMs with their jobs"""
+        from slack_handlers.handlers import handle_create_aws_vm
+        from slack_handlers.provisioning import provisioning_engine
+
+        mock_say = MagicMock()
+        with (
+            patch("slack_handlers.handlers.config") as mock_config,
+            patch("slack_handlers.handlers.EC2Helper") as mock_ec2_helper,
+            patch("slack_handlers.handlers._helper_select_keypair") as mock_key,
+            patch.object(provisioning_engine, "submit") as mock_submit,
+        ):
+            mock_config.AWS_AMI_MAP = {"linux": "ami-123"}
+            mock_key.return_value = {"KeyName": "U1", "KeyFingerprint": "aa:bb"}
+            mock_ec2 = mock_ec2_helper.return_value
+            mock_ec2.region = "us-east-1"
+            mock_ec2.create_instance.return_value = {
+                "count": 2,
+                "requested": 3,
+                "instances": [
+                    {"name": "u1-abcde-1", "instance_id": "i-1"},
+                    {"name": "u1-abcde-2", "instance_id": "i-2"},
+                ],
+            }
+            mock_submit.side_effect = [
+                MagicMock(job_id="job1"),
+                MagicMock(job_id="job2"),
+            ]
+
+            handle_create_aws_vm(
+                mock_say,
+                "U1",
+                "us-east-1",
+                MagicMock(),
+                {
+                    "os_name": "linux",
+                    "instance_type": "t2.micro",
+                    "key_pair": "existing",
+                    "count": "3",
+                },
+            )
+
+        mock_ec2.create_instance.assert_called_once_with(
+            "ami-123", "t2.micro", "U1", wait=False, count=3
+        )
+        assert [c.args[2]["instance_id"] for c in mock_submit.call_args_list] == [
+            "i-1",
+            "i-2",
+        ]
+        assert "Only 2 of 3 VMs" in str(mock_say.call_args_list[1].kwargs["blocks"])
+        table = mock_say.call_args_list[2][0][0]
+        assert "job1" in table and "u1-abcde-2" in table
+
+    def test_create_rejects_invalid_count(self):
+        """Test that --count outside 1..VM_CREATE_MAX_COUNT is refused before creating"""
+        from slack_handlers.handlers import handle_create_aws_vm
+
+        mock_say = MagicMock()
+        with (
+            patch("slack_handlers.handlers.config") as mock_config,
+            patch("slack_handlers.handlers.EC2Helper") as mock_ec2_helper,
+        ):
+            mock_config.AWS_AMI_MAP = {"linux": "ami-123"}
+            handle_create_aws_vm(
+                mock_say,
+                "U1",
+                "us-east-1",
+                MagicMock(),
+                {
+                    "os_name": "linux",
+                    "instance_type": "t2.micro",
+                    "key_pair": "new",
+                    "count": "50",
+                },
+            )
+
+        mock_ec2_helper.assert_not_called()
+        assert "`--count` must be a number from 1 to 10" in mock_say.call_args[0][0]
+
+    def test_gcp_delete_is_tracked_as_a_job(self):
+        """Test that `gcp vm modify --delete` no longer waits for the operation"""
+        from slack_handlers.handlers import handle_gcp_modify_vm
+        from slack_handlers.provisioning import provisioning_engine
+
+        mock_say = MagicMock()
+        with (
+            patch("slack_handlers.handlers.GCPHelper") as mock_gcp_helper,
+            patch.object(provisioning_engine, "submit") as mock_submit,
+        ):
+            mock_gcp_helper.return_value.delete_instance.return_value = {
+                "success": True,
+                "instance_name": "vm-1",
+                "zone": "asia-south1-a",
+                "operation": "operation-123",
+            }
+            handle_gcp_modify_vm(mock_say, "U1", {"delete": True, "vm-name": "vm-1"})
+
+        mock_gcp_helper.return_value.delete_instance.assert_called_once_with(
+            "vm-1", wait=False
+        )
+        args, kwargs = mock_submit.call_args
+        assert args == (
+            "gcp",
+            "U1",
+            {"name": "vm-1", "zone": "asia-south1-a", "operation": "operation-123"},
+        )
+        assert kwargs["operation"] == "delete"